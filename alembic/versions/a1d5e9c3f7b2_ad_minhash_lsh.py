@@ -0,0 +1,36 @@
+"""ad_minhash: MinHash-подписи объявлений + LSH-бакеты для поиска дублей
+
+Revision ID: a1d5e9c3f7b2
+Revises: f3c6a9d2e8b1
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "a1d5e9c3f7b2"
+down_revision = "f3c6a9d2e8b1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS ad_minhash (
+            ad_id      BIGINT PRIMARY KEY REFERENCES ads(id) ON DELETE CASCADE,
+            role       TEXT NOT NULL,
+            signature  INTEGER[] NOT NULL,
+            bands      BIGINT[] NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+    # bands && :query_bands — кандидаты с хотя бы одним общим LSH-бакетом
+    op.execute("CREATE INDEX IF NOT EXISTS ix_ad_minhash_bands ON ad_minhash USING GIN (bands)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_ad_minhash_bands")
+    op.execute("DROP TABLE IF EXISTS ad_minhash")
@@ -0,0 +1,59 @@
+"""ads: full-text (russian tsvector) + trigram search over published ads
+
+Revision ID: b2e6f1a4c8d3
+Revises: a1d5e9c3f7b2
+Create Date: 2026-10-19 00:00:00.000000
+
+ВАЖНО: STORED generated column переписывает ads целиком под ACCESS EXCLUSIVE локом.
+На 1M объявлений это десятки секунд; bot / jobs лучше остановить.
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "b2e6f1a4c8d3"
+down_revision = "a1d5e9c3f7b2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # веса: title (A) > location (B) > description/about (C); конфиг указан явно -> выражение IMMUTABLE
+    op.execute("""
+        ALTER TABLE ads ADD COLUMN IF NOT EXISTS search_tsv tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(payload->>'title', '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(payload->>'location', '')), 'B')
+            || setweight(
+                to_tsvector('russian', coalesce(payload->>'description', '') || ' ' || coalesce(payload->>'about', '')),
+                'C'
+            )
+        ) STORED
+    """)
+
+    # индексы частичные: ищем только по опубликованным, драфты/модерация не раздувают GIN
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_ads_search_tsv
+        ON ads USING GIN (search_tsv)
+        WHERE status = 'published'
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_ads_title_trgm
+        ON ads USING GIN ((lower(coalesce(payload->>'title', ''))) gin_trgm_ops)
+        WHERE status = 'published'
+    """)
+    # окно кандидатов (ORDER BY id DESC) по частым словам идёт backward-сканом этого индекса
+    op.execute("CREATE INDEX IF NOT EXISTS ix_ads_published_id ON ads (id DESC) WHERE status = 'published'")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_ads_published_id")
+    op.execute("DROP INDEX IF EXISTS ix_ads_title_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_ads_search_tsv")
+    op.execute("ALTER TABLE ads DROP COLUMN IF EXISTS search_tsv")
+    # pg_trgm не удаляем: расширение могут использовать другие объекты
@@ -0,0 +1,260 @@
+"""ads: typed columns derived from payload (title, location_norm, salary, expired_at, channel_message_id, contact_mode)
+
+Revision ID: c3f7a2b9d4e6
+Revises: b2e6f1a4c8d3
+Create Date: 2026-10-19 00:00:00.000000
+
+payload остаётся единственным источником истины: колонки поддерживает BEFORE-триггер
+ads_derive_columns() на любой INSERT / UPDATE OF payload (ORM, patch_payload, сырой SQL jobs).
+
+Миграция онлайн:
+  1) ADD COLUMN без DEFAULT — только каталог, без переписывания таблицы;
+  2) триггер — новые записи сразу с колонками;
+  3) бэкфилл пачками по id (UPDATE ... SET payload = payload), каждая пачка — своя транзакция;
+  4) индексы CREATE INDEX CONCURRENTLY — без блокировки записи.
+Шаги 3-4 идут в autocommit_block: миграцию можно прервать и перезапустить.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "c3f7a2b9d4e6"
+down_revision = "b2e6f1a4c8d3"
+branch_labels = None
+depends_on = None
+
+
+BACKFILL_BATCH = int(os.getenv("ADS_BACKFILL_BATCH", "5000"))
+BACKFILL_PAUSE_SEC = float(os.getenv("ADS_BACKFILL_PAUSE_SEC", "0.05"))
+
+_CHANNEL_MESSAGE_KEYS = (
+    "main_message_id",
+    "main_channel_message_id",
+    "channel_message_id",
+    "published_message_id",
+    "published_post_id",
+    "channel_post_id",
+)
+
+_INDEXES = {
+    # jobs.job_expire_ads: published, ещё не истёкшие, старше TTL
+    "ix_ads_published_unexpired_created": "(created_at) WHERE status = 'published' AND expired_at IS NULL",
+    "ix_ads_published_role_location": "(role, location_norm) WHERE status = 'published'",
+    "ix_ads_published_role_salary": "(role, salary_min, salary_max) WHERE status = 'published'",
+    "ix_ads_channel_message_id": "(channel_message_id) WHERE channel_message_id IS NOT NULL",
+}
+
+
+def _counters_ads_fn(exp_old: str, exp_new: str) -> str:
+    # см миграцию system_counters (d4a8e1f2b3c5); меняется только признак expired
+    return f"""
+        CREATE OR REPLACE FUNCTION system_counters_ads()
+        RETURNS trigger AS $$
+        DECLARE
+            old_pub INT := 0;
+            new_pub INT := 0;
+            old_exp INT := 0;
+            new_exp INT := 0;
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                old_pub := (OLD.status = 'published')::int;
+                old_exp := ({exp_old})::int;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                new_pub := (NEW.status = 'published')::int;
+                new_exp := ({exp_new})::int;
+            END IF;
+
+            IF TG_OP = 'INSERT' THEN
+                PERFORM system_counters_bump('ads_total', 1);
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM system_counters_bump('ads_total', -1);
+            END IF;
+
+            PERFORM system_counters_bump('ads_published', new_pub - old_pub);
+            PERFORM system_counters_bump('ads_expired_auto', new_exp - old_exp);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """
+
+
+def upgrade() -> None:
+    op.execute("""
+        ALTER TABLE ads
+            ADD COLUMN IF NOT EXISTS title              TEXT,
+            ADD COLUMN IF NOT EXISTS location_norm      TEXT,
+            ADD COLUMN IF NOT EXISTS salary_min         INTEGER,
+            ADD COLUMN IF NOT EXISTS salary_max         INTEGER,
+            ADD COLUMN IF NOT EXISTS expired_at         TIMESTAMPTZ,
+            ADD COLUMN IF NOT EXISTS channel_message_id BIGINT,
+            ADD COLUMN IF NOT EXISTS contact_mode       TEXT
+    """)
+
+    # "от 80 000 до 120 000 ₽" -> {80000,120000}; "80к" -> {80000,80000}; "до 50 тыс" -> {NULL,50000}.
+    # Суммы < 1000 (почасовые ставки, "2/2") не считаются; не распознали — {NULL,NULL}.
+    op.execute(r"""
+        CREATE OR REPLACE FUNCTION ads_parse_salary(_raw TEXT)
+        RETURNS INT[] AS $$
+        DECLARE
+            s    TEXT;
+            m    TEXT[];
+            v    NUMERIC;
+            vals NUMERIC[] := '{}';
+            lo   NUMERIC;
+            hi   NUMERIC;
+        BEGIN
+            IF _raw IS NULL OR btrim(_raw) = '' THEN
+                RETURN ARRAY[NULL, NULL]::INT[];
+            END IF;
+
+            s := lower(_raw);
+            -- разделители разрядов: "120 000" / "120\u00a0000" -> "120000"
+            s := regexp_replace(s, '(\d)[\s\u00a0]+(?=\d{3}(\D|$))', '\1', 'g');
+
+            FOR m IN SELECT regexp_matches(s, '(\d+(?:[.,]\d+)?)\s*(к|k|тыс)?', 'g') LOOP
+                v := replace(m[1], ',', '.')::NUMERIC;
+                IF m[2] IS NOT NULL THEN
+                    v := v * 1000;
+                END IF;
+                IF v >= 1000 AND v <= 100000000 THEN
+                    vals := vals || v;
+                END IF;
+            END LOOP;
+
+            IF array_length(vals, 1) IS NULL THEN
+                RETURN ARRAY[NULL, NULL]::INT[];
+            END IF;
+
+            SELECT min(x), max(x) INTO lo, hi FROM unnest(vals) AS x;
+            IF lo = hi THEN
+                IF s ~ '(^|\s)до\s' AND s !~ '(^|\s)от\s' THEN
+                    lo := NULL;
+                ELSIF s ~ '(^|\s)от\s' AND s !~ '(^|\s)до\s' THEN
+                    hi := NULL;
+                END IF;
+            END IF;
+            RETURN ARRAY[round(lo)::INT, round(hi)::INT];
+        END;
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """)
+
+    keys = ", ".join(f"'{k}'" for k in _CHANNEL_MESSAGE_KEYS)
+    op.execute(rf"""
+        CREATE OR REPLACE FUNCTION ads_derive_columns()
+        RETURNS trigger AS $$
+        DECLARE
+            p   JSONB := COALESCE(NEW.payload, '{{}}'::jsonb);
+            sal INT[];
+            k   TEXT;
+            v   TEXT;
+            exp TIMESTAMPTZ;
+        BEGIN
+            NEW.title := NULLIF(btrim(p->>'title'), '');
+            NEW.location_norm := NULLIF(
+                btrim(regexp_replace(lower(translate(COALESCE(p->>'location', ''), 'Ёё', 'ее')), '\s+', ' ', 'g')),
+                ''
+            );
+            NEW.contact_mode := NULLIF(p->>'contact_mode', '');
+
+            sal := ads_parse_salary(p->>'salary');
+            NEW.salary_min := sal[1];
+            NEW.salary_max := sal[2];
+
+            -- те же ключи и порядок, что читали responds / resurrection_worker
+            NEW.channel_message_id := NULL;
+            FOREACH k IN ARRAY ARRAY[{keys}] LOOP
+                v := p->>k;
+                IF v ~ '^\d{{1,18}}$' THEN
+                    IF v::BIGINT > 0 THEN
+                        NEW.channel_message_id := v::BIGINT;
+                        EXIT;
+                    END IF;
+                END IF;
+            END LOOP;
+
+            -- без ::boolean — кривое значение в payload не должно ронять запись объявления
+            IF COALESCE(p->>'expired_auto', '') IN ('true', 't', '1') THEN
+                exp := NULL;
+                BEGIN
+                    exp := (p->>'expired_auto_at')::TIMESTAMPTZ;
+                EXCEPTION WHEN others THEN
+                    exp := NULL;
+                END;
+                IF TG_OP = 'UPDATE' THEN
+                    exp := COALESCE(exp, OLD.expired_at);
+                END IF;
+                NEW.expired_at := COALESCE(exp, NOW());
+            ELSE
+                NEW.expired_at := NULL;
+            END IF;
+
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    op.execute("DROP TRIGGER IF EXISTS trg_ads_derive_columns ON ads")
+    op.execute("""
+        CREATE TRIGGER trg_ads_derive_columns
+        BEFORE INSERT OR UPDATE OF payload ON ads
+        FOR EACH ROW EXECUTE FUNCTION ads_derive_columns()
+    """)
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        last_id = 0
+        while True:
+            ids = bind.execute(
+                sa.text("""
+                    WITH batch AS (
+                        SELECT id FROM ads WHERE id > :last_id ORDER BY id LIMIT :n
+                    )
+                    UPDATE ads a
+                    SET payload = a.payload
+                    FROM batch
+                    WHERE a.id = batch.id
+                    RETURNING a.id
+                """),
+                {"last_id": last_id, "n": BACKFILL_BATCH},
+            ).scalars().all()
+            if not ids:
+                break
+            last_id = max(ids)
+            if BACKFILL_PAUSE_SEC > 0:
+                time.sleep(BACKFILL_PAUSE_SEC)
+
+        # колонки заполнены -> счётчик expired читает колонку (payload в AFTER-триггере больше не нужен)
+        bind.execute(sa.text(_counters_ads_fn("OLD.expired_at IS NOT NULL", "NEW.expired_at IS NOT NULL")))
+
+        for name, spec in _INDEXES.items():
+            bind.execute(sa.text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON ads {spec}"))
+
+
+def downgrade() -> None:
+    op.execute(_counters_ads_fn(
+        "COALESCE(OLD.payload->>'expired_auto', '') IN ('true', 't', '1')",
+        "COALESCE(NEW.payload->>'expired_auto', '') IN ('true', 't', '1')",
+    ))
+    for name in _INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("DROP TRIGGER IF EXISTS trg_ads_derive_columns ON ads")
+    op.execute("DROP FUNCTION IF EXISTS ads_derive_columns()")
+    op.execute("DROP FUNCTION IF EXISTS ads_parse_salary(TEXT)")
+    op.execute("""
+        ALTER TABLE ads
+            DROP COLUMN IF EXISTS title,
+            DROP COLUMN IF EXISTS location_norm,
+            DROP COLUMN IF EXISTS salary_min,
+            DROP COLUMN IF EXISTS salary_max,
+            DROP COLUMN IF EXISTS expired_at,
+            DROP COLUMN IF EXISTS channel_message_id,
+            DROP COLUMN IF EXISTS contact_mode
+    """)
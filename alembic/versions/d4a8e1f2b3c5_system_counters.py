@@ -0,0 +1,171 @@
+"""system counters maintained by triggers
+
+Revision ID: d4a8e1f2b3c5
+Revises: c9d4e7a1b2f3
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "d4a8e1f2b3c5"
+down_revision = "c9d4e7a1b2f3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 1) Таблица счётчиков: одна строка = один счётчик
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS system_counters (
+            name       TEXT PRIMARY KEY,
+            value      BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+
+    # 2) Атомарный инкремент (delta = 0 ничего не пишет — не держим лок строки зря)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION system_counters_bump(_name TEXT, _delta BIGINT)
+        RETURNS void AS $$
+        BEGIN
+            IF _delta = 0 THEN
+                RETURN;
+            END IF;
+            INSERT INTO system_counters (name, value, updated_at)
+            VALUES (_name, _delta, NOW())
+            ON CONFLICT (name) DO UPDATE
+            SET value = system_counters.value + EXCLUDED.value,
+                updated_at = NOW();
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # 3) ads: total / published / expired_auto
+    #    (без ::boolean — кривое значение в payload не должно ронять запись объявления)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION system_counters_ads()
+        RETURNS trigger AS $$
+        DECLARE
+            old_pub INT := 0;
+            new_pub INT := 0;
+            old_exp INT := 0;
+            new_exp INT := 0;
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                old_pub := (OLD.status = 'published')::int;
+                old_exp := (COALESCE(OLD.payload->>'expired_auto', '') IN ('true', 't', '1'))::int;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                new_pub := (NEW.status = 'published')::int;
+                new_exp := (COALESCE(NEW.payload->>'expired_auto', '') IN ('true', 't', '1'))::int;
+            END IF;
+
+            IF TG_OP = 'INSERT' THEN
+                PERFORM system_counters_bump('ads_total', 1);
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM system_counters_bump('ads_total', -1);
+            END IF;
+
+            PERFORM system_counters_bump('ads_published', new_pub - old_pub);
+            PERFORM system_counters_bump('ads_expired_auto', new_exp - old_exp);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # 4) responds: total + по статусам (responds_status:<STATUS>)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION system_counters_responds()
+        RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM system_counters_bump('responds_total', 1);
+                PERFORM system_counters_bump('responds_status:' || NEW.status, 1);
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM system_counters_bump('responds_total', -1);
+                PERFORM system_counters_bump('responds_status:' || OLD.status, -1);
+            ELSIF NEW.status IS DISTINCT FROM OLD.status THEN
+                PERFORM system_counters_bump('responds_status:' || OLD.status, -1);
+                PERFORM system_counters_bump('responds_status:' || NEW.status, 1);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # 5) respond_events: total + по event_type (events_type:<type>), события append-only
+    op.execute("""
+        CREATE OR REPLACE FUNCTION system_counters_respond_events()
+        RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM system_counters_bump('events_total', 1);
+                PERFORM system_counters_bump('events_type:' || NEW.event_type, 1);
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM system_counters_bump('events_total', -1);
+                PERFORM system_counters_bump('events_type:' || OLD.event_type, -1);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    op.execute("DROP TRIGGER IF EXISTS trg_system_counters_ads ON ads")
+    op.execute("""
+        CREATE TRIGGER trg_system_counters_ads
+        AFTER INSERT OR UPDATE OF status, payload OR DELETE ON ads
+        FOR EACH ROW EXECUTE FUNCTION system_counters_ads()
+    """)
+
+    op.execute("DROP TRIGGER IF EXISTS trg_system_counters_responds ON responds")
+    op.execute("""
+        CREATE TRIGGER trg_system_counters_responds
+        AFTER INSERT OR UPDATE OF status OR DELETE ON responds
+        FOR EACH ROW EXECUTE FUNCTION system_counters_responds()
+    """)
+
+    op.execute("DROP TRIGGER IF EXISTS trg_system_counters_respond_events ON respond_events")
+    op.execute("""
+        CREATE TRIGGER trg_system_counters_respond_events
+        AFTER INSERT OR DELETE ON respond_events
+        FOR EACH ROW EXECUTE FUNCTION system_counters_respond_events()
+    """)
+
+    # 6) Backfill: один раз считаем честный COUNT(*) (триггеры уже висят — лочим таблицы,
+    #    чтобы не потерять записи между подсчётом и заливкой)
+    op.execute("LOCK TABLE ads, responds, respond_events IN SHARE MODE")
+    op.execute("DELETE FROM system_counters")
+    op.execute("""
+        INSERT INTO system_counters (name, value, updated_at)
+        SELECT 'ads_total', COUNT(*), NOW() FROM ads
+        UNION ALL
+        SELECT 'ads_published', COUNT(*), NOW() FROM ads WHERE status = 'published'
+        UNION ALL
+        SELECT 'ads_expired_auto', COUNT(*), NOW() FROM ads
+        WHERE COALESCE(payload->>'expired_auto', '') IN ('true', 't', '1')
+        UNION ALL
+        SELECT 'responds_total', COUNT(*), NOW() FROM responds
+        UNION ALL
+        SELECT 'responds_status:' || status, COUNT(*), NOW() FROM responds GROUP BY status
+        UNION ALL
+        SELECT 'events_total', COUNT(*), NOW() FROM respond_events
+        UNION ALL
+        SELECT 'events_type:' || event_type, COUNT(*), NOW() FROM respond_events GROUP BY event_type
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_system_counters_respond_events ON respond_events")
+    op.execute("DROP TRIGGER IF EXISTS trg_system_counters_responds ON responds")
+    op.execute("DROP TRIGGER IF EXISTS trg_system_counters_ads ON ads")
+
+    op.execute("DROP FUNCTION IF EXISTS system_counters_respond_events()")
+    op.execute("DROP FUNCTION IF EXISTS system_counters_responds()")
+    op.execute("DROP FUNCTION IF EXISTS system_counters_ads()")
+    op.execute("DROP FUNCTION IF EXISTS system_counters_bump(TEXT, BIGINT)")
+
+    op.execute("DROP TABLE IF EXISTS system_counters")
@@ -0,0 +1,95 @@
+"""candidate_profiles: citizenship_code + индексы под поиск анкет с keyset-пагинацией
+
+Revision ID: d5b8e3c1f9a7
+Revises: c3f7a2b9d4e6
+Create Date: 2026-10-19 00:00:00.000000
+
+citizenship ILIKE '%x%' и ORDER BY coalesce(...) OFFSET не использовали индексы.
+Теперь: равенство по citizenship_code / lower(username) и индекс по ключу сортировки.
+Бэкфилл и индексы — онлайн (пачки + CONCURRENTLY), как в ads_typed_columns.
+"""
+
+from __future__ import annotations
+
+import os
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "d5b8e3c1f9a7"
+down_revision = "c3f7a2b9d4e6"
+branch_labels = None
+depends_on = None
+
+
+BACKFILL_BATCH = int(os.getenv("PROFILES_BACKFILL_BATCH", "5000"))
+
+# снимок findex_bot/utils/citizenship.py на момент миграции (нормализованный текст -> код)
+_CODES = {
+    "ru": "ru", "kz": "kz", "by": "by", "ua": "ua", "am": "am",
+    "az": "az", "ge": "ge", "uz": "uz", "tj": "tj", "kg": "kg",
+    "россия": "ru", "рф": "ru", "российская федерация": "ru", "russia": "ru",
+    "казахстан": "kz", "kazakhstan": "kz",
+    "беларусь": "by", "белоруссия": "by", "рб": "by", "belarus": "by",
+    "украина": "ua", "ukraine": "ua",
+    "армения": "am", "armenia": "am",
+    "азербайджан": "az", "azerbaijan": "az",
+    "грузия": "ge", "georgia": "ge",
+    "узбекистан": "uz", "uzbekistan": "uz",
+    "таджикистан": "tj", "tajikistan": "tj",
+    "кыргызстан": "kg", "киргизия": "kg", "киргизстан": "kg", "кыргызская республика": "kg", "kyrgyzstan": "kg",
+}
+
+_ACTIVITY = "(COALESCE(last_responded_at, updated_at)) DESC, user_id DESC"
+
+_INDEXES = {
+    "ix_candidate_profiles_activity": f"({_ACTIVITY})",
+    "ix_candidate_profiles_cit_activity": f"(citizenship_code, {_ACTIVITY})",
+    "ix_candidate_profiles_username_lower": "(lower(username))",
+}
+
+
+def upgrade() -> None:
+    # константный DEFAULT — только каталог (PG 11+), без переписывания таблицы
+    op.execute("ALTER TABLE candidate_profiles ADD COLUMN IF NOT EXISTS citizenship_code TEXT NOT NULL DEFAULT ''")
+
+    values = ", ".join(f"('{k}', '{v}')" for k, v in _CODES.items())
+    backfill_sql = sa.text(rf"""
+        WITH batch AS (
+            SELECT user_id,
+                   btrim(regexp_replace(replace(lower(btrim(citizenship)), 'ё', 'е'), '[\s\-]+', ' ', 'g')) AS norm
+            FROM candidate_profiles
+            WHERE user_id > :last_id
+            ORDER BY user_id
+            LIMIT :n
+        )
+        UPDATE candidate_profiles p
+        SET citizenship_code = COALESCE(m.code, batch.norm)
+        FROM batch
+        LEFT JOIN (VALUES {values}) AS m(norm, code) ON m.norm = batch.norm
+        WHERE p.user_id = batch.user_id
+        RETURNING p.user_id
+    """)
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        last_id = 0
+        while True:
+            ids = bind.execute(backfill_sql, {"last_id": last_id, "n": BACKFILL_BATCH}).scalars().all()
+            if not ids:
+                break
+            last_id = max(ids)
+
+        for name, spec in _INDEXES.items():
+            bind.execute(sa.text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON candidate_profiles {spec}"))
+        # фильтр по гражданству теперь через citizenship_code; индекс по сырому тексту не нужен
+        bind.execute(sa.text("DROP INDEX CONCURRENTLY IF EXISTS ix_candidate_profiles_citizenship"))
+
+
+def downgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS ix_candidate_profiles_citizenship ON candidate_profiles (citizenship)")
+    for name in _INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("ALTER TABLE candidate_profiles DROP COLUMN IF EXISTS citizenship_code")
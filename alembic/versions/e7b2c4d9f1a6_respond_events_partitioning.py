@@ -0,0 +1,181 @@
+"""respond_events: monthly range partitioning by created_at + global dedup registry
+
+Revision ID: e7b2c4d9f1a6
+Revises: d4a8e1f2b3c5
+Create Date: 2026-10-19 00:00:00.000000
+
+ВАЖНО: миграция переливает respond_events целиком под ACCESS EXCLUSIVE локом.
+Для текущих объёмов это секунды; bot / jobs / resurrection_worker лучше остановить.
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "e7b2c4d9f1a6"
+down_revision = "d4a8e1f2b3c5"
+branch_labels = None
+depends_on = None
+
+
+_COLUMNS = "id, respond_id, actor_role, actor_user_id, event_type, payload, dedup_key, created_at"
+
+
+def _create_indexes() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS ix_respond_events_respond_id ON respond_events (respond_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_respond_events_created_at ON respond_events (created_at)")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_respond_events_res_stage_created_at
+        ON respond_events (created_at)
+        WHERE actor_role = 'system' AND event_type = 'resurrection_stage'
+    """)
+
+
+def _create_counters_trigger() -> None:
+    # см миграцию system_counters (d4a8e1f2b3c5)
+    op.execute("DROP TRIGGER IF EXISTS trg_system_counters_respond_events ON respond_events")
+    op.execute("""
+        CREATE TRIGGER trg_system_counters_respond_events
+        AFTER INSERT OR DELETE ON respond_events
+        FOR EACH ROW EXECUTE FUNCTION system_counters_respond_events()
+    """)
+
+
+def upgrade() -> None:
+    op.execute("LOCK TABLE respond_events IN ACCESS EXCLUSIVE MODE")
+
+    # 1) Глобальный реестр dedup_key (UNIQUE на партиционированной таблице без created_at невозможен)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS respond_event_dedup (
+            dedup_key  TEXT PRIMARY KEY,
+            respond_id BIGINT NOT NULL,
+            event_id   BIGINT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_respond_event_dedup_created_at
+        ON respond_event_dedup (created_at)
+    """)
+    op.execute("""
+        INSERT INTO respond_event_dedup (dedup_key, respond_id, event_id, created_at)
+        SELECT dedup_key, respond_id, id, created_at
+        FROM respond_events
+        WHERE dedup_key IS NOT NULL
+        ON CONFLICT (dedup_key) DO NOTHING
+    """)
+
+    # 2) Старую таблицу убираем в сторону (имя PK-индекса освобождаем под новую таблицу)
+    op.execute("ALTER TABLE respond_events RENAME TO respond_events_legacy")
+    op.execute("ALTER INDEX IF EXISTS respond_events_pkey RENAME TO respond_events_legacy_pkey")
+
+    # 3) Новая партиционированная таблица
+    op.execute("CREATE SEQUENCE IF NOT EXISTS respond_events_part_id_seq AS BIGINT")
+    op.execute("""
+        CREATE TABLE respond_events (
+            id            BIGINT NOT NULL DEFAULT nextval('respond_events_part_id_seq'),
+            respond_id    BIGINT NOT NULL REFERENCES responds (id) ON DELETE CASCADE,
+            actor_role    TEXT NOT NULL,
+            actor_user_id BIGINT NULL,
+            event_type    TEXT NOT NULL,
+            payload       JSONB NOT NULL DEFAULT '{}'::jsonb,
+            dedup_key     TEXT NULL,
+            created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+            CONSTRAINT respond_events_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT ck_respond_events_actor_role
+                CHECK (actor_role IN ('system','author','candidate')),
+            CONSTRAINT ck_respond_events_actor_user_id
+                CHECK (
+                    (actor_role = 'system' AND actor_user_id IS NULL)
+                    OR
+                    (actor_role IN ('author','candidate') AND actor_user_id IS NOT NULL)
+                )
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE respond_events_part_id_seq OWNED BY respond_events.id")
+
+    # 4) Помесячные партиции: от самого старого события до +2 месяцев вперёд.
+    #    Дальше их заранее создаёт jobs (findex_bot/db/event_partitions.py).
+    op.execute("""
+        DO $$
+        DECLARE
+            m      DATE;
+            m_last DATE := (date_trunc('month', NOW()) + INTERVAL '2 months')::date;
+        BEGIN
+            SELECT COALESCE(date_trunc('month', MIN(created_at))::date, date_trunc('month', NOW())::date)
+            INTO m
+            FROM respond_events_legacy;
+
+            WHILE m <= m_last LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF respond_events FOR VALUES FROM (%L) TO (%L)',
+                    'respond_events_p' || to_char(m, 'YYYYMM'),
+                    m,
+                    (m + INTERVAL '1 month')::date
+                );
+                m := (m + INTERVAL '1 month')::date;
+            END LOOP;
+        END
+        $$
+    """)
+    op.execute("CREATE TABLE IF NOT EXISTS respond_events_default PARTITION OF respond_events DEFAULT")
+
+    # 5) Переливаем данные (триггер счётчиков вешаем после — события уже посчитаны)
+    op.execute(f"INSERT INTO respond_events ({_COLUMNS}) SELECT {_COLUMNS} FROM respond_events_legacy")
+    op.execute("""
+        SELECT setval(
+            'respond_events_part_id_seq',
+            COALESCE((SELECT MAX(id) FROM respond_events), 0) + 1,
+            false
+        )
+    """)
+    op.execute("DROP TABLE respond_events_legacy")
+
+    _create_indexes()
+    _create_counters_trigger()
+
+
+def downgrade() -> None:
+    op.execute("LOCK TABLE respond_events IN ACCESS EXCLUSIVE MODE")
+
+    op.execute("ALTER TABLE respond_events RENAME TO respond_events_partitioned")
+    op.execute("ALTER INDEX IF EXISTS respond_events_pkey RENAME TO respond_events_partitioned_pkey")
+    op.execute("ALTER SEQUENCE respond_events_part_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE respond_events (
+            id            BIGINT NOT NULL DEFAULT nextval('respond_events_part_id_seq') PRIMARY KEY,
+            respond_id    BIGINT NOT NULL REFERENCES responds (id) ON DELETE CASCADE,
+            actor_role    TEXT NOT NULL,
+            actor_user_id BIGINT NULL,
+            event_type    TEXT NOT NULL,
+            payload       JSONB NOT NULL DEFAULT '{}'::jsonb,
+            dedup_key     TEXT NULL,
+            created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+            CONSTRAINT ck_respond_events_actor_role
+                CHECK (actor_role IN ('system','author','candidate')),
+            CONSTRAINT ck_respond_events_actor_user_id
+                CHECK (
+                    (actor_role = 'system' AND actor_user_id IS NULL)
+                    OR
+                    (actor_role IN ('author','candidate') AND actor_user_id IS NOT NULL)
+                )
+        )
+    """)
+    op.execute(f"INSERT INTO respond_events ({_COLUMNS}) SELECT {_COLUMNS} FROM respond_events_partitioned")
+    op.execute("DROP TABLE respond_events_partitioned CASCADE")
+    op.execute("ALTER SEQUENCE respond_events_part_id_seq OWNED BY respond_events.id")
+
+    _create_indexes()
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_respond_events_dedup_key
+        ON respond_events (dedup_key)
+        WHERE dedup_key IS NOT NULL
+    """)
+    _create_counters_trigger()
+
+    op.execute("DROP TABLE IF EXISTS respond_event_dedup")
@@ -0,0 +1,33 @@
+"""ads: partial index под keyset-очередь модерации (status = 'pending', updated_at, id)
+
+Revision ID: e7c4a1f8b2d6
+Revises: d5b8e3c1f9a7
+Create Date: 2026-10-19 00:00:00.000000
+
+/намодерации листает pending по (updated_at, id) keyset-курсором (utils/moderation_queue);
+индекс маленький — в нём только объявления на модерации. Строится CONCURRENTLY.
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "e7c4a1f8b2d6"
+down_revision = "d5b8e3c1f9a7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.get_bind().execute(sa.text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_ads_pending_updated "
+            "ON ads (updated_at, id) WHERE status = 'pending'"
+        ))
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_ads_pending_updated")
@@ -0,0 +1,36 @@
+"""daily_pub_limits table (раньше создавалась лениво на каждый вызов)
+
+Revision ID: f3c6a9d2e8b1
+Revises: e7b2c4d9f1a6
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "f3c6a9d2e8b1"
+down_revision = "e7b2c4d9f1a6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # IF NOT EXISTS: на живых базах таблица уже создана старым рантайм-кодом
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS daily_pub_limits (
+            user_id    BIGINT NOT NULL,
+            day_utc    DATE   NOT NULL,
+            cnt        INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (user_id, day_utc)
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_daily_pub_limits_day_utc ON daily_pub_limits (day_utc)")
+
+
+def downgrade() -> None:
+    # данные лимитов не удаляем: старый рантайм-код продолжит работать с этой же таблицей
+    op.execute("DROP INDEX IF EXISTS ix_daily_pub_limits_day_utc")
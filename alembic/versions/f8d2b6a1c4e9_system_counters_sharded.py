@@ -0,0 +1,87 @@
+"""system_counters: шардированные строки (name, shard) вместо одной строки на счётчик
+
+Revision ID: f8d2b6a1c4e9
+Revises: e7c4a1f8b2d6
+Create Date: 2026-10-19 00:00:00.000000
+
+Было: AFTER-триггеры на ads / responds / respond_events делали UPSERT в одну строку счётчика —
+все транзакции, пишущие в эти таблицы, стояли в очереди на row-lock 'ads_total' / 'events_total'
+до своего COMMIT.
+Стало: system_counters_bump пишет в случайный из SYSTEM_COUNTER_SHARDS шардов (name, shard),
+конкурентные вставки почти не встречаются на одной строке; читатель суммирует по name.
+Сигнатура system_counters_bump(name, delta) не меняется — триггеры и ручные поправки
+(db/event_partitions) работают как были.
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "f8d2b6a1c4e9"
+down_revision = "e7c4a1f8b2d6"
+branch_labels = None
+depends_on = None
+
+SYSTEM_COUNTER_SHARDS = 16
+
+
+def upgrade() -> None:
+    # 1) Ключ (name, shard); существующие значения остаются в шарде 0
+    op.execute("ALTER TABLE system_counters ADD COLUMN IF NOT EXISTS shard SMALLINT NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE system_counters DROP CONSTRAINT IF EXISTS system_counters_pkey")
+    op.execute("ALTER TABLE system_counters ADD CONSTRAINT system_counters_pkey PRIMARY KEY (name, shard)")
+
+    # 2) Инкремент в случайный шард (delta = 0 по-прежнему ничего не пишет)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION system_counters_bump(_name TEXT, _delta BIGINT)
+        RETURNS void AS $$
+        BEGIN
+            IF _delta = 0 THEN
+                RETURN;
+            END IF;
+            INSERT INTO system_counters (name, shard, value, updated_at)
+            VALUES (_name, floor(random() * {SYSTEM_COUNTER_SHARDS})::smallint, _delta, NOW())
+            ON CONFLICT (name, shard) DO UPDATE
+            SET value = system_counters.value + EXCLUDED.value,
+                updated_at = NOW();
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+
+def downgrade() -> None:
+    # Схлопываем шарды обратно в одну строку на счётчик
+    op.execute("LOCK TABLE system_counters IN EXCLUSIVE MODE")
+    op.execute("""
+        CREATE TEMP TABLE _system_counters_sum ON COMMIT DROP AS
+        SELECT name, SUM(value)::bigint AS value, MAX(updated_at) AS updated_at
+        FROM system_counters
+        GROUP BY name
+    """)
+    op.execute("DELETE FROM system_counters")
+    op.execute("""
+        INSERT INTO system_counters (name, shard, value, updated_at)
+        SELECT name, 0, value, updated_at FROM _system_counters_sum
+    """)
+
+    op.execute("ALTER TABLE system_counters DROP CONSTRAINT IF EXISTS system_counters_pkey")
+    op.execute("ALTER TABLE system_counters DROP COLUMN IF EXISTS shard")
+    op.execute("ALTER TABLE system_counters ADD CONSTRAINT system_counters_pkey PRIMARY KEY (name)")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION system_counters_bump(_name TEXT, _delta BIGINT)
+        RETURNS void AS $$
+        BEGIN
+            IF _delta = 0 THEN
+                RETURN;
+            END IF;
+            INSERT INTO system_counters (name, value, updated_at)
+            VALUES (_name, _delta, NOW())
+            ON CONFLICT (name) DO UPDATE
+            SET value = system_counters.value + EXCLUDED.value,
+                updated_at = NOW();
+        END;
+        $$ LANGUAGE plpgsql
+    """)
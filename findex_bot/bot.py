@@ -3,28 +3,32 @@ from __future__ import annotations
 
 import os
 import asyncio
+import importlib
+import importlib.util
 import logging
 import uuid
 import contextlib
 from pathlib import Path
 from dataclasses import dataclass
+from typing import Any
 
 from dotenv import load_dotenv
 
-from aiogram import Bot, Dispatcher, Router, F
+from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
-from aiogram.client.session.aiohttp import AiohttpSession
-from aiogram.filters import CommandStart
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.fsm.context import FSMContext
 from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
 
 import findex_bot.runtime as runtime
 
 from findex_bot.middlewares.subscription import SubscriptionMiddleware
 from findex_bot.middlewares.fsm_watchdog import FSMWatchdogMiddleware
 from findex_bot.middlewares.published_guard import PublishedPreviewGuardMiddleware
+from findex_bot.middlewares.throttle import ThrottleMiddleware
+from findex_bot.middlewares import callback_trie
+from findex_bot.utils import fsm_batch, limits, metrics, redis_conn, supervisor, tg_client
 
 logging.basicConfig(level=logging.INFO, force=True)
 
@@ -79,17 +83,6 @@ runtime.MAIN_CHANNEL_ID = config.main_channel_id
 runtime.THREAD_VACANCIES = config.thread_vacancies
 runtime.CHANNEL_USERNAME = config.channel_username
 
-if not hasattr(runtime, "PUBLISHED_PREVIEW_MESSAGES"):
-    runtime.PUBLISHED_PREVIEW_MESSAGES = {}
-if not hasattr(runtime, "ADS_PENDING"):
-    runtime.ADS_PENDING = {}
-if not hasattr(runtime, "ADS_REJECTED"):
-    runtime.ADS_REJECTED = {}
-if not hasattr(runtime, "PUBLISHED_POSTS"):
-    runtime.PUBLISHED_POSTS = {}
-if not hasattr(runtime, "USER_PUB_COUNTER"):
-    runtime.USER_PUB_COUNTER = {}
-
 if not hasattr(runtime, "ALERTS_STORE"):
     runtime.ALERTS_STORE = {}
 if not hasattr(runtime, "REDIS"):
@@ -101,84 +94,38 @@ if not hasattr(runtime, "BOT_USERNAME"):
     runtime.BOT_USERNAME = None
 
 # ---------------- ROUTERS ----------------
-from findex_bot.handlers.fsm_watchdog import router as fsm_watchdog_router
-from findex_bot.handlers.subscription import router as subscription_router
-from findex_bot.handlers.start import router as start_router
-from findex_bot.handlers.menu import router as menu_router
-from findex_bot.handlers.help import router as help_router
-from findex_bot.handlers.diagnostics import router as diagnostics_router
-from findex_bot.handlers.system_admin import router as system_admin_router
-from findex_bot.handlers.moderation import router as moderation_router
-from findex_bot.handlers.forms import router as forms_router
-from findex_bot.handlers.employer import router as employer_router
-from findex_bot.handlers.seeker import router as seeker_router
-from findex_bot.handlers.replies import router as replies_router
-from findex_bot.handlers.alerts import router as alerts_router
-from findex_bot.handlers.responds import router as responds_router
-from findex_bot.handlers.inline_share import router as inline_share_router
-
-from findex_bot.handlers.debug_ping import (
-    router as debug_ping_router,
-    CallbackLoggerMiddleware,
+# Entry points "module:attr" в порядке include_router. Модули хендлеров импортируются
+# только в setup_dispatcher: import findex_bot.bot (webhook-ингресс, утилиты, тесты)
+# не тянет responds/forms/alerts и таблицы метро.
+ROUTER_ENTRYPOINTS: tuple[str, ...] = (
+    "findex_bot.handlers.fsm_watchdog:router",
+    "findex_bot.handlers.help:router",
+    "findex_bot.handlers.menu:router",
+    "findex_bot.handlers.system_admin:router",
+
+    "findex_bot.handlers.deeplink:router",
+    "findex_bot.handlers.inline_share:router",
+
+    "findex_bot.handlers.alerts:router",
+    "findex_bot.handlers.diagnostics:router",
+    "findex_bot.handlers.start:router",
+
+    "findex_bot.handlers.forms:router",
+    "findex_bot.handlers.moderation:router",
+
+    "findex_bot.handlers.employer:router",
+    "findex_bot.handlers.seeker:router",
+    "findex_bot.handlers.replies:router",
+    "findex_bot.handlers.responds:router",
+
+    "findex_bot.handlers.subscription:router",
+    "findex_bot.handlers.debug_ping:router",
 )
 
-from findex_bot.handlers.forms import SavedHintMiddleware
-
-
-# ---------------- DEEP-LINK ROUTER (/start resp_<ad_id>) ----------------
-deeplink_router = Router()
-
 
-@deeplink_router.message(CommandStart(deep_link=True), F.text.regexp(r"^/start\s+resp_\d+\s*$"))
-async def _start_deeplink_entry(message: Message, state: FSMContext):
-    text = (message.text or "").strip()
-    parts = text.split(maxsplit=1)
-    payload = parts[1].strip() if len(parts) > 1 else ""
-
-    ad_part = payload.replace("resp_", "", 1).strip()
-
-    try:
-        ad_id = int(ad_part)
-        if ad_id <= 0:
-            raise ValueError("ad_id must be > 0")
-    except Exception:
-        await message.answer(
-            "⚠️ Некорректная ссылка на объявление.\n"
-            "Открой объявление в канале и нажми «📩 Откликнуться» ещё раз."
-        )
-        return
-
-    try:
-        import findex_bot.handlers.responds as responds_mod  # type: ignore
-
-        for fname in ("start_from_deeplink", "handle_deeplink_start"):
-            fn = getattr(responds_mod, fname, None)
-            if callable(fn):
-                await fn(message, ad_id, state=state, redis=getattr(runtime, "REDIS", None))  # type: ignore
-
-                # Удаляем только техническое /start-сообщение
-                # только в сценарии valid deep-link resp_<ad_id>
-                with contextlib.suppress(Exception):
-                    await message.delete()
-                return
-    except Exception:
-        logging.exception("deeplink -> responds entry failed")
-
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="📩 Откликнуться", callback_data=f"respond:{ad_id}")]
-        ]
-    )
-    await message.answer(
-        "📩 Как ты хочешь откликнуться на объявление?\n\n"
-        "Нажми кнопку ниже — бот продолжит отклик.",
-        reply_markup=kb,
-    )
-
-    # И здесь тоже удаляем только техническое /start-сообщение
-    # в рамках того же valid deep-link сценария
-    with contextlib.suppress(Exception):
-        await message.delete()
+def load_entrypoint(spec: str) -> Any:
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
 
 
 # ---------------- SINGLE INSTANCE GUARD ----------------
@@ -186,43 +133,6 @@ POLLING_LOCK_KEY = os.getenv("POLLING_LOCK_KEY", "findexhub:polling_lock")
 POLLING_LOCK_TTL_SECONDS = 180
 POLLING_LOCK_RENEW_EVERY_SECONDS = 60
 
-# ---------------- REDIS HEALTHCHECK ----------------
-REDIS_HEALTHCHECK_EVERY_SECONDS = 10
-REDIS_RECONNECT_BACKOFF_SECONDS = 3
-
-
-def _build_redis_url() -> str:
-    redis_url = os.getenv("REDIS_URL")
-    if redis_url:
-        return redis_url
-
-    host = os.getenv("REDIS_HOST", "127.0.0.1")
-    port = os.getenv("REDIS_PORT", "6379")
-    password = os.getenv("REDIS_PASSWORD")
-
-    if password:
-        return f"redis://:{password}@{host}:{port}/0"
-    return f"redis://{host}:{port}/0"
-
-
-async def _maybe_close_redis_client(client) -> None:
-    if client is None:
-        return
-    try:
-        if hasattr(client, "aclose"):
-            await client.aclose()
-            return
-    except Exception:
-        pass
-
-    try:
-        res = client.close()
-        if asyncio.iscoroutine(res):
-            await res
-    except Exception:
-        pass
-
-
 async def _acquire_polling_guard(dp: Dispatcher):
     r0 = getattr(runtime, "REDIS", None)
     if r0 is not None:
@@ -360,10 +270,10 @@ async def _acquire_polling_guard(dp: Dispatcher):
 
 
 def build_bot() -> Bot:
-    session = AiohttpSession(timeout=180)
-    return Bot(
-        token=config.bot_token,
-        session=session,
+    # общий клиент (utils/tg_client): tuned connector, RetryAfter, coalescing, метрики
+    return tg_client.build_bot(
+        config.bot_token,
+        timeout=180,
         default=DefaultBotProperties(
             parse_mode=ParseMode.HTML,
             link_preview_is_disabled=True,
@@ -371,96 +281,111 @@ def build_bot() -> Bot:
     )
 
 
-# ---------------- REDIS INIT ----------------
+def setup_dispatcher(dp: Dispatcher) -> Dispatcher:
+    """Middlewares + routers. Общий для polling (main) и webhook-воркеров (findex_bot/webhook.py)."""
+    # write-back FSM: state+data читаются одним pipeline, пишутся одним MULTI на апдейт
+    fsm_batch.install(dp)
+    # latency апдейта + SQL/Redis/Telegram вызовы -> /metrics и /sys_top
+    metrics.install(dp)
+    # апдейты в обработке + фоновые задачи: на остановке дожидаемся их, отложенные удаления -> Redis
+    supervisor.install(dp)
+
+    # ---------------- MIDDLEWARES ----------------
+    # антиспам до роутинга: один EVAL в Redis на событие, лимит общий для всех реплик
+    throttle = ThrottleMiddleware()
+    dp.message.outer_middleware(throttle)
+    dp.callback_query.outer_middleware(throttle)
+
+    dp.callback_query.middleware(load_entrypoint("findex_bot.handlers.debug_ping:CallbackLoggerMiddleware")())
+    dp.message.middleware(load_entrypoint("findex_bot.handlers.forms:SavedHintMiddleware")())
+    dp.callback_query.middleware(PublishedPreviewGuardMiddleware())
+
+    sub = SubscriptionMiddleware()
+    dp.message.middleware(sub)
+    dp.callback_query.middleware(sub)
+
+    fsm_wd = FSMWatchdogMiddleware()
+    dp.message.middleware(fsm_wd)
+    dp.callback_query.middleware(fsm_wd)
+
+    # ---------------- ROUTERS ----------------
+    for spec in ROUTER_ENTRYPOINTS:
+        dp.include_router(load_entrypoint(spec))
+
+    # callback_query: префиксное дерево по callback_data вместо линейного обхода фильтров.
+    # Последним outer-middleware — throttle и прочие outer уже отработали.
+    callback_trie.install(dp)
+
+    return dp
+
+
+# ---------------- REDIS ----------------
+# один клиент на процесс поверх явного пула (utils/redis_conn): не пересоздаётся и не закрывается
+# до остановки; на сбоях breaker прячет его из runtime.REDIS (модули уходят в in-memory fallback)
 async def _init_redis():
-    try:
-        import redis.asyncio as redis  # type: ignore
-    except Exception:
+    if importlib.util.find_spec("redis") is None:
         runtime.REDIS = None
         runtime.REDIS_URL = None
         logging.warning("⚠️ redis package not installed -> alerts/responds will use in-memory fallback where possible")
         return
 
-    redis_url = _build_redis_url()
-    runtime.REDIS_URL = redis_url
-
-    try:
-        r = redis.from_url(redis_url, decode_responses=True)
-        await r.ping()
-        runtime.REDIS = r
+    mgr = await redis_conn.init(publish_runtime=True)
+    runtime.REDIS_URL = mgr.url
+    metrics.instrument_redis(mgr.client)
+    if mgr.available:
         logging.info("✅ Redis connected")
-    except Exception:
-        runtime.REDIS = None
-        logging.exception("⚠️ Redis not available -> alerts/responds will use fallback where possible")
+    else:
+        logging.warning("⚠️ Redis connect failed -> in-memory fallback until it comes back")
 
 
-async def _close_redis():
-    try:
-        r = getattr(runtime, "REDIS", None)
-        await _maybe_close_redis_client(r)
-    finally:
-        runtime.REDIS = None
+def _redis_client():
+    """Клиент для RedisStorage: тот же объект, что и runtime.REDIS, но независимо от состояния breaker."""
+    mgr = redis_conn.get_manager()
+    return mgr.client if mgr is not None else getattr(runtime, "REDIS", None)
 
 
-async def _redis_reconnect_once() -> bool:
-    try:
-        import redis.asyncio as redis  # type: ignore
-    except Exception:
-        return False
+def build_fsm_storage() -> BaseStorage:
+    """
+    Хранилище FSM на старте: RedisStorage, если Redis поднялся; иначе (нет пакета / недоступен)
+    MemoryStorage — состояние живёт в процессе до рестарта, зато бот не падает на каждом апдейте.
+    """
+    mgr = redis_conn.get_manager()
+    client = _redis_client()
+    if client is None or (mgr is not None and not mgr.available):
+        logging.warning("⚠️ Redis unavailable at startup -> FSM in MemoryStorage (state is per-process)")
+        return MemoryStorage()
+    return RedisStorage(redis=client)
 
-    redis_url = getattr(runtime, "REDIS_URL", None) or _build_redis_url()
-    runtime.REDIS_URL = redis_url
 
+async def _close_redis():
     try:
-        r = redis.from_url(redis_url, decode_responses=True)
-        await r.ping()
-
-        old = getattr(runtime, "REDIS", None)
-        runtime.REDIS = r
-
-        if old is not None and old is not r:
-            with contextlib.suppress(Exception):
-                await _maybe_close_redis_client(old)
-
-        logging.info("✅ Redis reconnected")
-        return True
-    except Exception:
-        return False
+        await redis_conn.shutdown()
+    finally:
+        runtime.REDIS = None
 
 
 async def _redis_health_loop():
-    try:
-        while True:
-            await asyncio.sleep(REDIS_HEALTHCHECK_EVERY_SECONDS)
-
-            r = getattr(runtime, "REDIS", None)
-            if r is None:
-                ok = await _redis_reconnect_once()
-                if not ok:
-                    await asyncio.sleep(REDIS_RECONNECT_BACKOFF_SECONDS)
-                continue
-
-            try:
-                await r.ping()
-            except Exception:
-                logging.warning("⚠️ Redis ping failed -> switching to fallback + trying reconnect")
-                with contextlib.suppress(Exception):
-                    await _maybe_close_redis_client(r)
-                runtime.REDIS = None
+    mgr = redis_conn.get_manager()
+    if mgr is None:
+        return
+    await mgr.health_loop()
 
-                ok = await _redis_reconnect_once()
-                if not ok:
-                    await asyncio.sleep(REDIS_RECONNECT_BACKOFF_SECONDS)
 
-    except asyncio.CancelledError:
-        return
+async def init_bot_username(bot: Bot) -> None:
+    try:
+        me = await bot.get_me()
+        runtime.BOT_USERNAME = (me.username or "").lstrip("@").strip() or None
+        logging.info(f"✅ BOT_USERNAME = @{runtime.BOT_USERNAME}" if runtime.BOT_USERNAME else "⚠️ BOT_USERNAME is empty")
+    except Exception:
+        runtime.BOT_USERNAME = (os.getenv("BOT_USERNAME") or "").lstrip("@").strip() or None
+        logging.exception("⚠️ bot.get_me failed -> BOT_USERNAME fallback from env")
 
 
 async def main():
     bot = build_bot()
 
     await _init_redis()
-    dp = Dispatcher(storage=RedisStorage(redis=runtime.REDIS))
+    dp = Dispatcher(storage=build_fsm_storage())
     redis_health_task = asyncio.create_task(_redis_health_loop())
 
     release_guard = None
@@ -480,13 +405,7 @@ async def main():
                     await bot.session.close()
         return
 
-    try:
-        me = await bot.get_me()
-        runtime.BOT_USERNAME = (me.username or "").lstrip("@").strip() or None
-        logging.info(f"✅ BOT_USERNAME = @{runtime.BOT_USERNAME}" if runtime.BOT_USERNAME else "⚠️ BOT_USERNAME is empty")
-    except Exception:
-        runtime.BOT_USERNAME = (os.getenv("BOT_USERNAME") or "").lstrip("@").strip() or None
-        logging.exception("⚠️ bot.get_me failed -> BOT_USERNAME fallback from env")
+    await init_bot_username(bot)
 
     try:
         await bot.delete_webhook(drop_pending_updates=True)
@@ -494,44 +413,15 @@ async def main():
     except Exception:
         logging.exception("⚠️ delete_webhook failed")
 
-    # ---------------- MIDDLEWARES ----------------
-    dp.callback_query.middleware(CallbackLoggerMiddleware())
-    dp.message.middleware(SavedHintMiddleware())
-    dp.callback_query.middleware(PublishedPreviewGuardMiddleware())
-
-    sub = SubscriptionMiddleware()
-    dp.message.middleware(sub)
-    dp.callback_query.middleware(sub)
-
-    fsm_wd = FSMWatchdogMiddleware()
-    dp.message.middleware(fsm_wd)
-    dp.callback_query.middleware(fsm_wd)
-
-    # ---------------- ROUTERS ----------------
-    dp.include_router(fsm_watchdog_router)
-    dp.include_router(help_router)
-    dp.include_router(menu_router)
-    dp.include_router(system_admin_router)
-
-    dp.include_router(deeplink_router)
-    dp.include_router(inline_share_router)
-
-    dp.include_router(alerts_router)
-    dp.include_router(diagnostics_router)
-    dp.include_router(start_router)
-
-    dp.include_router(forms_router)
-    dp.include_router(moderation_router)
+    setup_dispatcher(dp)
 
-    dp.include_router(employer_router)
-    dp.include_router(seeker_router)
-    dp.include_router(replies_router)
-    dp.include_router(responds_router)
-
-    dp.include_router(subscription_router)
-    dp.include_router(debug_ping_router)
+    metrics_runner = None
+    try:
+        metrics_runner = await metrics.start_metrics_server()
+    except Exception:
+        logging.exception("⚠️ metrics server failed to start")
 
-    logging.info("✅ Bot started (polling)")
+    logging.info("✅ Bot started (polling, dev; prod — python -m findex_bot.webhook)")
 
     try:
         await dp.start_polling(
@@ -540,6 +430,10 @@ async def main():
             allowed_updates=dp.resolve_used_update_types(),
         )
     finally:
+        with contextlib.suppress(Exception):
+            if metrics_runner is not None:
+                await metrics_runner.cleanup()
+
         with contextlib.suppress(Exception):
             redis_health_task.cancel()
             await redis_health_task
@@ -554,6 +448,10 @@ async def main():
             if release_guard is not None:
                 await release_guard()
 
+        # дописываем в Postgres отложенные write-through дневных лимитов
+        with contextlib.suppress(Exception):
+            await limits.flush_pending_writes()
+
         await _close_redis()
         with contextlib.suppress(Exception):
             await bot.session.close()
@@ -0,0 +1,122 @@
+# findex_bot/db/ad_search.py
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Поиск по опубликованным объявлениям (Postgres, миграция ads_search):
+#   ads.search_tsv  — generated tsvector (russian): title A / location B / description+about C, GIN
+#   lower(title)    — pg_trgm GIN, нечёткое совпадение заголовка (опечатки)
+#
+# Запрос пользователя -> префиксный tsquery ("пова цех" -> 'пова:* & цех:*'), чтобы inline-режим
+# находил по недопечатанному слову. Совпадения берутся окном SEARCH_WINDOW самых свежих
+# (ORDER BY id DESC LIMIT): для частых слов это backward-скан ix_ads_published_id, для редких —
+# bitmap по GIN; ранжируются только кандидаты окна, поэтому стоимость не растёт с числом совпадений.
+#
+# score = ts_rank_cd (нормировка 32 -> 0..1) + 0.5 * similarity(title), округлён до 6 знаков:
+# keyset-курсор "score:id" сравнивается точно, страницы не дублируются и не теряются.
+
+SEARCH_WINDOW = 500
+MAX_QUERY_WORDS = 6
+
+_WORD_RE = re.compile(r"[0-9a-zа-яё]+")
+
+_SEARCH_SQL = text(
+    """
+WITH q AS (
+    SELECT to_tsquery('russian', :tsq) AS tsq
+),
+cand AS (
+    SELECT a.id, a.search_tsv, lower(coalesce(a.payload->>'title', '')) AS title_lc
+    FROM ads a, q
+    WHERE a.status = 'published'
+      AND (a.search_tsv @@ q.tsq OR lower(coalesce(a.payload->>'title', '')) % :raw)
+      AND (CAST(:role AS text) IS NULL OR a.role = :role)
+      AND (CAST(:location AS text) IS NULL OR lower(a.payload->>'location') LIKE :location ESCAPE '\\')
+    ORDER BY a.id DESC
+    LIMIT :window
+),
+ranked AS (
+    SELECT c.id,
+           round((ts_rank_cd(c.search_tsv, q.tsq, 32) + 0.5 * similarity(c.title_lc, :raw))::numeric, 6) AS score
+    FROM cand c, q
+)
+SELECT id, score
+FROM ranked
+WHERE CAST(:c_score AS numeric) IS NULL OR (score, id) < (CAST(:c_score AS numeric), :c_id)
+ORDER BY score DESC, id DESC
+LIMIT :limit;
+"""
+)
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    ad_id: int
+    score: Decimal
+
+
+def build_prefix_tsquery(query: str) -> Optional[str]:
+    """Слова запроса -> 'w1:* & w2:*' (только буквы/цифры — синтаксис tsquery не инъецировать)."""
+    words = [w for w in _WORD_RE.findall((query or "").lower().replace("ё", "е")) if len(w) >= 2]
+    if not words:
+        return None
+    return " & ".join(f"{w}:*" for w in dict.fromkeys(words[:MAX_QUERY_WORDS]))
+
+
+def _like_contains(value: str) -> str:
+    v = value.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{v}%"
+
+
+def encode_cursor(hit: SearchHit) -> str:
+    return f"{hit.score}:{hit.ad_id}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[tuple[Decimal, int]]:
+    if not cursor:
+        return None
+    try:
+        score, ad_id = str(cursor).split(":", 1)
+        return Decimal(score), int(ad_id)
+    except (ValueError, InvalidOperation):
+        return None
+
+
+async def search(
+    session: AsyncSession,
+    query: str,
+    *,
+    role: Optional[str] = None,
+    location: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    window: int = SEARCH_WINDOW,
+) -> tuple[list[SearchHit], Optional[str]]:
+    """Хиты по убыванию score + курсор следующей страницы (None — больше нет)."""
+    tsq = build_prefix_tsquery(query)
+    if tsq is None:
+        return [], None
+
+    limit = max(1, int(limit))
+    after = decode_cursor(cursor)
+    params = {
+        "tsq": tsq,
+        "raw": " ".join((query or "").lower().split()),
+        "role": (role or "").strip().lower() or None,
+        "location": _like_contains(location.strip()) if location and location.strip() else None,
+        "window": max(limit, int(window)),
+        "c_score": after[0] if after else None,
+        "c_id": after[1] if after else 0,
+        "limit": limit + 1,
+    }
+    res = await session.execute(_SEARCH_SQL, params)
+    hits = [SearchHit(ad_id=int(r[0]), score=Decimal(r[1])) for r in res.fetchall()]
+
+    next_cursor = encode_cursor(hits[limit - 1]) if len(hits) > limit else None
+    return hits[:limit], next_cursor
@@ -0,0 +1,84 @@
+# findex_bot/db/ad_similarity.py
+from __future__ import annotations
+
+import datetime
+from typing import Any, Sequence
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, BIGINT, INTEGER
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Postgres-слой near-duplicate индекса объявлений (логика — findex_bot/utils/similarity.py).
+# Таблица ad_minhash создаётся миграцией ad_minhash_lsh:
+#   signature INTEGER[]  — MinHash-подпись
+#   bands     BIGINT[]   — хэши LSH-бакетов (по одному на band), GIN-индекс -> поиск кандидатов через &&
+
+_UPSERT_SQL = text(
+    """
+INSERT INTO ad_minhash (ad_id, role, signature, bands, updated_at)
+VALUES (:ad_id, :role, :signature, :bands, NOW())
+ON CONFLICT (ad_id) DO UPDATE SET
+    role = EXCLUDED.role,
+    signature = EXCLUDED.signature,
+    bands = EXCLUDED.bands,
+    updated_at = NOW();
+"""
+).bindparams(
+    bindparam("signature", type_=ARRAY(INTEGER)),
+    bindparam("bands", type_=ARRAY(BIGINT)),
+)
+
+# кандидаты: хотя бы один общий бакет, только опубликованные свежие объявления той же роли
+_CANDIDATES_SQL = text(
+    """
+SELECT m.ad_id, m.signature, a.public_url
+FROM ad_minhash m
+JOIN ads a ON a.id = m.ad_id
+WHERE m.bands && :bands
+  AND m.role = :role
+  AND m.ad_id <> :ad_id
+  AND a.status = 'published'
+  AND a.created_at >= :since
+LIMIT :limit;
+"""
+).bindparams(bindparam("bands", type_=ARRAY(BIGINT)))
+
+_BACKFILL_BATCH_SQL = text(
+    """
+SELECT id, role, payload
+FROM ads
+WHERE id > :after_id
+  AND status IN ('pending', 'published')
+ORDER BY id
+LIMIT :limit;
+"""
+)
+
+
+async def upsert_signatures(session: AsyncSession, rows: Sequence[dict[str, Any]]) -> None:
+    """rows: {ad_id, role, signature, bands}; один executemany + commit."""
+    if not rows:
+        return
+    await session.execute(_UPSERT_SQL, list(rows))
+    await session.commit()
+
+
+async def fetch_candidates(
+    session: AsyncSession,
+    *,
+    ad_id: int,
+    role: str,
+    bands: Sequence[int],
+    since: datetime.datetime,
+    limit: int,
+) -> list[tuple[int, list[int], str | None]]:
+    res = await session.execute(
+        _CANDIDATES_SQL,
+        {"ad_id": int(ad_id), "role": role, "bands": list(bands), "since": since, "limit": int(limit)},
+    )
+    return [(int(r[0]), list(r[1] or []), r[2]) for r in res.fetchall()]
+
+
+async def fetch_backfill_batch(session: AsyncSession, *, after_id: int, limit: int) -> list[tuple[int, str, dict]]:
+    res = await session.execute(_BACKFILL_BATCH_SQL, {"after_id": int(after_id), "limit": int(limit)})
+    return [(int(r[0]), str(r[1]), dict(r[2] or {})) for r in res.fetchall()]
@@ -2,53 +2,80 @@
 from __future__ import annotations
 
 import datetime
+from dataclasses import dataclass
 from typing import Optional
 
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-TABLE_SQL = """
-CREATE TABLE IF NOT EXISTS daily_pub_limits (
-    user_id    BIGINT NOT NULL,
-    day_utc    DATE   NOT NULL,
-    cnt        INTEGER NOT NULL DEFAULT 0,
-    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-    PRIMARY KEY (user_id, day_utc)
-);
+# Postgres-слой дневных счётчиков (durable копия).
+# Горячий путь — Redis (см findex_bot/utils/limits.py), сюда пишем write-through.
+# Таблицы создаются миграциями (daily_pub_limits_table и др.) — никакого DDL в рантайме.
+
+
+@dataclass(frozen=True)
+class CounterTable:
+    table: str
+    day_col: str
+    cnt_col: str
+
+
+PUB_TABLE = CounterTable(table="daily_pub_limits", day_col="day_utc", cnt_col="cnt")
+RESPOND_TABLE = CounterTable(table="respond_daily_limits", day_col="day", cnt_col="count")
+
+
+def _get_sql(t: CounterTable) -> str:
+    return f"""
+SELECT "{t.cnt_col}"
+FROM {t.table}
+WHERE user_id = :user_id AND "{t.day_col}" = :day
+LIMIT 1;
 """
 
-UPSERT_INC_SQL = """
-INSERT INTO daily_pub_limits (user_id, day_utc, cnt)
-VALUES (:user_id, :day_utc, 1)
-ON CONFLICT (user_id, day_utc)
+
+def _upsert_inc_sql(t: CounterTable) -> str:
+    return f"""
+INSERT INTO {t.table} (user_id, "{t.day_col}", "{t.cnt_col}")
+VALUES (:user_id, :day, 1)
+ON CONFLICT (user_id, "{t.day_col}")
 DO UPDATE SET
-    cnt = daily_pub_limits.cnt + 1,
+    "{t.cnt_col}" = {t.table}."{t.cnt_col}" + 1,
     updated_at = NOW()
-RETURNING cnt;
+RETURNING "{t.cnt_col}";
 """
 
-GET_SQL = """
-SELECT cnt
-FROM daily_pub_limits
-WHERE user_id = :user_id AND day_utc = :day_utc
-LIMIT 1;
+
+def _upsert_inc_below_sql(t: CounterTable) -> str:
+    # WHERE в DO UPDATE: при достижении лимита строка не обновляется и RETURNING пустой
+    return f"""
+INSERT INTO {t.table} (user_id, "{t.day_col}", "{t.cnt_col}")
+VALUES (:user_id, :day, 1)
+ON CONFLICT (user_id, "{t.day_col}")
+DO UPDATE SET
+    "{t.cnt_col}" = {t.table}."{t.cnt_col}" + 1,
+    updated_at = NOW()
+WHERE {t.table}."{t.cnt_col}" < :limit
+RETURNING "{t.cnt_col}";
 """
 
 
-def utc_today() -> datetime.date:
-    return datetime.datetime.now(datetime.timezone.utc).date()
+def _upsert_store_sql(t: CounterTable, *, monotonic: bool) -> str:
+    new_value = f'GREATEST({t.table}."{t.cnt_col}", EXCLUDED."{t.cnt_col}")' if monotonic else f'EXCLUDED."{t.cnt_col}"'
+    return f"""
+INSERT INTO {t.table} (user_id, "{t.day_col}", "{t.cnt_col}")
+VALUES (:user_id, :day, :value)
+ON CONFLICT (user_id, "{t.day_col}")
+DO UPDATE SET
+    "{t.cnt_col}" = {new_value},
+    updated_at = NOW();
+"""
 
 
-async def ensure_table(session: AsyncSession) -> None:
-    # Таблица создаётся лениво. Commit делает вызывающая сторона.
-    await session.execute(text(TABLE_SQL))
+def utc_today() -> datetime.date:
+    return datetime.datetime.now(datetime.timezone.utc).date()
 
 
-async def get_count(session: AsyncSession, user_id: int, day_utc: Optional[datetime.date] = None) -> int:
-    day = day_utc or utc_today()
-    await ensure_table(session)
-    res = await session.execute(text(GET_SQL), {"user_id": int(user_id), "day_utc": day})
-    row = res.first()
+def _first_int(row) -> int:
     if not row:
         return 0
     try:
@@ -57,14 +84,63 @@ async def get_count(session: AsyncSession, user_id: int, day_utc: Optional[datet
         return 0
 
 
-async def inc_and_get(session: AsyncSession, user_id: int, day_utc: Optional[datetime.date] = None) -> int:
+async def get_count(
+    session: AsyncSession,
+    user_id: int,
+    day_utc: Optional[datetime.date] = None,
+    *,
+    table: CounterTable = PUB_TABLE,
+) -> int:
     day = day_utc or utc_today()
-    await ensure_table(session)
-    res = await session.execute(text(UPSERT_INC_SQL), {"user_id": int(user_id), "day_utc": day})
+    res = await session.execute(text(_get_sql(table)), {"user_id": int(user_id), "day": day})
+    return _first_int(res.first())
+
+
+async def inc_and_get(
+    session: AsyncSession,
+    user_id: int,
+    day_utc: Optional[datetime.date] = None,
+    *,
+    table: CounterTable = PUB_TABLE,
+) -> int:
+    day = day_utc or utc_today()
+    res = await session.execute(text(_upsert_inc_sql(table)), {"user_id": int(user_id), "day": day})
+    return _first_int(res.first())
+
+
+async def inc_if_below(
+    session: AsyncSession,
+    user_id: int,
+    limit: int,
+    day: datetime.date,
+    *,
+    table: CounterTable = PUB_TABLE,
+) -> Optional[int]:
+    """Атомарно +1, если счётчик < limit. None — лимит исчерпан. Commit делает вызывающая сторона."""
+    res = await session.execute(
+        text(_upsert_inc_below_sql(table)),
+        {"user_id": int(user_id), "day": day, "limit": int(limit)},
+    )
     row = res.first()
     if not row:
-        return 0
-    try:
-        return int(row[0] or 0)
-    except Exception:
-        return 0
\ No newline at end of file
+        return None
+    return _first_int(row)
+
+
+async def store_value(
+    session: AsyncSession,
+    user_id: int,
+    day: datetime.date,
+    value: int,
+    *,
+    table: CounterTable = PUB_TABLE,
+    monotonic: bool = True,
+) -> None:
+    """
+    Write-through из Redis. monotonic=True — значение не уменьшается
+    (поздно пришедшая запись не откатит счётчик назад).
+    """
+    await session.execute(
+        text(_upsert_store_sql(table, monotonic=monotonic)),
+        {"user_id": int(user_id), "day": day, "value": max(0, int(value))},
+    )
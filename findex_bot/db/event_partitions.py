@@ -0,0 +1,209 @@
+# findex_bot/db/event_partitions.py
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# respond_events партиционирована помесячно (см миграцию respond_events_partitioning):
+#   respond_events_pYYYYMM  — [1 число месяца, 1 число следующего)
+#   respond_events_default  — всё, что не попало в именованные партиции (никогда не удаляем)
+PARENT_TABLE = "respond_events"
+PARTITION_PREFIX = "respond_events_p"
+
+_PARTITION_RE = re.compile(r"^respond_events_p(\d{4})(\d{2})$")
+
+LIST_PARTITIONS_SQL = """
+SELECT c.relname
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+JOIN pg_class p ON p.oid = i.inhparent
+WHERE p.relname = :parent
+ORDER BY c.relname
+"""
+
+# Чистим dedup-реестр пачками, чтобы не держать долгий лок
+PRUNE_DEDUP_SQL = """
+DELETE FROM respond_event_dedup
+WHERE ctid IN (
+    SELECT ctid
+    FROM respond_event_dedup
+    WHERE created_at < :border
+    LIMIT :lim
+)
+"""
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    start: date
+    end: date
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, n: int) -> date:
+    m = d.month - 1 + n
+    return date(d.year + m // 12, m % 12 + 1, 1)
+
+
+def partition_for(d: date) -> Partition:
+    start = month_start(d)
+    return Partition(
+        name=f"{PARTITION_PREFIX}{start:%Y%m}",
+        start=start,
+        end=add_months(start, 1),
+    )
+
+
+def parse_partition_name(name: str) -> Optional[Partition]:
+    m = _PARTITION_RE.match(str(name or ""))
+    if not m:
+        return None
+    try:
+        start = date(int(m.group(1)), int(m.group(2)), 1)
+    except ValueError:
+        return None
+    return Partition(name=str(name), start=start, end=add_months(start, 1))
+
+
+async def list_partitions(session: AsyncSession) -> list[Partition]:
+    res = await session.execute(text(LIST_PARTITIONS_SQL), {"parent": PARENT_TABLE})
+    out: list[Partition] = []
+    for (relname,) in res.all():
+        p = parse_partition_name(relname)
+        if p is not None:
+            out.append(p)
+    return out
+
+
+async def ensure_partitions(session: AsyncSession, *, now: datetime, months_ahead: int = 2) -> list[str]:
+    """
+    Заранее создаёт партиции на текущий и months_ahead следующих месяцев.
+    Commit делает вызывающая сторона.
+    """
+    existing = {p.name for p in await list_partitions(session)}
+    created: list[str] = []
+
+    cur = month_start(now.date())
+    for i in range(months_ahead + 1):
+        p = partition_for(add_months(cur, i))
+        if p.name in existing:
+            continue
+        await session.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{p.name}" PARTITION OF {PARENT_TABLE} '
+            f"FOR VALUES FROM ('{p.start.isoformat()}') TO ('{p.end.isoformat()}')"
+        ))
+        created.append(p.name)
+
+    return created
+
+
+def expired_partitions(partitions: list[Partition], *, border: datetime) -> list[Partition]:
+    """Партиции, которые целиком старше border (верхняя граница <= border)."""
+    border_day = border.astimezone(timezone.utc).date()
+    return [p for p in partitions if p.end <= border_day]
+
+
+def _json_default(v: Any) -> Any:
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    return str(v)
+
+
+async def _archive_partition(session: AsyncSession, p: Partition, *, archive_dir: str) -> dict[str, int]:
+    """
+    Выгружает партицию в <archive_dir>/<name>.jsonl.gz (через .tmp + rename).
+    Возвращает количество событий по event_type — для корректировки system_counters.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    final_path = os.path.join(archive_dir, f"{p.name}.jsonl.gz")
+    tmp_path = final_path + ".tmp"
+
+    counts: dict[str, int] = {}
+    stream = await session.stream(text(
+        f'SELECT id, respond_id, actor_role, actor_user_id, event_type, payload, dedup_key, created_at '
+        f'FROM "{p.name}" ORDER BY id'
+    ))
+
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        async for row in stream:
+            item = dict(row._mapping)
+            et = str(item.get("event_type") or "")
+            counts[et] = counts.get(et, 0) + 1
+            f.write(json.dumps(item, ensure_ascii=False, default=_json_default))
+            f.write("\n")
+
+    os.replace(tmp_path, final_path)
+    return counts
+
+
+async def _count_partition(session: AsyncSession, p: Partition) -> dict[str, int]:
+    res = await session.execute(text(f'SELECT event_type, COUNT(*) FROM "{p.name}" GROUP BY event_type'))
+    return {str(et or ""): int(n or 0) for et, n in res.all()}
+
+
+async def drop_partition(
+    session: AsyncSession,
+    p: Partition,
+    *,
+    archive_dir: str | None = None,
+) -> int:
+    """
+    (Опционально архивирует) и отцепляет + удаляет партицию.
+    DROP не вызывает row-триггеры, поэтому system_counters корректируем руками.
+    Возвращает число удалённых событий.
+    """
+    if archive_dir:
+        counts = await _archive_partition(session, p, archive_dir=archive_dir)
+    else:
+        counts = await _count_partition(session, p)
+
+    total = sum(counts.values())
+
+    await session.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{p.name}"'))
+    await session.execute(text(f'DROP TABLE "{p.name}"'))
+
+    bump = text("SELECT system_counters_bump(:name, :delta)")
+    if total:
+        await session.execute(bump, {"name": "events_total", "delta": -total})
+    for et, n in counts.items():
+        if n:
+            await session.execute(bump, {"name": f"events_type:{et}", "delta": -n})
+
+    await session.commit()
+    return total
+
+
+async def prune_dedup(session: AsyncSession, *, border: datetime, batch: int = 5000) -> int:
+    total = 0
+    while True:
+        res = await session.execute(text(PRUNE_DEDUP_SQL), {"border": border, "lim": int(batch)})
+        await session.commit()
+        n = int(res.rowcount or 0)
+        total += n
+        if n < batch:
+            return total
+
+
+def retention_border(*, now: datetime, retention_days: int, respond_ttl_days: int) -> datetime:
+    """
+    Граница retention. Не даём ей подойти ближе, чем RESPOND_TTL_DAYS + 30 дней:
+    dedup-ключи resurrect:* нужны, пока отклик может быть активен
+    (jobs.job_autoclose_expired закрывает отклики старше RESPOND_TTL_DAYS).
+    """
+    days = max(int(retention_days), int(respond_ttl_days) + 30)
+    return now - timedelta(days=days)
@@ -6,6 +6,7 @@ from datetime import datetime, date
 from sqlalchemy import (
     BigInteger,
     Integer,
+    SmallInteger,
     Text,
     Date,
     DateTime,
@@ -13,6 +14,7 @@ from sqlalchemy import (
     func,
     Index,
     CheckConstraint,
+    FetchedValue,
     UniqueConstraint,
     text,
 )
@@ -37,6 +39,31 @@ class Ad(Base):
     status: Mapped[str] = mapped_column(Text, nullable=False)       # draft | pending | published | rejected
     public_url: Mapped[str | None] = mapped_column(Text, nullable=True)
 
+    # Типизированные копии полей payload (миграция ads_typed_columns) — только для чтения:
+    # их пересчитывает триггер ads_derive_columns() при каждой записи payload.
+    # FetchedValue -> после UPDATE ORM перечитывает их, а не держит устаревшие значения.
+    title: Mapped[str | None] = mapped_column(
+        Text, nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue()
+    )
+    location_norm: Mapped[str | None] = mapped_column(
+        Text, nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue()
+    )
+    salary_min: Mapped[int | None] = mapped_column(
+        Integer, nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue()
+    )
+    salary_max: Mapped[int | None] = mapped_column(
+        Integer, nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue()
+    )
+    expired_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue()
+    )
+    channel_message_id: Mapped[int | None] = mapped_column(
+        BigInteger, nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue()
+    )
+    contact_mode: Mapped[str | None] = mapped_column(
+        Text, nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue()
+    )
+
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
@@ -54,7 +81,24 @@ class Ad(Base):
         CheckConstraint("status IN ('draft','pending','published','rejected')", name="ck_ads_status"),
         Index("ix_ads_author_role_status", "author_user_id", "role", "status"),
         Index("ix_ads_status_created_at", "status", "created_at"),
+        Index(
+            "ix_ads_published_unexpired_created",
+            "created_at",
+            postgresql_where=text("status = 'published' AND expired_at IS NULL"),
+        ),
+        Index("ix_ads_published_role_location", "role", "location_norm", postgresql_where=text("status = 'published'")),
+        Index(
+            "ix_ads_published_role_salary",
+            "role",
+            "salary_min",
+            "salary_max",
+            postgresql_where=text("status = 'published'"),
+        ),
+        Index("ix_ads_channel_message_id", "channel_message_id", postgresql_where=text("channel_message_id IS NOT NULL")),
+        Index("ix_ads_pending_updated", "updated_at", "id", postgresql_where=text("status = 'pending'")),
     )
+    # search_tsv (generated tsvector, миграция ads_search) намеренно не маппится:
+    # читается только поисковым SQL в db/ad_search.py, select(Ad) не тащит его в каждый запрос
 
 
 # ----------------------------
@@ -72,6 +116,8 @@ class CandidateProfile(Base):
     full_name: Mapped[str] = mapped_column(Text, nullable=False)
     age: Mapped[int] = mapped_column(Integer, nullable=False)
     citizenship: Mapped[str] = mapped_column(Text, nullable=False)
+    # нормализованный код для фильтров (utils/citizenship.py): "ru" / "kz" / ... или текст страны
+    citizenship_code: Mapped[str] = mapped_column(Text, nullable=False, server_default=text("''"))
     experience: Mapped[str] = mapped_column(Text, nullable=False)
 
     resume_link: Mapped[str | None] = mapped_column(Text, nullable=True)
@@ -96,10 +142,22 @@ class CandidateProfile(Base):
     __table_args__ = (
         CheckConstraint("age >= 14 AND age <= 80", name="ck_candidate_profiles_age"),
         Index("ix_candidate_profiles_username", "username"),
-        Index("ix_candidate_profiles_citizenship", "citizenship"),
+        Index("ix_candidate_profiles_username_lower", text("lower(username)")),
         Index("ix_candidate_profiles_age", "age"),
         Index("ix_candidate_profiles_has_resume", "has_resume"),
         Index("ix_candidate_profiles_last_responded_at", "last_responded_at"),
+        # ключ сортировки CandidateProfileRepo.search_profiles (keyset-пагинация)
+        Index(
+            "ix_candidate_profiles_activity",
+            text("(COALESCE(last_responded_at, updated_at)) DESC"),
+            text("user_id DESC"),
+        ),
+        Index(
+            "ix_candidate_profiles_cit_activity",
+            "citizenship_code",
+            text("(COALESCE(last_responded_at, updated_at)) DESC"),
+            text("user_id DESC"),
+        ),
     )
 
 
@@ -241,7 +299,7 @@ class RespondEvent(Base):
         server_default=text("'{}'::jsonb"),
     )
 
-    # ✅ для транзакционного дедупа (см repo.add_event)
+    # ✅ для транзакционного дедупа (см repo.add_event; уникальность — в respond_event_dedup)
     dedup_key: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(
@@ -263,13 +321,42 @@ class RespondEvent(Base):
         Index("ix_respond_events_respond_id", "respond_id"),
         Index("ix_respond_events_created_at", "created_at"),
 
-        # ✅ partial UNIQUE на dedup_key (для ON CONFLICT DO NOTHING)
+        # под выборку необработанных resurrection-стадий (resurrection_worker / sys_jobs)
         Index(
-            "ux_respond_events_dedup_key",
-            "dedup_key",
-            unique=True,
-            postgresql_where=text("dedup_key IS NOT NULL"),
+            "ix_respond_events_res_stage_created_at",
+            "created_at",
+            postgresql_where=text("actor_role = 'system' AND event_type = 'resurrection_stage'"),
         ),
+
+        # ⚠️ в БД таблица партиционирована по created_at (помесячно, см миграцию respond_events_partitioning):
+        # PK там (id, created_at), а UNIQUE по dedup_key живёт в respond_event_dedup
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+class RespondEventDedup(Base):
+    """
+    Глобальный (не партиционированный) реестр dedup_key для respond_events.
+    UNIQUE на партиционированной таблице обязан включать created_at,
+    поэтому дедуп держим здесь — он работает поверх всех партиций.
+    """
+
+    __tablename__ = "respond_event_dedup"
+
+    dedup_key: Mapped[str] = mapped_column(Text, primary_key=True)
+
+    respond_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    event_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+
+    # = respond_events.created_at события (для поиска нужной партиции и retention)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    __table_args__ = (
+        Index("ix_respond_event_dedup_created_at", "created_at"),
     )
 
 
@@ -294,4 +381,48 @@ class RespondDailyLimit(Base):
 
     __table_args__ = (
         Index("ix_respond_daily_limits_day", "day"),
-    )
\ No newline at end of file
+    )
+
+class DailyPubLimit(Base):
+    __tablename__ = "daily_pub_limits"
+
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    day_utc: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    cnt: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        server_default="0",
+    )
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    __table_args__ = (
+        Index("ix_daily_pub_limits_day_utc", "day_utc"),
+    )
+
+
+# ----------------------------
+# System counters (для /sys_status)
+# ----------------------------
+class SystemCounter(Base):
+    __tablename__ = "system_counters"
+
+    # ads_total | ads_published | responds_new | events_total | ...
+    name: Mapped[str] = mapped_column(Text, primary_key=True)
+
+    # шард строки: триггер пишет в случайный, значение счётчика = SUM(value) по name
+    shard: Mapped[int] = mapped_column(SmallInteger, primary_key=True, server_default="0")
+
+    # ✅ поддерживается триггерами на ads / responds / respond_events (см миграцию system_counters)
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
@@ -1,20 +1,26 @@
 # findex_bot/db/repo.py
 from __future__ import annotations
 
+import json
+from dataclasses import dataclass
 from datetime import datetime, date, timedelta, timezone
 from typing import Any, Optional
 
-from sqlalchemy import select, update, insert, func, case, text
-from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import select, update, insert, func, case, text, tuple_
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
+from findex_bot.db import ad_search, daily_limits
+from findex_bot.utils import share_cache
+from findex_bot.utils.citizenship import citizenship_code
 from findex_bot.db.models import (
     Ad,
     Respond,
     RespondEvent,
-    RespondDailyLimit,
+    RespondEventDedup,
     CandidateProfile,
+    SystemCounter,
 )
 
 
@@ -141,19 +147,50 @@ class AdRepo:
                     update(Ad).where(Ad.id == ad_id).values(payload=new_payload, role=role)
                 )
                 await self.session.commit()
+                await share_cache.invalidate(ad_id)
                 return
 
         await self.session.execute(update(Ad).where(Ad.id == ad_id).values(payload=new_payload))
         await self.session.commit()
+        if share_cache.affects_share(payload_patch):
+            await share_cache.invalidate(ad_id)
 
     async def set_status(self, ad_id: int, status: str) -> None:
         await self.session.execute(update(Ad).where(Ad.id == ad_id).values(status=status))
         await self.session.commit()
+        await share_cache.invalidate(ad_id)
 
     async def set_public_url(self, ad_id: int, url: str | None) -> None:
         await self.session.execute(update(Ad).where(Ad.id == ad_id).values(public_url=url))
         await self.session.commit()
 
+    async def mark_published(
+        self,
+        ad_id: int,
+        *,
+        public_url: str | None,
+        channel_message_id: int | None,
+        expected_status: str | None = "pending",
+    ) -> bool:
+        """
+        status + public_url + payload.channel_message_id одним UPDATE
+        (колонку ads.channel_message_id из payload выставит триггер).
+        expected_status — UPDATE только из этого статуса (объявление, отклонённое, пока пост
+        ждал слот канала, не перетираем). -> False, если строка не обновилась.
+        """
+        values: dict[str, Any] = {"status": "published", "public_url": public_url}
+        if channel_message_id:
+            values["payload"] = Ad.payload.op("||", return_type=JSONB)(
+                func.jsonb_build_object("channel_message_id", int(channel_message_id))
+            )
+        stmt = update(Ad).where(Ad.id == ad_id)
+        if expected_status is not None:
+            stmt = stmt.where(Ad.status == expected_status)
+        res = await self.session.execute(stmt.values(**values))
+        await self.session.commit()
+        await share_cache.invalidate(ad_id)
+        return int(res.rowcount or 0) > 0
+
     async def clone_for_republish(self, *, source_ad_id: int, author_user_id: int) -> Optional[Ad]:
         src = await self.get(source_ad_id)
         if not src:
@@ -199,10 +236,79 @@ class AdRepo:
         await self.session.refresh(new_ad)
         return new_ad
 
+    async def search_ads(
+        self,
+        query: str,
+        *,
+        role: str | None = None,
+        location: str | None = None,
+        limit: int = 20,
+        cursor: str | None = None,
+    ) -> tuple[list[Ad], str | None]:
+        """
+        Поиск по опубликованным (FTS + trigram, см db/ad_search.py).
+        Возвращает объявления в порядке релевантности и курсор следующей страницы.
+        """
+        hits, next_cursor = await ad_search.search(
+            self.session, query, role=role, location=location, limit=limit, cursor=cursor
+        )
+        if not hits:
+            return [], None
+
+        res = await self.session.execute(select(Ad).where(Ad.id.in_([h.ad_id for h in hits])))
+        by_id = {ad.id: ad for ad in res.scalars().all()}
+        return [by_id[h.ad_id] for h in hits if h.ad_id in by_id], next_cursor
+
 
 # ----------------------------
 # Candidate profiles
 # ----------------------------
+# выше этого — count_profiles отдаёт оценку планировщика вместо точного COUNT
+PROFILE_COUNT_EXACT_CAP = 1000
+
+# ключ сортировки анкет; выражение совпадает с индексами миграции candidate_profiles_search
+_PROFILE_ACTIVITY = func.coalesce(CandidateProfile.last_responded_at, CandidateProfile.updated_at)
+
+
+@dataclass(frozen=True)
+class ProfileFilter:
+    citizenship: str | None = None
+    age_from: int | None = None
+    age_to: int | None = None
+    username: str | None = None
+    has_resume: bool | None = None
+
+
+@dataclass(frozen=True)
+class ProfilePage:
+    items: list[CandidateProfile]
+    next_cursor: str | None
+
+
+@dataclass(frozen=True)
+class ProfileCount:
+    value: int
+    exact: bool
+
+
+def encode_profile_cursor(profile: CandidateProfile) -> str:
+    activity = profile.last_responded_at or profile.updated_at
+    return f"{activity.isoformat()}|{int(profile.user_id)}"
+
+
+def decode_profile_cursor(cursor: str | None) -> tuple[datetime, int] | None:
+    if not cursor:
+        return None
+    try:
+        raw_dt, raw_id = str(cursor).rsplit("|", 1)
+        dt = datetime.fromisoformat(raw_dt)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt, int(raw_id)
+    except ValueError:
+        return None
+
+
 class CandidateProfileRepo:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -241,6 +347,7 @@ class CandidateProfileRepo:
                 full_name=str(full_name).strip(),
                 age=int(age),
                 citizenship=str(citizenship).strip(),
+                citizenship_code=citizenship_code(citizenship),
                 experience=str(experience).strip(),
                 resume_link=(resume_link or None),
                 resume_file_id=(resume_file_id or None),
@@ -257,6 +364,7 @@ class CandidateProfileRepo:
                     "full_name": str(full_name).strip(),
                     "age": int(age),
                     "citizenship": str(citizenship).strip(),
+                    "citizenship_code": citizenship_code(citizenship),
                     "experience": str(experience).strip(),
                     "resume_link": (resume_link or None),
                     "resume_file_id": (resume_file_id or None),
@@ -287,71 +395,87 @@ class CandidateProfileRepo:
         )
         await self.session.commit()
 
-    async def list_profiles(
+    @staticmethod
+    def _profile_conditions(flt: ProfileFilter) -> list[Any]:
+        # каждое условие — равенство/диапазон по индексируемому выражению (без ILIKE '%x%')
+        conds: list[Any] = []
+        if flt.citizenship:
+            code = citizenship_code(flt.citizenship)
+            if code:
+                conds.append(CandidateProfile.citizenship_code == code)
+        if flt.age_from is not None:
+            conds.append(CandidateProfile.age >= int(flt.age_from))
+        if flt.age_to is not None:
+            conds.append(CandidateProfile.age <= int(flt.age_to))
+        if flt.username:
+            uname = flt.username.strip().lstrip("@").lower()
+            if uname:
+                conds.append(func.lower(CandidateProfile.username) == uname)
+        if flt.has_resume is not None:
+            conds.append(CandidateProfile.has_resume == bool(flt.has_resume))
+        return conds
+
+    async def search_profiles(
         self,
+        flt: ProfileFilter | None = None,
         *,
-        citizenship: str | None = None,
-        age_from: int | None = None,
-        age_to: int | None = None,
-        username: str | None = None,
-        has_resume: bool | None = None,
-        limit: int = 100,
-        offset: int = 0,
-    ) -> list[CandidateProfile]:
-        q = select(CandidateProfile)
-
-        if citizenship:
-            q = q.where(CandidateProfile.citizenship.ilike(f"%{citizenship.strip()}%"))
-
-        if age_from is not None:
-            q = q.where(CandidateProfile.age >= int(age_from))
-
-        if age_to is not None:
-            q = q.where(CandidateProfile.age <= int(age_to))
-
-        if username:
-            uname = username.strip().lstrip("@")
-            q = q.where(CandidateProfile.username.ilike(uname))
-
-        if has_resume is not None:
-            q = q.where(CandidateProfile.has_resume == bool(has_resume))
-
-        q = q.order_by(
-            func.coalesce(CandidateProfile.last_responded_at, CandidateProfile.updated_at).desc()
-        ).limit(limit).offset(offset)
+        limit: int = 20,
+        cursor: str | None = None,
+    ) -> ProfilePage:
+        """
+        Страница анкет по убыванию активности (coalesce(last_responded_at, updated_at), user_id).
+        Keyset вместо OFFSET: любая страница — один проход по индексу ix_candidate_profiles_activity
+        (или ix_candidate_profiles_cit_activity с фильтром по гражданству) на limit + 1 строк.
+        """
+        limit = max(1, int(limit))
+        q = select(CandidateProfile).where(*self._profile_conditions(flt or ProfileFilter()))
+
+        after = decode_profile_cursor(cursor)
+        if after is not None:
+            q = q.where(tuple_(_PROFILE_ACTIVITY, CandidateProfile.user_id) < tuple_(*after))
+
+        q = q.order_by(_PROFILE_ACTIVITY.desc(), CandidateProfile.user_id.desc()).limit(limit + 1)
 
         res = await self.session.execute(q)
-        return list(res.scalars().all())
+        rows = list(res.scalars().all())
+        if len(rows) <= limit:
+            return ProfilePage(items=rows, next_cursor=None)
+
+        rows = rows[:limit]
+        return ProfilePage(items=rows, next_cursor=encode_profile_cursor(rows[-1]))
 
     async def count_profiles(
         self,
+        flt: ProfileFilter | None = None,
         *,
-        citizenship: str | None = None,
-        age_from: int | None = None,
-        age_to: int | None = None,
-        username: str | None = None,
-        has_resume: bool | None = None,
-    ) -> int:
-        q = select(func.count()).select_from(CandidateProfile)
-
-        if citizenship:
-            q = q.where(CandidateProfile.citizenship.ilike(f"%{citizenship.strip()}%"))
-
-        if age_from is not None:
-            q = q.where(CandidateProfile.age >= int(age_from))
-
-        if age_to is not None:
-            q = q.where(CandidateProfile.age <= int(age_to))
-
-        if username:
-            uname = username.strip().lstrip("@")
-            q = q.where(CandidateProfile.username.ilike(uname))
-
-        if has_resume is not None:
-            q = q.where(CandidateProfile.has_resume == bool(has_resume))
-
-        res = await self.session.execute(q)
-        return int(res.scalar_one() or 0)
+        exact_cap: int = PROFILE_COUNT_EXACT_CAP,
+    ) -> ProfileCount:
+        """
+        До exact_cap — точный COUNT (по индексу, не дальше exact_cap + 1 строк),
+        больше — оценка планировщика (EXPLAIN), без полного прохода по таблице.
+        """
+        conds = self._profile_conditions(flt or ProfileFilter())
+        matched = select(CandidateProfile.user_id).where(*conds)
+
+        capped = select(func.count()).select_from(matched.limit(int(exact_cap) + 1).subquery())
+        n = int(await self.session.scalar(capped) or 0)
+        if n <= int(exact_cap):
+            return ProfileCount(value=n, exact=True)
+
+        estimate = await self._estimate_rows(matched)
+        return ProfileCount(value=max(n, estimate), exact=False)
+
+    async def _estimate_rows(self, stmt: Any) -> int:
+        sql = str(stmt.compile(dialect=self.session.get_bind().dialect, compile_kwargs={"literal_binds": True}))
+        conn = await self.session.connection()
+        res = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql)
+        plan = res.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        try:
+            return int(plan[0]["Plan"]["Plan Rows"])
+        except (LookupError, TypeError, ValueError):
+            return 0
 
 
 # ----------------------------
@@ -364,15 +488,6 @@ class RespondRepo:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    # -------- infra --------
-    async def ensure_dedup_unique_index(self) -> None:
-        await self.session.execute(text("""
-            CREATE UNIQUE INDEX IF NOT EXISTS ux_respond_events_dedup_key
-            ON respond_events (dedup_key)
-            WHERE dedup_key IS NOT NULL
-        """))
-        await self.session.commit()
-
     # -------- basic getters --------
     async def respond_exists(self, *, ad_id: int, candidate_user_id: int) -> bool:
         res = await self.session.execute(
@@ -460,6 +575,62 @@ class RespondRepo:
         return r
 
     # -------- events --------
+    async def _claim_dedup_key(self, *, dedup_key: str, respond_id: int) -> Optional[datetime]:
+        """
+        Резервирует dedup_key в respond_event_dedup (в текущей транзакции).
+        Возвращает created_at для события или None, если ключ уже занят.
+        """
+        res = await self.session.execute(
+            pg_insert(RespondEventDedup)
+            .values(dedup_key=dedup_key, respond_id=int(respond_id))
+            .on_conflict_do_nothing(index_elements=["dedup_key"])
+            .returning(RespondEventDedup.created_at)
+        )
+        return res.scalar_one_or_none()
+
+    async def _insert_event(
+        self,
+        *,
+        respond_id: int,
+        actor_role: str,
+        actor_user_id: int | None,
+        event_type: str,
+        payload: dict | None,
+        dedup_key: str | None,
+        created_at: datetime | None = None,
+    ) -> int:
+        values: dict[str, Any] = {
+            "respond_id": respond_id,
+            "actor_role": actor_role,
+            "actor_user_id": actor_user_id,
+            "event_type": event_type,
+            "payload": payload or {},
+            "dedup_key": dedup_key,
+        }
+        if created_at is not None:
+            values["created_at"] = created_at
+
+        res = await self.session.execute(
+            insert(RespondEvent).values(**values).returning(RespondEvent.id)
+        )
+        ev_id = int(res.scalar_one())
+
+        if dedup_key:
+            await self.session.execute(
+                update(RespondEventDedup)
+                .where(RespondEventDedup.dedup_key == dedup_key)
+                .values(event_id=ev_id)
+            )
+        return ev_id
+
+    async def _get_event(self, ev_id: int, *, created_at: datetime | None = None) -> Optional[RespondEvent]:
+        q = select(RespondEvent).where(RespondEvent.id == int(ev_id))
+        if created_at is not None:
+            # created_at = ключ партиционирования -> Postgres смотрит одну партицию
+            q = q.where(RespondEvent.created_at == created_at)
+        res = await self.session.execute(q)
+        return res.scalar_one_or_none()
+
     async def add_event(
         self,
         *,
@@ -471,35 +642,38 @@ class RespondRepo:
         dedup_key: str | None = None,
     ) -> RespondEvent:
         if dedup_key:
-            stmt = (
-                pg_insert(RespondEvent)
-                .values(
+            created_at = await self._claim_dedup_key(dedup_key=dedup_key, respond_id=respond_id)
+
+            if created_at is not None:
+                ev_id = await self._insert_event(
                     respond_id=respond_id,
                     actor_role=actor_role,
                     actor_user_id=actor_user_id,
                     event_type=event_type,
-                    payload=payload or {},
+                    payload=payload,
                     dedup_key=dedup_key,
+                    created_at=created_at,
                 )
-                .on_conflict_do_nothing(
-                    index_elements=["dedup_key"],
-                    index_where=RespondEvent.dedup_key.is_not(None),
-                )
-                .returning(RespondEvent.id)
-            )
-            res = await self.session.execute(stmt)
-            ev_id = res.scalar_one_or_none()
+                await self.session.commit()
+
+                ev = await self._get_event(ev_id, created_at=created_at)
+                if ev is not None:
+                    setattr(ev, "_dedup_inserted", True)
+                    return ev
+
             await self.session.commit()
 
-            if ev_id is not None:
-                res3 = await self.session.execute(select(RespondEvent).where(RespondEvent.id == ev_id))
-                ev = res3.scalar_one()
-                setattr(ev, "_dedup_inserted", True)
-                return ev
+            res2 = await self.session.execute(
+                select(RespondEventDedup).where(RespondEventDedup.dedup_key == dedup_key)
+            )
+            d = res2.scalar_one_or_none()
+            ev = None
+            if d is not None and d.event_id is not None:
+                ev = await self._get_event(int(d.event_id), created_at=d.created_at)
 
-            res2 = await self.session.execute(select(RespondEvent).where(RespondEvent.dedup_key == dedup_key))
-            ev = res2.scalar_one_or_none()
             if ev is None:
+                # ключ есть, а события нет (например, партиция уже архивирована) —
+                # возвращаем несохранённый объект, повторно НЕ пишем
                 ev = RespondEvent(
                     respond_id=respond_id,
                     actor_role=actor_role,
@@ -508,26 +682,22 @@ class RespondRepo:
                     payload=payload or {},
                     dedup_key=dedup_key,
                 )
-                self.session.add(ev)
-                await self.session.commit()
-                await self.session.refresh(ev)
-                setattr(ev, "_dedup_inserted", True)
-                return ev
 
             setattr(ev, "_dedup_inserted", False)
             return ev
 
-        ev = RespondEvent(
+        ev_id = await self._insert_event(
             respond_id=respond_id,
             actor_role=actor_role,
             actor_user_id=actor_user_id,
             event_type=event_type,
-            payload=payload or {},
+            payload=payload,
             dedup_key=None,
         )
-        self.session.add(ev)
         await self.session.commit()
-        await self.session.refresh(ev)
+
+        ev = await self._get_event(ev_id)
+        assert ev is not None
         setattr(ev, "_dedup_inserted", True)
         return ev
 
@@ -541,27 +711,22 @@ class RespondRepo:
         payload: dict | None = None,
         dedup_key: str,
     ) -> bool:
-        stmt = (
-            pg_insert(RespondEvent)
-            .values(
-                respond_id=respond_id,
-                actor_role=actor_role,
-                actor_user_id=actor_user_id,
-                event_type=event_type,
-                payload=payload or {},
-                dedup_key=dedup_key,
-            )
-            .on_conflict_do_nothing(
-                index_elements=["dedup_key"],
-                index_where=RespondEvent.dedup_key.is_not(None),
-            )
-            .returning(RespondEvent.id)
-        )
+        created_at = await self._claim_dedup_key(dedup_key=dedup_key, respond_id=respond_id)
+        if created_at is None:
+            await self.session.commit()
+            return False
 
-        res = await self.session.execute(stmt)
-        ev_id = res.scalar_one_or_none()
+        await self._insert_event(
+            respond_id=respond_id,
+            actor_role=actor_role,
+            actor_user_id=actor_user_id,
+            event_type=event_type,
+            payload=payload,
+            dedup_key=dedup_key,
+            created_at=created_at,
+        )
         await self.session.commit()
-        return ev_id is not None
+        return True
 
     # -------- status / activity --------
     async def set_status(self, respond_id: int, status: str, *, closed_at: datetime | None = None) -> None:
@@ -1018,31 +1183,43 @@ class RespondRepo:
         await self.session.commit()
 
     # -------- daily limits --------
+    # таблица respond_daily_limits — durable копия счётчика откликов (горячий путь — utils/limits)
     async def inc_daily_limit(self, *, user_id: int, day: date) -> int:
-        stmt = (
-            insert(RespondDailyLimit)
-            .values(
-                user_id=user_id,
-                day=day,
-                count=1,
-            )
-            .on_conflict_do_update(
-                index_elements=["user_id", "day"],
-                set_={"count": RespondDailyLimit.count + 1, "updated_at": _now_utc()},
-            )
-            .returning(RespondDailyLimit.count)
-        )
-
-        res = await self.session.execute(stmt)
+        v = await daily_limits.inc_and_get(self.session, int(user_id), day, table=daily_limits.RESPOND_TABLE)
         await self.session.commit()
-        return int(res.scalar_one())
+        return int(v)
 
     async def get_daily_limit(self, *, user_id: int, day: date) -> int:
+        return await daily_limits.get_count(self.session, int(user_id), day, table=daily_limits.RESPOND_TABLE)
+
+# ----------------------------
+# System counters
+# ----------------------------
+class SystemCountersRepo:
+    """
+    Счётчики для /sys_status.
+    Пишут их только триггеры в Postgres (см миграцию system_counters),
+    здесь — только чтение одной маленькой таблицы вместо COUNT(*) по ads/responds/respond_events.
+    Счётчик разложен по шардам (name, shard) — суммируем на чтении.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def snapshot(self) -> tuple[dict[str, int], Optional[datetime]]:
         res = await self.session.execute(
-            select(RespondDailyLimit.count).where(
-                RespondDailyLimit.user_id == user_id,
-                RespondDailyLimit.day == day,
-            )
+            select(
+                SystemCounter.name,
+                func.sum(SystemCounter.value),
+                func.max(SystemCounter.updated_at),
+            ).group_by(SystemCounter.name)
         )
-        v = res.scalar_one_or_none()
-        return int(v or 0)
\ No newline at end of file
+
+        counters: dict[str, int] = {}
+        fresh_at: Optional[datetime] = None
+        for name, value, updated_at in res.all():
+            counters[str(name)] = int(value or 0)
+            if updated_at is not None and (fresh_at is None or updated_at > fresh_at):
+                fresh_at = updated_at
+
+        return counters, fresh_at
@@ -1,7 +1,6 @@
 # findex_bot/handlers/alerts.py
 from __future__ import annotations
 
-import asyncio
 import contextlib
 import logging
 import time
@@ -29,9 +28,12 @@ from findex_bot.utils.moscow_metro import (
     build_moscow_location,
 )
 from findex_bot.utils.moscow_metro import metro_location_keyboard
+from findex_bot.handlers.shared_metro_flow import offer_metro_suggestions
 
 logger = logging.getLogger(__name__)
+import findex_bot.runtime as runtime
 from findex_bot.utils.obs import log_event
+from findex_bot.utils import supervisor
 router = Router()
 
 
@@ -85,13 +87,7 @@ TEMP_ALERT_SECONDS = 4
 
 async def _temp_message(message: Message, text: str, seconds: int = TEMP_ALERT_SECONDS) -> None:
     msg = await message.answer(text)
-
-    async def _delete_later() -> None:
-        await asyncio.sleep(seconds)
-        with contextlib.suppress(Exception):
-            await msg.delete()
-
-    asyncio.create_task(_delete_later())
+    await supervisor.delete_later(message.bot, int(msg.chat.id), int(msg.message_id), seconds)
 
 
 async def _cleanup_reset(state: FSMContext) -> None:
@@ -165,13 +161,7 @@ async def _alerts_access_state(bot, user_id: int) -> dict[str, Any]:
     except Exception:
         logger.exception("alerts: failed to parse _check_subscription result user_id=%s", user_id)
 
-    import findex_bot.runtime as runtime
-
-    is_blocked = False
-    try:
-        is_blocked = bool(runtime.is_blocked(int(user_id)))
-    except Exception:
-        is_blocked = False
+    is_blocked = runtime.is_blocked(int(user_id))
 
     return {
         "ok_sub": bool(ok_sub),
@@ -295,7 +285,8 @@ def _clean_user_input(s: str) -> str:
 def _alerts_location_prompt() -> str:
     return (
         "Теперь введи <b>локацию</b>.\n"
-        "Пример: <code>Москва</code>, <code>Тверская</code>, <code>Химки</code>\n\n"
+        "Пример: <code>Москва</code>, <code>Тверская</code>, <code>Химки</code>\n"
+        "С радиусом: <code>Курская 3 км</code> — подойдут и соседние станции.\n\n"
         "Для Москвы рекомендуем указать метро — так объявление найдут быстрее."
     )
 
@@ -874,6 +865,14 @@ async def alerts_set_location(message: Message, state: FSMContext):
         await state.clear()
         return
 
+    if await offer_metro_suggestions(
+        message=message,
+        state=state,
+        text=loc,
+        track_message_fn=_cleanup_track_bot_message,
+    ):
+        return
+
     try:
         a = await u.add_alert(user_id, target_role, position_raw, location_raw=loc)
     except ValueError as e:
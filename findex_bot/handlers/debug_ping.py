@@ -2,63 +2,50 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, Callable, Awaitable
+from typing import Any, Dict, Callable, Awaitable, Iterable
 
 from aiogram import Router, BaseMiddleware, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from sqlalchemy import select, func
+from sqlalchemy import select
 
 import findex_bot.runtime as runtime
 from findex_bot.db.db import get_sessionmaker
 from findex_bot.db.models import Ad
+from findex_bot.handlers.forms import REJECT_FIELD_REASONS, _field_title_local, _moderator_label, reject_ad_by_moderator
+from findex_bot.utils import moderation_queue, publish_queue
+from findex_bot.utils.moderation_queue import QueuePage
 from findex_bot.utils.ui_utils import moderation_keyboard
 
 router = Router()
 logger = logging.getLogger(__name__)
 
-PAGE_SIZE = 10
-
+PAGE_SIZE = moderation_queue.PAGE_SIZE
+
+# Очередь модерации: листание — keyset-курсор страницы (utils/moderation_queue),
+# выбор объявлений живёт прямо в клавиатуре сообщения (☑️/⬜ на кнопках) — без состояния в процессе.
+#   mod_pending_list[:n|p:<cursor>]   страница после / до курсора (без курсора — голова очереди)
+#   mod_pending_open:<ad_id>          открыть оригинальную карточку модерации
+#   mod_pending_sel:<ad_id>           отметить / снять
+#   mod_pending_all                   отметить всю страницу / снять всё
+#   mod_pending_ok                    одобрить отмеченные -> очередь публикации в канал (utils/publish_queue)
+#   mod_pending_rej                   показать / скрыть причины отклонения
+#   mod_pending_rejf:<field>          отклонить отмеченные с причиной по полю
 CB_PENDING_LIST = "mod_pending_list"
 CB_PENDING_OPEN = "mod_pending_open"
+CB_PENDING_SELECT = "mod_pending_sel"
+CB_PENDING_SELECT_ALL = "mod_pending_all"
+CB_PENDING_APPROVE = "mod_pending_ok"
+CB_PENDING_REJECT = "mod_pending_rej"
+CB_PENDING_REJECT_FIELD = "mod_pending_rejf"
+
+MARK_ON = "☑️"
+MARK_OFF = "⬜"
 
 
 def _is_moderator(user_id: int) -> bool:
     return int(user_id) in (getattr(runtime, "MODERATORS", set()) or set())
 
 
-def _payload_value(payload: dict[str, Any] | None, *keys: str) -> str:
-    p = payload or {}
-    for key in keys:
-        val = p.get(key)
-        if val is None:
-            continue
-        s = str(val).strip()
-        if s:
-            return s
-    return ""
-
-
-async def _count_pending() -> int:
-    async with get_sessionmaker()() as session:
-        stmt = select(func.count()).select_from(Ad).where(Ad.status == "pending")
-        res = await session.execute(stmt)
-        return int(res.scalar_one() or 0)
-
-
-async def _load_pending_page(page: int = 0) -> list[Ad]:
-    page = max(int(page), 0)
-    async with get_sessionmaker()() as session:
-        stmt = (
-            select(Ad)
-            .where(Ad.status == "pending")
-            .order_by(Ad.updated_at.asc(), Ad.id.asc())
-            .limit(PAGE_SIZE)
-            .offset(page * PAGE_SIZE)
-        )
-        res = await session.execute(stmt)
-        return list(res.scalars().all())
-
-
 async def _get_pending_by_id(ad_id: int) -> Ad | None:
     async with get_sessionmaker()() as session:
         stmt = select(Ad).where(
@@ -69,67 +56,145 @@ async def _get_pending_by_id(ad_id: int) -> Ad | None:
         return res.scalar_one_or_none()
 
 
-def _queue_text(ads: list[Ad], total: int, page: int) -> str:
-    if total <= 0 or not ads:
-        return "🟢 <b>Очередь модерации пуста</b>"
-
-    start_idx = page * PAGE_SIZE + 1
-    end_idx = min(page * PAGE_SIZE + len(ads), total)
+def _queue_text(page: QueuePage) -> str:
+    queued = publish_queue.depth()
+    if not page.items:
+        text = "🟢 <b>Очередь модерации пуста</b>"
+        if queued:
+            text += f"\n\n📤 В очереди публикации: <b>{queued}</b>"
+        return text
 
     lines = [
         "🗂 <b>Очередь модерации</b>",
         "",
-        f"Всего ожидают: <b>{total}</b>",
-        f"Показано: <b>{start_idx}-{end_idx}</b>",
-        "",
+        f"Всего ожидают: <b>{page.total}</b>",
     ]
+    if queued:
+        eta_min = max(1, round(publish_queue.PUBLISH_QUEUE.eta_sec() / 60))
+        lines.append(f"📤 В очереди публикации: <b>{queued}</b> (≈ {eta_min} мин)")
+    lines.append("")
+    lines.extend(item.row for item in page.items)
+    return "\n".join(lines)
 
-    for ad in ads:
-        payload = getattr(ad, "payload", None) or {}
-        title = _payload_value(payload, "title", "position", "job_title") or "Без названия"
-        location = _payload_value(payload, "location", "city", "metro")
-        role = str(getattr(ad, "role", "") or "").strip() or "—"
 
-        row = f"#{int(ad.id)} · {role} · {title}"
-        if location:
-            row += f" · {location}"
-        lines.append(row)
+def _select_button(ad_id: int, selected: bool) -> InlineKeyboardButton:
+    return InlineKeyboardButton(
+        text=f"{MARK_ON if selected else MARK_OFF} #{int(ad_id)}",
+        callback_data=f"{CB_PENDING_SELECT}:{int(ad_id)}",
+    )
 
-    return "\n".join(lines)
+
+def _reject_rows() -> list[list[InlineKeyboardButton]]:
+    buttons = [
+        InlineKeyboardButton(text=f"❌ {_field_title_local(field)}", callback_data=f"{CB_PENDING_REJECT_FIELD}:{field}")
+        for field in REJECT_FIELD_REASONS
+    ]
+    rows = [buttons[i : i + 2] for i in range(0, len(buttons), 2)]
+    rows.append([InlineKeyboardButton(text="↩️ Отмена", callback_data=CB_PENDING_REJECT)])
+    return rows
 
 
-def _queue_kb(ads: list[Ad], page: int, total: int) -> InlineKeyboardMarkup:
+def _queue_kb(page: QueuePage, selected: Iterable[int] = ()) -> InlineKeyboardMarkup:
+    chosen = {int(x) for x in selected}
     rows: list[list[InlineKeyboardButton]] = []
 
-    for ad in ads:
+    for item in page.items:
         rows.append([
-            InlineKeyboardButton(
-                text=f"📄 Открыть #{int(ad.id)}",
-                callback_data=f"{CB_PENDING_OPEN}:{int(ad.id)}:{int(page)}",
-            )
+            _select_button(item.ad_id, item.ad_id in chosen),
+            InlineKeyboardButton(text="📄 Открыть", callback_data=f"{CB_PENDING_OPEN}:{item.ad_id}"),
         ])
 
     nav_row: list[InlineKeyboardButton] = []
-    if page > 0:
-        nav_row.append(
-            InlineKeyboardButton(
-                text="⬅️",
-                callback_data=f"{CB_PENDING_LIST}:{page - 1}",
-            )
-        )
-    if (page + 1) * PAGE_SIZE < total:
-        nav_row.append(
-            InlineKeyboardButton(
-                text="➡️",
-                callback_data=f"{CB_PENDING_LIST}:{page + 1}",
-            )
-        )
-    if nav_row:
-        rows.append(nav_row)
+    if page.prev_cursor:
+        nav_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"{CB_PENDING_LIST}:p:{page.prev_cursor}"))
+    nav_row.append(InlineKeyboardButton(text="🔄", callback_data=CB_PENDING_LIST))
+    if page.next_cursor:
+        nav_row.append(InlineKeyboardButton(text="➡️", callback_data=f"{CB_PENDING_LIST}:n:{page.next_cursor}"))
+    rows.append(nav_row)
+
+    if page.items:
+        rows.append([InlineKeyboardButton(text=f"{MARK_ON} Все на странице", callback_data=CB_PENDING_SELECT_ALL)])
+        rows.append([
+            InlineKeyboardButton(text="✅ Одобрить отмеченные", callback_data=CB_PENDING_APPROVE),
+            InlineKeyboardButton(text="❌ Отклонить отмеченные", callback_data=CB_PENDING_REJECT),
+        ])
 
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+# ---------------- выбор в клавиатуре ----------------
+def _select_id(button: InlineKeyboardButton) -> int | None:
+    data = button.callback_data or ""
+    if not data.startswith(f"{CB_PENDING_SELECT}:"):
+        return None
+    try:
+        return int(data.split(":", 1)[1])
+    except Exception:
+        return None
+
+
+def _selected_ids(markup: InlineKeyboardMarkup | None) -> list[int]:
+    out: list[int] = []
+    for row in (markup.inline_keyboard if markup else []):
+        for button in row:
+            ad_id = _select_id(button)
+            if ad_id is not None and (button.text or "").startswith(MARK_ON):
+                out.append(ad_id)
+    return out
+
+
+def _page_ids(markup: InlineKeyboardMarkup | None) -> list[int]:
+    return [
+        ad_id
+        for row in (markup.inline_keyboard if markup else [])
+        for ad_id in (_select_id(b) for b in row)
+        if ad_id is not None
+    ]
+
+
+def _with_selection(markup: InlineKeyboardMarkup, selected: set[int]) -> InlineKeyboardMarkup:
+    rows: list[list[InlineKeyboardButton]] = []
+    for row in markup.inline_keyboard:
+        new_row = []
+        for button in row:
+            ad_id = _select_id(button)
+            new_row.append(button if ad_id is None else _select_button(ad_id, ad_id in selected))
+        rows.append(new_row)
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def _is_reject_row(row: list[InlineKeyboardButton]) -> bool:
+    # строки причин + "↩️ Отмена" (одна кнопка mod_pending_rej в строке)
+    if len(row) == 1 and row[0].callback_data == CB_PENDING_REJECT:
+        return True
+    return any((b.callback_data or "").startswith(f"{CB_PENDING_REJECT_FIELD}:") for b in row)
+
+
+def _toggle_reject_rows(markup: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+    rows = [row for row in markup.inline_keyboard if not _is_reject_row(row)]
+    if len(rows) == len(markup.inline_keyboard):
+        rows.extend(_reject_rows())
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+async def _edit_markup(callback: CallbackQuery, markup: InlineKeyboardMarkup) -> None:
+    try:
+        await callback.message.edit_reply_markup(reply_markup=markup)
+    except Exception as e:
+        if "message is not modified" not in str(e).lower():
+            logger.exception("mod_pending: edit markup failed")
+
+
+def _parse_list_data(data: str) -> tuple[str | None, str | None]:
+    """mod_pending_list:n:<cursor> -> (after, None); :p:<cursor> -> (None, before); иначе голова очереди."""
+    parts = (data or "").split(":")
+    if len(parts) == 3 and parts[1] == "n":
+        return parts[2], None
+    if len(parts) == 3 and parts[1] == "p":
+        return None, parts[2]
+    return None, None
+
+
 async def _copy_original_moderation_card(callback: CallbackQuery, ad: Ad) -> bool:
     """
     Единственно правильный путь:
@@ -180,13 +245,17 @@ async def _copy_original_moderation_card(callback: CallbackQuery, ad: Ad) -> boo
         return False
 
 
-async def _render_pending_queue(target: Message | CallbackQuery, page: int = 0) -> None:
-    page = max(int(page), 0)
-    total = await _count_pending()
-    ads = await _load_pending_page(page=page)
+async def _render_pending_queue(
+    target: Message | CallbackQuery,
+    *,
+    after: str | None = None,
+    before: str | None = None,
+) -> None:
+    page = await moderation_queue.QUEUE.page(target.bot, after=after, before=before)
+    await publish_queue.PUBLISH_QUEUE.fetch_depth(target.bot)
 
-    text = _queue_text(ads, total, page)
-    kb = _queue_kb(ads, page, total)
+    text = _queue_text(page)
+    kb = _queue_kb(page)
 
     if isinstance(target, Message):
         await target.answer(text, reply_markup=kb, parse_mode="HTML")
@@ -209,22 +278,127 @@ async def pending_ads_cmd(message: Message):
     user = message.from_user
     if not user or not _is_moderator(int(user.id)):
         return
-    await _render_pending_queue(message, page=0)
+    await _render_pending_queue(message)
 
 
-@router.callback_query(F.data.startswith(f"{CB_PENDING_LIST}:"))
+@router.callback_query(F.data.startswith(CB_PENDING_LIST))
 async def pending_ads_page(callback: CallbackQuery):
     user = callback.from_user
     if not user or not _is_moderator(int(user.id)):
         return
 
-    parts = (callback.data or "").split(":")
+    after, before = _parse_list_data(callback.data or "")
+    await _render_pending_queue(callback, after=after, before=before)
+
+
+@router.callback_query(F.data.startswith(f"{CB_PENDING_SELECT}:"))
+async def pending_ads_select(callback: CallbackQuery):
+    user = callback.from_user
+    if not user or not _is_moderator(int(user.id)) or not callback.message:
+        return
+
+    try:
+        ad_id = int((callback.data or "").split(":")[1])
+    except Exception:
+        return await callback.answer()
+
+    selected = set(_selected_ids(callback.message.reply_markup))
+    selected ^= {ad_id}
+    await _edit_markup(callback, _with_selection(callback.message.reply_markup, selected))
+    await callback.answer()
+
+
+@router.callback_query(F.data == CB_PENDING_SELECT_ALL)
+async def pending_ads_select_all(callback: CallbackQuery):
+    user = callback.from_user
+    if not user or not _is_moderator(int(user.id)) or not callback.message:
+        return
+
+    markup = callback.message.reply_markup
+    ids = set(_page_ids(markup))
+    selected = set() if ids and ids <= set(_selected_ids(markup)) else ids
+    await _edit_markup(callback, _with_selection(markup, selected))
+    await callback.answer()
+
+
+@router.callback_query(F.data == CB_PENDING_APPROVE)
+async def pending_ads_approve(callback: CallbackQuery):
+    user = callback.from_user
+    if not user or not _is_moderator(int(user.id)) or not callback.message:
+        return
+
+    ids = _selected_ids(callback.message.reply_markup)
+    if not ids:
+        return await callback.answer("Отметьте объявления ⬜ в списке", show_alert=True)
+    if not int(getattr(runtime, "MAIN_CHANNEL_ID", 0) or 0):
+        return await callback.answer("⚠️ MAIN_CHANNEL_ID не настроен", show_alert=True)
+
+    moderator = _moderator_label(callback)
+    report_chat_id = int(callback.message.chat.id)
+    added = await publish_queue.enqueue(
+        callback.bot,
+        [publish_queue.PublishJob(ad_id=ad_id, moderator=moderator, report_chat_id=report_chat_id) for ad_id in ids],
+    )
+    eta_min = max(1, round(publish_queue.PUBLISH_QUEUE.eta_sec() / 60))
+
     try:
-        page = int(parts[1])
+        await callback.answer(f"📤 В очередь публикации: {added}\nВся очередь ≈ {eta_min} мин", show_alert=True)
     except Exception:
-        page = 0
+        pass
+    await _render_pending_queue(callback)
+
 
-    await _render_pending_queue(callback, page=page)
+@router.callback_query(F.data == CB_PENDING_REJECT)
+async def pending_ads_reject_menu(callback: CallbackQuery):
+    user = callback.from_user
+    if not user or not _is_moderator(int(user.id)) or not callback.message:
+        return
+
+    markup = callback.message.reply_markup
+    if markup is None:
+        return await callback.answer()
+    await _edit_markup(callback, _toggle_reject_rows(markup))
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith(f"{CB_PENDING_REJECT_FIELD}:"))
+async def pending_ads_reject(callback: CallbackQuery):
+    user = callback.from_user
+    if not user or not _is_moderator(int(user.id)) or not callback.message:
+        return
+
+    field = (callback.data or "").split(":", 1)[1].strip().lower()
+    ids = _selected_ids(callback.message.reply_markup)
+    if not ids:
+        return await callback.answer("Отметьте объявления ⬜ в списке", show_alert=True)
+
+    moderator = _moderator_label(callback)
+    rejected = 0
+    for ad_id in ids:
+        try:
+            ad = await reject_ad_by_moderator(
+                callback.bot,
+                ad_id,
+                field,
+                moderator=moderator,
+                moderator_user_id=int(user.id),
+                only_pending=True,
+            )
+        except Exception:
+            logger.exception("mod_pending: bulk reject failed ad_id=%s field=%s", ad_id, field)
+            continue
+        if ad is not None:
+            rejected += 1
+
+    skipped = len(ids) - rejected
+    text = f"❌ Отклонено: {rejected}"
+    if skipped:
+        text += f"\nПропущено (уже не на модерации): {skipped}"
+    try:
+        await callback.answer(text, show_alert=True)
+    except Exception:
+        pass
+    await _render_pending_queue(callback)
 
 
 @router.callback_query(F.data.startswith(f"{CB_PENDING_OPEN}:"))
@@ -0,0 +1,67 @@
+# findex_bot/handlers/deeplink.py
+from __future__ import annotations
+
+import contextlib
+import logging
+
+from aiogram import F, Router
+from aiogram.filters import CommandStart
+from aiogram.fsm.context import FSMContext
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
+
+import findex_bot.runtime as runtime
+
+# /start resp_<ad_id> (раньше жил прямо в bot.py)
+router = Router()
+
+
+@router.message(CommandStart(deep_link=True), F.text.regexp(r"^/start\s+resp_\d+\s*$"))
+async def _start_deeplink_entry(message: Message, state: FSMContext):
+    text = (message.text or "").strip()
+    parts = text.split(maxsplit=1)
+    payload = parts[1].strip() if len(parts) > 1 else ""
+
+    ad_part = payload.replace("resp_", "", 1).strip()
+
+    try:
+        ad_id = int(ad_part)
+        if ad_id <= 0:
+            raise ValueError("ad_id must be > 0")
+    except Exception:
+        await message.answer(
+            "⚠️ Некорректная ссылка на объявление.\n"
+            "Открой объявление в канале и нажми «📩 Откликнуться» ещё раз."
+        )
+        return
+
+    try:
+        import findex_bot.handlers.responds as responds_mod  # type: ignore
+
+        for fname in ("start_from_deeplink", "handle_deeplink_start"):
+            fn = getattr(responds_mod, fname, None)
+            if callable(fn):
+                await fn(message, ad_id, state=state, redis=getattr(runtime, "REDIS", None))  # type: ignore
+
+                # Удаляем только техническое /start-сообщение
+                # только в сценарии valid deep-link resp_<ad_id>
+                with contextlib.suppress(Exception):
+                    await message.delete()
+                return
+    except Exception:
+        logging.exception("deeplink -> responds entry failed")
+
+    kb = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="📩 Откликнуться", callback_data=f"respond:{ad_id}")]
+        ]
+    )
+    await message.answer(
+        "📩 Как ты хочешь откликнуться на объявление?\n\n"
+        "Нажми кнопку ниже — бот продолжит отклик.",
+        reply_markup=kb,
+    )
+
+    # И здесь тоже удаляем только техническое /start-сообщение
+    # в рамках того же valid deep-link сценария
+    with contextlib.suppress(Exception):
+        await message.delete()
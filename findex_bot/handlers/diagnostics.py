@@ -13,7 +13,7 @@ from sqlalchemy import select
 
 import findex_bot.runtime as runtime
 from findex_bot.db.db import get_sessionmaker
-from findex_bot.db.daily_limits import get_count as db_get_pub_count
+from findex_bot.utils import limits
 from findex_bot.db.models import Ad
 from findex_bot.utils.ui_utils import (
     DAILY_FREE_LIMIT,
@@ -179,7 +179,7 @@ async def _limits_line(user_id: int, username: str | None) -> Optional[str]:
     ✅ ПРАВИЛО ПРОЕКТА:
     - для безлимитных (UNLIMITED_USER_IDS в env + fallback usernames) лимиты НЕ ПОКАЗЫВАЕМ ВООБЩЕ.
     - для модераторов — тоже НЕ ПОКАЗЫВАЕМ (у них публикация не должна быть ограничена).
-    - для обычных — берём truth-source из Postgres (daily_pub_limits), как в forms.py/menu.py.
+    - для обычных — берём счётчик из utils/limits (Redis, fallback Postgres), как в forms.py/menu.py.
 
     Возвращает строку или None (если строку показывать нельзя).
     """
@@ -194,9 +194,7 @@ async def _limits_line(user_id: int, username: str | None) -> Optional[str]:
 
         published = 0
         try:
-            async with get_sessionmaker()() as session:
-                published = await db_get_pub_count(session, uid)
-                await session.commit()
+            published = await limits.get_used_pub(uid)
         except Exception:
             published = 0
 
@@ -211,8 +209,8 @@ async def _limits_line(user_id: int, username: str | None) -> Optional[str]:
 
 
 def _blocks_line(user_id: int) -> str:
-    blocked = getattr(runtime, "BLOCKED_USERS", set()) or set()
-    return "❌ Блокировки: есть" if int(user_id) in blocked else "✅ Блокировки: нет"
+    blocked = runtime.is_blocked(int(user_id))
+    return "❌ Блокировки: есть" if blocked else "✅ Блокировки: нет"
 
 
 async def _get_pending_ads(user_id: int) -> list[Ad]:
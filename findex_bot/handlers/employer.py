@@ -19,12 +19,13 @@ from findex_bot.handlers.shared_metro_flow import (
     metro_close as shared_metro_close,
     metro_pick as shared_metro_pick,
     metro_line_pick as shared_metro_line_pick,
+    offer_metro_suggestions as shared_offer_metro_suggestions,
 )
 from findex_bot.handlers.shared_preview_refs import (
     cleanup_after_preview as shared_cleanup_after_preview,
     persist_preview_ref as shared_persist_preview_ref,
 )
-from findex_bot.db.daily_limits import get_count as db_get_pub_count
+from findex_bot.utils import limits, preview_registry, similarity
 from findex_bot.states.vacancies import EmployerForm
 from findex_bot.utils.vacancy_utils import get_ad_text
 from findex_bot.utils.validators import (
@@ -251,10 +252,7 @@ def _prompt_contact_mode() -> str:
 
 async def _published_today(user_id: int) -> int:
     try:
-        async with get_sessionmaker()() as session:
-            v = await db_get_pub_count(session, int(user_id))
-            await session.commit()
-            return int(v)
+        return int(await limits.get_used_pub(int(user_id)))
     except Exception:
         return 0
 
@@ -528,6 +526,14 @@ async def emp_location(message: Message, state: FSMContext):
         )
         return
 
+    if await shared_offer_metro_suggestions(
+        message=message,
+        state=state,
+        text=val,
+        track_message_fn=track_cleanup_message,
+    ):
+        return
+
     val = normalize_location_input(val)
     async with get_sessionmaker()() as session:
         await AdRepo(session).patch_payload(int(ad_id), location=val)
@@ -1076,6 +1082,7 @@ async def emp_send(cb: CallbackQuery, state: FSMContext):
 
         photo_id = _get_primary_photo_id(payload)
         video_id = payload.get("video_file_id")
+        text = similarity.with_note(text, await similarity.moderation_note(ad), media=bool(photo_id or video_id))
 
         send_kwargs = {}
         if thread_id:
@@ -1123,6 +1130,14 @@ async def emp_send(cb: CallbackQuery, state: FSMContext):
             reject_notice_message_id=None,
         )
 
+        if preview_message_id:
+            await preview_registry.lock_preview(
+                preview_chat_id,
+                preview_message_id,
+                preview_registry.PREVIEW_MODE_MODERATION,
+                ad_id=ad_id,
+            )
+
     try:
         if cb.message:
             try:
@@ -3,7 +3,8 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from typing import Optional, Any, Tuple
+from dataclasses import dataclass
+from typing import Optional, Any, Awaitable, Callable, Tuple
 
 from aiogram import Router, F
 from aiogram.types import (
@@ -14,15 +15,13 @@ from aiogram.types import (
     LinkPreviewOptions,
 )
 from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
 from aiogram.fsm.context import FSMContext
 
 import findex_bot.runtime as runtime
 from findex_bot.db.db import get_sessionmaker
 from findex_bot.db.repo import AdRepo
-from findex_bot.db.daily_limits import (
-    get_count as db_get_pub_count,
-    inc_and_get as db_inc_pub_count,
-)
+from findex_bot.utils import ad_render, limits, moderation_queue, preview_registry, publish_queue, supervisor
 from findex_bot.utils.ui_utils import (
     safe_answer,
     DAILY_FREE_LIMIT,
@@ -40,7 +39,7 @@ from findex_bot.utils.ui_utils import (
     reset_cleanup_bucket,
     track_cleanup_message,
 )
-from findex_bot.utils.vacancy_utils import get_ad_text, resolve_ad_role
+from findex_bot.utils.vacancy_utils import resolve_ad_role
 from findex_bot.handlers.alerts import fire_alerts_on_publish
 from findex_bot.handlers.forms_parts.preview_edit_router import _parse_preview_edit, _start_edit_from_preview
 from findex_bot.handlers.forms_parts.published_preview_render_service import _send_published_preview_message, _replace_published_preview_message
@@ -54,6 +53,19 @@ K_PREVIEW_MSG_ID = "preview_msg_id"
 K_PREVIEW_IS_MEDIA = "preview_is_media"
 LIMIT_NOTICE_TTL_SEC = 5
 
+# причина отклонения по полю (кнопки причин на карточке и в /намодерации)
+REJECT_FIELD_REASONS: dict[str, str] = {
+    "title": "Должность некорректная",
+    "schedule": "График некорректный",
+    "salary": "Зарплата некорректная",
+    "location": "Локация некорректная",
+    "contacts": "Контакты некорректные",
+    "description": "Описание некорректное",
+    "about": "О себе некорректно",
+    "media": "Медиа/фото некорректное",
+}
+REJECT_DEFAULT_REASON = "Некорректные данные объявления"
+
 
 def _limit_notice_cache() -> dict[int, tuple[int, int]]:
     cache = getattr(runtime, "LIMIT_NOTICE_MESSAGES", None)
@@ -86,19 +98,13 @@ async def _send_limit_notice(bot, user_id: int, text: str) -> None:
     )
     cache[uid] = (int(msg.chat.id), int(msg.message_id))
 
-    async def _delete_later(chat_id: int, message_id: int, target_uid: int) -> None:
-        try:
-            await asyncio.sleep(LIMIT_NOTICE_TTL_SEC)
-            try:
-                await bot.delete_message(chat_id=chat_id, message_id=message_id)
-            except Exception:
-                pass
-        finally:
-            current = cache.get(target_uid)
-            if current == (chat_id, message_id):
-                cache.pop(target_uid, None)
+    notice = (int(msg.chat.id), int(msg.message_id))
+
+    async def _forget_notice() -> None:
+        if cache.get(uid) == notice:
+            cache.pop(uid, None)
 
-    asyncio.create_task(_delete_later(int(msg.chat.id), int(msg.message_id), uid))
+    await supervisor.delete_later(bot, notice[0], notice[1], LIMIT_NOTICE_TTL_SEC, after=_forget_notice)
 
 
 def _get_primary_photo_id(payload: dict[str, Any] | None) -> str | None:
@@ -154,9 +160,22 @@ def _moderator_label(cb: CallbackQuery) -> str:
     return "—"
 
 
-def _publish_info_block(cb: CallbackQuery, public_url: str | None) -> str:
+def _publish_info_block(moderator: str, public_url: str | None) -> str:
     url = public_url or "—"
-    return f"\n\n✅ Опубликовано!\nМодератор: {_moderator_label(cb)}\nСсылка: {url}"
+    return f"\n\n✅ Опубликовано!\nМодератор: {moderator}\nСсылка: {url}"
+
+
+def _reject_info_block(moderator: str, reason: str) -> str:
+    return f"\n\n❌ Отклонено\nМодератор: {moderator}\nПричина: {reason}"
+
+
+def _is_acting_message(cb: CallbackQuery | None, chat_id: int, message_id: int) -> bool:
+    if cb is None or not cb.message:
+        return False
+    try:
+        return int(cb.message.chat.id) == int(chat_id) and int(cb.message.message_id) == int(message_id)
+    except Exception:
+        return False
 
 
 def _strip_publish_info(text: str) -> str:
@@ -182,31 +201,11 @@ def _safe_trunc_caption_1024(s: str) -> str:
     return s[:1021] + "…"
 
 
-async def _edit_moderation_message_published(cb: CallbackQuery, public_url: str | None) -> None:
-    if not cb.message:
-        return
-
-    add = _publish_info_block(cb, public_url)
-
-    try:
-        if cb.message.caption is not None:
-            base = _strip_publish_info(cb.message.caption)
-            new_caption = base + add
-            if len(new_caption) > 1024:
-                new_caption = new_caption[:1021] + "…"
-            await cb.message.edit_caption(caption=new_caption, reply_markup=None)
-        else:
-            base = _strip_publish_info(cb.message.text or "")
-            await cb.message.edit_text(_safe_trunc_4096(base + add), reply_markup=None)
-    except Exception:
-        pass
-
-
 async def _edit_moderation_message_rejected(cb: CallbackQuery, reason: str) -> None:
     if not cb.message:
         return
 
-    add = f"\n\n❌ Отклонено\nМодератор: {_moderator_label(cb)}\nПричина: {reason}"
+    add = _reject_info_block(_moderator_label(cb), reason)
 
     try:
         if cb.message.caption is not None:
@@ -226,12 +225,13 @@ async def _sync_original_moderation_message_published(
     *,
     bot,
     ad,
-    cb: CallbackQuery,
+    moderator: str,
     public_url: str | None,
+    cb: CallbackQuery | None = None,
 ) -> None:
     """
-    Синхронизирует оригинальную карточку модерации, если approve был нажат
-    не на ней, а на её копии из /намодерации.
+    Переводит оригинальную карточку модерации в «Опубликовано»
+    (пропускается, если cb — сама эта карточка: её правит вызывающий).
     """
     try:
         payload = ad.payload or {}
@@ -241,23 +241,16 @@ async def _sync_original_moderation_message_published(
         if not mod_chat_id or not mod_message_id:
             return
 
-        if cb.message:
-            try:
-                if (
-                    int(cb.message.chat.id) == mod_chat_id
-                    and int(cb.message.message_id) == mod_message_id
-                ):
-                    return
-            except Exception:
-                pass
+        if _is_acting_message(cb, mod_chat_id, mod_message_id):
+            return
 
-        add = _publish_info_block(cb, public_url)
+        add = _publish_info_block(moderator, public_url)
 
-        base = get_ad_text(ad)
+        base = ad_render.text(ad)
 
         author_username = str(payload.get("author_username") or "").strip()
         author_name = str(payload.get("author_name") or "").strip()
-        author_id = payload.get("author_id") or getattr(ad, "author_user_id", None)
+        author_id = getattr(ad, "author_user_id", None) or payload.get("author_id")
 
         author_block = ""
         if author_username:
@@ -303,12 +296,13 @@ async def _sync_original_moderation_message_rejected(
     *,
     bot,
     ad,
-    cb: CallbackQuery,
+    moderator: str,
     reason: str,
+    cb: CallbackQuery | None = None,
 ) -> None:
     """
     Синхронизирует оригинальную карточку модерации, если reject был нажат
-    не на ней, а на её копии из /намодерации.
+    не на ней, а на её копии из /намодерации (или пришёл пачкой из очереди, cb=None).
     """
     try:
         payload = ad.payload or {}
@@ -318,23 +312,16 @@ async def _sync_original_moderation_message_rejected(
         if not mod_chat_id or not mod_message_id:
             return
 
-        if cb.message:
-            try:
-                if (
-                    int(cb.message.chat.id) == mod_chat_id
-                    and int(cb.message.message_id) == mod_message_id
-                ):
-                    return
-            except Exception:
-                pass
+        if _is_acting_message(cb, mod_chat_id, mod_message_id):
+            return
 
-        add = f"\n\n❌ Отклонено\nМодератор: {_moderator_label(cb)}\nПричина: {reason}"
+        add = _reject_info_block(moderator, reason)
 
-        base = get_ad_text(ad)
+        base = ad_render.text(ad)
 
         author_username = str(payload.get("author_username") or "").strip()
         author_name = str(payload.get("author_name") or "").strip()
-        author_id = payload.get("author_id") or getattr(ad, "author_user_id", None)
+        author_id = getattr(ad, "author_user_id", None) or payload.get("author_id")
 
         author_block = ""
         if author_username:
@@ -380,15 +367,19 @@ async def _delete_current_moderation_copy_if_needed(
     *,
     bot,
     ad,
-    cb: CallbackQuery,
+    cb: CallbackQuery | None = None,
+    card: tuple[int, int] | None = None,
 ) -> None:
     """
     Если действие выполнено на копии карточки из /намодерации,
     удаляем эту копию после синхронизации оригинала.
     Если действие было на оригинальной moderation-карточке, ничего не делаем.
+    card — (chat_id, message_id) карточки, когда действие завершает очередь публикации, а не callback.
     """
     try:
-        if not cb.message:
+        if cb is not None and cb.message:
+            card = (int(cb.message.chat.id), int(cb.message.message_id))
+        if not card:
             return
 
         payload = ad.payload or {}
@@ -398,8 +389,7 @@ async def _delete_current_moderation_copy_if_needed(
         if not mod_chat_id or not mod_message_id:
             return
 
-        current_chat_id = int(cb.message.chat.id)
-        current_message_id = int(cb.message.message_id)
+        current_chat_id, current_message_id = int(card[0]), int(card[1])
 
         if current_chat_id == mod_chat_id and current_message_id == mod_message_id:
             return
@@ -446,43 +436,6 @@ def _extract_preview_coords_from_payload(payload: dict[str, Any] | None) -> tupl
     return extract_preview_coords_from_payload(payload)
 
 
-def _extract_preview_coords_fallback_runtime(ad_id: int) -> tuple[int, int, bool]:
-    from findex_bot.handlers.forms_parts.preview_ref_readers import extract_preview_coords_fallback_runtime
-
-    return extract_preview_coords_fallback_runtime(ad_id, runtime_module=runtime)
-
-
-def _extract_value_from_ad_text(ad_text: str, label: str) -> str:
-    marker = f"{label}:"
-    for raw_line in (ad_text or "").splitlines():
-        line = (raw_line or "").strip()
-        if marker in line:
-            try:
-                return line.split(marker, 1)[1].strip()
-            except Exception:
-                continue
-    return ""
-
-
-def _strip_contacts_from_ad_text(ad_text: str) -> str:
-    """
-    Для публикации в основной канал скрываем строку с контактами,
-    если выбран способ отклика через бота.
-    Модерация при этом продолжает видеть полную карточку.
-    """
-    lines = []
-    for raw_line in (ad_text or "").splitlines():
-        line = (raw_line or "").strip()
-        if line.startswith("📞 Контакты:") or line.startswith("Контакты:"):
-            continue
-        lines.append(raw_line)
-
-    cleaned = "\n".join(lines)
-    while "\n\n\n" in cleaned:
-        cleaned = cleaned.replace("\n\n\n", "\n\n")
-    return cleaned.strip()
-
-
 def _contact_mode_key(value: Any) -> str:
     return str(value or "").strip().lower()
 
@@ -513,40 +466,24 @@ def _is_contact_mode_with_bot_button(value: Any) -> bool:
     }
 
 
-def _published_compact_text(ad_text: str) -> str:
-    title = _extract_value_from_ad_text(ad_text, "Должность")
-    location = _extract_value_from_ad_text(ad_text, "Локация")
-
-    if title and location:
-        return f"✅ Опубликовано • {title} • {location}"
-    if title:
-        return f"✅ Опубликовано • {title}"
-    if location:
-        return f"✅ Опубликовано • {location}"
-    return "✅ Опубликовано"
-
-
 def _build_user_published_text(
     *,
-    ad_text: str,
+    ad,
     public_url: str | None,
     published: int | None,
     unlimited: bool,
     collapsed: bool,
 ) -> str:
     if collapsed:
-        return _published_compact_text(ad_text)
-    return (ad_text or "").strip() + _user_publish_footer(public_url, published, unlimited)
+        return ad_render.compact(ad)
+    return ad_render.text(ad).strip() + _user_publish_footer(public_url, published, unlimited)
 
 
 async def _resolve_published_count(author_id: int, unlimited: bool) -> Optional[int]:
     if not author_id or unlimited:
         return None
     try:
-        async with get_sessionmaker()() as s:
-            published_count = await db_get_pub_count(s, int(author_id))
-            await s.commit()
-            return int(published_count)
+        return int(await limits.get_used_pub(int(author_id)))
     except Exception:
         logger.exception("failed to resolve published count for author_id=%s", author_id)
         return None
@@ -558,7 +495,7 @@ async def _edit_user_preview_published(
     *,
     bot,
     ad_id: int,
-    ad_text: str,
+    ad,
     public_url: str | None,
     published: int | None,
     unlimited: bool,
@@ -566,15 +503,12 @@ async def _edit_user_preview_published(
     collapsed: bool = False,
 ) -> None:
     chat_id, msg_id, is_media = _extract_preview_coords_from_payload(payload)
-    if not chat_id or not msg_id:
-        chat_id, msg_id, is_media = _extract_preview_coords_fallback_runtime(ad_id)
-
     if not chat_id or not msg_id:
         logger.warning("preview coords not found for ad_id=%s (cannot edit user preview)", ad_id)
         return
 
     text = _build_user_published_text(
-        ad_text=ad_text,
+        ad=ad,
         public_url=public_url,
         published=published,
         unlimited=unlimited,
@@ -599,6 +533,11 @@ async def _edit_user_preview_published(
                 link_preview_options=LinkPreviewOptions(is_disabled=True),
             )
 
+        # лок «published» — только после удачного edit, вместе с preview_status в payload:
+        # реестр и payload не расходятся. Если edit не прошёл, остаётся лок модерации —
+        # кнопки черновика на превью всё равно заглушены.
+        await preview_registry.lock_preview(chat_id, msg_id, preview_registry.PREVIEW_MODE_PUBLISHED, ad_id=int(ad_id))
+
         try:
             async with get_sessionmaker()() as s:
                 await AdRepo(s).patch_payload(
@@ -760,6 +699,12 @@ async def toggle_published_preview(cb: CallbackQuery):
                 preview_status="published",
             )
             await session.commit()
+            await preview_registry.lock_preview(
+                int(cb.message.chat.id),
+                int(new_message_id),
+                preview_registry.PREVIEW_MODE_PUBLISHED,
+                ad_id=int(ad_id),
+            )
         except Exception:
             logger.exception(
                 "failed to patch payload after published preview toggle ad_id=%s collapsed=%s new_message_id=%s",
@@ -800,7 +745,7 @@ async def republish_from_preview(cb: CallbackQuery):
         role = resolve_ad_role(new_ad)
         kb = _draft_preview_kb(role, int(new_ad.id))
 
-        text = get_ad_text(new_ad)
+        text = ad_render.text(new_ad)
         photo_file_id = _get_primary_photo_id(payload)
         video_file_id = payload.get("video_file_id")
 
@@ -842,6 +787,7 @@ async def republish_from_preview(cb: CallbackQuery):
             preview_status="draft",
             preview_collapsed=False,
         )
+        await preview_registry.register(int(msg.chat.id), int(msg.message_id), ad_id=int(new_ad.id))
 
     return await safe_answer(cb, "✅ Сделал копию. Новый предпросмотр отправлен в личку.", alert=True)
 
@@ -1277,30 +1223,66 @@ async def rejr_dispatch(cb: CallbackQuery, state: FSMContext):
             await track_cleanup_message(state, sent)
         return
 
-    field_reason_map = {
-        "title": "Должность некорректная",
-        "schedule": "График некорректный",
-        "salary": "Зарплата некорректная",
-        "location": "Локация некорректная",
-        "contacts": "Контакты некорректные",
-        "description": "Описание некорректное",
-        "about": "О себе некорректно",
-        "media": "Медиа/фото некорректное",
-    }
-    reason = field_reason_map.get(field, "Некорректные данные объявления")
+    reason = REJECT_FIELD_REASONS.get(field, REJECT_DEFAULT_REASON)
+
+    ad = await reject_ad_by_moderator(
+        cb.bot,
+        ad_id,
+        field,
+        moderator=_moderator_label(cb),
+        moderator_user_id=int(cb.from_user.id),
+        cb=cb,
+    )
+    if ad is None:
+        return await safe_answer(cb, "❌ Объявление не найдено", alert=True)
+
+    await _edit_moderation_message_rejected(cb, reason)
+
+    await _delete_current_moderation_copy_if_needed(
+        bot=cb.bot,
+        ad=ad,
+        cb=cb,
+    )
+
+    return await safe_answer(cb, "❌ Отклонено", alert=True)
+
+
+async def reject_ad_by_moderator(
+    bot,
+    ad_id: int,
+    field: str,
+    *,
+    moderator: str,
+    moderator_user_id: int,
+    cb: CallbackQuery | None = None,
+    only_pending: bool = False,
+):
+    """
+    Отклонение объявления модератором: draft + причина в payload, синхронизация оригинальной
+    карточки модерации и уведомление автора с кнопкой «Исправить».
+    Общая для rejr_dispatch и пакетного отклонения из /намодерации (cb=None, only_pending=True).
+    -> объявление или None, если не найдено (или уже не на модерации при only_pending).
+    """
+    from findex_bot.utils.obs import log_event
+
+    ad_id = int(ad_id)
+    field = (field or "").strip().lower()
+    reason = REJECT_FIELD_REASONS.get(field, REJECT_DEFAULT_REASON)
 
     async with get_sessionmaker()() as session:
         repo = AdRepo(session)
         ad = await repo.get(ad_id)
         if not ad:
-            return await safe_answer(cb, "❌ Объявление не найдено", alert=True)
+            return None
+        if only_pending and getattr(ad, "status", None) != "pending":
+            return None
 
         payload = ad.payload or {}
-        author_id = int(payload.get("author_id") or getattr(ad, "author_user_id", 0) or 0)
+        author_id = int(getattr(ad, "author_user_id", 0) or payload.get("author_id") or 0)
 
         payload_role = str(payload.get("role") or payload.get("ad_role") or "").strip().lower()
         db_role = resolve_ad_role(ad)
-        forced_role = _role_from_moderation_message(cb)
+        forced_role = _role_from_moderation_message(cb) if cb is not None else ""
 
         if forced_role in {"seeker", "employer"}:
             final_role = forced_role
@@ -1315,8 +1297,8 @@ async def rejr_dispatch(cb: CallbackQuery, state: FSMContext):
         log_event(
             logger,
             "moderation_reject_reason",
-            moderator_user_id=cb.from_user.id,
-            callback_data=cb.data,
+            moderator_user_id=moderator_user_id,
+            callback_data=(cb.data if cb is not None else None),
             ad_id=ad_id,
             field_key=field,
             role=final_role,
@@ -1336,23 +1318,20 @@ async def rejr_dispatch(cb: CallbackQuery, state: FSMContext):
         except Exception:
             logger.exception("failed to set ad draft status on rejection ad_id=%s field=%s", ad_id, field)
 
+        await preview_registry.set_mode_for_ad(ad_id, preview_registry.PREVIEW_MODE_DRAFT)
+
         try:
             await repo.patch_payload(ad_id, **patch_kwargs)
         except Exception:
             logger.exception("failed to patch rejection payload ad_id=%s field=%s", ad_id, field)
 
-    await _edit_moderation_message_rejected(cb, reason)
+    moderation_queue.forget(ad_id)
 
     await _sync_original_moderation_message_rejected(
-        bot=cb.bot,
+        bot=bot,
         ad=ad,
-        cb=cb,
+        moderator=moderator,
         reason=reason,
-    )
-
-    await _delete_current_moderation_copy_if_needed(
-        bot=cb.bot,
-        ad=ad,
         cb=cb,
     )
 
@@ -1360,7 +1339,7 @@ async def rejr_dispatch(cb: CallbackQuery, state: FSMContext):
         log_event(
             logger,
             "moderation_reject_notify",
-            moderator_user_id=cb.from_user.id,
+            moderator_user_id=moderator_user_id,
             ad_id=ad_id,
             field_key=field,
             result="fail",
@@ -1373,7 +1352,7 @@ async def rejr_dispatch(cb: CallbackQuery, state: FSMContext):
             ]
         )
 
-        rej_msg = await cb.bot.send_message(
+        rej_msg = await bot.send_message(
             author_id,
             rejected_user_text(reason),
             reply_markup=kb_fix,
@@ -1384,7 +1363,7 @@ async def rejr_dispatch(cb: CallbackQuery, state: FSMContext):
         log_event(
             logger,
             "moderation_reject_notify",
-            moderator_user_id=cb.from_user.id,
+            moderator_user_id=moderator_user_id,
             author_id=author_id,
             ad_id=ad_id,
             field_key=field,
@@ -1405,7 +1384,7 @@ async def rejr_dispatch(cb: CallbackQuery, state: FSMContext):
         log_event(
             logger,
             "moderation_reject_notify",
-            moderator_user_id=cb.from_user.id,
+            moderator_user_id=moderator_user_id,
             author_id=author_id,
             ad_id=ad_id,
             field_key=field,
@@ -1413,7 +1392,7 @@ async def rejr_dispatch(cb: CallbackQuery, state: FSMContext):
         )
         logger.exception("failed to notify user about rejection ad_id=%s author_id=%s", ad_id, author_id)
 
-    return await safe_answer(cb, "❌ Отклонено", alert=True)
+    return ad
 
 
 
@@ -1430,135 +1409,275 @@ async def seek_quick_edit(cb: CallbackQuery, state: FSMContext):
     await _start_edit_from_preview(cb, state)
 
 
-@router.callback_query(F.data.startswith("approve:"))
-async def approve_ad(callback: CallbackQuery):
-    await safe_answer(callback)
+# ---------------- публикация в канал ----------------
+# publish_ad — одна публикация целиком; её вызывают approve_ad (кнопка на карточке)
+# и очередь публикации (utils/publish_queue) для пакетного одобрения из /намодерации.
+PUBLISH_OK = "published"
+PUBLISH_ALREADY = "already"
+PUBLISH_NOT_FOUND = "not_found"
+PUBLISH_NOT_PENDING = "not_pending"
+PUBLISH_LIMIT = "limit"
+PUBLISH_FAILED = "failed"
+PUBLISH_NO_CHANNEL = "no_channel"
+PUBLISH_RETRY = "retry"  # 429 / сеть: очередь повторит (retry_after — сколько ждать по ответу Telegram)
 
+
+@dataclass(frozen=True)
+class PublishResult:
+    status: str
+    ad: Any = None
+    public_url: Optional[str] = None
+    retry_after: float = 0.0
+
+
+async def _edit_user_preview_published_safe(**kwargs: Any) -> None:
     try:
-        ad_id = int((callback.data or "").split(":")[1])
+        await _edit_user_preview_published(**kwargs)
     except Exception:
-        return await safe_answer(callback, "⚠️ Некорректные данные", alert=True)
+        logger.exception("edit user preview failed for ad_id=%s", kwargs.get("ad_id"))
+
 
+async def _fire_alerts_safe(bot, ad, public_url: Optional[str]) -> None:
+    try:
+        await fire_alerts_on_publish(bot, ad, url=public_url)
+    except Exception:
+        logger.exception("alerts failed")
+
+
+async def _retract_channel_post(bot, channel_id: int, message_id: int, ad_id: int) -> None:
+    try:
+        await bot.delete_message(channel_id, int(message_id))
+    except Exception:
+        logger.exception("failed to retract channel post ad_id=%s message_id=%s", ad_id, message_id)
+
+
+async def publish_ad(
+    bot,
+    ad_id: int,
+    *,
+    moderator: str,
+    cb: CallbackQuery | None = None,
+    card: tuple[int, int] | None = None,
+    only_pending: bool = False,
+    before_send: Optional[Callable[[], Awaitable[Any]]] = None,
+    on_sent: Optional[Callable[[int], Awaitable[Any]]] = None,
+    resume_message_id: Optional[int] = None,
+) -> PublishResult:
+    """
+    Слот лимита -> пост в канал -> статус published -> оригинальная карточка модерации
+    и превью автора. Рассылка алертов уходит в фон (supervisor.spawn).
+    cb — карточка, на которой нажали «Одобрить» (её правит вызывающий);
+    card — (chat_id, message_id) такой карточки из очереди публикации: копия из /намодерации удаляется;
+    only_pending — не публиковать то, что уже ушло с модерации.
+    Хуки очереди публикации (utils/publish_queue): before_send — ждать слот темпа канала,
+    on_sent — пост ушёл (message_id), resume_message_id — пост уже отправлен прошлой попыткой:
+    второй раз не шлём, только дописываем статус.
+    """
     channel_id = int(getattr(runtime, "MAIN_CHANNEL_ID", 0) or 0)
     channel_username = str(getattr(runtime, "CHANNEL_USERNAME", "") or "").lstrip("@").strip()
 
     if channel_id == 0:
-        return await safe_answer(callback, "⚠️ MAIN_CHANNEL_ID не настроен", alert=True)
+        return PublishResult(PUBLISH_NO_CHANNEL)
 
     async with get_sessionmaker()() as session:
         repo = AdRepo(session)
-        ad = await repo.get(ad_id)
+        ad = await repo.get(int(ad_id))
         if not ad:
-            return await safe_answer(callback, "❌ Объявление не найдено", alert=True)
+            return PublishResult(PUBLISH_NOT_FOUND)
 
-        if getattr(ad, "status", None) == "published":
-            try:
-                if callback.message:
-                    await callback.message.edit_reply_markup(reply_markup=None)
-            except Exception:
-                pass
-            return await safe_answer(callback, "⚠️ Уже опубликовано", alert=True)
+        status = getattr(ad, "status", None)
+        if status == "published":
+            return PublishResult(PUBLISH_ALREADY, ad=ad, public_url=getattr(ad, "public_url", None))
+        if only_pending and status != "pending":
+            if resume_message_id:
+                # пост ушёл прошлой попыткой, а объявление за это время сняли с модерации
+                await _retract_channel_post(bot, channel_id, int(resume_message_id), ad_id)
+            return PublishResult(PUBLISH_NOT_PENDING, ad=ad)
 
         payload = ad.payload or {}
-        author_id = payload.get("author_id") or getattr(ad, "author_user_id", None)
+        author_id = getattr(ad, "author_user_id", None) or payload.get("author_id")
         author_username = payload.get("author_username")
 
         unlimited = is_unlimited(author_id, author_username)
 
-        if author_id and (not unlimited):
+        # Слот лимита резервируем атомарно ДО публикации (Redis Lua / upsert в Postgres),
+        # при ошибке отправки в канал — возвращаем. При resume слот уже занят прошлой попыткой.
+        published_after: Optional[int] = None
+        reserved = False
+        if resume_message_id:
+            published_after = await _resolve_published_count(int(author_id or 0), unlimited)
+        elif author_id and (not unlimited):
             try:
-                async with get_sessionmaker()() as s2:
-                    published = await db_get_pub_count(s2, int(author_id))
-                    await s2.commit()
+                allowed, published = await limits.try_consume(limits.PUB, int(author_id))
             except Exception:
-                logger.exception("failed to pre-check daily publish count author_id=%s ad_id=%s", author_id, ad_id)
-                published = 0
+                logger.exception("failed to reserve daily publish slot author_id=%s ad_id=%s", author_id, ad_id)
+                allowed, published = True, 0
+            else:
+                reserved = bool(allowed)
+                published_after = int(published) if allowed else None
 
-            if published >= int(DAILY_FREE_LIMIT):
+            if not allowed:
                 left = format_hhmmss(utc_seconds_to_reset())
                 warn = (
                     f"⛔️ Лимит публикаций исчерпан ({published}/{DAILY_FREE_LIMIT}).\n"
                     f"До сброса (UTC): {left}"
                 )
                 try:
-                    await _send_limit_notice(callback.bot, int(author_id), warn)
+                    await _send_limit_notice(bot, int(author_id), warn)
                 except Exception:
                     logger.exception("failed to send clean limit notice author_id=%s ad_id=%s", author_id, ad_id)
 
-                return await safe_answer(callback, "⛔ Лимит исчерпан (автору отправлено)", alert=True)
+                return PublishResult(PUBLISH_LIMIT, ad=ad)
 
         contact_mode = payload.get("contact_mode")
         bot_only_mode = _is_contact_mode_bot_only(contact_mode)
 
-        text = get_ad_text(ad, include_contacts=not bot_only_mode)
         photo_file_id = _get_primary_photo_id(payload)
         video_file_id = payload.get("video_file_id")
-
-        if bot_only_mode:
-            text = _strip_contacts_from_ad_text(text)
+        # через бота — без строки контактов; модерация при этом видит полную карточку
+        if video_file_id or photo_file_id:
+            text = ad_render.caption(ad, contacts=not bot_only_mode)
+        else:
+            text = ad_render.text(ad, contacts=not bot_only_mode, limit=ad_render.TEXT_LIMIT)
 
         kb = channel_ad_kb(ad.id) if _is_contact_mode_with_bot_button(contact_mode) else None
 
-        try:
-            if video_file_id:
-                msg = await callback.bot.send_video(channel_id, video=video_file_id, caption=text, reply_markup=kb)
-            elif photo_file_id:
-                msg = await callback.bot.send_photo(channel_id, photo=photo_file_id, caption=text, reply_markup=kb)
-            else:
-                msg = await callback.bot.send_message(channel_id, text, reply_markup=kb)
-        except Exception:
-            logger.exception("publish failed")
-            return await safe_answer(callback, "❌ Ошибка публикации", alert=True)
-
-        public_url: Optional[str] = None
-        if channel_username:
-            public_url = f"https://t.me/{channel_username}/{msg.message_id}"
+        async def _release_slot() -> None:
+            if reserved:
+                try:
+                    await limits.release(limits.PUB, int(author_id))
+                except Exception:
+                    logger.exception("failed to release daily publish slot author_id=%s ad_id=%s", author_id, ad_id)
 
-        published_after: Optional[int] = None
-        if author_id and (not unlimited):
+        message_id = int(resume_message_id or 0)
+        if not message_id:
             try:
-                async with get_sessionmaker()() as s3:
-                    published_after = int(await db_inc_pub_count(s3, int(author_id)))
-                    await s3.commit()
+                if before_send is not None:
+                    await before_send()
+                    # ожидание слота / паузы 429 бывает долгим: модератор мог успеть отклонить
+                    await session.refresh(ad, attribute_names=["status"])
+                    if ad.status != status:
+                        await _release_slot()
+                        if ad.status == "published":
+                            return PublishResult(PUBLISH_ALREADY, ad=ad, public_url=getattr(ad, "public_url", None))
+                        return PublishResult(PUBLISH_NOT_PENDING, ad=ad)
+                if video_file_id:
+                    msg = await bot.send_video(channel_id, video=video_file_id, caption=text, reply_markup=kb)
+                elif photo_file_id:
+                    msg = await bot.send_photo(channel_id, photo=photo_file_id, caption=text, reply_markup=kb)
+                else:
+                    msg = await bot.send_message(channel_id, text, reply_markup=kb)
+            except TelegramRetryAfter as e:
+                logger.warning("publish flood control ad_id=%s retry_after=%s", ad_id, e.retry_after)
+                await _release_slot()
+                return PublishResult(PUBLISH_RETRY, ad=ad, retry_after=float(e.retry_after or 1))
+            except (TelegramNetworkError, TelegramServerError):
+                logger.exception("publish failed (transient) ad_id=%s", ad_id)
+                await _release_slot()
+                return PublishResult(PUBLISH_RETRY, ad=ad)
             except Exception:
-                logger.exception("failed to increment daily publish count author_id=%s ad_id=%s", author_id, ad_id)
-                published_after = None
-
-        await repo.set_status(ad.id, "published")
-        await repo.set_public_url(ad.id, public_url)
+                logger.exception("publish failed")
+                await _release_slot()
+                return PublishResult(PUBLISH_FAILED, ad=ad)
 
-        await _edit_moderation_message_published(callback, public_url)
+            message_id = int(msg.message_id)
+            if on_sent is not None:
+                try:
+                    await on_sent(message_id)
+                except Exception:
+                    logger.exception("publish on_sent hook failed ad_id=%s", ad_id)
 
-        await _sync_original_moderation_message_published(
-            bot=callback.bot,
+        public_url: Optional[str] = None
+        if channel_username:
+            public_url = f"https://t.me/{channel_username}/{message_id}"
+
+        if not await repo.mark_published(
+            ad.id, public_url=public_url, channel_message_id=message_id, expected_status=status,
+        ):
+            # статус сменился между проверкой и отправкой — пост в канале не оставляем
+            logger.warning("publish: ad_id=%s left status=%s before mark_published, retracting", ad_id, status)
+            await _retract_channel_post(bot, channel_id, message_id, ad_id)
+            if not resume_message_id:
+                await _release_slot()
+            return PublishResult(PUBLISH_NOT_PENDING, ad=ad)
+
+    moderation_queue.forget(int(ad.id))
+
+    # разные чаты (модерация / автор) — правки независимы, идут параллельно
+    await asyncio.gather(
+        _sync_original_moderation_message_published(
+            bot=bot,
             ad=ad,
-            cb=callback,
+            moderator=moderator,
             public_url=public_url,
-        )
-
-        await _delete_current_moderation_copy_if_needed(
-            bot=callback.bot,
+            cb=cb,
+        ),
+        _edit_user_preview_published_safe(
+            bot=bot,
+            ad_id=ad.id,
             ad=ad,
-            cb=callback,
-        )
+            public_url=public_url,
+            published=published_after,
+            unlimited=unlimited,
+            payload=payload,
+            collapsed=False,
+        ),
+    )
 
-        try:
-            await _edit_user_preview_published(
-                bot=callback.bot,
-                ad_id=ad.id,
-                ad_text=get_ad_text(ad),
-                public_url=public_url,
-                published=published_after,
-                unlimited=unlimited,
-                payload=payload,
-                collapsed=False,
-            )
-        except Exception:
-            logger.exception("edit user preview failed for ad_id=%s", ad.id)
+    if card is not None:
+        await _delete_current_moderation_copy_if_needed(bot=bot, ad=ad, card=card)
 
+    supervisor.spawn(_fire_alerts_safe(bot, ad, public_url), name=f"alerts_on_publish:{int(ad.id)}")
+
+    return PublishResult(PUBLISH_OK, ad=ad, public_url=public_url)
+
+
+@router.callback_query(F.data.startswith("approve:"))
+async def approve_ad(callback: CallbackQuery):
+    """
+    Одобрение не ждёт канал: объявление встаёт в очередь публикации (utils/publish_queue),
+    модератор сразу получает «в очереди». Карточку модерации и превью автора правит publish_ad,
+    когда пост реально уйдёт; неудача — ответом на эту карточку.
+    """
+    try:
+        ad_id = int((callback.data or "").split(":")[1])
+    except Exception:
+        return await safe_answer(callback, "⚠️ Некорректные данные", alert=True)
+
+    if not int(getattr(runtime, "MAIN_CHANNEL_ID", 0) or 0):
+        return await safe_answer(callback, "⚠️ MAIN_CHANNEL_ID не настроен", alert=True)
+
+    async with get_sessionmaker()() as session:
+        ad = await AdRepo(session).get(ad_id)
+    if not ad:
+        return await safe_answer(callback, "❌ Объявление не найдено", alert=True)
+
+    status = getattr(ad, "status", None)
+    if status == "published":
         try:
-            await fire_alerts_on_publish(callback.bot, ad, url=public_url)
+            if callback.message:
+                await callback.message.edit_reply_markup(reply_markup=None)
         except Exception:
-            logger.exception("alerts failed")
+            pass
+        return await safe_answer(callback, "⚠️ Уже опубликовано", alert=True)
+    if status != "pending":
+        return await safe_answer(callback, "⚠️ Объявление уже не на модерации", alert=True)
+
+    card = (int(callback.message.chat.id), int(callback.message.message_id)) if callback.message else (0, 0)
+    job = publish_queue.PublishJob(
+        ad_id=ad_id,
+        moderator=_moderator_label(callback),
+        card_chat_id=card[0],
+        card_message_id=card[1],
+    )
+    added = await publish_queue.enqueue(callback.bot, [job])
+    moderation_queue.forget(ad_id)
+
+    if not added:
+        return await safe_answer(callback, "⏳ Уже в очереди публикации", alert=True)
 
-    return await safe_answer(callback, "✅ Опубликовано", alert=True)
+    eta = int(publish_queue.PUBLISH_QUEUE.eta_sec())
+    note = "📤 В очереди публикации"
+    if eta > 0:
+        note += f" (≈ {eta} сек)"
+    return await safe_answer(callback, note, alert=True)
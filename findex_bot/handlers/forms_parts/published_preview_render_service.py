@@ -3,7 +3,6 @@ from __future__ import annotations
 from aiogram.types import LinkPreviewOptions
 
 from findex_bot.utils.ui_utils import published_preview_kb, is_unlimited
-from findex_bot.utils.vacancy_utils import get_ad_text
 
 
 async def _send_published_preview_message(
@@ -24,9 +23,8 @@ async def _send_published_preview_message(
     )
 
     payload = ad.payload or {}
-    ad_text = get_ad_text(ad)
     text = _build_user_published_text(
-        ad_text=ad_text,
+        ad=ad,
         public_url=public_url,
         published=published,
         unlimited=unlimited,
@@ -84,7 +82,7 @@ async def _replace_published_preview_message(
     from findex_bot.handlers.forms import _resolve_published_count
 
     payload = ad.payload or {}
-    author_id = int(payload.get("author_id") or getattr(ad, "author_user_id", 0) or 0)
+    author_id = int(getattr(ad, "author_user_id", 0) or payload.get("author_id") or 0)
     author_username = payload.get("author_username")
     unlimited = is_unlimited(author_id, author_username)
 
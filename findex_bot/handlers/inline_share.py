@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+import os
 from typing import Optional
 
 from aiogram import Router
@@ -14,6 +15,7 @@ from aiogram.types import (
 import findex_bot.runtime as runtime
 from findex_bot.db.db import get_sessionmaker
 from findex_bot.db.repo import AdRepo
+from findex_bot.utils import share_cache
 from findex_bot.utils.vacancy_utils import build_share_card, is_ad_shareable
 
 logger = logging.getLogger(__name__)
@@ -38,38 +40,16 @@ def _parse_share_query(raw: str) -> Optional[int]:
         return None
 
 
-@router.inline_query()
-async def inline_share_handler(iq: InlineQuery):
-    ad_id = _parse_share_query(iq.query or "")
-    if not ad_id:
-        return await iq.answer(
-            results=[],
-            cache_time=1,
-            is_personal=True,
-        )
+INLINE_SEARCH_LIMIT = 20
+INLINE_SEARCH_MIN_CHARS = 2
 
-    async with get_sessionmaker()() as session:
-        repo = AdRepo(session)
-        ad = await repo.get(int(ad_id))
+# share опубликованного объявления одинаков для всех — Telegram может отдавать его из своего кэша.
+# После снятия с публикации чужой клиент может видеть карточку ещё до SHARE_INLINE_CACHE_TIME сек
+# (ссылка «Откликнуться» при этом всё равно проверяет статус).
+SHARE_INLINE_CACHE_TIME = int(os.getenv("SHARE_INLINE_CACHE_TIME", "300"))
 
-    if not ad:
-        return await iq.answer(
-            results=[],
-            cache_time=1,
-            is_personal=True,
-        )
-
-    ok, _reason = is_ad_shareable(ad)
-    if not ok:
-        return await iq.answer(
-            results=[],
-            cache_time=1,
-            is_personal=True,
-        )
-
-    bot_username = str(getattr(runtime, "BOT_USERNAME", "") or "").strip().lstrip("@")
-    share_text = build_share_card(ad, bot_username)
 
+def _share_card(ad, bot_username: str) -> share_cache.ShareCard:
     payload = ad.payload or {}
     role = str(getattr(ad, "role", "") or payload.get("role") or "employer").strip().lower()
     title = str(payload.get("title") or "Вакансия").strip()
@@ -88,24 +68,100 @@ async def inline_share_handler(iq: InlineQuery):
         description_parts.append(salary)
     result_description = " • ".join(description_parts) if description_parts else "Компактная карточка для пересылки"
 
-    result = InlineQueryResultArticle(
-        id=f"share_ad_{int(ad.id)}",
+    return share_cache.ShareCard(
+        ad_id=int(ad.id),
         title=result_title,
         description=result_description,
+        text=build_share_card(ad, bot_username),
+    )
+
+
+def _card_result(card: share_cache.ShareCard) -> InlineQueryResultArticle:
+    return InlineQueryResultArticle(
+        id=f"share_ad_{int(card.ad_id)}",
+        title=card.title,
+        description=card.description,
         input_message_content=InputTextMessageContent(
-            message_text=share_text,
+            message_text=card.text,
             parse_mode="HTML",
             link_preview_options=LinkPreviewOptions(is_disabled=True),
         ),
     )
 
+
+def _share_result(ad, bot_username: str) -> InlineQueryResultArticle:
+    return _card_result(_share_card(ad, bot_username))
+
+
+async def _load_share_card(ad_id: int, bot_username: str) -> Optional[share_cache.ShareCard]:
+    """Карточка из общего кэша; промах — одна загрузка из БД и запись в кэш (в т.ч. «нельзя»)."""
+    cached = await share_cache.get(ad_id, bot_username)
+    if cached is not None:
+        return cached.card
+
+    async with get_sessionmaker()() as session:
+        ad = await AdRepo(session).get(int(ad_id))
+
+    card = _share_card(ad, bot_username) if ad and is_ad_shareable(ad)[0] else None
+    await share_cache.put(ad_id, share_cache.CacheEntry(card=card, bot_username=bot_username))
+    return card
+
+
+def _bot_username() -> str:
+    return str(getattr(runtime, "BOT_USERNAME", "") or "").strip().lstrip("@")
+
+
+async def _answer_search(iq: InlineQuery, query: str) -> None:
+    # свободный текст: живой поиск по опубликованным, offset Telegram = keyset-курсор
+    async with get_sessionmaker()() as session:
+        ads, next_cursor = await AdRepo(session).search_ads(
+            query,
+            limit=INLINE_SEARCH_LIMIT,
+            cursor=(iq.offset or None),
+        )
+
+    bot_username = _bot_username()
+    results = [_share_result(ad, bot_username) for ad in ads if is_ad_shareable(ad)[0]]
     try:
         await iq.answer(
-            results=[result],
+            results=results,
             cache_time=1,
             is_personal=True,
+            next_offset=next_cursor or "",
+        )
+    except Exception:
+        logger.exception("inline search answer failed for query=%r", query)
+
+
+@router.inline_query()
+async def inline_share_handler(iq: InlineQuery):
+    raw = (iq.query or "").strip()
+    ad_id = _parse_share_query(raw)
+    if not ad_id:
+        if len(raw) >= INLINE_SEARCH_MIN_CHARS and not raw.startswith("share"):
+            share_cache.QUERIES["search"] += 1
+            return await _answer_search(iq, raw)
+        share_cache.QUERIES["empty"] += 1
+        return await iq.answer(
+            results=[],
+            cache_time=1,
+            is_personal=True,
+        )
+
+    share_cache.QUERIES["share"] += 1
+    card = await _load_share_card(int(ad_id), _bot_username())
+    if card is None:
+        return await iq.answer(
+            results=[],
+            cache_time=1,
+            is_personal=True,
+        )
+
+    try:
+        await iq.answer(
+            results=[_card_result(card)],
+            cache_time=SHARE_INLINE_CACHE_TIME,
+            is_personal=False,
         )
     except Exception:
         logger.exception("inline share answer failed for ad_id=%s", ad_id)
-        with logger.disabled:
-            pass
\ No newline at end of file
@@ -5,7 +5,7 @@ import contextlib
 import logging
 
 from typing import Optional, Any
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 
 from aiogram import Router, F
 from aiogram.filters import Command
@@ -21,7 +21,7 @@ import findex_bot.runtime as runtime
 from findex_bot.utils.ui_surface import clear_surface, enter_surface
 
 from findex_bot.db.db import get_sessionmaker
-from findex_bot.db.daily_limits import get_count as db_get_pub_count
+from findex_bot.utils import limits
 from findex_bot.db.repo import RespondRepo
 from findex_bot.db.models import Respond
 from findex_bot.utils.ui_utils import (
@@ -378,9 +378,7 @@ async def _limit_banner_for_user(user_id: int, username: str | None) -> Optional
 
     published = 0
     try:
-        async with get_sessionmaker()() as session:
-            published = await db_get_pub_count(session, int(user_id))
-            await session.commit()
+        published = await limits.get_used_pub(int(user_id))
     except Exception:
         published = 0
 
@@ -785,10 +783,6 @@ async def _send_or_edit_menu(target: Message | CallbackQuery):
 
 
 
-RESPOND_DAILY_LIMIT = 12
-RESPOND_DAILY_KEY_TEMPLATE = "respond:daily:{user_id}:{day}"
-
-
 def _limits_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -797,29 +791,18 @@ def _limits_kb() -> InlineKeyboardMarkup:
     )
 
 
-def _respond_daily_key(user_id: int) -> str:
-    tz = timezone(timedelta(hours=3))
-    day_key = datetime.now(tz).strftime("%Y%m%d")
-    return RESPOND_DAILY_KEY_TEMPLATE.format(user_id=int(user_id), day=day_key)
-
-
 async def _my_limits_text(user_id: int, username: str | None = None) -> str:
     respond_used = 0
     try:
-        r = getattr(runtime, "REDIS", None)
-        if r is not None:
-            raw = await r.get(_respond_daily_key(int(user_id)))
-            respond_used = int(raw or 0)
+        respond_used = await limits.get_used_respond(int(user_id))
     except Exception:
         respond_used = 0
 
-    respond_left = max(RESPOND_DAILY_LIMIT - respond_used, 0)
+    respond_left = limits.remaining(limits.RESPOND, respond_used)
 
     pub_used = 0
     try:
-        async with get_sessionmaker()() as session:
-            pub_used = await db_get_pub_count(session, int(user_id))
-            await session.commit()
+        pub_used = await limits.get_used_pub(int(user_id))
     except Exception:
         pub_used = 0
 
@@ -840,13 +823,14 @@ async def _my_limits_text(user_id: int, username: str | None = None) -> str:
         pass
 
     reset_left = format_hhmmss(utc_seconds_to_reset())
+    respond_reset_left = format_hhmmss(limits.seconds_to_reset(limits.RESPOND))
 
     return (
         "📊 <b>Мои лимиты</b>\n\n"
         "📩 <b>Отклики сегодня</b>\n"
-        f"Использовано: <b>{respond_used}</b> из <b>{RESPOND_DAILY_LIMIT}</b>\n"
+        f"Использовано: <b>{respond_used}</b> из <b>{limits.RESPOND.limit}</b>\n"
         f"Осталось: <b>{respond_left}</b>\n"
-        f"Сброс через: <b>{reset_left}</b>\n\n"
+        f"Сброс через: <b>{respond_reset_left}</b>\n\n"
         "📢 <b>Публикации сегодня</b>\n"
         f"Использовано: <b>{pub_used}</b> из <b>{pub_limit}</b>\n"
         f"Осталось: <b>{pub_left}</b>\n"
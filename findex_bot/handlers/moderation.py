@@ -13,6 +13,7 @@ from findex_bot.db.db import get_sessionmaker
 from findex_bot.db.repo import AdRepo
 from findex_bot.utils.ui_utils import safe_answer, rejection_reasons_kb, rejected_user_text, field_title
 from findex_bot.utils.obs import log_event
+from findex_bot.utils import preview_registry
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -243,11 +244,14 @@ async def mod_reject_reason(cb: CallbackQuery):
         except Exception:
             await repo.set_status(ad_id, "draft")
 
+        # превью автора снова редактируемое (снимаем лок модерации в реестре)
+        await preview_registry.set_mode_for_ad(ad_id, preview_registry.PREVIEW_MODE_DRAFT)
+
         # 3) вписываем причину в сообщение модерации (НЕ теряя тех-инфо)
         await _edit_mod_message_keep_header(cb, reason)
 
         # 4) сообщение пользователю + кнопка точечного исправления (как на скрине)
-        author_id = payload.get("author_id") or getattr(ad, "author_id", None)
+        author_id = getattr(ad, "author_user_id", None) or payload.get("author_id")
         if not author_id:
             log_event(
                 logger,
@@ -10,12 +10,10 @@ import html
 import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
-from zoneinfo import ZoneInfo
 
 from aiogram import Router, F
 from aiogram.enums import ParseMode
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.state import StatesGroup, State
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import (
     CallbackQuery,
@@ -31,6 +29,9 @@ import findex_bot.runtime as runtime
 from findex_bot.db.db import get_sessionmaker
 from findex_bot.db.repo import AdRepo, RespondRepo, CandidateProfileRepo
 from findex_bot.db.models import Ad, Respond, CandidateProfile  # type: ignore
+from findex_bot.utils import limits, supervisor
+from findex_bot.utils.citizenship import CITIZENSHIP_MAP, CITIZENSHIP_OPTIONS
+from findex_bot.states.responds import RespondFSM  # noqa: F401 — реэкспорт для старых импортов
 from findex_bot.utils.ui_utils import (
     safe_answer,
     reset_cleanup_bucket,
@@ -56,16 +57,15 @@ router = Router()
 # Константы
 # ---------------------------
 RESPOND_TTL_DAYS = 30
-RESPOND_DAILY_LIMIT = 12
+RESPOND_DAILY_LIMIT = limits.RESPOND_DAILY_LIMIT
 PENDING_RESPOND_TTL_MIN = 30
 AD_TTL_DAYS = int(os.getenv("AD_TTL_DAYS", "30"))
 
-RESPOND_DAILY_TZ = os.getenv("RESPOND_DAILY_TZ", "Europe/Moscow")
+RESPOND_DAILY_TZ = limits.RESPOND_DAILY_TZ
 
 FORM_TOTAL_STEPS = 4
 
 PENDING_KEY = "respond:pending:{user_id}"
-DAILY_KEY = "respond:daily:{user_id}:{day}"
 SUBMIT_LOCK_KEY = "respond:submit_lock:{user_id}:{ad_id}"
 INTRO_KEY = "respond:intro:{user_id}:{ad_id}"
 
@@ -140,19 +140,6 @@ DRAFT_FLOW_FIELDS = (
     "editing_field",
 )
 
-CITIZENSHIP_OPTIONS: list[tuple[str, str, str]] = [
-    ("ru", "🇷🇺", "Россия"),
-    ("kz", "🇰🇿", "Казахстан"),
-    ("by", "🇧🇾", "Беларусь"),
-    ("ua", "🇺🇦", "Украина"),
-    ("am", "🇦🇲", "Армения"),
-    ("az", "🇦🇿", "Азербайджан"),
-    ("ge", "🇬🇪", "Грузия"),
-    ("uz", "🇺🇿", "Узбекистан"),
-    ("tj", "🇹🇯", "Таджикистан"),
-    ("kg", "🇰🇬", "Кыргызстан"),
-]
-CITIZENSHIP_MAP: dict[str, str] = {code: title for code, _flag, title in CITIZENSHIP_OPTIONS}
 
 ST_NEW = "NEW"
 ST_IN_DIALOG = "IN_DIALOG"
@@ -168,14 +155,6 @@ def _now_utc() -> datetime:
     return datetime.now(timezone.utc)
 
 
-def _project_tz() -> ZoneInfo:
-    try:
-        return ZoneInfo(RESPOND_DAILY_TZ)
-    except Exception:
-        logger.exception("invalid RESPOND_DAILY_TZ=%s, fallback to Europe/Moscow", RESPOND_DAILY_TZ)
-        return ZoneInfo("Europe/Moscow")
-
-
 def _norm_status(raw: str | None) -> str:
     s = (raw or "").strip()
     if not s:
@@ -215,22 +194,6 @@ def _respond_is_expired(created_at: datetime | None) -> bool:
     return dt < (_now_utc() - timedelta(days=RESPOND_TTL_DAYS))
 
 
-class RespondFSM(StatesGroup):
-    form_name = State()
-    form_age = State()
-    form_citizenship_pick = State()
-    form_citizenship = State()
-    form_experience = State()
-    form_resume = State()
-    form_preview = State()
-    form_existing_notice = State()
-    form_intro_choice = State()
-    form_saved_choice = State()
-
-    author_reply_text = State()
-    cand_reply_text = State()
-
-
 def _h(v: Any) -> str:
     return html.escape(str(v or ""), quote=False)
 
@@ -270,6 +233,7 @@ def _ad_is_expired(ad_created_at: datetime) -> bool:
 def _pick_channel_message_id(ad: Ad) -> Optional[int]:
     payload = getattr(ad, "payload", None) or {}
     candidates = [
+        getattr(ad, "channel_message_id", None),
         payload.get("main_message_id"),
         payload.get("main_channel_message_id"),
         payload.get("channel_message_id"),
@@ -755,50 +719,10 @@ def _build_candidate_reply_prompt(ad: Ad, respond: Respond) -> str:
     )
 
 
-def _daily_counter_key_and_ttl(user_id: int) -> tuple[str, int]:
-    tz = _project_tz()
-    now_local = datetime.now(tz)
-    next_midnight = (now_local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-    ttl = int((next_midnight - now_local).total_seconds())
-    if ttl <= 0:
-        ttl = 60
-    day_key = now_local.strftime("%Y%m%d")
-    return DAILY_KEY.format(user_id=int(user_id), day=day_key), ttl
-
-
 async def _check_and_inc_daily_limit(redis: Any, user_id: int) -> tuple[bool, int]:
-    r = _get_redis(redis)
-    key, ttl = _daily_counter_key_and_ttl(int(user_id))
-    lua = r"""
-    local key = KEYS[1]
-    local limit = tonumber(ARGV[1])
-    local ttl = tonumber(ARGV[2])
-
-    local v = redis.call("GET", key)
-    if not v then
-      redis.call("SET", key, 1, "EX", ttl)
-      return 1
-    end
-
-    local n = tonumber(v)
-    if not n then
-      redis.call("SET", key, 1, "EX", ttl)
-      return 1
-    end
-
-    if n >= limit then
-      return -1
-    end
-
-    n = n + 1
-    redis.call("SET", key, n, "KEEPTTL")
-    return n
-    """
-    res = await r.eval(lua, 1, key, str(RESPOND_DAILY_LIMIT), str(ttl))
-    n = int(res)
-    if n == -1:
-        return False, RESPOND_DAILY_LIMIT
-    return True, n
+    # единый сервис лимитов (Redis Lua + write-through в respond_daily_limits);
+    # redis оставлен в сигнатуре для совместимости вызовов — клиент берётся из runtime
+    return await limits.try_consume(limits.RESPOND, int(user_id))
 
 
 async def _acquire_submit_lock(redis: Any, user_id: int, ad_id: int) -> tuple[bool, str]:
@@ -971,19 +895,12 @@ async def _send_ephemeral_notice(bot, chat_id: int, text: str, *, seconds: int =
         logger.exception("send_ephemeral_notice: send_message failed chat_id=%s", chat_id)
         return
 
-    try:
-        await asyncio.sleep(int(seconds))
-    except Exception:
-        logger.exception("send_ephemeral_notice: sleep failed chat_id=%s", chat_id)
-        return
-
-    with contextlib.suppress(Exception):
-        await bot.delete_message(chat_id=int(chat_id), message_id=int(m.message_id))
+    await supervisor.delete_later(bot, int(chat_id), int(m.message_id), int(seconds))
 
 
 def _schedule_daily_limit_notice(bot, user_id: int, count: int) -> None:
     left = max(int(RESPOND_DAILY_LIMIT) - int(count or 0), 0)
-    asyncio.create_task(
+    supervisor.spawn(
         _send_ephemeral_notice(
             bot,
             int(user_id),
@@ -2229,7 +2146,7 @@ async def _guard_ad_for_respond(cb_or_msg: Any, ad_id: int) -> Optional[Ad]:
             await cb_or_msg.answer("🚫 Отклик невозможен\nОбъявление закрыто работодателем.")
         return None
 
-    if bool(payload.get("expired_auto")):
+    if getattr(ad, "expired_at", None) or bool(payload.get("expired_auto")):
         if isinstance(cb_or_msg, CallbackQuery):
             await safe_answer(cb_or_msg, "🚫 Вакансия больше не актуальна.\nОтклик невозможен.", alert=True)
         else:
@@ -3335,11 +3252,7 @@ async def _upsert_transient_form_hint(
     )
     await state.update_data(form_transient_hint_message_id=int(m.message_id))
 
-    async def _drop_hint() -> None:
-        await asyncio.sleep(ttl_sec)
-        with contextlib.suppress(Exception):
-            await bot.delete_message(chat_id=int(chat_id), message_id=int(m.message_id))
-
+    async def _forget_hint() -> None:
         try:
             fresh = await state.get_data()
             if int(fresh.get("form_transient_hint_message_id") or 0) == int(m.message_id):
@@ -3347,7 +3260,7 @@ async def _upsert_transient_form_hint(
         except Exception:
             pass
 
-    asyncio.create_task(_drop_hint())
+    await supervisor.delete_later(bot, int(chat_id), int(m.message_id), ttl_sec, after=_forget_hint)
 
 
 @router.message(RespondFSM.form_preview)
@@ -3402,10 +3315,7 @@ async def _upsert_transient_form_hint(
     )
     await state.update_data(form_transient_hint_message_id=int(m.message_id))
 
-    async def _drop_hint() -> None:
-        await asyncio.sleep(ttl_sec)
-        with contextlib.suppress(Exception):
-            await bot.delete_message(chat_id=int(chat_id), message_id=int(m.message_id))
+    async def _forget_hint() -> None:
         try:
             fresh = await state.get_data()
             if int(fresh.get("form_transient_hint_message_id") or 0) == int(m.message_id):
@@ -3413,7 +3323,7 @@ async def _upsert_transient_form_hint(
         except Exception:
             pass
 
-    asyncio.create_task(_drop_hint())
+    await supervisor.delete_later(bot, int(chat_id), int(m.message_id), ttl_sec, after=_forget_hint)
 
 
 
@@ -3818,38 +3728,20 @@ async def form_step_resume(message: Message, state: FSMContext):
     )
     await state.update_data(resume_invalid_hint_message_id=int(m.message_id))
 
-    async def _cleanup_resume_invalid_hint(chat_id: int, mid: int):
-        try:
-            await asyncio.sleep(2.5)
-            await message.bot.delete_message(
-                chat_id=int(chat_id),
-                message_id=int(mid),
-            )
-            logger.warning(
-                "RESP_DEBUG delete_hint chat_id=%s mid=%s",
-                int(chat_id),
-                int(mid),
-            )
-        except Exception as e:
-            logger.exception(
-                "RESPOND RESUME HINT DELETE FAILED chat_id=%s mid=%s err=%r",
-                int(chat_id),
-                int(mid),
-                e,
-            )
-
+    async def _forget_resume_invalid_hint() -> None:
         try:
             cur = await state.get_data()
-            if int(cur.get("resume_invalid_hint_message_id") or 0) == int(mid):
+            if int(cur.get("resume_invalid_hint_message_id") or 0) == int(m.message_id):
                 await state.update_data(resume_invalid_hint_message_id=None)
         except Exception:
             pass
 
-    asyncio.create_task(
-        _cleanup_resume_invalid_hint(
-            int(message.chat.id),
-            int(m.message_id),
-        )
+    await supervisor.delete_later(
+        message.bot,
+        int(message.chat.id),
+        int(m.message_id),
+        2.5,
+        after=_forget_resume_invalid_hint,
     )
 
 
@@ -4404,7 +4296,7 @@ async def author_reject(cb: CallbackQuery, redis: Any = None):
         )
 
         with contextlib.suppress(Exception):
-            asyncio.create_task(
+            supervisor.spawn(
                 _send_ephemeral_notice(
                     cb.bot,
                     int(r2.candidate_user_id),
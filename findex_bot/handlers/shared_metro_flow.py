@@ -1,6 +1,12 @@
 from __future__ import annotations
 
-from aiogram.types import CallbackQuery
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, Message
+
+from findex_bot.utils.moscow_metro import metro_suggest_keyboard, metro_suggestions, norm_station
+
+# локация, для которой уже показали подсказки станций: повтор того же текста сохраняется как есть
+K_METRO_SUGGESTED_FOR = "metro_suggested_for"
 
 
 async def edit_metro_card(cb: CallbackQuery, text: str, reply_markup=None) -> None:
@@ -63,3 +69,34 @@ async def metro_line_pick(
         )
     except Exception:
         pass
+
+
+async def offer_metro_suggestions(
+    *,
+    message: Message,
+    state: FSMContext,
+    text: str,
+    track_message_fn,
+) -> bool:
+    """
+    «кур» на шаге локации -> кнопки подходящих станций (тот же callback, что и выбор из линии).
+    -> True, если подсказки показаны и сохранять текст пока не нужно.
+    """
+    suggested_key = norm_station(text)
+    data = await state.get_data()
+    if data.get(K_METRO_SUGGESTED_FOR) == suggested_key:
+        await state.update_data(**{K_METRO_SUGGESTED_FOR: None})
+        return False
+
+    stations = metro_suggestions(text)
+    if not stations:
+        return False
+
+    await state.update_data(**{K_METRO_SUGGESTED_FOR: suggested_key})
+    msg = await message.answer(
+        "🚇 Похоже на метро Москвы — выбери станцию.\n"
+        "Если это не метро, отправь локацию ещё раз — сохраню как написано.",
+        reply_markup=metro_suggest_keyboard(stations),
+    )
+    await track_message_fn(state, msg)
+    return True
@@ -4,6 +4,7 @@ from aiogram.fsm.context import FSMContext
 
 from findex_bot.db.db import get_sessionmaker
 from findex_bot.db.repo import AdRepo
+from findex_bot.utils import preview_registry
 from findex_bot.utils.ui_utils import cleanup_tracked_messages
 
 
@@ -55,3 +56,6 @@ async def persist_preview_ref(
         payload["preview_chat_id"] = int(chat_id)
         ad.payload = payload
         await session.commit()
+
+    # новое превью — черновик (guard его не глушит), старая ссылка из реестра уходит
+    await preview_registry.register(int(chat_id), int(message_id), ad_id=int(ad_id))
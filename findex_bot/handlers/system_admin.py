@@ -1,6 +1,7 @@
 # findex_bot/handlers/system_admin.py
 from __future__ import annotations
 
+import html
 import os
 import time
 import socket
@@ -22,6 +23,8 @@ from sqlalchemy import text
 
 import findex_bot.runtime as runtime
 from findex_bot.db.db import get_sessionmaker
+from findex_bot.db.repo import SystemCountersRepo
+from findex_bot.utils import metrics, publish_queue, redis_conn
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -111,32 +114,10 @@ async def _guard_admin_callback(callback: CallbackQuery) -> bool:
 
 def _get_redis() -> Any:
     """
-    system_admin.py работает внутри bot.py,
-    поэтому здесь нормально использовать runtime.REDIS как основной Redis-клиент бота.
+    system_admin.py работает внутри bot.py: общий клиент процесса (utils/redis_conn).
+    None — Redis недоступен (breaker open), свой клиент тут не создаём.
     """
-    r = getattr(runtime, "REDIS", None)
-    if r is not None:
-        return r
-
-    try:
-        from redis.asyncio import Redis  # type: ignore
-    except Exception:
-        return None
-
-    dsn = os.getenv("REDIS_DSN") or os.getenv("REDIS_URL")
-    if dsn:
-        r = Redis.from_url(dsn, decode_responses=True)
-        runtime.REDIS = r
-        return r
-
-    host = os.getenv("REDIS_HOST", "redis")
-    port = int(os.getenv("REDIS_PORT", "6379"))
-    db = int(os.getenv("REDIS_DB", "0"))
-    password = os.getenv("REDIS_PASSWORD") or None
-
-    r = Redis(host=host, port=port, db=db, password=password, decode_responses=True)
-    runtime.REDIS = r
-    return r
+    return getattr(runtime, "REDIS", None)
 
 
 def _fmt_ttl(value: int) -> str:
@@ -239,71 +220,64 @@ async def _redis_info() -> dict[str, Any]:
         }
 
 
+_DB_COUNTER_KEYS: dict[str, str] = {
+    "ads_total": "ads_total",
+    "ads_published": "ads_published",
+    "ads_expired_auto": "ads_expired_auto",
+    "responds_total": "responds_total",
+    "responds_new": "responds_status:NEW",
+    "responds_invited": "responds_status:INVITED",
+    "responds_dialog": "responds_status:IN_DIALOG",
+    "responds_closed_system": "responds_status:CLOSED_SYSTEM",
+    "events_total": "events_total",
+    "events_resurrection": "events_type:resurrection_stage",
+    "events_resurrection_handled": "events_type:resurrection_stage_handled",
+    "events_closed_system": "events_type:respond_closed_system",
+}
+
+
 async def _db_info() -> dict[str, Any]:
+    """
+    Счётчики берём из system_counters (поддерживаются триггерами) —
+    это O(1) вне зависимости от размера ads / responds / respond_events.
+    """
     t0 = time.perf_counter()
 
+    out: dict[str, Any] = {key: 0 for key in _DB_COUNTER_KEYS}
+    out["counters_at"] = None
+    out["counters_error"] = ""
+
     try:
         async with get_sessionmaker()() as session:
             await session.execute(text("SELECT 1"))
             db_ms = (time.perf_counter() - t0) * 1000
 
-            row = (
-                await session.execute(text("""
-                    SELECT
-                        (SELECT COUNT(*) FROM ads) AS ads_total,
-                        (SELECT COUNT(*) FROM ads WHERE status = 'published') AS ads_published,
-                        (SELECT COUNT(*) FROM ads WHERE COALESCE((payload->>'expired_auto')::boolean, false) IS TRUE) AS ads_expired_auto,
-
-                        (SELECT COUNT(*) FROM responds) AS responds_total,
-                        (SELECT COUNT(*) FROM responds WHERE status = 'NEW') AS responds_new,
-                        (SELECT COUNT(*) FROM responds WHERE status = 'INVITED') AS responds_invited,
-                        (SELECT COUNT(*) FROM responds WHERE status = 'IN_DIALOG') AS responds_dialog,
-                        (SELECT COUNT(*) FROM responds WHERE status = 'CLOSED_SYSTEM') AS responds_closed_system,
-
-                        (SELECT COUNT(*) FROM respond_events) AS events_total,
-                        (SELECT COUNT(*) FROM respond_events WHERE event_type = 'resurrection_stage') AS events_resurrection,
-                        (SELECT COUNT(*) FROM respond_events WHERE event_type = 'resurrection_stage_handled') AS events_resurrection_handled,
-                        (SELECT COUNT(*) FROM respond_events WHERE event_type = 'respond_closed_system') AS events_closed_system
-                """))
-            ).one()
+            try:
+                counters, fresh_at = await SystemCountersRepo(session).snapshot()
+            except Exception as e:
+                logger.exception("system_admin counters snapshot failed")
+                counters, fresh_at = {}, None
+                out["counters_error"] = repr(e)
 
-        return {
+        for key, counter_name in _DB_COUNTER_KEYS.items():
+            out[key] = int(counters.get(counter_name, 0) or 0)
+
+        out.update({
             "ok": True,
             "db_ms": round(db_ms, 1),
-            "ads_total": int(row.ads_total or 0),
-            "ads_published": int(row.ads_published or 0),
-            "ads_expired_auto": int(row.ads_expired_auto or 0),
-            "responds_total": int(row.responds_total or 0),
-            "responds_new": int(row.responds_new or 0),
-            "responds_invited": int(row.responds_invited or 0),
-            "responds_dialog": int(row.responds_dialog or 0),
-            "responds_closed_system": int(row.responds_closed_system or 0),
-            "events_total": int(row.events_total or 0),
-            "events_resurrection": int(row.events_resurrection or 0),
-            "events_resurrection_handled": int(row.events_resurrection_handled or 0),
-            "events_closed_system": int(row.events_closed_system or 0),
+            "counters_at": fresh_at,
             "error": "",
-        }
+        })
+        return out
     except Exception as e:
         db_ms = (time.perf_counter() - t0) * 1000
         logger.exception("system_admin db check failed")
-        return {
+        out.update({
             "ok": False,
             "db_ms": round(db_ms, 1),
-            "ads_total": 0,
-            "ads_published": 0,
-            "ads_expired_auto": 0,
-            "responds_total": 0,
-            "responds_new": 0,
-            "responds_invited": 0,
-            "responds_dialog": 0,
-            "responds_closed_system": 0,
-            "events_total": 0,
-            "events_resurrection": 0,
-            "events_resurrection_handled": 0,
-            "events_closed_system": 0,
             "error": repr(e),
-        }
+        })
+        return out
 
 
 async def _jobs_snapshot() -> dict[str, Any]:
@@ -319,9 +293,10 @@ async def _jobs_snapshot() -> dict[str, Any]:
                              FROM respond_events e
                              WHERE e.actor_role = 'system'
                                AND e.event_type = 'resurrection_stage'
+                               AND e.created_at >= :res_since
                                AND NOT EXISTS (
                                    SELECT 1
-                                   FROM respond_events h
+                                   FROM respond_event_dedup h
                                    WHERE h.dedup_key = ('res-handled:' || e.id::text)
                                )) AS resurrection_unhandled,
 
@@ -329,10 +304,11 @@ async def _jobs_snapshot() -> dict[str, Any]:
                              FROM respond_events e
                              WHERE e.actor_role = 'system'
                                AND e.event_type = 'resurrection_stage'
+                               AND e.created_at >= :res_since
                                AND e.created_at < NOW() - INTERVAL '10 minutes'
                                AND NOT EXISTS (
                                    SELECT 1
-                                   FROM respond_events h
+                                   FROM respond_event_dedup h
                                    WHERE h.dedup_key = ('res-handled:' || e.id::text)
                                )) AS resurrection_unhandled_old,
 
@@ -374,6 +350,8 @@ async def _jobs_snapshot() -> dict[str, Any]:
                                ) <= :cut38h) AS res_38h_plus
                     """),
                     {
+                        # то же окно, что и у resurrection_worker
+                        "res_since": now - timedelta(days=RESPOND_TTL_DAYS + 1),
                         "cut30m": now - timedelta(seconds=RES_STAGE_30M_SEC),
                         "cut4h": now - timedelta(seconds=RES_STAGE_4H_SEC),
                         "cut12h": now - timedelta(seconds=RES_STAGE_12H_SEC),
@@ -501,6 +479,19 @@ async def _render_system_ping_text() -> str:
     return text_msg
 
 
+def _render_redis_pool_line() -> str:
+    mgr = redis_conn.get_manager()
+    if mgr is None:
+        return ""
+    snap = mgr.snapshot()
+    pool = snap["pool"]
+    return (
+        f"• Redis pool: breaker=<code>{snap['state']}</code> • "
+        f"conn <code>{pool['in_use']}/{pool['created']}/{pool['max']}</code> (in_use/open/max) • "
+        f"trips=<code>{snap['trips']}</code>\n"
+    )
+
+
 async def _render_system_status_text() -> str:
     db = await _db_info()
     redis = await _redis_info()
@@ -513,6 +504,7 @@ async def _render_system_status_text() -> str:
         f"<b>Инфраструктура</b>\n"
         f"• Postgres: <b>{'OK' if db['ok'] else 'ERR'}</b> • {db['db_ms']} ms\n"
         f"• Redis: <b>{'OK' if redis['ok'] else 'ERR'}</b> • {redis['redis_ms']} ms\n"
+        f"{_render_redis_pool_line()}"
         f"• Bot polling: <code>{_fmt_health(redis['bot_ttl'])}</code>\n"
         f"• Jobs: <code>{redis['jobs_health']}</code> • leader=<code>{redis['jobs_leader']}</code> • ttl=<code>{_fmt_ttl(redis['jobs_ttl'])}</code>\n"
         f"• Resurrection: <code>{redis['res_health']}</code> • leader=<code>{redis['res_leader']}</code> • ttl=<code>{_fmt_ttl(redis['res_ttl'])}</code>\n\n"
@@ -537,21 +529,41 @@ async def _render_system_status_text() -> str:
         f"• всего: <code>{db['events_total']}</code>\n"
         f"• resurrection_stage: <code>{db['events_resurrection']}</code>\n"
         f"• resurrection_stage_handled: <code>{db['events_resurrection_handled']}</code>\n"
-        f"• respond_closed_system: <code>{db['events_closed_system']}</code>\n"
+        f"• respond_closed_system: <code>{db['events_closed_system']}</code>\n\n"
+
+        f"🧮 Счётчики на: <code>{_fmt_dt(db['counters_at'])}</code>\n"
     )
 
     if not db["ok"]:
         text_msg += f"\n⚠️ Ошибка БД: <code>{db['error']}</code>"
+    if db["counters_error"]:
+        text_msg += f"\n⚠️ Ошибка счётчиков: <code>{db['counters_error']}</code>"
     if not redis["ok"]:
         text_msg += f"\n⚠️ Ошибка Redis: <code>{redis['error']}</code>"
 
     return text_msg
 
 
-async def _render_system_jobs_text() -> str:
+def _render_publish_queue_line(depth: int) -> str:
+    totals = publish_queue.totals_snapshot()
+    line = f"• публикация в канал: <code>{depth}</code> в очереди"
+    if depth:
+        line += f" (≈ {max(1, round(publish_queue.PUBLISH_QUEUE.eta_sec() / 60))} мин)"
+    line += (
+        f" • опубликовано=<code>{totals['published']}</code>"
+        f" • ретраи=<code>{totals['retried']}</code>"
+        f" • ошибки=<code>{totals['failed'] + totals['error']}</code>\n"
+    )
+    return line
+
+
+async def _render_system_jobs_text(bot: Any = None) -> str:
     redis = await _redis_info()
     jobs = await _jobs_snapshot()
     db = await _db_info()
+    publish_depth = (
+        await publish_queue.PUBLISH_QUEUE.fetch_depth(bot) if bot is not None else publish_queue.depth()
+    )
 
     pipeline_line = (
         "⚠️ <b>PIPELINE ЗАВИС</b>\n"
@@ -581,7 +593,8 @@ async def _render_system_jobs_text() -> str:
         f"• invited >=4ч: <code>{jobs['invited_4h_plus']}</code>\n"
         f"• invited >=12ч: <code>{jobs['invited_12h_plus']}</code>\n"
         f"• respond anchors >=36ч: <code>{jobs['res_36h_plus']}</code>\n"
-        f"• respond anchors >=38ч: <code>{jobs['res_38h_plus']}</code>\n\n"
+        f"• respond anchors >=38ч: <code>{jobs['res_38h_plus']}</code>\n"
+        f"{_render_publish_queue_line(publish_depth)}\n"
 
         f"<b>Итоги</b>\n"
         f"• auto-expired объявлений: <code>{db['ads_expired_auto']}</code>\n"
@@ -633,6 +646,8 @@ async def _render_system_top_text() -> str:
         f"• anchors >=38ч: <code>{jobs['res_38h_plus']}</code>\n"
     )
 
+    text_msg += "\n" + _render_handlers_top()
+
     if not db["ok"]:
         text_msg += f"\n\n⚠️ Ошибка БД: <code>{db['error']}</code>"
     if not jobs["ok"]:
@@ -641,6 +656,33 @@ async def _render_system_top_text() -> str:
     return text_msg
 
 
+def _render_handlers_top() -> str:
+    """Топ хендлеров этого процесса (utils/metrics) + последние медленные апдейты."""
+    rows = metrics.top_handlers(limit=8)
+    if not rows:
+        return "<b>Хендлеры (этот процесс)</b>\n• пока нет данных\n"
+
+    lines = ["<b>Хендлеры (этот процесс)</b> — n • avg/p95 ms • sql/redis/tg на апдейт"]
+    for r in rows:
+        p95 = ">10000" if r["p95_ms"] < 0 else str(r["p95_ms"])
+        lines.append(
+            f"• <code>{html.escape(_short(r['handler'], 48))}</code>\n"
+            f"  {r['count']} • {r['avg_ms']}/{p95} • {r['sql']}/{r['redis']}/{r['tg']}"
+        )
+
+    slow = metrics.slow_samples(limit=3)
+    if slow:
+        lines.append(f"\n<b>Медленные апдейты</b> (≥{metrics.SLOW_UPDATE_MS} ms)")
+        for smp in slow:
+            top = html.escape(", ".join(f"{name}×{n} {ms}ms" for name, n, ms in smp["top"][:4]) or "—")
+            lines.append(
+                f"• <code>{html.escape(_short(smp['handler'], 48))}</code> {smp['ms']} ms\n"
+                f"  {top}"
+            )
+
+    return "\n".join(lines) + "\n"
+
+
 async def _render_system_events_text() -> str:
     data = await _recent_events(limit=10)
 
@@ -744,10 +786,10 @@ async def system_jobs(message: Message) -> None:
     if not await _guard_admin(message):
         return
 
-    await _send_system_text(message, await _render_system_jobs_text())
+    await _send_system_text(message, await _render_system_jobs_text(message.bot))
 
 
-@router.message(Command(commands=["system_top", "сводка"]))
+@router.message(Command(commands=["system_top", "sys_top", "сводка"]))
 async def system_top(message: Message) -> None:
     if not await _guard_admin(message):
         return
@@ -784,7 +826,7 @@ async def system_jobs_cb(callback: CallbackQuery) -> None:
     if not await _guard_admin_callback(callback):
         return
     await callback.answer()
-    await _send_system_text_from_callback(callback, await _render_system_jobs_text())
+    await _send_system_text_from_callback(callback, await _render_system_jobs_text(callback.bot))
 
 
 @router.callback_query(F.data == CB_SYS_TOP)
@@ -18,6 +18,8 @@ except Exception:
 import findex_bot.runtime as runtime
 from findex_bot.db.db import get_sessionmaker
 from findex_bot.db.repo import RespondRepo
+from findex_bot.db import event_partitions
+from findex_bot.utils import redis_conn
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +45,16 @@ BATCH_SIZE = int(os.getenv("JOBS_BATCH_SIZE", "200"))
 RESPOND_TTL_DAYS = int(os.getenv("RESPOND_TTL_DAYS", "30"))
 AD_TTL_DAYS = int(os.getenv("AD_TTL_DAYS", "30"))
 
+# respond_events retention (помесячные партиции)
+#   archive — выгрузить партицию в jsonl.gz и удалить
+#   drop    — удалить без выгрузки
+#   off     — только создавать партиции заранее
+RESPOND_EVENTS_RETENTION_DAYS = int(os.getenv("RESPOND_EVENTS_RETENTION_DAYS", "180"))
+RESPOND_EVENTS_RETENTION_MODE = (os.getenv("RESPOND_EVENTS_RETENTION_MODE", "archive") or "archive").strip().lower()
+RESPOND_EVENTS_ARCHIVE_DIR = os.getenv("RESPOND_EVENTS_ARCHIVE_DIR", os.path.join(BASE_DIR, "run", "archive", "respond_events"))
+RESPOND_EVENTS_PARTITIONS_AHEAD = int(os.getenv("RESPOND_EVENTS_PARTITIONS_AHEAD", "2"))
+RESPOND_EVENTS_MAINTENANCE_EVERY_SEC = int(os.getenv("RESPOND_EVENTS_MAINTENANCE_EVERY_SEC", "3600"))
+
 # Resurrection stages
 RES_STAGE_30M_SEC = 30 * 60
 RES_STAGE_4H_SEC = 4 * 60 * 60
@@ -71,26 +83,6 @@ S_CLOSED_SYSTEM = "CLOSED_SYSTEM"
 # ----------------------------
 # Redis leader lock
 # ----------------------------
-def _get_redis() -> Any:
-    """
-    ВАЖНО:
-    jobs.py работает как отдельный процесс и использует свой собственный Redis client.
-    Он не должен трогать runtime.REDIS, чтобы не смешивать ответственность с bot.py.
-    """
-    from redis.asyncio import Redis  # type: ignore
-
-    dsn = os.getenv("REDIS_DSN") or os.getenv("REDIS_URL")
-    if dsn:
-        return Redis.from_url(dsn, decode_responses=True)
-
-    host = os.getenv("REDIS_HOST", "redis")
-    port = int(os.getenv("REDIS_PORT", "6379"))
-    db = int(os.getenv("REDIS_DB", "0"))
-    password = os.getenv("REDIS_PASSWORD") or None
-
-    return Redis(host=host, port=port, db=db, password=password, decode_responses=True)
-
-
 async def _try_become_leader(redis: Any, token: str) -> bool:
     return bool(await redis.set(LEADER_KEY, token, nx=True, ex=LEADER_TTL_SEC))
 
@@ -172,6 +164,8 @@ async def job_expire_ads(session: AsyncSession) -> int:
     """
     Автоматически помечает старые published объявления как expired в payload,
     не ломая текущую схему статусов ads.
+    Отбор — по колонке expired_at (её выставляет триггер из payload) и частичному
+    индексу ix_ads_published_unexpired_created: JSONB не читается.
     """
     border = _now_utc() - timedelta(days=AD_TTL_DAYS)
 
@@ -183,7 +177,7 @@ async def job_expire_ads(session: AsyncSession) -> int:
         )
         WHERE status = 'published'
           AND created_at < :border
-          AND COALESCE((payload->>'expired_auto')::boolean, false) IS NOT TRUE
+          AND expired_at IS NULL
         RETURNING id
     """)
     res = await session.execute(q, {"border": border})
@@ -192,6 +186,49 @@ async def job_expire_ads(session: AsyncSession) -> int:
     return len(rows)
 
 
+async def job_respond_events_maintenance(session: AsyncSession) -> int:
+    """
+    Партиции respond_events:
+    - заранее создаёт партиции на ближайшие месяцы,
+    - партиции старше retention архивирует/удаляет целиком (без DELETE по строкам),
+    - чистит respond_event_dedup старше той же границы.
+    """
+    now = _now_utc()
+
+    created = await event_partitions.ensure_partitions(
+        session,
+        now=now,
+        months_ahead=RESPOND_EVENTS_PARTITIONS_AHEAD,
+    )
+    await session.commit()
+    if created:
+        logger.info("respond_events partitions created: %s", ", ".join(created))
+
+    if RESPOND_EVENTS_RETENTION_MODE not in {"archive", "drop"}:
+        return 0
+
+    border = event_partitions.retention_border(
+        now=now,
+        retention_days=RESPOND_EVENTS_RETENTION_DAYS,
+        respond_ttl_days=RESPOND_TTL_DAYS,
+    )
+    archive_dir = RESPOND_EVENTS_ARCHIVE_DIR if RESPOND_EVENTS_RETENTION_MODE == "archive" else None
+
+    n = 0
+    for p in event_partitions.expired_partitions(await event_partitions.list_partitions(session), border=border):
+        removed = await event_partitions.drop_partition(session, p, archive_dir=archive_dir)
+        logger.info(
+            "respond_events partition %s removed (mode=%s, events=%s)",
+            p.name,
+            RESPOND_EVENTS_RETENTION_MODE,
+            removed,
+        )
+        n += removed
+
+    n += await event_partitions.prune_dedup(session, border=border)
+    return n
+
+
 # ----------------------------
 # Resurrection stages
 # ----------------------------
@@ -318,7 +355,8 @@ async def job_resurrection_stages(session: AsyncSession) -> int:
 # Main loop
 # ----------------------------
 async def _leader_loop(token: str) -> None:
-    redis = _get_redis()
+    # свой клиент процесса (общий пул/таймауты/retry из utils/redis_conn), runtime.REDIS не трогаем
+    redis = (await redis_conn.init(publish_runtime=False, default_host="redis")).client
 
     while True:
         became = await _try_become_leader(redis, token)
@@ -338,13 +376,20 @@ async def _leader_loop(token: str) -> None:
     renew_task = asyncio.create_task(_renewer())
 
     try:
-        async with get_sessionmaker()() as session:
-            repo = RespondRepo(session)
-            await repo.ensure_dedup_unique_index()
+        last_maintenance_at: float | None = None
+        loop = asyncio.get_running_loop()
 
         while True:
             total = 0
 
+            if last_maintenance_at is None or loop.time() - last_maintenance_at >= RESPOND_EVENTS_MAINTENANCE_EVERY_SEC:
+                last_maintenance_at = loop.time()
+                async with get_sessionmaker()() as session:
+                    try:
+                        total += await job_respond_events_maintenance(session)
+                    except Exception:
+                        logger.exception("job_respond_events_maintenance failed")
+
             async with get_sessionmaker()() as session:
                 try:
                     total += await job_autoclose_expired(session)
@@ -371,12 +416,7 @@ async def _leader_loop(token: str) -> None:
     finally:
         renew_task.cancel()
         try:
-            if hasattr(redis, "aclose"):
-                await redis.aclose()
-            else:
-                res = redis.close()
-                if asyncio.iscoroutine(res):
-                    await res
+            await redis_conn.shutdown()
         except Exception:
             pass
 
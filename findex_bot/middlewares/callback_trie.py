@@ -0,0 +1,402 @@
+# findex_bot/middlewares/callback_trie.py
+from __future__ import annotations
+
+import logging
+import operator
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Dispatcher, Router
+from aiogram.dispatcher.event.bases import REJECTED, UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.types import CallbackQuery
+from magic_filter import MagicFilter
+from magic_filter.operations import (
+    CallOperation,
+    CombinationOperation,
+    ComparatorOperation,
+    FunctionOperation,
+    GetAttributeOperation,
+)
+from magic_filter.util import and_op, in_op, or_op
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Fast-path роутинг callback_query по префиксному дереву
+# ======================================================
+# Штатно aiogram проверяет callback по всем хендлерам всех роутеров в порядке
+# регистрации (F.data.startswith(...) у каждого). Здесь на старте из фильтров
+# хендлеров достаются ключи callback_data:
+#   F.data == "x" / F.data.in_({...})           -> точные значения
+#   F.data.startswith("x") / startswith((..))   -> префиксы (trie по символам)
+#   |  — объединение ключей, &  — достаточно одной стороны
+# Хендлер без разбираемого фильтра по data — wildcard (проверяется всегда).
+#
+# На callback: проход по trie O(len(data)) + точное совпадение + wildcard'ы,
+# кандидаты в исходном порядке регистрации, дальше ровно как в aiogram:
+# root-фильтры роутера, handler.check, inner-middleware цепочка, SkipHandler.
+# Семантика не меняется: отбрасываются только хендлеры, чей фильтр по data
+# гарантированно не пройдёт.
+#
+# CALLBACK_TRIE=0 — выключить (штатная линейная маршрутизация).
+
+CALLBACK_TRIE_ENABLED = os.getenv("CALLBACK_TRIE", "1") == "1"
+
+
+@dataclass(frozen=True)
+class DataKeys:
+    exact: frozenset[str] = frozenset()
+    prefixes: frozenset[str] = frozenset()
+
+    def __or__(self, other: "DataKeys") -> "DataKeys":
+        return DataKeys(self.exact | other.exact, self.prefixes | other.prefixes)
+
+
+def _str_values(v: Any) -> Optional[frozenset[str]]:
+    if isinstance(v, str):
+        return frozenset({v})
+    if isinstance(v, (set, frozenset, list, tuple)) and all(isinstance(x, str) for x in v):
+        return frozenset(v)
+    return None
+
+
+def analyze_magic(magic: MagicFilter) -> Optional[DataKeys]:
+    """Ключи callback_data, без которых фильтр точно ложен; None — не разобрать."""
+    ops = tuple(getattr(magic, "_operations", ()) or ())
+    if not ops:
+        return None
+
+    last = ops[-1]
+    if isinstance(last, CombinationOperation) and len(ops) > 1:
+        left = analyze_magic(type(magic)(operations=ops[:-1]))
+        right = analyze_magic(last.right) if isinstance(last.right, MagicFilter) else None
+        if last.combinator is or_op:
+            return (left | right) if left is not None and right is not None else None
+        if last.combinator is and_op:
+            return left if left is not None else right
+        return None
+
+    first = ops[0]
+    if not (isinstance(first, GetAttributeOperation) and first.name == "data"):
+        return None
+
+    if len(ops) == 2:
+        op = ops[1]
+        if isinstance(op, ComparatorOperation) and op.comparator is operator.eq and isinstance(op.right, str):
+            return DataKeys(exact=frozenset({op.right}))
+        if isinstance(op, FunctionOperation) and op.function is in_op and len(op.args) == 1:
+            vals = _str_values(op.args[0])
+            return DataKeys(exact=vals) if vals is not None else None
+        return None
+
+    if len(ops) == 3:
+        attr, call = ops[1], ops[2]
+        if (
+            isinstance(attr, GetAttributeOperation)
+            and attr.name == "startswith"
+            and isinstance(call, CallOperation)
+            and len(call.args) == 1
+            and not call.kwargs
+        ):
+            vals = _str_values(call.args[0])
+            return DataKeys(prefixes=vals) if vals else None
+
+    return None
+
+
+def handler_keys(handler: HandlerObject) -> Optional[DataKeys]:
+    for f in handler.filters or ():
+        magic = getattr(f, "magic", None)
+        if magic is None:
+            continue
+        keys = analyze_magic(magic)
+        if keys is not None:
+            return keys
+    return None
+
+
+@dataclass
+class Route:
+    order: int
+    router: Router
+    observer: TelegramEventObserver
+    handler: HandlerObject
+    keys: Optional[DataKeys]
+
+    @property
+    def name(self) -> str:
+        cb = self.handler.callback
+        return f"{getattr(cb, '__module__', '?').rsplit('.', 1)[-1]}.{getattr(cb, '__name__', cb)}"
+
+
+@dataclass
+class _Node:
+    children: Dict[str, "_Node"] = field(default_factory=dict)
+    routes: List[int] = field(default_factory=list)
+
+
+class CallbackTrie:
+    def __init__(self, routes: List[Route]) -> None:
+        self.routes = routes
+        self.root = _Node()
+        self.exact: Dict[str, List[int]] = {}
+        self.wildcard: List[int] = []
+
+        for r in routes:
+            if r.keys is None:
+                self.wildcard.append(r.order)
+                continue
+            for value in r.keys.exact:
+                self.exact.setdefault(value, []).append(r.order)
+            for prefix in r.keys.prefixes:
+                node = self.root
+                for ch in prefix:
+                    node = node.children.setdefault(ch, _Node())
+                node.routes.append(r.order)
+
+    def candidates(self, data: Optional[str]) -> List[Route]:
+        if data is None:
+            return [self.routes[i] for i in self.wildcard]
+
+        found: List[int] = list(self.wildcard)
+        found.extend(self.exact.get(data, ()))
+
+        node = self.root
+        found.extend(node.routes)  # startswith("")
+        for ch in data:
+            node = node.children.get(ch)  # type: ignore[assignment]
+            if node is None:
+                break
+            found.extend(node.routes)
+
+        found = sorted(set(found))
+        return [self.routes[i] for i in found]
+
+    def collisions(self) -> List[str]:
+        """Ключи, которые перехватываются более ранним хендлером (если остальные фильтры пройдут)."""
+        out: List[str] = []
+        keyed = [r for r in self.routes if r.keys is not None]
+        for i, early in enumerate(keyed):
+            for late in keyed[i + 1:]:
+                for key in sorted(late.keys.exact | late.keys.prefixes):  # type: ignore[union-attr]
+                    hit = key in early.keys.exact and key in late.keys.exact  # type: ignore[union-attr]
+                    hit = hit or any(key.startswith(p) for p in early.keys.prefixes)  # type: ignore[union-attr]
+                    if hit:
+                        out.append(f"{key!r}: {early.name} (#{early.order}) перед {late.name} (#{late.order})")
+        return out
+
+
+def collect_routes(root: Router, event_name: str = "callback_query") -> List[Route]:
+    """Хендлеры в порядке штатной маршрутизации aiogram (pre-order по дереву роутеров)."""
+    routes: List[Route] = []
+    for router in root.chain_tail:
+        observer = router.observers.get(event_name)
+        if observer is None:
+            continue
+        for handler in observer.handlers:
+            routes.append(Route(len(routes), router, observer, handler, handler_keys(handler)))
+    return routes
+
+
+def fast_path_supported(root: Router, event_name: str = "callback_query") -> Tuple[bool, str]:
+    # outer-middleware вложенных роутеров вызываются из propagate_event — в обход их не пропускаем
+    for router in root.chain_tail:
+        if router is root:
+            continue
+        observer = router.observers.get(event_name)
+        if observer is not None and len(observer.outer_middleware) > 0:
+            return False, f"router {router.name!r} has {event_name} outer middleware"
+    return True, ""
+
+
+class CallbackTrieMiddleware(BaseMiddleware):
+    """
+    Последний outer-middleware на dp.callback_query: маршрутизирует сам и
+    не зовёт штатный propagate (handler) — кроме случая, когда fast path выключен.
+    """
+
+    def __init__(self, dp: Dispatcher) -> None:
+        self.dp = dp
+        self.trie: Optional[CallbackTrie] = None
+        self.enabled = CALLBACK_TRIE_ENABLED
+
+    def build(self) -> CallbackTrie:
+        ok, reason = fast_path_supported(self.dp)
+        if not ok:
+            self.enabled = False
+            logger.warning("callback_trie: disabled (%s)", reason)
+
+        routes = collect_routes(self.dp)
+        self.trie = CallbackTrie(routes)
+
+        n_prefix = sum(len(r.keys.prefixes) for r in routes if r.keys is not None)
+        n_exact = sum(len(r.keys.exact) for r in routes if r.keys is not None)
+        logger.info(
+            "callback_trie: handlers=%s prefixes=%s exact=%s wildcard=%s enabled=%s",
+            len(routes),
+            n_prefix,
+            n_exact,
+            len(self.trie.wildcard),
+            self.enabled,
+        )
+        # пересечения ключей — не ошибка (хендлеры обычно различаются StateFilter),
+        # но порядок include_router для них важен: отчёт один раз на старте
+        collisions = self.trie.collisions()
+        if collisions:
+            logger.info("callback_trie: %s key collisions\n  %s", len(collisions), "\n  ".join(collisions))
+        for i in self.trie.wildcard:
+            logger.warning("callback_trie: wildcard handler %s (#%s) — фильтр по data не разобран", routes[i].name, i)
+        return self.trie
+
+    async def iter_matches(self, event: CallbackQuery, data: Dict[str, Any]) -> AsyncIterator[Tuple[Route, Dict[str, Any]]]:
+        """Кандидаты из trie, у которых прошли root-фильтры роутера и фильтры хендлера — по порядку."""
+        trie = self.trie or self.build()
+        root_ok: Dict[int, Optional[Dict[str, Any]]] = {}
+
+        for route in trie.candidates(event.data):
+            rid = id(route.router)
+            if rid not in root_ok:
+                result, extra = await route.observer.check_root_filters(event, **data)
+                root_ok[rid] = dict(extra) if result else None
+            base = root_ok[rid]
+            if base is None:
+                continue
+
+            kwargs = dict(base)
+            kwargs.update(event_router=route.router, handler=route.handler)
+            result, extra = await route.handler.check(event, **kwargs)
+            if result:
+                kwargs.update(extra)
+                yield route, kwargs
+
+    async def resolve(self, event: CallbackQuery, data: Dict[str, Any]) -> Optional[Route]:
+        async for route, _kwargs in self.iter_matches(event, data):
+            return route
+        return None
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        if self.enabled and self.trie is None:
+            self.build()
+        if not self.enabled or not isinstance(event, CallbackQuery):
+            return await handler(event, data)
+
+        async for route, kwargs in self.iter_matches(event, data):
+            wrapped = route.observer.outer_middleware.wrap_middlewares(
+                route.observer._resolve_middlewares(),
+                route.handler.call,
+            )
+            try:
+                response = await wrapped(event, kwargs)
+            except SkipHandler:
+                continue
+            if response is REJECTED:
+                return UNHANDLED
+            return response
+
+        return UNHANDLED
+
+
+def install(dp: Dispatcher) -> CallbackTrieMiddleware:
+    """Регистрировать последним outer-middleware на callback_query; trie строится на старте."""
+    mw = CallbackTrieMiddleware(dp)
+    dp.callback_query.outer_middleware(mw)
+
+    async def _build_on_startup() -> None:
+        mw.build()
+
+    dp.startup.register(_build_on_startup)
+    return mw
+
+
+# ======================================================
+# Microbenchmark: python -m findex_bot.middlewares.callback_trie
+# ======================================================
+async def resolve_linear(root: Router, event: CallbackQuery, data: Dict[str, Any]) -> Optional[HandlerObject]:
+    """Как штатный aiogram: все роутеры по порядку, все хендлеры по порядку."""
+    for router in root.chain_tail:
+        observer = router.observers.get("callback_query")
+        if observer is None:
+            continue
+        result, extra = await observer.check_root_filters(event, **data)
+        if not result:
+            continue
+        kwargs = dict(data)
+        kwargs.update(extra)
+        for h in observer.handlers:
+            ok, _d = await h.check(event, **dict(kwargs, event_router=router, handler=h))
+            if ok:
+                return h
+    return None
+
+
+async def bench(dp: Dispatcher, samples: Iterable[str], rounds: int = 200) -> Dict[str, float]:
+    """us на callback: линейный проход vs trie (только маршрутизация, хендлеры не вызываются)."""
+    from datetime import datetime
+
+    from aiogram.types import Chat, Message, User
+
+    user = User(id=1, is_bot=False, first_name="bench")
+    msg = Message(message_id=1, date=datetime.now(), chat=Chat(id=1, type="private"))
+    events = [
+        CallbackQuery(id=str(i), from_user=user, chat_instance="1", data=s, message=msg)
+        for i, s in enumerate(samples)
+    ]
+    base = {"raw_state": None, "state": None, "bot": None}
+
+    mw = CallbackTrieMiddleware(dp)
+    mw.build()
+
+    for ev in events:
+        lin = await resolve_linear(dp, ev, base)
+        fast = await mw.resolve(ev, base)
+        if lin is not (fast.handler if fast else None):
+            logger.warning("bench: mismatch for %r", ev.data)
+
+    res: Dict[str, float] = {}
+    for label in ("linear", "trie"):
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for ev in events:
+                if label == "linear":
+                    await resolve_linear(dp, ev, base)
+                else:
+                    await mw.resolve(ev, base)
+        res[label] = (time.perf_counter() - t0) / (rounds * max(1, len(events))) * 1e6
+    return res
+
+
+def _main() -> None:
+    import asyncio
+
+    logging.basicConfig(level=logging.INFO)
+
+    from findex_bot import bot as bot_mod
+
+    dp = bot_mod.setup_dispatcher(Dispatcher())
+    routes = collect_routes(dp)
+    samples: List[str] = []
+    for r in routes:
+        if r.keys is None:
+            continue
+        samples.extend(sorted(r.keys.exact)[:1])
+        samples.extend(f"{p}123" for p in sorted(r.keys.prefixes)[:1])
+    samples.append("unknown:1")
+
+    res = asyncio.run(bench(dp, samples))
+    print(
+        f"callbacks={len(samples)} linear={res['linear']:.1f}us trie={res['trie']:.1f}us "
+        f"speedup=x{res['linear'] / max(res['trie'], 1e-9):.1f}"
+    )
+
+
+if __name__ == "__main__":
+    _main()
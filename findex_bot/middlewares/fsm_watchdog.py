@@ -2,7 +2,6 @@
 
 from __future__ import annotations
 
-import asyncio
 
 import os
 import time
@@ -12,8 +11,7 @@ from typing import Any, Awaitable, Callable, Optional
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 from findex_bot.states.vacancies import EmployerForm, SeekerForm
-from findex_bot.handlers.responds import RespondFSM
-from findex_bot.handlers.responds import RespondFSM
+from findex_bot.states.responds import RespondFSM
 from aiogram.fsm.context import FSMContext
 
 logger = logging.getLogger(__name__)
@@ -21,9 +19,10 @@ logger = logging.getLogger(__name__)
 FSM_WD_CONTINUE = "fsmwd:continue"
 FSM_WD_RESTART = "fsmwd:restart"
 
-K_LAST_TS = "fsm_last_ts"
-K_LAST_STATE = "fsm_last_state"
-K_LAST_PROMPT_TS = "fsm_wd_prompt_ts"
+# ключи общие с write-back контекстом (utils/fsm_batch): там метаданные пишутся в буфер,
+# патч ниже остаётся для "обычных" FSMContext (созданных вне апдейта)
+from findex_bot.utils import supervisor
+from findex_bot.utils.fsm_batch import K_LAST_PROMPT_TS, K_LAST_STATE, K_LAST_TS
 
 DEFAULT_TIMEOUT_SEC = 60 * 60
 DEFAULT_COOLDOWN_SEC = 60
@@ -49,15 +48,6 @@ def _get_cooldown_sec() -> int:
 
 
 
-async def _delete_message_later(msg: Message, delay_sec: float = 2.5) -> None:
-    try:
-        await asyncio.sleep(delay_sec)
-        await msg.delete()
-    except Exception:
-        pass
-
-
-
 from findex_bot.utils.hints_registry import (
     RESPOND_CITIZENSHIP_PICK_TRASH,
     RESPOND_FORM_PREVIEW_TRASH,
@@ -234,7 +224,7 @@ class FSMWatchdogMiddleware(BaseMiddleware):
                     try:
                         hint_key = st_data.get("clean_thread_hint_key")
                         hint = await event.answer(_clean_thread_hint_for_state(current_state, hint_key))
-                        asyncio.create_task(_delete_message_later(hint, 2.5))
+                        await supervisor.delete_later(hint.bot, int(hint.chat.id), int(hint.message_id), 2.5)
                     except Exception:
                         pass
                     try:
@@ -1,12 +1,12 @@
 # findex_bot/middlewares/published_guard.py
 from __future__ import annotations
 
-from typing import Callable, Awaitable, Dict, Any, Optional
+from typing import Callable, Awaitable, Dict, Any
 
 from aiogram import BaseMiddleware
 from aiogram.types import CallbackQuery
 
-import findex_bot.runtime as runtime
+from findex_bot.utils import preview_registry
 
 
 _PREVIEW_CB_PREFIXES = (
@@ -44,79 +44,8 @@ _ALLOW_CB_PREFIXES = (
     "show_contacts:",
 )
 
-_PREVIEW_MODE_MODERATION = getattr(runtime, "PREVIEW_MODE_MODERATION", "moderation")
-_PREVIEW_MODE_PUBLISHED = getattr(runtime, "PREVIEW_MODE_PUBLISHED", "published")
-
-
-def _get_preview_lock_storage() -> dict[tuple[int, int], str]:
-    store = getattr(runtime, "PUBLISHED_PREVIEW_MESSAGES", None)
-    if store is None:
-        store = {}
-
-    # обратная совместимость: раньше мог быть set[(chat_id,msg_id)]
-    if isinstance(store, set):
-        converted: dict[tuple[int, int], str] = {}
-        for item in store:
-            try:
-                chat_id, msg_id = item
-                converted[(int(chat_id), int(msg_id))] = _PREVIEW_MODE_MODERATION
-            except Exception:
-                continue
-        store = converted
-
-    if not isinstance(store, dict):
-        store = {}
-
-    runtime.PUBLISHED_PREVIEW_MESSAGES = store
-    return store
-
-
-def _get_pending() -> dict:
-    p = getattr(runtime, "ADS_PENDING", None)
-    if p is None or not isinstance(p, dict):
-        p = {}
-        runtime.ADS_PENDING = p
-    return p
-
-
-def _bool_flag(ad: dict, *keys: str) -> bool:
-    for k in keys:
-        try:
-            if bool(ad.get(k)):
-                return True
-        except Exception:
-            continue
-    return False
-
-
-def _pending_mode_for_message(chat_id: int, msg_id: int) -> Optional[str]:
-    pending = _get_pending()
-    if not pending:
-        return None
-
-    for _, ad in pending.items():
-        if not isinstance(ad, dict):
-            continue
-        try:
-            pchat = int(ad.get("preview_chat_id") or 0)
-            pmsg = int(ad.get("preview_message_id") or 0)
-        except Exception:
-            continue
-
-        if pchat != int(chat_id) or pmsg != int(msg_id):
-            continue
-
-        is_published = _bool_flag(ad, "published", "is_published")
-        on_moderation = _bool_flag(ad, "sent_to_moderation", "on_moderation", "moderation")
-
-        if is_published:
-            return _PREVIEW_MODE_PUBLISHED
-        if on_moderation:
-            return _PREVIEW_MODE_MODERATION
-
-        return None
-
-    return None
+_PREVIEW_MODE_MODERATION = preview_registry.PREVIEW_MODE_MODERATION
+_PREVIEW_MODE_PUBLISHED = preview_registry.PREVIEW_MODE_PUBLISHED
 
 
 class PublishedPreviewGuardMiddleware(BaseMiddleware):
@@ -150,25 +79,14 @@ class PublishedPreviewGuardMiddleware(BaseMiddleware):
         msg_id = int(event.message.message_id)
 
         # ✅ 4) ЖЁСТКАЯ ГАРАНТИЯ:
-        # вмешиваемся только если сообщение реально опознано как preview (store/pending)
-        store = _get_preview_lock_storage()
-        mode = store.get((chat_id, msg_id))
-        if mode is None:
-            mode = _pending_mode_for_message(chat_id, msg_id)
+        # вмешиваемся только если сообщение реально опознано как залоченное preview:
+        # один GET по (chat_id, msg_id) в реестре превью (общий для всех реплик, с TTL)
+        mode = await preview_registry.mode_for_message(chat_id, msg_id)
 
         # если это НЕ preview-сообщение — не лезем вообще
         if mode is None:
             return await handler(event, data)
 
-        # ✅ 5) UX-стоп для тех, кому закрыли preview
-        locked_users = getattr(runtime, "LOCKED_PREVIEW_USERS", set()) or set()
-        try:
-            if int(event.from_user.id) in locked_users:
-                await event.answer("⛔ Предпросмотр уже закрыт. Создай новое объявление: /start", show_alert=True)
-                return
-        except Exception:
-            pass
-
         if mode == _PREVIEW_MODE_PUBLISHED:
             await event.answer("✅ Объявление уже опубликовано", show_alert=True)
             return
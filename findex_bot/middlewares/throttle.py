@@ -1,10 +1,94 @@
 # findex_bot/middlewares/throttle.py
+from __future__ import annotations
+
+import logging
+import math
+import os
 import time
-from collections import deque
-from typing import Any, Awaitable, Callable, Dict, Deque
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from aiogram import BaseMiddleware
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import CallbackQuery, Message
+
+import findex_bot.runtime as runtime
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Антиспам: GCRA (generic cell rate algorithm) в Redis
+# ======================================================
+# На пользователя — один ключ throttle:{user_id} с TAT (theoretical arrival time, ms).
+# Проверка + запись — один EVAL на событие, время берётся из Redis TIME,
+# поэтому лимит общий для всех реплик бота и не зависит от их часов.
+# Ключ живёт ровно до TAT: у неактивного пользователя он сам исчезает.
+#
+# Без Redis (или если Redis упал) — тот же алгоритм в памяти процесса,
+# словарь периодически чистится от "остывших" пользователей.
+#
+# Мягкий режим как и раньше: не банит, просто не пропускает слишком частые события.
+
+THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "1") == "1"
+THROTTLE_LIMIT = int(os.getenv("THROTTLE_LIMIT", "12"))
+THROTTLE_WINDOW_SECONDS = float(os.getenv("THROTTLE_WINDOW_SECONDS", "10"))
+
+KEY_THROTTLE = "throttle:{user_id}"
+
+# стоимость callback'а по префиксу callback_data (первое совпадение); сообщения стоят DEFAULT_COST.
+# 0 — не троттлим и не ходим в Redis.
+# Префиксы — литералы (хендлеры сюда не импортируем): при переименовании callback'ов править и здесь.
+# Модераторы (runtime.MODERATORS) не троттлятся: разбор очереди /намодерации — десятки кликов подряд.
+DEFAULT_COST = 1
+ROUTE_COSTS: tuple[tuple[str, int], ...] = (
+    ("al_noop", 0),
+    ("resp_noop", 0),         # responds.CB_NOOP
+    ("noop", 0),              # ui_utils.NOOP_CALLBACK
+    ("fsmwd:", 0),
+    ("resp_form_send:", 3),   # responds.CB_FORM_SEND — отправка отклика
+    ("resp_fast_send:", 3),   # responds.CB_FAST_RESPOND — быстрый отклик
+    ("approve:", 3),
+    ("send_employer:", 3),
+    ("send_seeker:", 3),
+    ("send_to_moderation", 3),
+    ("republish:", 3),
+    ("repost:", 2),
+    ("show_contacts:", 2),
+)
+
+# 0 — пропустить, иначе через сколько ms событие снова пройдёт
+_GCRA_LUA = r"""
+local key = KEYS[1]
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+
+local t = redis.call("TIME")
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local tat = tonumber(redis.call("GET", key) or "0") or 0
+if tat < now then
+  tat = now
+end
+
+local new_tat = tat + interval * cost
+local allow_at = new_tat - burst
+if allow_at > now then
+  return allow_at - now
+end
+
+redis.call("SET", key, new_tat, "PX", math.max(1, new_tat - now))
+return 0
+"""
+
+_MEM_SWEEP_EVERY = 1000
+
+
+def route_cost(event: Any) -> int:
+    if isinstance(event, CallbackQuery):
+        cb = str(event.data or "")
+        for prefix, cost in ROUTE_COSTS:
+            if cb.startswith(prefix):
+                return cost
+    return DEFAULT_COST
 
 
 class ThrottleMiddleware(BaseMiddleware):
@@ -12,13 +96,25 @@ class ThrottleMiddleware(BaseMiddleware):
     Мягкий антиспам:
     - не банит
     - просто не пропускает слишком частые события
+    - limit событий стоимостью 1 за window_seconds (с burst до limit подряд)
     """
 
-    def __init__(self, window_seconds: int = 10, limit: int = 12, hint_seconds: int = 2):
-        self.window_seconds = window_seconds
-        self.limit = limit
+    def __init__(
+        self,
+        window_seconds: float = THROTTLE_WINDOW_SECONDS,
+        limit: int = THROTTLE_LIMIT,
+        hint_seconds: int = 2,
+    ):
+        self.window_seconds = float(window_seconds)
+        self.limit = max(1, int(limit))
         self.hint_seconds = hint_seconds
-        self._hits: Dict[int, Deque[float]] = {}
+
+        self.interval_ms = max(1, int(self.window_seconds * 1000 / self.limit))
+        self.burst_ms = self.interval_ms * self.limit
+
+        # fallback без Redis: user_id -> TAT (ms)
+        self._mem_tat: Dict[int, int] = {}
+        self._mem_calls = 0
 
     @staticmethod
     def _get_user_id(event: Any) -> int | None:
@@ -28,32 +124,71 @@ class ThrottleMiddleware(BaseMiddleware):
             return event.from_user.id
         return None
 
+    def _cost(self, event: Any) -> int:
+        # дороже лимита — такое событие не прошло бы никогда
+        return min(route_cost(event), self.limit)
+
+    async def check(self, user_id: int, cost: int) -> int:
+        """0 — пропустить, иначе ms до следующей попытки."""
+        if cost <= 0:
+            return 0
+
+        r = getattr(runtime, "REDIS", None)
+        if r is not None:
+            try:
+                key = KEY_THROTTLE.format(user_id=int(user_id))
+                return int(await r.eval(_GCRA_LUA, 1, key, str(self.interval_ms), str(self.burst_ms), str(cost)))
+            except Exception:
+                logger.exception("throttle: redis check failed user_id=%s -> memory", user_id)
+
+        return self._check_memory(int(user_id), cost)
+
+    def _check_memory(self, user_id: int, cost: int, now_ms: Optional[int] = None) -> int:
+        now = int(now_ms if now_ms is not None else time.time() * 1000)
+
+        self._mem_calls += 1
+        if self._mem_calls % _MEM_SWEEP_EVERY == 0:
+            self._sweep(now)
+
+        tat = max(self._mem_tat.get(user_id, 0), now)
+        new_tat = tat + self.interval_ms * cost
+        allow_at = new_tat - self.burst_ms
+        if allow_at > now:
+            return allow_at - now
+
+        self._mem_tat[user_id] = new_tat
+        return 0
+
+    def _sweep(self, now_ms: int) -> None:
+        for uid in [uid for uid, tat in self._mem_tat.items() if tat <= now_ms]:
+            self._mem_tat.pop(uid, None)
+
     async def __call__(
         self,
         handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
         event: Any,
         data: Dict[str, Any],
     ):
-        uid = self._get_user_id(event)
-        if uid is None:
+        if not THROTTLE_ENABLED:
             return await handler(event, data)
 
-        now = time.time()
-        q = self._hits.setdefault(uid, deque())
-
-        # чистим старые хиты
-        while q and (now - q[0]) > self.window_seconds:
-            q.popleft()
+        uid = self._get_user_id(event)
+        if uid is None or uid in runtime.MODERATORS:
+            return await handler(event, data)
 
-        q.append(now)
+        retry_ms = await self.check(uid, self._cost(event))
+        if retry_ms <= 0:
+            return await handler(event, data)
 
-        if len(q) > self.limit:
-            # мягкое сообщение, без show_alert (чтобы не бесить)
+        wait_sec = max(self.hint_seconds, math.ceil(retry_ms / 1000))
+        # мягкое сообщение, без show_alert (чтобы не бесить)
+        try:
             if isinstance(event, CallbackQuery):
-                await event.answer(f"Слишком часто. Подожди {self.hint_seconds} сек 🙃", show_alert=False)
+                await event.answer(f"Слишком часто. Подожди {wait_sec} сек 🙃", show_alert=False)
                 return
             if isinstance(event, Message):
-                await event.answer(f"Ты слишком быстро пишешь/жмёшь. Подожди {self.hint_seconds} сек 🙃")
+                await event.answer(f"Ты слишком быстро пишешь/жмёшь. Подожди {wait_sec} сек 🙃")
                 return
-
-        return await handler(event, data)
+        except Exception:
+            logger.exception("throttle: hint answer failed user_id=%s", uid)
+        return
@@ -6,7 +6,7 @@ import asyncio
 import logging
 import contextlib
 import html
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
 
 from sqlalchemy import text
@@ -19,13 +19,13 @@ except Exception:
 
 from aiogram import Bot
 from aiogram.enums import ParseMode
-from aiogram.client.default import DefaultBotProperties
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, LinkPreviewOptions
 
 import findex_bot.runtime as runtime
 from findex_bot.db.db import get_sessionmaker
 from findex_bot.db.repo import RespondRepo
 from findex_bot.db.models import Respond, Ad
+from findex_bot.utils import redis_conn, tg_client
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +47,9 @@ LEADER_RENEW_EVERY_SEC = int(os.getenv("RES_WORKER_LEADER_RENEW_SEC", "10"))
 TICK_SEC = int(os.getenv("RES_WORKER_TICK_SEC", "10"))
 BATCH_SIZE = int(os.getenv("RES_WORKER_BATCH_SIZE", "100"))
 
+# необработанные стадии ищем только в окне TTL отклика (+1 день запаса)
+RES_EVENTS_LOOKBACK_DAYS = int(os.getenv("RESPOND_TTL_DAYS", "30")) + 1
+
 CB_RESUME = "respond_resume"
 CB_NOOP = "resp_noop"
 
@@ -76,26 +79,6 @@ def _h(v: Any) -> str:
     return html.escape(str(v or ""), quote=False)
 
 
-def _get_redis() -> Any:
-    """
-    ВАЖНО:
-    resurrection_worker.py — отдельный процесс.
-    Он использует свой собственный Redis client и не должен трогать runtime.REDIS.
-    """
-    from redis.asyncio import Redis  # type: ignore
-
-    dsn = os.getenv("REDIS_DSN") or os.getenv("REDIS_URL")
-    if dsn:
-        return Redis.from_url(dsn, decode_responses=True)
-
-    host = os.getenv("REDIS_HOST", "redis")
-    port = int(os.getenv("REDIS_PORT", "6379"))
-    db = int(os.getenv("REDIS_DB", "0"))
-    password = os.getenv("REDIS_PASSWORD") or None
-
-    return Redis(host=host, port=port, db=db, password=password, decode_responses=True)
-
-
 async def _try_become_leader(redis: Any, token: str) -> bool:
     return bool(await redis.set(LEADER_KEY, token, nx=True, ex=LEADER_TTL_SEC))
 
@@ -192,6 +175,7 @@ def _channel_post_url_from_ad(ad: Ad | None, respond: Respond | None = None) ->
 
     payload = getattr(ad, "payload", None) or {}
     candidates = [
+        getattr(ad, "channel_message_id", None),
         payload.get("main_message_id"),
         payload.get("main_channel_message_id"),
         payload.get("channel_message_id"),
@@ -348,6 +332,8 @@ def _targets_for_stage(respond: Respond, scenario: str) -> list[tuple[str, int]]
 
 
 async def _load_unhandled_resurrection_events(session: AsyncSession) -> list[dict[str, Any]]:
+    # created_at >= :since — отсекает старые партиции respond_events (отклики старше
+    # RESPOND_TTL_DAYS всё равно закрыты jobs), а "handled"-маркер ищем по PK в respond_event_dedup
     q = text("""
         SELECT
             e.id,
@@ -357,15 +343,17 @@ async def _load_unhandled_resurrection_events(session: AsyncSession) -> list[dic
         FROM respond_events e
         WHERE e.actor_role = 'system'
           AND e.event_type = 'resurrection_stage'
+          AND e.created_at >= :since
           AND NOT EXISTS (
               SELECT 1
-              FROM respond_events h
+              FROM respond_event_dedup h
               WHERE h.dedup_key = ('res-handled:' || e.id::text)
           )
         ORDER BY e.created_at ASC
         LIMIT :lim
     """)
-    res = await session.execute(q, {"lim": BATCH_SIZE})
+    since = _now_utc() - timedelta(days=RES_EVENTS_LOOKBACK_DAYS)
+    res = await session.execute(q, {"lim": BATCH_SIZE, "since": since})
     rows = res.fetchall()
 
     items: list[dict[str, Any]] = []
@@ -671,7 +659,8 @@ async def worker_tick(bot: Bot, session: AsyncSession) -> int:
 
 
 async def _leader_loop(token: str) -> None:
-    redis = _get_redis()
+    # свой клиент процесса (общий пул/таймауты/retry из utils/redis_conn), runtime.REDIS не трогаем
+    redis = (await redis_conn.init(publish_runtime=False, default_host="redis")).client
 
     while True:
         became = await _try_become_leader(redis, token)
@@ -690,10 +679,7 @@ async def _leader_loop(token: str) -> None:
 
     renew_task = asyncio.create_task(_renewer())
 
-    bot = Bot(
-        token=_bot_token(),
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
-    )
+    bot = tg_client.build_bot(_bot_token())
 
     try:
         while True:
@@ -711,12 +697,7 @@ async def _leader_loop(token: str) -> None:
         with contextlib.suppress(Exception):
             await bot.session.close()
         try:
-            if hasattr(redis, "aclose"):
-                await redis.aclose()
-            else:
-                res = redis.close()
-                if asyncio.iscoroutine(res):
-                    await res
+            await redis_conn.shutdown()
         except Exception:
             pass
 
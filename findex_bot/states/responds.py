@@ -0,0 +1,22 @@
+# findex_bot/states/responds.py
+from __future__ import annotations
+
+from aiogram.fsm.state import StatesGroup, State
+
+
+# отдельно от handlers/responds.py: FSMWatchdogMiddleware сверяет стейты,
+# не импортируя весь модуль откликов
+class RespondFSM(StatesGroup):
+    form_name = State()
+    form_age = State()
+    form_citizenship_pick = State()
+    form_citizenship = State()
+    form_experience = State()
+    form_resume = State()
+    form_preview = State()
+    form_existing_notice = State()
+    form_intro_choice = State()
+    form_saved_choice = State()
+
+    author_reply_text = State()
+    cand_reply_text = State()
@@ -0,0 +1,213 @@
+# findex_bot/utils/ad_render.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from findex_bot.utils.vacancy_utils import _p, make_hashtag, resolve_ad_role
+
+# ======================================================
+# Рендер текста объявления: структура + кэш вариантов
+# ======================================================
+# Было: get_ad_text собирал текст заново в каждом месте (публикация — дважды, превью автора,
+# карточки модерации, share), а forms.py разбирал готовый текст обратно строками
+# (_extract_value_from_ad_text / _strip_contacts_from_ad_text).
+#
+# Стало:
+#   - build_parts(payload) -> AdParts: поля объявления уже очищены, хэштеги посчитаны;
+#     все варианты (с контактами / без, компактная строка «Опубликовано», подпись до 1024)
+#     собираются из полей, текст обратно не разбирается;
+#   - кэш процесса (LRU, AD_RENDER_CACHE_SIZE) по ключу (ad_id, хэш полей рендера, вариант):
+#     правка payload меняет хэш — старые записи просто вытесняются, сбрасывать нечего.
+#     В хэш входят только поля из RENDER_FIELDS: служебные ключи payload (координаты превью,
+#     moderation_*) кэш не сбивают.
+
+AD_RENDER_CACHE_SIZE = max(16, int(os.getenv("AD_RENDER_CACHE_SIZE", "2048")))
+
+CAPTION_LIMIT = 1024
+TEXT_LIMIT = 4096
+
+VARIANT_FULL = "full"
+VARIANT_NO_CONTACTS = "no_contacts"
+VARIANT_COMPACT = "compact"
+_VARIANT_PARTS = "parts"
+
+# всё, что читает рендер (и только это) — входит в хэш
+RENDER_FIELDS = ("role", "ad_role", "title", "salary", "location", "contacts", "about", "description", "schedule")
+
+# накопительные счётчики процесса (для /metrics)
+TOTALS: dict[str, int] = {
+    "hit": 0,
+    "miss": 0,
+    "evicted": 0,
+}
+
+
+def _s(payload: dict, key: str) -> str:
+    return str(payload.get(key) or "").strip()
+
+
+@dataclass(frozen=True)
+class AdParts:
+    role: str  # "seeker" / "employer"
+    title: str
+    salary: str
+    location: str
+    contacts: str
+    schedule: str
+    body: str  # «О себе» соискателя / «Описание» работодателя
+    tags: str
+
+    def text(self, *, contacts: bool = True) -> str:
+        if self.role == "seeker":
+            lines = [
+                "Соискатель",
+                "",
+                f"👤 Должность: {self.title}",
+                f"🕒 График: {self.schedule}",
+                f"💲 Зарплата: {self.salary}",
+                f"📍 Локация: {self.location}",
+            ]
+            body_label = "📝 О себе:"
+        else:
+            lines = [
+                "Работодатель",
+                "",
+                f"👤 Должность: {self.title}",
+                f"💲 Зарплата: {self.salary}",
+                f"📍 Локация: {self.location}",
+            ]
+            body_label = "📝 Описание:"
+        if contacts:
+            lines.append(f"📞 Контакты: {self.contacts}")
+        lines.extend([body_label, self.body, "", self.tags])
+        return "\n".join(lines)
+
+    def compact(self) -> str:
+        """Свёрнутое превью автора после публикации."""
+        shown = " • ".join(x for x in (self.title, self.location) if x)
+        return f"✅ Опубликовано • {shown}" if shown else "✅ Опубликовано"
+
+
+def build_parts(ad_or_payload: Any) -> AdParts:
+    payload = _p(ad_or_payload)
+    role = resolve_ad_role(ad_or_payload)
+    title = _s(payload, "title")
+    location = _s(payload, "location")
+    description = _s(payload, "description")
+    return AdParts(
+        role=role,
+        title=title,
+        salary=_s(payload, "salary"),
+        location=location,
+        contacts=_s(payload, "contacts"),
+        schedule=_s(payload, "schedule"),
+        body=(_s(payload, "about") or description) if role == "seeker" else description,
+        tags=f"#FindexHub {make_hashtag(title)} {make_hashtag(location)}".strip(),
+    )
+
+
+def payload_hash(ad_or_payload: Any) -> str:
+    payload = _p(ad_or_payload)
+    raw = json.dumps([payload.get(k) for k in RENDER_FIELDS], ensure_ascii=False, default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def truncate(text: str, limit: int) -> str:
+    text = (text or "").strip()
+    if len(text) <= limit:
+        return text
+    return text[: limit - 1] + "…"
+
+
+# ---------------- cache ----------------
+class RenderCache:
+    def __init__(self, max_items: int = AD_RENDER_CACHE_SIZE) -> None:
+        self.max_items = max(1, int(max_items))
+        self._items: "OrderedDict[tuple[int, str, str], Any]" = OrderedDict()
+
+    def get(self, key: tuple[int, str, str]) -> Optional[Any]:
+        val = self._items.get(key)
+        if val is None:
+            TOTALS["miss"] += 1
+            return None
+        self._items.move_to_end(key)
+        TOTALS["hit"] += 1
+        return val
+
+    def put(self, key: tuple[int, str, str], val: Any) -> None:
+        self._items[key] = val
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+            TOTALS["evicted"] += 1
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+CACHE = RenderCache()
+
+
+def _ad_id(ad_or_payload: Any) -> int:
+    raw = getattr(ad_or_payload, "id", None)
+    if raw is None and isinstance(ad_or_payload, dict):
+        raw = ad_or_payload.get("id")
+    try:
+        return int(raw or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _cached(ad_or_payload: Any, variant: str, build) -> Any:
+    key = (_ad_id(ad_or_payload), payload_hash(ad_or_payload), variant)
+    val = CACHE.get(key)
+    if val is None:
+        val = build()
+        CACHE.put(key, val)
+    return val
+
+
+# ---------------- API ----------------
+def parts(ad_or_payload: Any) -> AdParts:
+    return _cached(ad_or_payload, _VARIANT_PARTS, lambda: build_parts(ad_or_payload))
+
+
+def render(ad_or_payload: Any, variant: str = VARIANT_FULL, *, limit: int = 0) -> str:
+    """Вариант текста объявления; limit>0 — обрезка (CAPTION_LIMIT для подписи к медиа)."""
+    if variant not in (VARIANT_FULL, VARIANT_NO_CONTACTS, VARIANT_COMPACT):
+        raise ValueError(f"unknown ad render variant: {variant!r}")
+
+    def build() -> str:
+        p = parts(ad_or_payload)
+        out = p.compact() if variant == VARIANT_COMPACT else p.text(contacts=(variant == VARIANT_FULL))
+        return truncate(out, limit) if limit else out
+
+    return _cached(ad_or_payload, f"{variant}@{int(limit)}" if limit else variant, build)
+
+
+def text(ad_or_payload: Any, *, contacts: bool = True, limit: int = 0) -> str:
+    return render(ad_or_payload, VARIANT_FULL if contacts else VARIANT_NO_CONTACTS, limit=limit)
+
+
+def caption(ad_or_payload: Any, *, contacts: bool = True) -> str:
+    return text(ad_or_payload, contacts=contacts, limit=CAPTION_LIMIT)
+
+
+def compact(ad_or_payload: Any) -> str:
+    return render(ad_or_payload, VARIANT_COMPACT)
+
+
+def cache_size() -> int:
+    return len(CACHE)
+
+
+def totals_snapshot() -> dict[str, int]:
+    return dict(TOTALS)
@@ -13,6 +13,7 @@ from typing import Any, Optional
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 import findex_bot.runtime as runtime
+from findex_bot.utils import geo
 
 logger = logging.getLogger(__name__)
 
@@ -252,7 +253,7 @@ def _tokens(s: str) -> set[str]:
     return {t for t in v.split() if len(t) >= 3}
 
 
-def _matches_location_bidirectional(value: str, keywords: list[str]) -> bool:
+def _matches_location_bidirectional(value: str, keywords: list[str], radius_km: float = 0.0) -> bool:
     if not keywords:
         return False
 
@@ -261,12 +262,23 @@ def _matches_location_bidirectional(value: str, keywords: list[str]) -> bool:
         return False
 
     v_tokens = _tokens(v_norm)
+    # обе стороны есть в справочнике (geo): станции — по узлу (Тверская = Пушкинская = Чеховская,
+    # любая транслитерация), «Москва» — любая станция Москвы, радиус алерта — по расстоянию;
+    # две разные станции вне радиуса не совпадают, даже если обе «москва ...»
+    v_place = geo.resolve(v_norm)
 
     for k in keywords:
         k_norm = _normalize(k)
         if not k_norm:
             continue
 
+        if v_place is not None:
+            k_place = geo.resolve(k_norm)
+            if k_place is not None:
+                if geo.place_matches(v_place, k_place, radius_km):
+                    return True
+                continue
+
         if k_norm in v_norm:
             return True
         if v_norm in k_norm:
@@ -291,6 +303,13 @@ def _is_alert_expired(a: dict, now_ts: int | None = None) -> bool:
     return False
 
 
+def _alert_radius_km(alert: dict) -> float:
+    try:
+        return max(0.0, float(alert.get("radius_km") or 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
 def _alert_matches(ad_role: str, ad_position: str, ad_location: str, alert: dict) -> bool:
     if (alert.get("target_role") or "") != ad_role:
         return False
@@ -312,7 +331,7 @@ def _alert_matches(ad_role: str, ad_position: str, ad_location: str, alert: dict
     if not _matches_keywords(ad_position, pos_kw):
         return False
 
-    if not _matches_location_bidirectional(ad_location, loc_kw):
+    if not _matches_location_bidirectional(ad_location, loc_kw, _alert_radius_km(alert)):
         return False
 
     return True
@@ -333,6 +352,7 @@ class Alert:
     month_key: str = ""
     consumed: bool = False
     consumed_at: int = 0
+    radius_km: float = 0.0  # 0 — без радиуса (станция/узел, город)
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -346,6 +366,7 @@ class Alert:
             "month_key": str(self.month_key or current_month_key(self.created_at)),
             "consumed": bool(self.consumed),
             "consumed_at": int(self.consumed_at or 0),
+            "radius_km": float(self.radius_km or 0),
         }
 
 
@@ -379,6 +400,7 @@ def _ensure_alert_shape(a: dict) -> dict:
     a.setdefault("month_key", current_month_key(created_at))
     a.setdefault("consumed", False)
     a.setdefault("consumed_at", 0)
+    a.setdefault("radius_km", 0)
     if ttl_days > 0:
         a.setdefault("expires_at", int(created_at + ttl_days * 24 * 3600))
     else:
@@ -530,12 +552,21 @@ async def _rebuild_user_target_index(user_id: int, alerts: list[dict]) -> None:
 
 
 async def add_alert(user_id: int, target_role: str, position_raw: str, location_raw: str) -> dict:
+    # «Курская 3 км» -> локация + радиус
+    location_raw, radius_km = geo.split_radius(location_raw)
     pos = _split_keywords(position_raw)
     loc = _split_keywords(location_raw)
     if not pos or not loc:
         raise ValueError("position and location are required")
     if len(pos) != 1:
         raise ValueError("Один алерт можно настроить только на одну вакансию. Для каждой вакансии создай отдельный алерт.")
+    if radius_km > geo.MAX_RADIUS_KM:
+        raise ValueError(f"⚠️ Радиус — не больше {geo.format_radius(geo.MAX_RADIUS_KM)}.")
+    if radius_km and any(geo.resolve(k) is None for k in loc):
+        raise ValueError(
+            "⚠️ Радиус работает для станций метро Москвы и городов из справочника. "
+            "Пример: Курская 3 км или Химки 5 км."
+        )
 
     alerts = await get_user_alerts(user_id)
 
@@ -554,6 +585,7 @@ async def add_alert(user_id: int, target_role: str, position_raw: str, location_
         month_key=current_month_key(now_ts),
         consumed=False,
         consumed_at=0,
+        radius_km=radius_km,
     )
 
     alerts.append(a.to_dict())
@@ -612,6 +644,9 @@ def format_alert_line(a: dict) -> str:
     target = (a.get("target_role") or "?").strip()
     pos = ", ".join(_title_words(x) for x in (a.get("position_keywords") or []))
     loc = ", ".join(_title_words(x) for x in (a.get("location_keywords") or []))
+    radius_km = _alert_radius_km(a)
+    if loc and radius_km:
+        loc = f"{loc} (до {geo.format_radius(radius_km)})"
 
     now_ts = int(time.time())
     expires_at = int(a.get("expires_at") or (int(a.get("created_at") or now_ts) + ALERT_TTL_SECONDS))
@@ -738,11 +773,8 @@ def _looks_like_bot_blocked_error(exc: Exception) -> bool:
 # ----------------------------
 # Access gates
 # ----------------------------
-async def _is_project_blocked_user(user_id: int) -> bool:
-    try:
-        return bool(runtime.is_blocked(int(user_id)))
-    except Exception:
-        return False
+def _is_project_blocked_user(user_id: int) -> bool:
+    return runtime.is_blocked(int(user_id))
 
 
 async def _is_channel_subscribed(bot, user_id: int) -> tuple[bool, str, str]:
@@ -871,7 +903,7 @@ async def notify_on_published(
 
     for uid in user_ids:
         try:
-            if await _is_project_blocked_user(uid):
+            if _is_project_blocked_user(uid):
                 logger.info("alerts: skip user=%s ad_id=%s reason=project_blocked", uid, ad_id)
                 continue
 
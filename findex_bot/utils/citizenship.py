@@ -0,0 +1,66 @@
+# findex_bot/utils/citizenship.py
+from __future__ import annotations
+
+import re
+
+# Гражданство кандидата: в анкете хранится как ввёл/выбрал пользователь (citizenship),
+# для фильтров — нормализованный код (candidate_profiles.citizenship_code):
+#   страны из кнопок анкеты -> их код ("ru", "kz", ...), в т.ч. по частым синонимам;
+#   остальное -> нормализованный текст ("сербия"), чтобы фильтр был равенством по btree.
+# Алиасы продублированы в миграции candidate_profiles_search (бэкфилл) — менять вместе.
+
+CITIZENSHIP_OPTIONS: list[tuple[str, str, str]] = [
+    ("ru", "🇷🇺", "Россия"),
+    ("kz", "🇰🇿", "Казахстан"),
+    ("by", "🇧🇾", "Беларусь"),
+    ("ua", "🇺🇦", "Украина"),
+    ("am", "🇦🇲", "Армения"),
+    ("az", "🇦🇿", "Азербайджан"),
+    ("ge", "🇬🇪", "Грузия"),
+    ("uz", "🇺🇿", "Узбекистан"),
+    ("tj", "🇹🇯", "Таджикистан"),
+    ("kg", "🇰🇬", "Кыргызстан"),
+]
+CITIZENSHIP_MAP: dict[str, str] = {code: title for code, _flag, title in CITIZENSHIP_OPTIONS}
+
+CITIZENSHIP_ALIASES: dict[str, str] = {
+    "рф": "ru",
+    "российская федерация": "ru",
+    "russia": "ru",
+    "kazakhstan": "kz",
+    "белоруссия": "by",
+    "рб": "by",
+    "belarus": "by",
+    "ukraine": "ua",
+    "armenia": "am",
+    "azerbaijan": "az",
+    "georgia": "ge",
+    "uzbekistan": "uz",
+    "tajikistan": "tj",
+    "киргизия": "kg",
+    "киргизстан": "kg",
+    "кыргызская республика": "kg",
+    "kyrgyzstan": "kg",
+}
+
+_SPACE_RE = re.compile(r"[\s\-]+")
+
+
+def _norm(raw: str) -> str:
+    return _SPACE_RE.sub(" ", (raw or "").strip().lower().replace("ё", "е")).strip()
+
+
+_BY_TEXT: dict[str, str] = {
+    **{_norm(title): code for code, _flag, title in CITIZENSHIP_OPTIONS},
+    **{_norm(alias): code for alias, code in CITIZENSHIP_ALIASES.items()},
+}
+
+
+def citizenship_code(raw: str | None) -> str:
+    """"Россия" / "РФ" / "ru" -> "ru"; "Сербия" -> "сербия"; пусто -> ""."""
+    s = _norm(raw or "")
+    if not s:
+        return ""
+    if s in CITIZENSHIP_MAP:
+        return s
+    return _BY_TEXT.get(s, s)
@@ -0,0 +1,370 @@
+# findex_bot/utils/fsm_batch.py
+from __future__ import annotations
+
+import copy
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Set, cast
+
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.middleware import FSMContextMiddleware
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import DEFAULT_DESTINY, BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import DisabledEventIsolation, SimpleEventIsolation
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.exceptions import WatchError
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Write-back FSM: один round-trip на чтение и один MULTI на запись за апдейт
+# ======================================================
+# BufferedFSMContext при первом обращении читает state+data одним pipeline,
+# дальше get_state/get_data/update_data/set_state/clear работают с буфером,
+# а BufferedFSMContextMiddleware в конце хендлера сбрасывает изменения одной
+# MULTI-транзакцией (и только если что-то реально поменялось).
+#
+# Метаданные watchdog (fsm_last_ts / fsm_last_state) пишутся в тот же буфер —
+# раньше FSMWatchdogMiddleware делал на каждый set_state/clear лишний update_data.
+#
+# После flush контекст переходит в write-through (фоновые задачи хендлера,
+# которые держат ссылку на state, пишут сразу в storage).
+#
+# Буфер живёт весь хендлер (с запросами в Telegram), поэтому:
+#   - update_data сбрасывается только изменёнными ключами поверх свежих данных из storage
+#     (в Redis — WATCH/MULTI с повтором), чужие ключи параллельного апдейта не затираются;
+#     целиком данные перезаписывают только set_data / clear;
+#   - install() ставит SimpleEventIsolation вместо штатного DisabledEventIsolation —
+#     апдейты одного пользователя в процессе идут по очереди.
+
+K_LAST_TS = "fsm_last_ts"
+K_LAST_STATE = "fsm_last_state"
+K_LAST_PROMPT_TS = "fsm_wd_prompt_ts"
+
+FSM_BATCH_DEBUG = os.getenv("FSM_BATCH_DEBUG", "0") == "1"
+FLUSH_WATCH_RETRIES = 3
+
+
+@dataclass
+class FSMOpStats:
+    # вызовы FSMContext из хендлеров/middleware
+    ctx_reads: int = 0
+    ctx_writes: int = 0
+    # что реально ушло в Redis
+    redis_roundtrips: int = 0
+    redis_commands: int = 0
+
+
+# накопительные счётчики процесса (для /sys_status и метрик)
+TOTALS: dict[str, int] = {
+    "updates": 0,
+    "ctx_reads": 0,
+    "ctx_writes": 0,
+    "redis_roundtrips": 0,
+    "redis_commands": 0,
+}
+
+
+def _now_ts() -> int:
+    return int(time.time())
+
+
+def _state_str(state: StateType) -> Optional[str]:
+    if state is None:
+        return None
+    return cast(str, state.state if isinstance(state, State) else state)
+
+
+class BufferedFSMContext(FSMContext):
+    def __init__(self, storage: BaseStorage, key: StorageKey) -> None:
+        super().__init__(storage=storage, key=key)
+        self.stats = FSMOpStats()
+        self._loaded = False
+        self._closed = False
+        self._state: Optional[str] = None
+        self._data: Dict[str, Any] = {}
+        self._state_dirty = False
+        self._data_dirty = False
+        self._changed: Set[str] = set()  # ключи update_data / метаданных
+        self._replaced = False  # set_data / clear: данные перезаписываются целиком
+
+    # -------- load / flush --------
+    async def _load(self) -> None:
+        if self._loaded:
+            return
+
+        storage = self.storage
+        if isinstance(storage, RedisStorage):
+            k_state = storage.key_builder.build(self.key, "state")
+            k_data = storage.key_builder.build(self.key, "data")
+            pipe = storage.redis.pipeline(transaction=False)
+            pipe.get(k_state)
+            pipe.get(k_data)
+            raw_state, raw_data = await pipe.execute()
+            self.stats.redis_roundtrips += 1
+            self.stats.redis_commands += 2
+
+            if isinstance(raw_state, bytes):
+                raw_state = raw_state.decode("utf-8")
+            if isinstance(raw_data, bytes):
+                raw_data = raw_data.decode("utf-8")
+            self._state = cast(Optional[str], raw_state)
+            self._data = dict(storage.json_loads(raw_data)) if raw_data else {}
+        else:
+            self._state = await storage.get_state(key=self.key)
+            self._data = dict(await storage.get_data(key=self.key))
+
+        self._loaded = True
+
+    @property
+    def dirty(self) -> bool:
+        return self._state_dirty or self._data_dirty
+
+    async def flush(self) -> None:
+        """Сбрасывает буфер и переводит контекст в write-through."""
+        if self._closed:
+            return
+        self._closed = True
+
+        if not self.dirty:
+            return
+
+        storage = self.storage
+        if isinstance(storage, RedisStorage):
+            await self._flush_redis(storage)
+        else:
+            if self._state_dirty:
+                await storage.set_state(key=self.key, state=self._state)
+            if self._data_dirty:
+                data = self._data
+                if not self._replaced:
+                    data = self._merge(await storage.get_data(key=self.key))
+                await storage.set_data(key=self.key, data=data)
+
+        self._state_dirty = False
+        self._data_dirty = False
+        self._changed.clear()
+        self._replaced = False
+
+    def _merge(self, current: Mapping[str, Any]) -> Dict[str, Any]:
+        """Свежие данные из storage + только те ключи, что поменял этот апдейт."""
+        merged = dict(current)
+        for k in self._changed:
+            merged[k] = self._data[k]
+        return merged
+
+    async def _flush_redis(self, storage: RedisStorage) -> None:
+        k_state = storage.key_builder.build(self.key, "state")
+        k_data = storage.key_builder.build(self.key, "data")
+        merge = self._data_dirty and not self._replaced
+
+        async with storage.redis.pipeline(transaction=True) as pipe:
+            for attempt in range(FLUSH_WATCH_RETRIES):
+                try:
+                    data = self._data
+                    if merge:
+                        await pipe.watch(k_data)
+                        raw = await pipe.get(k_data)
+                        self.stats.redis_roundtrips += 2
+                        self.stats.redis_commands += 2
+                        if isinstance(raw, bytes):
+                            raw = raw.decode("utf-8")
+                        data = self._merge(storage.json_loads(raw) if raw else {})
+                        pipe.multi()
+
+                    if self._state_dirty:
+                        if self._state is None:
+                            pipe.delete(k_state)
+                        else:
+                            pipe.set(k_state, self._state, ex=storage.state_ttl)
+                        self.stats.redis_commands += 1
+                    if self._data_dirty:
+                        if not data:
+                            pipe.delete(k_data)
+                        else:
+                            pipe.set(k_data, storage.json_dumps(data), ex=storage.data_ttl)
+                        self.stats.redis_commands += 1
+                    await pipe.execute()
+                    self.stats.redis_roundtrips += 1
+                    return
+                except WatchError:
+                    # данные поменял параллельный апдейт — перечитываем и накладываем заново
+                    if attempt + 1 >= FLUSH_WATCH_RETRIES:
+                        raise
+                    await pipe.reset()
+
+    # -------- FSMContext API --------
+    async def get_state(self) -> Optional[str]:
+        if self._closed:
+            return await super().get_state()
+        self.stats.ctx_reads += 1
+        await self._load()
+        return self._state
+
+    async def get_data(self) -> Dict[str, Any]:
+        if self._closed:
+            return await super().get_data()
+        self.stats.ctx_reads += 1
+        await self._load()
+        # копия: хендлеры иногда мутируют то, что получили, не вызывая update_data
+        return copy.deepcopy(self._data)
+
+    async def get_value(self, key: str, default: Optional[Any] = None) -> Optional[Any]:
+        if self._closed:
+            return await super().get_value(key, default)
+        self.stats.ctx_reads += 1
+        await self._load()
+        return copy.deepcopy(self._data.get(key, default))
+
+    async def set_state(self, state: StateType = None) -> None:
+        if self._closed:
+            return await super().set_state(state)
+        self.stats.ctx_writes += 1
+        await self._load()
+        self._state = _state_str(state)
+        self._state_dirty = True
+        self._data[K_LAST_TS] = _now_ts()
+        self._data[K_LAST_STATE] = str(state)
+        self._changed.update((K_LAST_TS, K_LAST_STATE))
+        self._data_dirty = True
+
+    async def set_data(self, data: Mapping[str, Any]) -> None:
+        if self._closed:
+            return await super().set_data(data)
+        if not isinstance(data, dict):
+            # то же поведение, что у storage.set_data
+            return await super().set_data(data)
+        self.stats.ctx_writes += 1
+        await self._load()
+        self._data = copy.deepcopy(dict(data))
+        self._replaced = True
+        self._data_dirty = True
+
+    async def update_data(self, data: Optional[Mapping[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        if data:
+            kwargs.update(data)
+        if self._closed:
+            # только kwargs: FSMWatchdogMiddleware патчит FSMContext.update_data(**kwargs)
+            return await super().update_data(**kwargs)
+        kwargs.setdefault(K_LAST_TS, _now_ts())
+
+        self.stats.ctx_writes += 1
+        await self._load()
+        self._data.update(copy.deepcopy(kwargs))
+        self._changed.update(kwargs)
+        self._data_dirty = True
+        return copy.deepcopy(self._data)
+
+    async def clear(self) -> None:
+        if self._closed:
+            return await super().clear()
+        self.stats.ctx_writes += 1
+        await self._load()
+        self._state = None
+        self._data = {}
+        self._replaced = True
+        self._state_dirty = True
+        self._data_dirty = True
+
+
+class BufferedFSMContextMiddleware(FSMContextMiddleware):
+    """Замена штатного dp.fsm: тот же resolve контекста и isolation, но контекст буферизованный."""
+
+    def get_context(
+        self,
+        bot: Bot,
+        chat_id: int,
+        user_id: int,
+        thread_id: Optional[int] = None,
+        business_connection_id: Optional[str] = None,
+        destiny: str = DEFAULT_DESTINY,
+    ) -> FSMContext:
+        return BufferedFSMContext(
+            storage=self.storage,
+            key=StorageKey(
+                user_id=user_id,
+                chat_id=chat_id,
+                bot_id=bot.id,
+                thread_id=thread_id,
+                business_connection_id=business_connection_id,
+                destiny=destiny,
+            ),
+        )
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        bot: Bot = cast(Bot, data["bot"])
+        context = self.resolve_event_context(bot, data)
+        data["fsm_storage"] = self.storage
+        if not context:
+            return await handler(event, data)
+
+        async with self.events_isolation.lock(key=context.key):
+            data.update({"state": context, "raw_state": await context.get_state()})
+            try:
+                return await handler(event, data)
+            finally:
+                if isinstance(context, BufferedFSMContext):
+                    try:
+                        await context.flush()
+                    except Exception:
+                        logger.exception("fsm_batch: flush failed key=%s", context.key)
+                    _record(context, event)
+
+
+def _record(ctx: BufferedFSMContext, event: TelegramObject) -> None:
+    st = ctx.stats
+    TOTALS["updates"] += 1
+    TOTALS["ctx_reads"] += st.ctx_reads
+    TOTALS["ctx_writes"] += st.ctx_writes
+    TOTALS["redis_roundtrips"] += st.redis_roundtrips
+    TOTALS["redis_commands"] += st.redis_commands
+
+    if FSM_BATCH_DEBUG:
+        logger.info(
+            "fsm_batch update_id=%s user_id=%s ctx_reads=%s ctx_writes=%s redis_roundtrips=%s redis_commands=%s",
+            getattr(event, "update_id", None),
+            ctx.key.user_id,
+            st.ctx_reads,
+            st.ctx_writes,
+            st.redis_roundtrips,
+            st.redis_commands,
+        )
+
+
+def install(dp: Dispatcher) -> BufferedFSMContextMiddleware:
+    """Подменяет dp.fsm на буферизованный (порядок outer-middleware на update сохраняется)."""
+    old = dp.fsm
+    isolation = old.events_isolation
+    if isinstance(isolation, DisabledEventIsolation):
+        # буфер держится весь хендлер — без изоляции параллельные апдейты пишут поверх друг друга
+        isolation = SimpleEventIsolation()
+    new = BufferedFSMContextMiddleware(
+        storage=old.storage,
+        events_isolation=isolation,
+        strategy=old.strategy,
+    )
+
+    # у MiddlewareManager нет __setitem__ — пересобираем список, сохраняя позицию
+    manager = dp.update.outer_middleware
+    items = list(manager)
+    if old in items:
+        for m in items:
+            manager.unregister(m)
+        for m in items:
+            manager.register(new if m is old else m)
+
+    dp.fsm = new
+    return new
+
+
+def totals_snapshot() -> dict[str, int]:
+    return dict(TOTALS)
@@ -0,0 +1,198 @@
+# findex_bot/utils/geo.py
+from __future__ import annotations
+
+import logging
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from findex_bot.utils import geo_data
+from findex_bot.utils.moscow_metro import (
+    STATIONS,
+    find_location_station,
+    latin_skeleton,
+    location_station_part,
+    norm_station,
+)
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Локации алертов: точки из офлайн-справочника + сеточный индекс
+# ======================================================
+# Было: локация алерта и объявления сравнивались как строки (подстрока / общие слова),
+# станции — только по узлу пересадки; «в 3 км от Курской» не выразить.
+#
+# Стало:
+#   - resolve(text) -> Place: станция метро (через индекс moscow_metro — любые формы
+#     «Москва (Курская)», «м. kurskaya») или город из geo_data.CITIES (с алиасами «спб», «мск»);
+#     None — локации нет в справочнике, тогда алерты сравнивают текст, как раньше;
+#   - GridIndex: все точки разложены по ячейкам GRID_CELL_DEG; запрос «в радиусе R» смотрит
+#     только соседние ячейки и добивает точным расстоянием (гаверсинус);
+#   - place_matches(ad, wanted, radius_km): один узел / «Москва» для любой станции Москвы /
+#     расстояние <= радиуса. Радиус только добавляет совпадения, сужать нечего.
+# Всё строится при импорте, сеть не нужна; resolve и «соседи в радиусе» в lru_cache —
+# в рассылке по подписчикам это словарные обращения.
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = 111.2
+GRID_CELL_DEG = 0.02  # ~2.2 км по широте, ~1.3 км по долготе на широте Москвы
+MAX_RADIUS_KM = 50.0
+
+MOSCOW_KEY = "city:москва"
+
+_RADIUS_RE = re.compile(
+    r"[\s,;]*(?:\+|в радиусе|радиус|в пределах|до)?\s*(\d{1,3}(?:[.,]\d+)?)\s*(?:км|km)\.?\s*$",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class Place:
+    key: str    # "st:<станция>" / "city:<город>"
+    name: str
+    lat: float
+    lon: float
+    hub: str    # станции: "st:<узел пересадки>"; города: == key
+    city: str   # город, в котором точка (станции Москвы -> MOSCOW_KEY)
+    area: bool = False  # «Москва» целиком: своей точки для радиуса нет
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    h = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+# ---------------- grid index ----------------
+class GridIndex:
+    def __init__(self, cell_deg: float = GRID_CELL_DEG) -> None:
+        self.cell_deg = float(cell_deg)
+        self._cells: dict[tuple[int, int], list[Place]] = {}
+        self._size = 0
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def add(self, place: Place) -> None:
+        self._cells.setdefault(self._cell(place.lat, place.lon), []).append(place)
+        self._size += 1
+
+    def within(self, lat: float, lon: float, radius_km: float) -> list[Place]:
+        """Точки не дальше radius_km от (lat, lon), ближние первыми."""
+        if radius_km <= 0:
+            return []
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlon = radius_km / (KM_PER_DEG_LAT * max(0.01, math.cos(math.radians(lat))))
+        i0, j0 = self._cell(lat - dlat, lon - dlon)
+        i1, j1 = self._cell(lat + dlat, lon + dlon)
+
+        found: list[tuple[float, Place]] = []
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                for place in self._cells.get((i, j), ()):
+                    d = distance_km(lat, lon, place.lat, place.lon)
+                    if d <= radius_km:
+                        found.append((d, place))
+        found.sort(key=lambda x: x[0])
+        return [p for _d, p in found]
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def _build() -> tuple[dict[int, Place], dict[str, Place], dict[str, Place], dict[str, Place], GridIndex]:
+    coords = {norm_station(name): ll for name, ll in geo_data.METRO_COORDS.items()}
+    by_sid: dict[int, Place] = {}
+    for st in STATIONS:
+        ll = coords.get(st.key)
+        if ll is None:
+            logger.warning("geo: no coordinates for station %r", st.name)
+            continue
+        by_sid[st.sid] = Place(
+            key=f"st:{st.key}", name=st.name, lat=ll[0], lon=ll[1], hub=f"st:{st.hub}", city=MOSCOW_KEY,
+        )
+
+    moscow_towns = {norm_station(n) for n in geo_data.MOSCOW_TOWNS}
+    cities: dict[str, Place] = {}
+    city_names: dict[str, Place] = {}
+    city_latin: dict[str, Place] = {}
+    for name, lat, lon, aliases in geo_data.CITIES:
+        ckey = norm_station(name)
+        key = f"city:{ckey}"
+        place = Place(
+            key=key, name=name, lat=lat, lon=lon, hub=key,
+            city=(MOSCOW_KEY if ckey in moscow_towns else key), area=(key == MOSCOW_KEY),
+        )
+        cities[key] = place
+        for alias in (name, *aliases):
+            city_names.setdefault(norm_station(alias), place)
+            city_latin.setdefault(latin_skeleton(alias), place)
+
+    index = GridIndex()
+    for place in (*by_sid.values(), *cities.values()):
+        if not place.area:
+            index.add(place)
+    return by_sid, cities, city_names, city_latin, index
+
+
+_BY_SID, CITIES, _CITY_BY_NAME, _CITY_BY_LATIN, INDEX = _build()
+_STATION_BY_KEY: dict[str, Place] = {p.key: p for p in _BY_SID.values()}
+
+
+# ---------------- API ----------------
+@lru_cache(maxsize=8192)
+def resolve(location: str) -> Optional[Place]:
+    """Локация объявления / ключевое слово алерта -> точка справочника или None."""
+    raw = str(location or "").strip()
+    if not raw:
+        return None
+    st = find_location_station(raw)
+    if st is not None:
+        return _BY_SID.get(st.sid)
+
+    # «Москва, Зеленоград» / «москва троицк» -> населённый пункт внутри Москвы
+    key = norm_station(location_station_part(raw))
+    place = _CITY_BY_NAME.get(key)
+    if place is None and key and not re.search(r"[а-я]", key):
+        place = _CITY_BY_LATIN.get(latin_skeleton(key))
+    return place
+
+
+def split_radius(text: str) -> tuple[str, float]:
+    """«Курская 3 км» / «Химки, до 5 km» -> ("Курская", 3.0); без радиуса -> (text, 0.0)."""
+    raw = str(text or "").strip()
+    m = _RADIUS_RE.search(raw)
+    if not m or not raw[: m.start()].strip():
+        return raw, 0.0
+    return raw[: m.start()].strip(" ,;"), float(m.group(1).replace(",", "."))
+
+
+def format_radius(radius_km: float) -> str:
+    return f"{float(radius_km):g} км"
+
+
+@lru_cache(maxsize=16384)
+def nearby_keys(place_key: str, radius_km: float) -> frozenset[str]:
+    """Ключи точек в радиусе от точки справочника (сама точка — всегда внутри)."""
+    place = CITIES.get(place_key) or _STATION_BY_KEY.get(place_key)
+    if place is None:
+        return frozenset()
+    return frozenset(p.key for p in INDEX.within(place.lat, place.lon, radius_km)) | {place.key}
+
+
+def place_matches(ad: Place, wanted: Place, radius_km: float = 0.0) -> bool:
+    """
+    ad — локация объявления, wanted — из алерта:
+      - один узел (Курская = Чкаловская, Химки = Химки);
+      - алерт на «Москву» — любая станция / населённый пункт Москвы;
+      - радиус > 0 — расстояние между точками не больше радиуса.
+    """
+    if ad.hub == wanted.hub or ad.city == wanted.key:
+        return True
+    if radius_km <= 0 or ad.area or wanted.area:
+        return False
+    return wanted.key in nearby_keys(ad.key, float(radius_km))
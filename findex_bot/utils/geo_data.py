@@ -0,0 +1,331 @@
+# findex_bot/utils/geo_data.py
+from __future__ import annotations
+
+# ======================================================
+# Офлайн-справочник координат (WGS84, градусы)
+# ======================================================
+# Станции метро Москвы — по названиям из moscow_metro.METRO_LINES (одно название = одна точка,
+# пересадочные станции с одним именем на разных линиях сведены к одной координате).
+# Координаты приблизительные (порядка ±300 м): для радиусов алертов от 1 км этого достаточно.
+# Города — центр населённого пункта; алиасы сравниваются после norm_station.
+
+METRO_COORDS: dict[str, tuple[float, float]] = {
+    # 1 Сокольническая
+    "Бульвар Рокоссовского": (55.8148, 37.7342),
+    "Черкизовская": (55.8038, 37.7448),
+    "Преображенская площадь": (55.7963, 37.7150),
+    "Сокольники": (55.7893, 37.6799),
+    "Красносельская": (55.7801, 37.6661),
+    "Комсомольская": (55.7753, 37.6550),
+    "Красные ворота": (55.7685, 37.6478),
+    "Чистые пруды": (55.7649, 37.6383),
+    "Лубянка": (55.7597, 37.6257),
+    "Охотный Ряд": (55.7571, 37.6156),
+    "Библиотека им. Ленина": (55.7522, 37.6102),
+    "Кропоткинская": (55.7453, 37.6035),
+    "Парк культуры": (55.7353, 37.5931),
+    "Фрунзенская": (55.7273, 37.5804),
+    "Спортивная": (55.7226, 37.5622),
+    "Воробьёвы горы": (55.7094, 37.5574),
+    "Университет": (55.6926, 37.5343),
+    "Проспект Вернадского": (55.6766, 37.5047),
+    "Юго-Западная": (55.6637, 37.4827),
+    "Тропарёво": (55.6459, 37.4725),
+    "Румянцево": (55.6332, 37.4419),
+    "Саларьево": (55.6227, 37.4241),
+    "Филатов Луг": (55.6010, 37.4080),
+    "Прокшино": (55.5865, 37.4335),
+    "Ольховая": (55.5690, 37.4590),
+    "Коммунарка": (55.5600, 37.4690),
+    # 2 Замоскворецкая
+    "Ховрино": (55.8777, 37.4877),
+    "Беломорская": (55.8650, 37.4760),
+    "Речной вокзал": (55.8547, 37.4763),
+    "Водный стадион": (55.8400, 37.4868),
+    "Войковская": (55.8189, 37.4978),
+    "Сокол": (55.8057, 37.5149),
+    "Аэропорт": (55.8003, 37.5330),
+    "Динамо": (55.7896, 37.5582),
+    "Белорусская": (55.7774, 37.5822),
+    "Маяковская": (55.7699, 37.5958),
+    "Тверская": (55.7650, 37.6040),
+    "Театральная": (55.7589, 37.6188),
+    "Новокузнецкая": (55.7424, 37.6290),
+    "Павелецкая": (55.7300, 37.6365),
+    "Автозаводская": (55.7070, 37.6577),
+    "Технопарк": (55.6950, 37.6640),
+    "Коломенская": (55.6779, 37.6637),
+    "Каширская": (55.6552, 37.6495),
+    "Кантемировская": (55.6361, 37.6563),
+    "Царицыно": (55.6210, 37.6697),
+    "Орехово": (55.6130, 37.6950),
+    "Домодедовская": (55.6100, 37.7174),
+    "Красногвардейская": (55.6138, 37.7448),
+    "Алма-Атинская": (55.6336, 37.7656),
+    # 3 Арбатско-Покровская
+    "Щёлковская": (55.8096, 37.7983),
+    "Первомайская": (55.7945, 37.7994),
+    "Измайловская": (55.7877, 37.7795),
+    "Партизанская": (55.7884, 37.7494),
+    "Семёновская": (55.7830, 37.7193),
+    "Электрозаводская": (55.7821, 37.7053),
+    "Бауманская": (55.7724, 37.6791),
+    "Курская": (55.7586, 37.6594),
+    "Площадь Революции": (55.7567, 37.6216),
+    "Арбатская": (55.7523, 37.6035),
+    "Смоленская": (55.7477, 37.5838),
+    "Киевская": (55.7431, 37.5654),
+    "Парк Победы": (55.7362, 37.5166),
+    "Славянский бульвар": (55.7297, 37.4710),
+    "Кунцевская": (55.7307, 37.4461),
+    "Молодёжная": (55.7410, 37.4159),
+    "Крылатское": (55.7568, 37.4081),
+    "Строгино": (55.8038, 37.4030),
+    "Мякинино": (55.8234, 37.3853),
+    "Волоколамская": (55.8352, 37.3825),
+    "Митино": (55.8461, 37.3609),
+    "Пятницкое шоссе": (55.8536, 37.3531),
+    # 4 Филёвская
+    "Александровский сад": (55.7523, 37.6086),
+    "Выставочная": (55.7500, 37.5424),
+    "Международная": (55.7483, 37.5334),
+    "Студенческая": (55.7387, 37.5486),
+    "Кутузовская": (55.7405, 37.5342),
+    "Фили": (55.7460, 37.5149),
+    "Багратионовская": (55.7437, 37.4973),
+    "Филёвский парк": (55.7396, 37.4838),
+    "Пионерская": (55.7361, 37.4665),
+    # 5 Кольцевая
+    "Таганская": (55.7424, 37.6532),
+    "Добрынинская": (55.7290, 37.6225),
+    "Октябрьская": (55.7292, 37.6113),
+    "Краснопресненская": (55.7606, 37.5774),
+    "Новослободская": (55.7796, 37.6012),
+    "Проспект Мира": (55.7797, 37.6334),
+    # 6 Калужско-Рижская
+    "Медведково": (55.8881, 37.6614),
+    "Бабушкинская": (55.8697, 37.6642),
+    "Свиблово": (55.8555, 37.6532),
+    "Ботанический сад": (55.8453, 37.6381),
+    "ВДНХ": (55.8208, 37.6411),
+    "Алексеевская": (55.8078, 37.6387),
+    "Рижская": (55.7925, 37.6361),
+    "Сухаревская": (55.7723, 37.6327),
+    "Тургеневская": (55.7654, 37.6366),
+    "Китай-город": (55.7564, 37.6314),
+    "Третьяковская": (55.7407, 37.6256),
+    "Шаболовская": (55.7188, 37.6079),
+    "Ленинский проспект": (55.7070, 37.5858),
+    "Академическая": (55.6879, 37.5734),
+    "Профсоюзная": (55.6777, 37.5629),
+    "Новые Черёмушки": (55.6700, 37.5545),
+    "Калужская": (55.6567, 37.5402),
+    "Беляево": (55.6425, 37.5262),
+    "Коньково": (55.6319, 37.5193),
+    "Тёплый стан": (55.6188, 37.5060),
+    "Ясенево": (55.6061, 37.5334),
+    "Новоясеневская": (55.6019, 37.5535),
+    # 7 Таганско-Краснопресненская
+    "Планерная": (55.8600, 37.4365),
+    "Сходненская": (55.8500, 37.4398),
+    "Тушинская": (55.8256, 37.4369),
+    "Спартак": (55.8182, 37.4352),
+    "Щукинская": (55.8094, 37.4633),
+    "Октябрьское поле": (55.7937, 37.4934),
+    "Полежаевская": (55.7777, 37.5191),
+    "Беговая": (55.7735, 37.5456),
+    "Улица 1905 года": (55.7650, 37.5617),
+    "Баррикадная": (55.7607, 37.5810),
+    "Пушкинская": (55.7657, 37.6043),
+    "Кузнецкий Мост": (55.7614, 37.6243),
+    "Пролетарская": (55.7317, 37.6666),
+    "Волгоградский проспект": (55.7254, 37.6852),
+    "Текстильщики": (55.7090, 37.7318),
+    "Кузьминки": (55.7055, 37.7637),
+    "Рязанский проспект": (55.7170, 37.7935),
+    "Выхино": (55.7159, 37.8179),
+    "Лермонтовский проспект": (55.7020, 37.8510),
+    "Жулебино": (55.6847, 37.8557),
+    "Котельники": (55.6743, 37.8582),
+    # 8 Калининская
+    "Марксистская": (55.7408, 37.6560),
+    "Площадь Ильича": (55.7472, 37.6809),
+    "Авиамоторная": (55.7517, 37.7171),
+    "Шоссе Энтузиастов": (55.7580, 37.7517),
+    "Перово": (55.7511, 37.7863),
+    "Новогиреево": (55.7518, 37.8166),
+    "Новокосино": (55.7451, 37.8642),
+    # 9 Солнцевская
+    "Деловой центр": (55.7491, 37.5395),
+    "Минская": (55.7232, 37.5037),
+    "Ломоносовский проспект": (55.7053, 37.5224),
+    "Раменки": (55.6961, 37.5048),
+    "Мичуринский проспект": (55.6889, 37.4852),
+    "Озёрная": (55.6697, 37.4486),
+    "Говорово": (55.6587, 37.4172),
+    "Солнцево": (55.6491, 37.3913),
+    "Боровское шоссе": (55.6470, 37.3700),
+    "Новопеределкино": (55.6385, 37.3544),
+    "Рассказовка": (55.6325, 37.3328),
+    "Пыхтино": (55.6270, 37.2870),
+    "Аэропорт Внуково": (55.6050, 37.2870),
+    # 10 Серпуховско-Тимирязевская
+    "Алтуфьево": (55.8950, 37.5872),
+    "Бибирево": (55.8839, 37.6030),
+    "Отрадное": (55.8638, 37.6046),
+    "Владыкино": (55.8475, 37.5906),
+    "Петровско-Разумовская": (55.8366, 37.5755),
+    "Тимирязевская": (55.8187, 37.5745),
+    "Дмитровская": (55.8077, 37.5812),
+    "Савёловская": (55.7940, 37.5872),
+    "Менделеевская": (55.7820, 37.5991),
+    "Цветной бульвар": (55.7715, 37.6206),
+    "Чеховская": (55.7657, 37.6084),
+    "Боровицкая": (55.7504, 37.6093),
+    "Полянка": (55.7367, 37.6185),
+    "Серпуховская": (55.7265, 37.6249),
+    "Тульская": (55.7087, 37.6224),
+    "Нагатинская": (55.6826, 37.6209),
+    "Нагорная": (55.6729, 37.6104),
+    "Нахимовский проспект": (55.6623, 37.6053),
+    "Севастопольская": (55.6515, 37.5980),
+    "Чертановская": (55.6406, 37.6060),
+    "Южная": (55.6223, 37.6090),
+    "Пражская": (55.6117, 37.6032),
+    "Улица Академика Янгеля": (55.5958, 37.6013),
+    "Аннино": (55.5834, 37.5969),
+    "Бульвар Дмитрия Донского": (55.5690, 37.5766),
+    # 11 Люблинско-Дмитровская
+    "Физтех": (55.9300, 37.5180),
+    "Лианозово": (55.8990, 37.5420),
+    "Яхромская": (55.8880, 37.5330),
+    "Селигерская": (55.8650, 37.5500),
+    "Верхние Лихоборы": (55.8555, 37.5627),
+    "Окружная": (55.8488, 37.5711),
+    "Фонвизинская": (55.8224, 37.5880),
+    "Бутырская": (55.8134, 37.6027),
+    "Марьина Роща": (55.7937, 37.6160),
+    "Достоевская": (55.7816, 37.6140),
+    "Трубная": (55.7677, 37.6219),
+    "Сретенский бульвар": (55.7661, 37.6360),
+    "Чкаловская": (55.7559, 37.6593),
+    "Римская": (55.7467, 37.6802),
+    "Крестьянская Застава": (55.7323, 37.6652),
+    "Дубровка": (55.7181, 37.6765),
+    "Кожуховская": (55.7063, 37.6856),
+    "Печатники": (55.6929, 37.7282),
+    "Волжская": (55.6903, 37.7533),
+    "Люблино": (55.6766, 37.7618),
+    "Братиславская": (55.6589, 37.7484),
+    "Марьино": (55.6504, 37.7438),
+    "Борисово": (55.6325, 37.7433),
+    "Шипиловская": (55.6218, 37.7437),
+    "Зябликово": (55.6120, 37.7452),
+    # 12 Большая кольцевая
+    "Лефортово": (55.7640, 37.7030),
+    "Нижегородская": (55.7326, 37.7280),
+    "Нагатинский затон": (55.6840, 37.6890),
+    "Кленовый бульвар": (55.6790, 37.6700),
+    "Варшавская": (55.6533, 37.6194),
+    "Каховская": (55.6530, 37.5960),
+    "Зюзино": (55.6550, 37.5730),
+    "Воронцовская": (55.6580, 37.5390),
+    "Новаторская": (55.6700, 37.5150),
+    "Аминьевская": (55.6980, 37.4640),
+    "Давыдково": (55.7170, 37.4630),
+    "Терехово": (55.7480, 37.4620),
+    "Мнёвники": (55.7640, 37.4720),
+    "Народное Ополчение": (55.7750, 37.4850),
+    "Хорошёвская": (55.7766, 37.5197),
+    "ЦСКА": (55.7860, 37.5350),
+    "Петровский парк": (55.7920, 37.5570),
+    # 13 Бутовская
+    "Улица Старокачаловская": (55.5690, 37.5770),
+    "Лесопарковая": (55.5813, 37.5779),
+    "Битцевский парк": (55.6000, 37.5560),
+    "Улица Скобелевская": (55.5480, 37.5540),
+    "Бульвар Адмирала Ушакова": (55.5453, 37.5425),
+    "Улица Горчакова": (55.5421, 37.5320),
+    "Бунинская аллея": (55.5380, 37.5160),
+    # 14 Некрасовская
+    "Некрасовка": (55.7030, 37.9270),
+    "Лухмановская": (55.7085, 37.9010),
+    "Улица Дмитриевского": (55.7100, 37.8790),
+    "Косино": (55.7033, 37.8510),
+    "Юго-Восточная": (55.7050, 37.8180),
+    "Окская": (55.7190, 37.7820),
+    "Стахановская": (55.7270, 37.7520),
+    # 15 Троицкая
+    "ЗИЛ": (55.7020, 37.6480),
+    "Крымская": (55.6900, 37.6050),
+    "Вавиловская": (55.6745, 37.5640),
+    "Университет дружбы народов": (55.6525, 37.5040),
+    "Генерала Тюленева": (55.6390, 37.4800),
+    "Тютчевская": (55.6130, 37.4640),
+    "Корниловская": (55.5900, 37.4600),
+    "Новомосковская": (55.5480, 37.4760),
+}
+
+# (название, широта, долгота, алиасы)
+CITIES: list[tuple[str, float, float, tuple[str, ...]]] = [
+    ("Москва", 55.7558, 37.6173, ("мск", "moscow", "moskva")),
+    # Московская область / Новая Москва
+    ("Зеленоград", 55.9825, 37.1814, ()),
+    ("Химки", 55.8970, 37.4297, ()),
+    ("Долгопрудный", 55.9386, 37.5201, ()),
+    ("Лобня", 56.0130, 37.4833, ()),
+    ("Мытищи", 55.9116, 37.7308, ()),
+    ("Королёв", 55.9162, 37.8545, ()),
+    ("Пушкино", 56.0104, 37.8471, ()),
+    ("Щёлково", 55.9220, 37.9975, ()),
+    ("Балашиха", 55.7963, 37.9382, ()),
+    ("Реутов", 55.7609, 37.8575, ()),
+    ("Люберцы", 55.6766, 37.8981, ()),
+    ("Котельники", 55.6600, 37.8640, ()),
+    ("Дзержинский", 55.6300, 37.8500, ()),
+    ("Видное", 55.5516, 37.7085, ()),
+    ("Домодедово", 55.4363, 37.7664, ()),
+    ("Подольск", 55.4312, 37.5449, ()),
+    ("Троицк", 55.4848, 37.3055, ()),
+    ("Московский", 55.6000, 37.3550, ()),
+    ("Одинцово", 55.6789, 37.2637, ()),
+    ("Красногорск", 55.8204, 37.3302, ()),
+    ("Жуковский", 55.5995, 38.1166, ()),
+    ("Раменское", 55.5670, 38.2303, ()),
+    ("Электросталь", 55.7842, 38.4448, ()),
+    ("Ногинск", 55.8686, 38.4418, ()),
+    ("Сергиев Посад", 56.3153, 38.1358, ()),
+    ("Наро-Фоминск", 55.3860, 36.7333, ()),
+    ("Серпухов", 54.9158, 37.4111, ()),
+    ("Коломна", 55.1025, 38.7531, ()),
+    # крупные города
+    ("Санкт-Петербург", 59.9386, 30.3141, ("спб", "питер", "петербург", "saint petersburg", "spb")),
+    ("Казань", 55.7963, 49.1088, ()),
+    ("Нижний Новгород", 56.2965, 43.9361, ("нн",)),
+    ("Екатеринбург", 56.8389, 60.6057, ("екб",)),
+    ("Новосибирск", 55.0084, 82.9357, ("нск",)),
+    ("Краснодар", 45.0355, 38.9753, ()),
+    ("Сочи", 43.5855, 39.7231, ()),
+    ("Ростов-на-Дону", 47.2357, 39.7015, ("ростов",)),
+    ("Самара", 53.1959, 50.1002, ()),
+    ("Воронеж", 51.6720, 39.1843, ()),
+    ("Тверь", 56.8587, 35.9176, ()),
+    ("Тула", 54.1961, 37.6182, ()),
+    ("Калуга", 54.5138, 36.2612, ()),
+    ("Рязань", 54.6269, 39.6916, ()),
+    ("Владимир", 56.1291, 40.4066, ()),
+    ("Ярославль", 57.6261, 39.8845, ()),
+    ("Пермь", 58.0105, 56.2502, ()),
+    ("Уфа", 54.7388, 55.9721, ()),
+    ("Челябинск", 55.1644, 61.4368, ()),
+    ("Омск", 54.9885, 73.3242, ()),
+    ("Красноярск", 56.0153, 92.8932, ()),
+    ("Волгоград", 48.7080, 44.5133, ()),
+    ("Минск", 53.9006, 27.5590, ()),
+    ("Алматы", 43.2389, 76.8897, ()),
+    ("Ташкент", 41.2995, 69.2401, ()),
+    ("Бишкек", 42.8746, 74.5698, ()),
+]
+
+# населённые пункты в границах Москвы: для «Москва» без радиуса — как любая станция
+MOSCOW_TOWNS: tuple[str, ...] = ("Зеленоград", "Троицк", "Московский")
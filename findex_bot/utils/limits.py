@@ -0,0 +1,259 @@
+# findex_bot/utils/limits.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Any, Optional
+from zoneinfo import ZoneInfo
+
+import findex_bot.runtime as runtime
+from findex_bot.db.db import get_sessionmaker
+from findex_bot.db import daily_limits as db_limits
+from findex_bot.utils.ui_utils import DAILY_FREE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Дневные лимиты: единый сервис для публикаций и откликов
+# ======================================================
+# Горячий путь — Redis (атомарный Lua check-and-increment, TTL до конца дня).
+# Postgres — durable копия: пишем асинхронно (write-through), читаем только
+# для "прогрева" ключа, если его нет в Redis (рестарт / flush / первый вызов за день).
+# Без Redis — атомарный upsert прямо в Postgres.
+
+RESPOND_DAILY_LIMIT = 12
+RESPOND_DAILY_TZ = os.getenv("RESPOND_DAILY_TZ", "Europe/Moscow")
+
+
+def _respond_tz() -> tzinfo:
+    try:
+        return ZoneInfo(RESPOND_DAILY_TZ)
+    except Exception:
+        logger.exception("invalid RESPOND_DAILY_TZ=%s, fallback to Europe/Moscow", RESPOND_DAILY_TZ)
+        return ZoneInfo("Europe/Moscow")
+
+
+@dataclass(frozen=True)
+class LimitKind:
+    code: str
+    limit: int
+    key_template: str   # {user_id} {day}
+    day_fmt: str
+    tz: tzinfo
+    table: db_limits.CounterTable
+
+
+# публикации: сутки по UTC (как и раньше в daily_pub_limits)
+PUB = LimitKind(
+    code="pub",
+    limit=int(DAILY_FREE_LIMIT),
+    key_template="pub:daily:{user_id}:{day}",
+    day_fmt="%Y%m%d",
+    tz=timezone.utc,
+    table=db_limits.PUB_TABLE,
+)
+
+# отклики: сутки по RESPOND_DAILY_TZ, ключ совместим со старым respond:daily:*
+RESPOND = LimitKind(
+    code="respond",
+    limit=int(RESPOND_DAILY_LIMIT),
+    key_template="respond:daily:{user_id}:{day}",
+    day_fmt="%Y%m%d",
+    tz=_respond_tz(),
+    table=db_limits.RESPOND_TABLE,
+)
+
+# -2 — ключа нет (нужно прогреть из Postgres), -1 — лимит исчерпан, иначе новое значение
+_CONSUME_LUA = r"""
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+
+local v = redis.call("GET", key)
+if not v then
+  return -2
+end
+
+local n = tonumber(v) or 0
+if n >= limit then
+  return -1
+end
+
+n = redis.call("INCR", key)
+if redis.call("TTL", key) < 0 then
+  redis.call("EXPIRE", key, ttl)
+end
+return n
+"""
+
+# DECR не уходит ниже нуля
+_RELEASE_LUA = r"""
+local key = KEYS[1]
+local v = tonumber(redis.call("GET", key) or "0") or 0
+if v <= 0 then
+  return 0
+end
+return redis.call("DECR", key)
+"""
+
+# держим ссылки на фоновые write-through задачи, иначе их может собрать GC
+_PERSIST_TASKS: set[asyncio.Task] = set()
+
+
+def _get_redis() -> Any:
+    return getattr(runtime, "REDIS", None)
+
+
+def day_bucket(kind: LimitKind, now: datetime | None = None) -> tuple[date, str, int]:
+    """(день, redis-ключ дня, ttl до конца дня + 1ч запаса)."""
+    now_local = (now or datetime.now(timezone.utc)).astimezone(kind.tz)
+    next_midnight = (now_local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    ttl = int((next_midnight - now_local).total_seconds())
+    if ttl <= 0:
+        ttl = 60
+    return now_local.date(), now_local.strftime(kind.day_fmt), ttl + 3600
+
+
+def redis_key(kind: LimitKind, user_id: int, now: datetime | None = None) -> str:
+    _day, day_key, _ttl = day_bucket(kind, now)
+    return kind.key_template.format(user_id=int(user_id), day=day_key)
+
+
+def remaining(kind: LimitKind, used: int) -> int:
+    return max(0, int(kind.limit) - int(used or 0))
+
+
+async def _db_get(kind: LimitKind, user_id: int, day: date) -> int:
+    async with get_sessionmaker()() as session:
+        return await db_limits.get_count(session, int(user_id), day, table=kind.table)
+
+
+async def _persist(kind: LimitKind, user_id: int, day: date, value: int, *, monotonic: bool) -> None:
+    try:
+        async with get_sessionmaker()() as session:
+            await db_limits.store_value(
+                session,
+                int(user_id),
+                day,
+                int(value),
+                table=kind.table,
+                monotonic=monotonic,
+            )
+            await session.commit()
+    except Exception:
+        logger.exception("limits write-through failed kind=%s user_id=%s day=%s", kind.code, user_id, day)
+
+
+def _persist_later(kind: LimitKind, user_id: int, day: date, value: int, *, monotonic: bool = True) -> None:
+    task = asyncio.create_task(_persist(kind, user_id, day, value, monotonic=monotonic))
+    _PERSIST_TASKS.add(task)
+    task.add_done_callback(_PERSIST_TASKS.discard)
+
+
+async def _warm_key(r: Any, kind: LimitKind, user_id: int, day: date, key: str, ttl: int) -> None:
+    seed = await _db_get(kind, int(user_id), day)
+    await r.set(key, int(seed), nx=True, ex=int(ttl))
+
+
+async def get_used(kind: LimitKind, user_id: int) -> int:
+    day, _day_key, ttl = day_bucket(kind)
+    key = redis_key(kind, user_id)
+
+    r = _get_redis()
+    if r is not None:
+        try:
+            raw = await r.get(key)
+            if raw is not None:
+                return int(raw or 0)
+            await _warm_key(r, kind, int(user_id), day, key, ttl)
+            return int(await r.get(key) or 0)
+        except Exception:
+            logger.exception("limits redis get failed kind=%s user_id=%s -> postgres", kind.code, user_id)
+
+    try:
+        return await _db_get(kind, int(user_id), day)
+    except Exception:
+        logger.exception("limits postgres get failed kind=%s user_id=%s", kind.code, user_id)
+        return 0
+
+
+async def try_consume(kind: LimitKind, user_id: int) -> tuple[bool, int]:
+    """
+    Атомарно: если used < limit — used += 1.
+    Возвращает (allowed, used_after); при отказе used_after = limit.
+    """
+    day, _day_key, ttl = day_bucket(kind)
+    key = redis_key(kind, user_id)
+
+    r = _get_redis()
+    if r is not None:
+        try:
+            n = int(await r.eval(_CONSUME_LUA, 1, key, str(kind.limit), str(ttl)))
+            if n == -2:
+                await _warm_key(r, kind, int(user_id), day, key, ttl)
+                n = int(await r.eval(_CONSUME_LUA, 1, key, str(kind.limit), str(ttl)))
+
+            if n == -1:
+                return False, int(kind.limit)
+            if n > 0:
+                _persist_later(kind, int(user_id), day, n)
+                return True, n
+        except Exception:
+            logger.exception("limits redis consume failed kind=%s user_id=%s -> postgres", kind.code, user_id)
+
+    async with get_sessionmaker()() as session:
+        n2 = await db_limits.inc_if_below(session, int(user_id), int(kind.limit), day, table=kind.table)
+        await session.commit()
+
+    if n2 is None:
+        return False, int(kind.limit)
+    return True, int(n2)
+
+
+async def release(kind: LimitKind, user_id: int) -> None:
+    """Откат try_consume (например, публикация в канал не удалась)."""
+    day, _day_key, _ttl = day_bucket(kind)
+    key = redis_key(kind, user_id)
+
+    r = _get_redis()
+    if r is not None:
+        try:
+            n = int(await r.eval(_RELEASE_LUA, 1, key))
+            _persist_later(kind, int(user_id), day, n, monotonic=False)
+            return
+        except Exception:
+            logger.exception("limits redis release failed kind=%s user_id=%s -> postgres", kind.code, user_id)
+
+    try:
+        used = await _db_get(kind, int(user_id), day)
+        await _persist(kind, int(user_id), day, max(0, used - 1), monotonic=False)
+    except Exception:
+        logger.exception("limits postgres release failed kind=%s user_id=%s", kind.code, user_id)
+
+
+async def get_used_pub(user_id: int) -> int:
+    return await get_used(PUB, user_id)
+
+
+async def get_used_respond(user_id: int) -> int:
+    return await get_used(RESPOND, user_id)
+
+
+def seconds_to_reset(kind: LimitKind, now: datetime | None = None) -> int:
+    _day, _day_key, ttl = day_bucket(kind, now)
+    return max(0, ttl - 3600)
+
+
+def pending_writes() -> int:
+    return len(_PERSIST_TASKS)
+
+
+async def flush_pending_writes(timeout: float = 5.0) -> None:
+    tasks = list(_PERSIST_TASKS)
+    if not tasks:
+        return
+    with_timeout: Optional[float] = float(timeout) if timeout else None
+    await asyncio.wait(tasks, timeout=with_timeout)
@@ -0,0 +1,525 @@
+# findex_bot/utils/metrics.py
+from __future__ import annotations
+
+import bisect
+import contextvars
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Инструментация апдейтов: latency хендлера + SQL / Redis / Telegram вызовы
+# ======================================================
+# UpdateInstrumentationMiddleware (первый outer-middleware на update) кладёт в
+# contextvar UpdateStats, коллекторы дописывают туда свои вызовы:
+#   SQL      — события SQLAlchemy before/after_cursor_execute (instrument_engine)
+#   Redis    — обёртка execute_command / pipeline().execute клиента (instrument_redis)
+#   Telegram — request-middleware сессии бота (TelegramCallsMiddleware)
+# Имя хендлера ставит HandlerNameMiddleware (inner, там уже известен HandlerObject).
+#
+# По завершении апдейта всё сводится в гистограммы процесса:
+#   GET /metrics (Prometheus text format) — webhook-воркер и polling (METRICS_PORT)
+#   /sys_top — топ хендлеров и последние медленные апдейты с разбивкой вызовов.
+# Вызовы вне апдейта (фоновые задачи) попадают только в общие счётчики.
+
+SLOW_UPDATE_MS = int(os.getenv("SLOW_UPDATE_MS", "1500"))
+SLOW_SAMPLES_MAX = 50
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # polling: 0 — без HTTP
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+KINDS = ("sql", "redis", "tg")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALLS_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+HANDLER_UNMATCHED = "-"
+
+
+@dataclass
+class CallStat:
+    count: int = 0
+    seconds: float = 0.0
+
+    def add(self, seconds: float, n: int = 1) -> None:
+        self.count += n
+        self.seconds += seconds
+
+
+@dataclass
+class UpdateStats:
+    event_type: str = "-"
+    handler: str = HANDLER_UNMATCHED
+    started: float = field(default_factory=time.perf_counter)
+    calls: Dict[str, CallStat] = field(default_factory=lambda: {k: CallStat() for k in KINDS})
+    # разбивка для медленных апдейтов: "tg:sendMessage" / "redis:GET" / "sql:SELECT"
+    breakdown: Dict[str, CallStat] = field(default_factory=dict)
+    finished: bool = False
+
+    def add(self, kind: str, name: str, seconds: float, n: int = 1) -> None:
+        if self.finished:
+            return
+        self.calls[kind].add(seconds, n)
+        self.breakdown.setdefault(f"{kind}:{name}", CallStat()).add(seconds, n)
+
+
+_CURRENT: contextvars.ContextVar[Optional[UpdateStats]] = contextvars.ContextVar("findex_update_stats", default=None)
+
+
+def current() -> Optional[UpdateStats]:
+    return _CURRENT.get()
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последний — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка по верхней границе бакета (для /sys_top хватает)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+@dataclass
+class HandlerAgg:
+    latency: Histogram = field(default_factory=lambda: Histogram(LATENCY_BUCKETS))
+    calls: Dict[str, Histogram] = field(default_factory=lambda: {k: Histogram(CALLS_BUCKETS) for k in KINDS})
+    call_seconds: Dict[str, float] = field(default_factory=lambda: {k: 0.0 for k in KINDS})
+
+
+# -------- агрегаты процесса --------
+HANDLERS: Dict[str, HandlerAgg] = {}
+TOTAL_CALLS: Dict[str, CallStat] = {k: CallStat() for k in KINDS}
+TG_METHODS: Dict[str, CallStat] = {}
+TG_ERRORS: Dict[str, Dict[str, int]] = {}  # method -> {exception class: n}
+SLOW_SAMPLES: Deque[dict[str, Any]] = deque(maxlen=SLOW_SAMPLES_MAX)
+SLOW_TOTAL = 0
+
+
+def _record_call(kind: str, name: str, seconds: float, n: int = 1) -> None:
+    TOTAL_CALLS[kind].add(seconds, n)
+    if kind == "tg":
+        TG_METHODS.setdefault(name, CallStat()).add(seconds, n)
+    st = _CURRENT.get()
+    if st is not None:
+        st.add(kind, name, seconds, n)
+
+
+def finish(st: UpdateStats) -> float:
+    global SLOW_TOTAL
+
+    st.finished = True
+    elapsed = time.perf_counter() - st.started
+
+    agg = HANDLERS.get(st.handler)
+    if agg is None:
+        agg = HANDLERS[st.handler] = HandlerAgg()
+    agg.latency.observe(elapsed)
+    for kind in KINDS:
+        agg.calls[kind].observe(st.calls[kind].count)
+        agg.call_seconds[kind] += st.calls[kind].seconds
+
+    if elapsed * 1000 >= SLOW_UPDATE_MS:
+        SLOW_TOTAL += 1
+        top = sorted(st.breakdown.items(), key=lambda kv: kv[1].seconds, reverse=True)[:8]
+        sample = {
+            "ts": int(time.time()),
+            "handler": st.handler,
+            "event_type": st.event_type,
+            "ms": int(elapsed * 1000),
+            "calls": {k: (st.calls[k].count, int(st.calls[k].seconds * 1000)) for k in KINDS},
+            "top": [(name, c.count, int(c.seconds * 1000)) for name, c in top],
+        }
+        SLOW_SAMPLES.append(sample)
+        logger.warning(
+            "slow update handler=%s type=%s ms=%s sql=%s redis=%s tg=%s top=%s",
+            st.handler,
+            st.event_type,
+            sample["ms"],
+            sample["calls"]["sql"],
+            sample["calls"]["redis"],
+            sample["calls"]["tg"],
+            sample["top"],
+        )
+    return elapsed
+
+
+# ======================================================
+# Middlewares
+# ======================================================
+def _event_type(update: Any) -> str:
+    t = getattr(update, "event_type", None)
+    if t:
+        return str(t)
+    return "-"
+
+
+class UpdateInstrumentationMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        st = UpdateStats(event_type=_event_type(event))
+        token = _CURRENT.set(st)
+        try:
+            return await handler(event, data)
+        finally:
+            _CURRENT.reset(token)
+            try:
+                finish(st)
+            except Exception:
+                logger.exception("metrics: finish failed")
+
+
+def handler_name(handler_obj: Any) -> str:
+    cb = getattr(handler_obj, "callback", None)
+    if cb is None:
+        return HANDLER_UNMATCHED
+    mod = str(getattr(cb, "__module__", "") or "").rsplit(".", 1)[-1]
+    name = getattr(cb, "__qualname__", None) or getattr(cb, "__name__", None) or type(cb).__name__
+    return f"{mod}.{name}" if mod else str(name)
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        st = _CURRENT.get()
+        if st is not None:
+            st.handler = handler_name(data.get("handler"))
+        return await handler(event, data)
+
+
+class TelegramCallsMiddleware(BaseRequestMiddleware):
+    """Каждый реальный запрос к Bot API (ретраи RetryAfter считаются отдельно)."""
+
+    async def __call__(self, make_request, bot, method):  # type: ignore[override]
+        name = type(method).__name__
+        t0 = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            errs = TG_ERRORS.setdefault(name, {})
+            errs[type(e).__name__] = errs.get(type(e).__name__, 0) + 1
+            raise
+        finally:
+            _record_call("tg", name, time.perf_counter() - t0)
+
+
+# ======================================================
+# Коллекторы SQL / Redis
+# ======================================================
+_INSTRUMENTED_ENGINES: set[int] = set()
+
+
+def _sql_verb(statement: Any) -> str:
+    s = str(statement or "").lstrip()
+    return (s.split(None, 1)[0].upper() if s else "-")[:16]
+
+
+def instrument_engine(engine: Any) -> None:
+    """SQLAlchemy events на sync_engine (для AsyncEngine)."""
+    from sqlalchemy import event as sa_event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if id(sync_engine) in _INSTRUMENTED_ENGINES:
+        return
+    _INSTRUMENTED_ENGINES.add(id(sync_engine))
+
+    @sa_event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        conn.info.setdefault("_metrics_t0", []).append(time.perf_counter())
+
+    @sa_event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        stack = conn.info.get("_metrics_t0")
+        if not stack:
+            return
+        _record_call("sql", _sql_verb(statement), time.perf_counter() - stack.pop())
+
+    @sa_event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):  # noqa: ANN001
+        conn = getattr(exception_context, "connection", None)
+        stack = conn.info.get("_metrics_t0") if conn is not None else None
+        if stack:
+            _record_call("sql", "ERROR", time.perf_counter() - stack.pop())
+
+
+def instrument_redis(client: Any) -> Any:
+    """
+    Оборачивает execute_command и pipeline().execute у конкретного redis.asyncio клиента.
+    Pipeline считается одним round-trip (name=PIPELINE) с n командами.
+    """
+    if client is None or getattr(client, "_findex_metrics", False):
+        return client
+
+    orig_execute = client.execute_command
+    orig_pipeline = client.pipeline
+
+    async def execute_command(*args: Any, **kwargs: Any) -> Any:
+        t0 = time.perf_counter()
+        try:
+            return await orig_execute(*args, **kwargs)
+        finally:
+            name = str(args[0]).upper() if args else "-"
+            _record_call("redis", name, time.perf_counter() - t0)
+
+    def pipeline(*args: Any, **kwargs: Any) -> Any:
+        pipe = orig_pipeline(*args, **kwargs)
+        orig_pipe_execute = pipe.execute
+
+        async def execute(*a: Any, **kw: Any) -> Any:
+            n = len(getattr(pipe, "command_stack", ()) or ())
+            t0 = time.perf_counter()
+            try:
+                return await orig_pipe_execute(*a, **kw)
+            finally:
+                _record_call("redis", "PIPELINE", time.perf_counter() - t0, max(1, n))
+
+        pipe.execute = execute
+        return pipe
+
+    client.execute_command = execute_command
+    client.pipeline = pipeline
+    client._findex_metrics = True
+    return client
+
+
+# ======================================================
+# Установка
+# ======================================================
+def install(dp: Dispatcher) -> None:
+    """Instrumentation — самым первым outer-middleware на update (FSM/Redis внутри него тоже считаются)."""
+    mw = UpdateInstrumentationMiddleware()
+    manager = dp.update.outer_middleware
+    items = list(manager)
+    for m in items:
+        manager.unregister(m)
+    manager.register(mw)
+    for m in items:
+        manager.register(m)
+
+    names = HandlerNameMiddleware()
+    for event_name, observer in dp.observers.items():
+        if event_name in ("update", "error"):
+            continue
+        observer.middleware(names)
+
+    try:
+        from findex_bot.db.db import get_engine
+
+        instrument_engine(get_engine())
+    except Exception:
+        logger.exception("metrics: sqlalchemy instrumentation failed")
+
+
+# ======================================================
+# Экспорт
+# ======================================================
+def _esc(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _fmt_le(b: float) -> str:
+    return "+Inf" if b == float("inf") else repr(float(b))
+
+
+def _render_hist(lines: list[str], name: str, labels: str, h: Histogram) -> None:
+    acc = 0
+    for i, b in enumerate(list(h.buckets) + [float("inf")]):
+        acc += h.counts[i]
+        sep = "," if labels else ""
+        lines.append(f'{name}_bucket{{{labels}{sep}le="{_fmt_le(b)}"}} {acc}')
+    lbl = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{lbl} {h.sum:.6f}")
+    lines.append(f"{name}_count{lbl} {h.count}")
+
+
+def render_prometheus() -> str:
+    lines: list[str] = []
+
+    lines.append("# HELP findex_update_duration_seconds Update handling latency by handler")
+    lines.append("# TYPE findex_update_duration_seconds histogram")
+    for handler, agg in sorted(HANDLERS.items()):
+        _render_hist(lines, "findex_update_duration_seconds", f'handler="{_esc(handler)}"', agg.latency)
+
+    lines.append("# HELP findex_update_calls Calls per update by handler and kind (sql/redis/tg)")
+    lines.append("# TYPE findex_update_calls histogram")
+    for handler, agg in sorted(HANDLERS.items()):
+        for kind in KINDS:
+            _render_hist(lines, "findex_update_calls", f'handler="{_esc(handler)}",kind="{kind}"', agg.calls[kind])
+
+    lines.append("# HELP findex_update_call_seconds_total Time spent in calls during updates")
+    lines.append("# TYPE findex_update_call_seconds_total counter")
+    for handler, agg in sorted(HANDLERS.items()):
+        for kind in KINDS:
+            lines.append(
+                f'findex_update_call_seconds_total{{handler="{_esc(handler)}",kind="{kind}"}} {agg.call_seconds[kind]:.6f}'
+            )
+
+    lines.append("# HELP findex_calls_total All calls of the process (incl. background tasks)")
+    lines.append("# TYPE findex_calls_total counter")
+    for kind in KINDS:
+        lines.append(f'findex_calls_total{{kind="{kind}"}} {TOTAL_CALLS[kind].count}')
+    lines.append("# TYPE findex_call_seconds_total counter")
+    for kind in KINDS:
+        lines.append(f'findex_call_seconds_total{{kind="{kind}"}} {TOTAL_CALLS[kind].seconds:.6f}')
+
+    lines.append("# HELP findex_telegram_requests_total Telegram Bot API requests by method")
+    lines.append("# TYPE findex_telegram_requests_total counter")
+    for method, c in sorted(TG_METHODS.items()):
+        lines.append(f'findex_telegram_requests_total{{method="{_esc(method)}"}} {c.count}')
+    lines.append("# TYPE findex_telegram_request_seconds_total counter")
+    for method, c in sorted(TG_METHODS.items()):
+        lines.append(f'findex_telegram_request_seconds_total{{method="{_esc(method)}"}} {c.seconds:.6f}')
+    lines.append("# HELP findex_telegram_errors_total Telegram Bot API errors by method and exception")
+    lines.append("# TYPE findex_telegram_errors_total counter")
+    for method, errs in sorted(TG_ERRORS.items()):
+        for err, n in sorted(errs.items()):
+            lines.append(f'findex_telegram_errors_total{{method="{_esc(method)}",error="{_esc(err)}"}} {n}')
+
+    lines.append("# TYPE findex_slow_updates_total counter")
+    lines.append(f"findex_slow_updates_total {SLOW_TOTAL}")
+
+    try:
+        from findex_bot.utils import fsm_batch
+
+        lines.append("# HELP findex_fsm_ops_total FSM context operations and their Redis cost")
+        lines.append("# TYPE findex_fsm_ops_total counter")
+        for k, v in sorted(fsm_batch.totals_snapshot().items()):
+            lines.append(f'findex_fsm_ops_total{{op="{k}"}} {v}')
+    except Exception:
+        logger.exception("metrics: fsm totals failed")
+
+    try:
+        from findex_bot.utils import scheduler
+
+        lines.append("# HELP findex_delayed_actions_total Delayed actions (ephemeral message deletions)")
+        lines.append("# TYPE findex_delayed_actions_total counter")
+        for k, v in sorted(scheduler.totals_snapshot().items()):
+            lines.append(f'findex_delayed_actions_total{{op="{k}"}} {v}')
+    except Exception:
+        logger.exception("metrics: scheduler totals failed")
+
+    try:
+        from findex_bot.utils import publish_queue
+
+        lines.append("# HELP findex_publish_queue_total Channel publish queue jobs by outcome")
+        lines.append("# TYPE findex_publish_queue_total counter")
+        for k, v in sorted(publish_queue.totals_snapshot().items()):
+            lines.append(f'findex_publish_queue_total{{op="{k}"}} {v}')
+        lines.append("# TYPE findex_publish_queue_depth gauge")
+        lines.append(f"findex_publish_queue_depth {publish_queue.depth()}")
+    except Exception:
+        logger.exception("metrics: publish queue totals failed")
+
+    try:
+        from findex_bot.utils import ad_render
+
+        lines.append("# HELP findex_ad_render_total Ad text render cache lookups")
+        lines.append("# TYPE findex_ad_render_total counter")
+        for k, v in sorted(ad_render.totals_snapshot().items()):
+            lines.append(f'findex_ad_render_total{{op="{k}"}} {v}')
+        lines.append("# TYPE findex_ad_render_cache_size gauge")
+        lines.append(f"findex_ad_render_cache_size {ad_render.cache_size()}")
+    except Exception:
+        logger.exception("metrics: ad render totals failed")
+
+    try:
+        from findex_bot.utils import share_cache
+
+        lines.append("# HELP findex_inline_queries_total Inline queries by kind (rate() = inline QPS)")
+        lines.append("# TYPE findex_inline_queries_total counter")
+        for k, v in sorted(share_cache.queries_snapshot().items()):
+            lines.append(f'findex_inline_queries_total{{kind="{k}"}} {v}')
+        lines.append("# HELP findex_inline_share_cache_total Inline share card cache lookups")
+        lines.append("# TYPE findex_inline_share_cache_total counter")
+        for k, v in sorted(share_cache.totals_snapshot().items()):
+            lines.append(f'findex_inline_share_cache_total{{op="{k}"}} {v}')
+    except Exception:
+        logger.exception("metrics: inline share totals failed")
+
+    try:
+        from findex_bot.utils import redis_conn
+
+        mgr = redis_conn.get_manager()
+        if mgr is not None:
+            mgr.render_prometheus(lines)
+    except Exception:
+        logger.exception("metrics: redis pool metrics failed")
+
+    return "\n".join(lines) + "\n"
+
+
+def top_handlers(limit: int = 10) -> list[dict[str, Any]]:
+    """Хендлеры по суммарному времени (avg * count) — что реально ест процесс."""
+    rows = []
+    for handler, agg in HANDLERS.items():
+        n = agg.latency.count
+        if n == 0:
+            continue
+        p95 = agg.latency.quantile(0.95)
+        rows.append({
+            "handler": handler,
+            "count": n,
+            "avg_ms": int(agg.latency.sum / n * 1000),
+            "p95_ms": int(p95 * 1000) if p95 != float("inf") else -1,  # -1: > последнего бакета
+            "total_s": agg.latency.sum,
+            "sql": round(agg.calls["sql"].sum / n, 1),
+            "redis": round(agg.calls["redis"].sum / n, 1),
+            "tg": round(agg.calls["tg"].sum / n, 1),
+        })
+    rows.sort(key=lambda r: r["total_s"], reverse=True)
+    return rows[:limit]
+
+
+def slow_samples(limit: int = 5) -> list[dict[str, Any]]:
+    return list(SLOW_SAMPLES)[-limit:][::-1]
+
+
+async def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> Any:
+    """Отдельный HTTP только под /metrics (polling-режим). Возвращает AppRunner или None."""
+    if not port:
+        return None
+    from aiohttp import web
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=int(port)).start()
+    logger.info("✅ metrics on http://%s:%s/metrics", host, port)
+    return runner
+
+
+async def metrics_handler(_request: Any) -> Any:
+    from aiohttp import web
+
+    return web.Response(text=render_prometheus(), content_type="text/plain", charset="utf-8")
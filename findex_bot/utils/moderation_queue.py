@@ -0,0 +1,252 @@
+# findex_bot/utils/moderation_queue.py
+from __future__ import annotations
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from sqlalchemy import func, select, tuple_
+
+from findex_bot.db.db import get_sessionmaker
+from findex_bot.db.models import Ad
+from findex_bot.utils import publish_queue
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Очередь модерации (/намодерации)
+# ======================================================
+# Было: COUNT(*) + OFFSET page*10 на каждое листание, строки очереди рендерились заново.
+#
+# Стало:
+#   - keyset по (updated_at, id) — индекс ix_ads_pending_updated (status = 'pending');
+#     курсор страницы = ключ последней (next) / первой (prev) строки, в callback_data;
+#   - вперёд читаем сразу PAGE_SIZE * (1 + PREFETCH_PAGES) строк: следующие страницы
+#     уже отрендерены и лежат в кэше процесса (TTL QUEUE_CACHE_TTL_SEC), листание их не читает из БД;
+#   - объявления, уже одобренные/отклонённые в этом процессе или стоящие в очереди публикации,
+#     из показа выкидываются сразу (forget / publish_queue.queued_among — маркеры в Redis,
+#     видны всем процессам), без сброса кэша.
+# Кэш — только ускорение: в другом процессе (webhook-воркеры) страница устареет не дольше TTL,
+# а открытие карточки всё равно проверяет status = 'pending'.
+
+PAGE_SIZE = 10
+PREFETCH_PAGES = max(0, int(os.getenv("MOD_QUEUE_PREFETCH_PAGES", "2")))
+QUEUE_CACHE_TTL_SEC = float(os.getenv("MOD_QUEUE_CACHE_TTL_SEC", "20"))
+
+_FIRST = ""  # ключ кэша первой страницы
+
+
+@dataclass(frozen=True)
+class QueueItem:
+    ad_id: int
+    updated_at: datetime
+    row: str  # готовая строка списка "#id · role · title · location"
+
+
+@dataclass(frozen=True)
+class QueuePage:
+    items: list[QueueItem]
+    total: int
+    prev_cursor: Optional[str]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(updated_at: datetime, ad_id: int) -> str:
+    """(updated_at, id) -> "<unix микросекунды>.<id>" (коротко: влезает в callback_data)."""
+    ts = updated_at if updated_at.tzinfo else updated_at.replace(tzinfo=timezone.utc)
+    us = int(ts.timestamp()) * 1_000_000 + ts.microsecond
+    return f"{us}.{int(ad_id)}"
+
+
+def decode_cursor(raw: Optional[str]) -> Optional[tuple[datetime, int]]:
+    try:
+        us_raw, id_raw = str(raw or "").split(".", 1)
+        us = int(us_raw)
+        ts = datetime.fromtimestamp(us // 1_000_000, tz=timezone.utc).replace(microsecond=us % 1_000_000)
+        return ts, int(id_raw)
+    except Exception:
+        return None
+
+
+def _payload_value(payload: dict[str, Any] | None, *keys: str) -> str:
+    p = payload or {}
+    for key in keys:
+        val = p.get(key)
+        if val is None:
+            continue
+        s = str(val).strip()
+        if s:
+            return s
+    return ""
+
+
+def render_row(ad: Any) -> str:
+    payload = getattr(ad, "payload", None) or {}
+    title = _payload_value(payload, "title", "position", "job_title") or "Без названия"
+    location = _payload_value(payload, "location", "city", "metro")
+    role = str(getattr(ad, "role", "") or "").strip() or "—"
+
+    row = f"#{int(ad.id)} · {role} · {title}"
+    if location:
+        row += f" · {location}"
+    return row
+
+
+def _item(ad: Any) -> QueueItem:
+    return QueueItem(ad_id=int(ad.id), updated_at=ad.updated_at, row=render_row(ad))
+
+
+def _key_of(item: QueueItem) -> str:
+    return encode_cursor(item.updated_at, item.ad_id)
+
+
+# ---------------- SQL ----------------
+_KEY = tuple_(Ad.updated_at, Ad.id)
+
+
+def pending_after_stmt(after: Optional[tuple[datetime, int]], limit: int):
+    stmt = select(Ad).where(Ad.status == "pending")
+    if after is not None:
+        stmt = stmt.where(_KEY > tuple_(*after))
+    return stmt.order_by(Ad.updated_at.asc(), Ad.id.asc()).limit(int(limit))
+
+
+def pending_before_stmt(before: tuple[datetime, int], limit: int):
+    return (
+        select(Ad)
+        .where(Ad.status == "pending", _KEY < tuple_(*before))
+        .order_by(Ad.updated_at.desc(), Ad.id.desc())
+        .limit(int(limit))
+    )
+
+
+def pending_count_stmt():
+    return select(func.count()).select_from(Ad).where(Ad.status == "pending")
+
+
+# ---------------- service ----------------
+class ModerationQueue:
+    def __init__(
+        self,
+        *,
+        page_size: int = PAGE_SIZE,
+        prefetch_pages: int = PREFETCH_PAGES,
+        ttl_sec: float = QUEUE_CACHE_TTL_SEC,
+    ) -> None:
+        self.page_size = max(1, int(page_size))
+        self.prefetch_pages = max(0, int(prefetch_pages))
+        self.ttl_sec = float(ttl_sec)
+
+        # курсор "после чего" -> (срок, строки страницы, есть ли дальше)
+        self._pages: dict[str, tuple[float, list[QueueItem], bool]] = {}
+        self._total: Optional[tuple[float, int]] = None
+        # ушли с модерации в этом процессе: ad_id -> срок (дольше TTL кэша не нужен)
+        self._gone: dict[int, float] = {}
+
+    # ---------------- invalidation ----------------
+    def forget(self, ad_id: int) -> None:
+        now = time.monotonic()
+        self._gone[int(ad_id)] = now + self.ttl_sec
+        self._total = None
+        for k in [k for k, v in self._gone.items() if v < now]:
+            self._gone.pop(k, None)
+
+    def clear(self) -> None:
+        self._pages.clear()
+        self._total = None
+
+
+    # ---------------- reads ----------------
+    async def _count(self, session) -> int:
+        now = time.monotonic()
+        if self._total is not None and self._total[0] > now:
+            return self._total[1]
+        total = int(await session.scalar(pending_count_stmt()) or 0)
+        self._total = (now + self.ttl_sec, total)
+        return total
+
+    def _cached(self, key: str) -> Optional[tuple[list[QueueItem], bool]]:
+        hit = self._pages.get(key)
+        if hit is None:
+            return None
+        expires, items, has_more = hit
+        if expires <= time.monotonic():
+            self._pages.pop(key, None)
+            return None
+        return items, has_more
+
+    async def _load_forward(self, session, key: str) -> tuple[list[QueueItem], bool]:
+        """Страница после key + PREFETCH_PAGES следующих одним запросом; всё — в кэш."""
+        n = self.page_size * (1 + self.prefetch_pages)
+        res = await session.execute(pending_after_stmt(decode_cursor(key), n + 1))
+        rows = [_item(ad) for ad in res.scalars().all()]
+        has_tail = len(rows) > n
+        rows = rows[:n]
+
+        expires = time.monotonic() + self.ttl_sec
+        chunks = [rows[i : i + self.page_size] for i in range(0, len(rows), self.page_size)] or [[]]
+        cursor = key
+        for i, chunk in enumerate(chunks):
+            has_more = i < len(chunks) - 1 or has_tail
+            self._pages[cursor] = (expires, chunk, has_more)
+            if chunk:
+                cursor = _key_of(chunk[-1])
+        return chunks[0], (len(chunks) > 1 or has_tail)
+
+    async def page(self, bot, *, after: Optional[str] = None, before: Optional[str] = None) -> QueuePage:
+        """Страница очереди; целиком разобранные страницы (всё одобрено/в очереди публикации) пролистываются."""
+        page = await self._page_once(bot, after=after, before=before)
+        for _ in range(1 + self.prefetch_pages):
+            if page.items or not page.next_cursor or before:
+                break
+            page = await self._page_once(bot, after=page.next_cursor)
+        return page
+
+    async def _page_once(self, bot, *, after: Optional[str] = None, before: Optional[str] = None) -> QueuePage:
+        before_key = decode_cursor(before) if before else None
+        after_key = _key_of_raw(after)
+
+        async with get_sessionmaker()() as session:
+            total = await self._count(session)
+
+            rows: list[QueueItem] = []
+            if before_key is not None:
+                # назад — редкий путь, без кэша: обратный keyset и разворот
+                res = await session.execute(pending_before_stmt(before_key, self.page_size + 1))
+                rows = [_item(ad) for ad in res.scalars().all()]
+            if rows:
+                has_prev = len(rows) > self.page_size
+                items = list(reversed(rows[: self.page_size]))
+                has_next = True
+            else:
+                if before_key is not None:
+                    after_key = _FIRST  # до курсора ничего не осталось — первая страница
+                cached = self._cached(after_key)
+                if cached is None:
+                    cached = await self._load_forward(session, after_key)
+                items, has_next = cached
+                has_prev = bool(after_key)
+
+        queued = await publish_queue.queued_among(bot, [it.ad_id for it in items if it.ad_id not in self._gone])
+        visible = [it for it in items if it.ad_id not in self._gone and it.ad_id not in queued]
+        return QueuePage(
+            items=visible,
+            total=max(total, len(visible)),
+            prev_cursor=(_key_of(items[0]) if items and has_prev else None),
+            next_cursor=(_key_of(items[-1]) if items and has_next else None),
+        )
+
+
+def _key_of_raw(raw: Optional[str]) -> str:
+    parsed = decode_cursor(raw) if raw else None
+    return encode_cursor(*parsed) if parsed else _FIRST
+
+
+QUEUE = ModerationQueue()
+
+
+def forget(ad_id: int) -> None:
+    QUEUE.forget(ad_id)
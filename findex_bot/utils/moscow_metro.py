@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import math
 import re
-from typing import Any
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Optional
 
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
@@ -13,6 +15,8 @@ METRO_CLOSE_CALLBACK = "metro_close"
 
 LINES_PER_PAGE = 8
 STATIONS_PER_PAGE = 20
+SUGGEST_LIMIT = 8
+SUGGEST_MIN_CHARS = 3
 
 MOSCOW_LOCATION_PROMPT = (
     "Укажи 📍 локацию.\n"
@@ -228,6 +232,22 @@ def metro_location_prompt() -> str:
 
 
 def metro_location_keyboard() -> InlineKeyboardMarkup:
+    return _LOCATION_KB
+
+
+def metro_lines_keyboard(page: int = 0) -> InlineKeyboardMarkup:
+    pages = _LINES_KB
+    return pages[max(0, min(int(page), len(pages) - 1))]
+
+
+def metro_stations_keyboard(line_uid: str, page: int = 0) -> InlineKeyboardMarkup:
+    pages = _STATIONS_KB.get(str(line_uid))
+    if not pages:
+        return metro_lines_keyboard(0)
+    return pages[max(0, min(int(page), len(pages) - 1))]
+
+
+def _build_location_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="🚇 Выбрать метро Москвы", callback_data=METRO_PICK_CALLBACK)],
@@ -235,9 +255,8 @@ def metro_location_keyboard() -> InlineKeyboardMarkup:
     )
 
 
-def metro_lines_keyboard(page: int = 0) -> InlineKeyboardMarkup:
+def _build_lines_keyboard(page: int) -> InlineKeyboardMarkup:
     total_pages = max(1, math.ceil(len(METRO_LINES) / LINES_PER_PAGE))
-    page = max(0, min(int(page), total_pages - 1))
     start = page * LINES_PER_PAGE
     chunk = METRO_LINES[start:start + LINES_PER_PAGE]
 
@@ -262,14 +281,9 @@ def metro_lines_keyboard(page: int = 0) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def metro_stations_keyboard(line_uid: str, page: int = 0) -> InlineKeyboardMarkup:
-    item = LINE_BY_UID.get(str(line_uid))
-    if not item:
-        return metro_lines_keyboard(0)
-
-    stations = item["stations"]
+def _build_stations_keyboard(line_uid: str, page: int) -> InlineKeyboardMarkup:
+    stations = LINE_BY_UID[line_uid]["stations"]
     total_pages = max(1, math.ceil(len(stations) / STATIONS_PER_PAGE))
-    page = max(0, min(int(page), total_pages - 1))
     start = page * STATIONS_PER_PAGE
     chunk = stations[start:start + STATIONS_PER_PAGE]
 
@@ -339,6 +353,9 @@ def validate_location_input(text: str) -> str | None:
             return None
         if re.fullmatch(r"москва\s*,\s*(?:м\.?\s*)?[а-яёa-z0-9\- ]+", low):
             return None
+        part = _moscow_station_part(raw)
+        if part and find_station(part) is not None:
+            return None  # «Москва (Библиотека им. Ленина)» — точка внутри названия станции
         return "⚠️ Для Москвы укажи метро в формате: Москва (Тверская) или Москва, Тверская."
 
     if "," in raw:
@@ -352,13 +369,23 @@ def normalize_location_input(text: str) -> str:
     low = raw.lower()
     if low == "москва":
         return "Москва"
+
+    # станция из индекса -> каноничное название («москва, курская», «м. kurskaya», «Курская»)
+    station = find_station(_moscow_station_part(raw) or raw)
+    if station is not None:
+        return build_moscow_location(station.name)
+
+    part = _moscow_station_part(raw)
+    if part is not None:
+        return build_moscow_location(normalize_metro_station_name(part))
+    return raw[:1].upper() + raw[1:] if raw else raw
+
+
+def _moscow_station_part(raw: str) -> str | None:
     m = re.fullmatch(r"москва\s*\((.+)\)", raw, flags=re.IGNORECASE)
     if not m:
         m = re.fullmatch(r"москва\s*,\s*(.+)", raw, flags=re.IGNORECASE)
-    if m:
-        station = normalize_metro_station_name(m.group(1))
-        return build_moscow_location(station)
-    return raw[:1].upper() + raw[1:] if raw else raw
+    return m.group(1) if m else None
 
 
 def _line_emoji(color: str) -> str:
@@ -380,3 +407,245 @@ def _line_emoji(color: str) -> str:
         "#497561": "💚",
     }
     return mapping.get(str(color).lower(), "🚇")
+
+
+# ======================================================
+# Индекс станций: нормализация, транслит, префиксное дерево
+# ======================================================
+# Строится один раз при импорте, вместе со всеми клавиатурами линий/станций.
+# Станция с одним названием на нескольких линиях — одна запись (Киевская, Курская, ...);
+# пересадочные узлы с разными названиями сведены в hub — для сравнения локаций в алертах.
+#
+# Поиск по префиксу любого слова названия, кириллицей или латиницей:
+#   "кур" -> Курская; "ворота" -> Красные ворота; "kursk" / "tverskaya" -> Курская / Тверская.
+# Латиница сравнивается по «скелету» (kh=h, ya=ia=a, y=i, удвоения схлопнуты), поэтому
+# разные варианты транслитерации дают одну запись.
+
+TRANSFER_HUBS: list[tuple[str, ...]] = [
+    ("Охотный Ряд", "Театральная", "Площадь Революции"),
+    ("Библиотека им. Ленина", "Арбатская", "Александровский сад", "Боровицкая"),
+    ("Пушкинская", "Тверская", "Чеховская"),
+    ("Кузнецкий Мост", "Лубянка"),
+    ("Чистые пруды", "Тургеневская", "Сретенский бульвар"),
+    ("Третьяковская", "Новокузнецкая"),
+    ("Таганская", "Марксистская"),
+    ("Площадь Ильича", "Римская"),
+    ("Новослободская", "Менделеевская"),
+    ("Цветной бульвар", "Трубная"),
+    ("Краснопресненская", "Баррикадная"),
+    ("Добрынинская", "Серпуховская"),
+    ("Курская", "Чкаловская"),
+    ("Пролетарская", "Крестьянская Застава"),
+    ("Деловой центр", "Выставочная", "Международная"),
+    ("Петровский парк", "Динамо"),
+    ("Каховская", "Севастопольская"),
+    ("Зябликово", "Красногвардейская"),
+    ("Бульвар Дмитрия Донского", "Улица Старокачаловская"),
+    ("Хорошёвская", "Полежаевская"),
+]
+
+_TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh", "з": "z",
+    "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p",
+    "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "kh", "ц": "ts", "ч": "ch",
+    "ш": "sh", "щ": "shch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+}
+_LATIN_FOLD = (
+    ("shch", "sh"), ("sch", "sh"), ("kh", "h"), ("tz", "c"), ("ts", "c"), ("zh", "z"), ("ch", "c"),
+    ("yu", "u"), ("iu", "u"), ("ju", "u"), ("ya", "a"), ("ia", "a"), ("ja", "a"),
+    ("yo", "e"), ("jo", "e"), ("ye", "e"), ("y", "i"), ("j", "i"), ("w", "v"), ("x", "ks"),
+)
+_PREFIX_RE = re.compile(r"^(?:м\.|м\s|метро\b|ст\.|станция\b|m\.|metro\b)\s*")
+_NON_WORD_RE = re.compile(r"[^0-9a-zа-я]+")
+_CYR_RE = re.compile(r"[а-я]")
+
+
+def norm_station(text: str) -> str:
+    """«м. Тропарёво» -> "тропарево"; «Библиотека им. Ленина» -> "библиотека им ленина"."""
+    s = str(text or "").strip().lower().replace("ё", "е")
+    s = _PREFIX_RE.sub("", s)
+    return _NON_WORD_RE.sub(" ", s).strip()
+
+
+def translit(text: str) -> str:
+    return "".join(_TRANSLIT.get(ch, ch) for ch in norm_station(text))
+
+
+def latin_skeleton(text: str) -> str:
+    s = translit(text)
+    for src, dst in _LATIN_FOLD:
+        s = s.replace(src, dst)
+    return re.sub(r"([a-z])\1+", r"\1", s)
+
+
+@dataclass(frozen=True)
+class Station:
+    sid: int
+    name: str
+    key: str                          # norm_station(name)
+    lines: tuple[tuple[str, int], ...]  # (line uid, индекс на линии) — для callback metro_station
+    hub: str                          # общий ключ пересадочного узла
+
+    @property
+    def callback_data(self) -> str:
+        uid, idx = self.lines[0]
+        return f"{METRO_STATION_CALLBACK}:{uid}:{idx}"
+
+
+class _TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TrieNode] = {}
+        self.ids: set[int] = set()
+
+
+class StationTrie:
+    def __init__(self) -> None:
+        self._root = _TrieNode()
+
+    def add(self, key: str, sid: int) -> None:
+        node = self._root
+        for ch in key:
+            node = node.children.setdefault(ch, _TrieNode())
+            node.ids.add(sid)
+
+    def find(self, prefix: str) -> set[int]:
+        node = self._root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return set()
+        return node.ids
+
+
+def _word_suffixes(key: str) -> list[str]:
+    words = key.split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+def _build_index() -> tuple[list[Station], dict[str, int], dict[str, int], StationTrie, StationTrie]:
+    names: dict[str, str] = {}
+    lines: dict[str, list[tuple[str, int]]] = {}
+    for item in METRO_LINES:
+        for idx, name in enumerate(item["stations"]):
+            key = norm_station(name)
+            names.setdefault(key, name)
+            lines.setdefault(key, []).append((item["uid"], idx))
+
+    hub_of: dict[str, str] = {}
+    for group in TRANSFER_HUBS:
+        keys = [norm_station(n) for n in group]
+        for k in keys:
+            hub_of[k] = keys[0]
+
+    stations: list[Station] = []
+    by_key: dict[str, int] = {}
+    by_latin: dict[str, int] = {}
+    cyr, lat = StationTrie(), StationTrie()
+    for sid, key in enumerate(sorted(names)):
+        st = Station(sid=sid, name=names[key], key=key, lines=tuple(lines[key]), hub=hub_of.get(key, key))
+        stations.append(st)
+        by_key[key] = sid
+        by_latin.setdefault(latin_skeleton(key), sid)
+        for suffix in _word_suffixes(key):
+            cyr.add(suffix, sid)
+        for suffix in _word_suffixes(latin_skeleton(key)):
+            lat.add(suffix, sid)
+    return stations, by_key, by_latin, cyr, lat
+
+
+STATIONS, _BY_KEY, _BY_LATIN, _TRIE_CYR, _TRIE_LAT = _build_index()
+
+
+def find_station(text: str) -> Optional[Station]:
+    """Точное совпадение названия (кириллица или любая латинская транслитерация)."""
+    key = norm_station(text)
+    if not key:
+        return None
+    sid = _BY_KEY.get(key)
+    if sid is None and not _CYR_RE.search(key):
+        sid = _BY_LATIN.get(latin_skeleton(key))
+    return STATIONS[sid] if sid is not None else None
+
+
+def search_stations(query: str, limit: int = SUGGEST_LIMIT) -> list[Station]:
+    """Станции по префиксу слова: сначала точное, затем начало названия, затем прочие слова."""
+    key = norm_station(query)
+    if not key:
+        return []
+    cyrillic = bool(_CYR_RE.search(key))
+    probe = key if cyrillic else latin_skeleton(key)
+    ids = (_TRIE_CYR if cyrillic else _TRIE_LAT).find(probe)
+
+    def rank(sid: int) -> tuple[int, str]:
+        st = STATIONS[sid]
+        name_key = st.key if cyrillic else latin_skeleton(st.key)
+        if name_key == probe:
+            return 0, st.key
+        return (1 if name_key.startswith(probe) else 2), st.key
+
+    return [STATIONS[sid] for sid in sorted(ids, key=rank)[: max(0, int(limit))]]
+
+
+def location_station_part(location: str) -> str:
+    """«Москва (Курская)» / «Москва, Курская» / «москва курская» (ключевые слова алерта) -> "Курская"."""
+    raw = re.sub(r"\s+", " ", str(location or "").strip())
+    part = _moscow_station_part(raw)
+    if part is None:
+        m = re.fullmatch(r"москва\s+(.+)", raw, flags=re.IGNORECASE)
+        part = m.group(1) if m else raw
+    return part
+
+
+@lru_cache(maxsize=4096)
+def find_location_station(location: str) -> Optional[Station]:
+    return find_station(location_station_part(location))
+
+
+def station_hub(location: str) -> Optional[str]:
+    """
+    Локация -> ключ узла станции: «Москва (Пушкинская)», «москва чеховская» (ключевые слова алерта),
+    «м. Тверская», «tverskaya» -> один ключ. Не станция (в т.ч. просто «Москва») -> None.
+    """
+    st = find_location_station(location)
+    return st.hub if st is not None else None
+
+
+def metro_suggestions(text: str) -> list[Station]:
+    """
+    Подсказки станций для недописанной локации ("кур", "tversk").
+    Пусто, если это уже точная станция / формат «Москва (...)» / слишком коротко.
+    """
+    raw = re.sub(r"\s+", " ", str(text or "").strip())
+    if _moscow_station_part(raw) is not None or raw.lower() == "москва":
+        return []
+    if len(norm_station(raw).replace(" ", "")) < SUGGEST_MIN_CHARS or find_station(raw) is not None:
+        return []
+    return search_stations(raw)
+
+
+def metro_suggest_keyboard(stations: list[Station]) -> InlineKeyboardMarkup:
+    return _suggest_keyboard(tuple(st.sid for st in stations))
+
+
+@lru_cache(maxsize=1024)
+def _suggest_keyboard(sids: tuple[int, ...]) -> InlineKeyboardMarkup:
+    rows = [
+        [InlineKeyboardButton(text=f"🚇 {STATIONS[sid].name}", callback_data=STATIONS[sid].callback_data)]
+        for sid in sids
+    ]
+    rows.append([InlineKeyboardButton(text="🗺 Все линии", callback_data=f"{METRO_PICK_CALLBACK}:0")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+# ---------------- клавиатуры: собираются один раз ----------------
+_LOCATION_KB = _build_location_keyboard()
+_LINES_KB = [_build_lines_keyboard(p) for p in range(max(1, math.ceil(len(METRO_LINES) / LINES_PER_PAGE)))]
+_STATIONS_KB = {
+    item["uid"]: [
+        _build_stations_keyboard(item["uid"], p)
+        for p in range(max(1, math.ceil(len(item["stations"]) / STATIONS_PER_PAGE)))
+    ]
+    for item in METRO_LINES
+}
@@ -0,0 +1,187 @@
+# findex_bot/utils/preview_registry.py
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import findex_bot.runtime as runtime
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Реестр превью-сообщений: (chat_id, message_id) -> {ad_id, mode}
+# ======================================================
+# Обновляется там, где превью отправляется/переотправляется (persist_preview_ref,
+# republish) и где меняется его режим (отправка на модерацию, публикация, отклонение).
+# PublishedPreviewGuardMiddleware делает ровно один GET по (chat_id, message_id).
+#
+#   preview:ref:{chat_id}:{message_id}  STRING json {"ad_id": int, "mode": str}  + TTL
+#   preview:ad:{ad_id}                  STRING "chat_id:message_id"              + TTL
+#
+# mode: "" — черновик (guard пропускает), moderation / published — превью залочено.
+
+PREVIEW_MODE_DRAFT = ""
+PREVIEW_MODE_MODERATION = getattr(runtime, "PREVIEW_MODE_MODERATION", "moderation")
+PREVIEW_MODE_PUBLISHED = getattr(runtime, "PREVIEW_MODE_PUBLISHED", "published")
+
+PREVIEW_REGISTRY_TTL_SECONDS = int(os.getenv("PREVIEW_REGISTRY_TTL_DAYS", "45")) * 24 * 3600
+
+KEY_REF = "preview:ref:{chat_id}:{message_id}"
+KEY_BY_AD = "preview:ad:{ad_id}"
+
+# без Redis: key -> (expires_at, value)
+_MEM: dict[str, tuple[float, str]] = {}
+_MEM_MAX_ITEMS = 50_000
+
+
+@dataclass(frozen=True)
+class PreviewRef:
+    ad_id: int
+    mode: str
+
+
+def _ref_key(chat_id: int, message_id: int) -> str:
+    return KEY_REF.format(chat_id=int(chat_id), message_id=int(message_id))
+
+
+def _ad_key(ad_id: int) -> str:
+    return KEY_BY_AD.format(ad_id=int(ad_id))
+
+
+def _get_redis() -> Any:
+    return getattr(runtime, "REDIS", None)
+
+
+def _mem_get(key: str) -> Optional[str]:
+    item = _MEM.get(key)
+    if item is None:
+        return None
+    expires_at, value = item
+    if expires_at <= time.time():
+        _MEM.pop(key, None)
+        return None
+    return value
+
+
+def _mem_set(key: str, value: str) -> None:
+    if len(_MEM) >= _MEM_MAX_ITEMS:
+        now = time.time()
+        for k in [k for k, (exp, _v) in _MEM.items() if exp <= now]:
+            _MEM.pop(k, None)
+        if len(_MEM) >= _MEM_MAX_ITEMS:
+            # самые старые по сроку жизни
+            for k, _item in sorted(_MEM.items(), key=lambda kv: kv[1][0])[: _MEM_MAX_ITEMS // 10]:
+                _MEM.pop(k, None)
+    _MEM[key] = (time.time() + PREVIEW_REGISTRY_TTL_SECONDS, value)
+
+
+def _decode(raw: Any) -> Optional[PreviewRef]:
+    if raw is None:
+        return None
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", errors="replace")
+    try:
+        v = json.loads(raw)
+        return PreviewRef(ad_id=int(v.get("ad_id") or 0), mode=str(v.get("mode") or ""))
+    except Exception:
+        return None
+
+
+def _encode(ad_id: int, mode: str) -> str:
+    return json.dumps({"ad_id": int(ad_id), "mode": str(mode or "")})
+
+
+def _split_coords(raw: Any) -> Optional[tuple[int, int]]:
+    if raw is None:
+        return None
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", errors="replace")
+    try:
+        chat_id, message_id = str(raw).split(":", 1)
+        return int(chat_id), int(message_id)
+    except Exception:
+        return None
+
+
+async def register(chat_id: int, message_id: int, *, ad_id: int, mode: str = PREVIEW_MODE_DRAFT) -> None:
+    """
+    Превью объявления теперь в (chat_id, message_id). Старая ссылка (если превью
+    переотправили) удаляется — guard не должен глушить уже неактуальное сообщение.
+    """
+    if not chat_id or not message_id or not ad_id:
+        return
+
+    ref_key = _ref_key(chat_id, message_id)
+    ad_key = _ad_key(ad_id)
+    coords = f"{int(chat_id)}:{int(message_id)}"
+    value = _encode(int(ad_id), mode)
+
+    r = _get_redis()
+    if r is None:
+        old = _split_coords(_mem_get(ad_key))
+        if old is not None and old != (int(chat_id), int(message_id)):
+            _MEM.pop(_ref_key(*old), None)
+        _mem_set(ref_key, value)
+        _mem_set(ad_key, coords)
+        return
+
+    try:
+        old = _split_coords(await r.get(ad_key))
+        pipe = r.pipeline(transaction=True)
+        if old is not None and old != (int(chat_id), int(message_id)):
+            pipe.delete(_ref_key(*old))
+        pipe.set(ref_key, value, ex=PREVIEW_REGISTRY_TTL_SECONDS)
+        pipe.set(ad_key, coords, ex=PREVIEW_REGISTRY_TTL_SECONDS)
+        await pipe.execute()
+    except Exception:
+        logger.exception("preview_registry: register failed ad_id=%s chat_id=%s msg_id=%s", ad_id, chat_id, message_id)
+
+
+async def set_mode_for_ad(ad_id: int, mode: str) -> None:
+    """Меняет режим текущего превью объявления (если оно зарегистрировано)."""
+    if not ad_id:
+        return
+
+    ad_key = _ad_key(ad_id)
+    r = _get_redis()
+    if r is None:
+        coords = _split_coords(_mem_get(ad_key))
+        if coords is not None:
+            _mem_set(_ref_key(*coords), _encode(int(ad_id), mode))
+        return
+
+    try:
+        coords = _split_coords(await r.get(ad_key))
+        if coords is None:
+            return
+        await r.set(_ref_key(*coords), _encode(int(ad_id), mode), ex=PREVIEW_REGISTRY_TTL_SECONDS)
+    except Exception:
+        logger.exception("preview_registry: set_mode failed ad_id=%s mode=%s", ad_id, mode)
+
+
+async def lookup(chat_id: int, message_id: int) -> Optional[PreviewRef]:
+    key = _ref_key(chat_id, message_id)
+    r = _get_redis()
+    if r is None:
+        return _decode(_mem_get(key))
+    return _decode(await r.get(key))
+
+
+async def mode_for_message(chat_id: int, message_id: int) -> Optional[str]:
+    """Режим залоченного превью или None (не превью / черновик / Redis недоступен)."""
+    try:
+        ref = await lookup(int(chat_id), int(message_id))
+    except Exception:
+        logger.exception("preview_registry: lookup failed chat_id=%s msg_id=%s", chat_id, message_id)
+        return None
+    if ref is None or not ref.mode:
+        return None
+    return ref.mode
+
+
+async def lock_preview(chat_id: int, message_id: int, mode: str, *, ad_id: int) -> None:
+    await register(int(chat_id), int(message_id), ad_id=int(ad_id), mode=str(mode))
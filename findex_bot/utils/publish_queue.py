@@ -0,0 +1,583 @@
+# findex_bot/utils/publish_queue.py
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import socket
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiogram import Bot
+
+import findex_bot.runtime as runtime
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Очередь публикации в основной канал
+# ======================================================
+# «Одобрить» (карточка или пакет из /намодерации) не шлёт пост в канал из callback'а:
+# объявление встаёт в очередь, модератор сразу получает «в очереди», а цикл публикации
+# постит не чаще CHANNEL_POSTS_PER_MIN в минуту (лимит Telegram на сообщения в один канал ~20/мин).
+#
+# Redis (общий для всех процессов бота):
+#   publish_queue:{bot_id}                 STREAM задач (ad_id, moderator, куда отчитаться, попытка);
+#                                          группа "publishers", каждый процесс — свой consumer
+#   publish_queue:{bot_id}:ad:{ad_id}      маркер "в очереди" (SET NX) — повторное одобрение того же
+#                                          ad_id (двойной клик, два модератора) задачу не дублирует
+#   publish_queue:{bot_id}:sent:{ad_id}    message_id уже отправленного поста: если процесс упал между
+#                                          постом и записью статуса, повтор только дописывает
+#                                          published/public_url, второй пост в канал не уходит
+#   publish_queue:{bot_id}:slot            общий темп: ключ с PX = интервал между постами; после 429
+#                                          ставится на retry_after из ответа Telegram — ждут все процессы
+# Задача снимается со stream (XACK + XDEL) только после исхода; задачи упавшего процесса забирает
+# XAUTOCLAIM после PUBLISH_CLAIM_IDLE_SEC.
+#
+# Без Redis (или если Redis упал) — та же очередь в памяти процесса; на рестарте неопубликованное
+# остаётся pending и снова видно в /намодерации.
+#
+# Саму публикацию делает handlers.forms.publish_ad(only_pending=True): объявление, которое
+# за время ожидания отклонили или уже опубликовали, пропускается; темп тратят только реальные посты.
+# 429 RetryAfter / сетевые ошибки -> задача возвращается в очередь (до PUBLISH_MAX_ATTEMPTS попыток).
+
+CHANNEL_POSTS_PER_MIN = max(1.0, float(os.getenv("CHANNEL_POSTS_PER_MIN", "20")))
+PUBLISH_QUEUE_STOP_SEC = float(os.getenv("PUBLISH_QUEUE_STOP_SEC", "10"))
+PUBLISH_QUEUE_IDLE_SEC = float(os.getenv("PUBLISH_QUEUE_IDLE_SEC", "1.0"))
+PUBLISH_MAX_ATTEMPTS = max(1, int(os.getenv("PUBLISH_MAX_ATTEMPTS", "5")))
+PUBLISH_RETRY_BACKOFF_SEC = float(os.getenv("PUBLISH_RETRY_BACKOFF_SEC", "5"))
+PUBLISH_LOOP_ERROR_SEC = float(os.getenv("PUBLISH_LOOP_ERROR_SEC", "1.0"))  # пауза после сбоя итерации
+PUBLISH_CLAIM_IDLE_SEC = float(os.getenv("PUBLISH_CLAIM_IDLE_SEC", "120"))
+PUBLISH_MARKER_TTL_SEC = int(os.getenv("PUBLISH_MARKER_TTL_SEC", str(24 * 3600)))
+
+KEY_STREAM = "publish_queue:{bot_id}"
+KEY_QUEUED = "publish_queue:{bot_id}:ad:{ad_id}"
+KEY_SENT = "publish_queue:{bot_id}:sent:{ad_id}"
+KEY_SLOT = "publish_queue:{bot_id}:slot"
+GROUP = "publishers"
+
+# статусы handlers.forms.PUBLISH_*
+ST_PUBLISHED = "published"
+ST_RETRY = "retry"
+ST_ERROR = "error"
+
+_SUMMARY_LABELS = (
+    ("published", "✅ опубликовано"),
+    ("limit", "⛔ лимит автора"),
+    ("failed", "❌ ошибка"),
+    ("error", "❌ ошибка"),
+    ("not_pending", "↩️ уже не на модерации"),
+    ("already", "↩️ уже опубликовано"),
+    ("not_found", "❓ не найдено"),
+    ("no_channel", "⚠️ канал не настроен"),
+)
+
+
+@dataclass(frozen=True)
+class PublishJob:
+    ad_id: int
+    moderator: str                  # подпись в карточке модерации ("@username" / id)
+    report_chat_id: int = 0         # пакет: куда отправить сводку, когда очередь опустеет
+    card_chat_id: int = 0           # одиночное одобрение: карточка, на которой нажали «Одобрить»
+    card_message_id: int = 0
+    attempt: int = 0
+
+    def to_fields(self) -> Dict[str, str]:
+        return {
+            "ad_id": str(int(self.ad_id)),
+            "moderator": self.moderator,
+            "report_chat_id": str(int(self.report_chat_id)),
+            "card_chat_id": str(int(self.card_chat_id)),
+            "card_message_id": str(int(self.card_message_id)),
+            "attempt": str(int(self.attempt)),
+        }
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, Any]) -> "PublishJob":
+        return cls(
+            ad_id=int(fields["ad_id"]),
+            moderator=str(fields.get("moderator") or "—"),
+            report_chat_id=int(fields.get("report_chat_id") or 0),
+            card_chat_id=int(fields.get("card_chat_id") or 0),
+            card_message_id=int(fields.get("card_message_id") or 0),
+            attempt=int(fields.get("attempt") or 0),
+        )
+
+
+@dataclass(frozen=True)
+class PublishHooks:
+    before_send: Callable[[], Awaitable[None]]          # ждать слот темпа прямо перед постом
+    on_sent: Callable[[int], Awaitable[None]]           # пост ушёл: запомнить message_id
+    resume_message_id: Optional[int] = None             # пост уже был отправлен прошлой попыткой
+
+
+# -> объект с .status и .retry_after (handlers.forms.PublishResult)
+PublishFn = Callable[[Bot, PublishJob, PublishHooks], Awaitable[Any]]
+
+
+async def _publish_via_forms(bot: Bot, job: PublishJob, hooks: PublishHooks) -> Any:
+    from findex_bot.handlers.forms import publish_ad
+
+    card = (job.card_chat_id, job.card_message_id) if job.card_message_id else None
+    return await publish_ad(
+        bot,
+        job.ad_id,
+        moderator=job.moderator,
+        only_pending=True,
+        card=card,
+        before_send=hooks.before_send,
+        on_sent=hooks.on_sent,
+        resume_message_id=hooks.resume_message_id,
+    )
+
+
+# накопительные счётчики процесса (для /metrics)
+TOTALS: dict[str, int] = {
+    "enqueued": 0,
+    "enqueued_memory": 0,
+    "duplicate": 0,
+    "published": 0,
+    "failed": 0,
+    "skipped": 0,
+    "retried": 0,
+    "reclaimed": 0,
+    "error": 0,
+}
+
+
+def render_summary(counts: Dict[str, int]) -> str:
+    merged: Dict[str, int] = {}
+    for key, label in _SUMMARY_LABELS:
+        if counts.get(key):
+            merged[label] = merged.get(label, 0) + int(counts[key])
+    parts = [f"{label}: {n}" for label, n in merged.items()]
+    return "📤 Очередь публикации разобрана\n" + ("\n".join(parts) if parts else "—")
+
+
+def _failure_note(ad_id: int, status: str) -> str:
+    label = dict(_SUMMARY_LABELS).get(status, status)
+    return f"⚠️ #{int(ad_id)} не опубликовано: {label}"
+
+
+def _consumer_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ChannelPublishQueue:
+    def __init__(
+        self,
+        *,
+        posts_per_min: float = CHANNEL_POSTS_PER_MIN,
+        publish: Optional[PublishFn] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[object]] = asyncio.sleep,
+        idle_sec: float = PUBLISH_QUEUE_IDLE_SEC,
+        consumer: Optional[str] = None,
+    ) -> None:
+        self.interval = 60.0 / max(0.01, float(posts_per_min))
+        self.idle_sec = max(0.05, float(idle_sec))
+        self.consumer = consumer or _consumer_name()
+        self._publish = publish or _publish_via_forms
+        self._clock = clock
+        self._sleep = sleep
+
+        # fallback без Redis: ad_id -> задача (порядок постановки) + отправленные посты
+        self._jobs: "OrderedDict[int, PublishJob]" = OrderedDict()
+        self._sent: Dict[int, int] = {}
+        self._next_slot = 0.0
+        self._reports: Dict[int, Dict[str, int]] = {}
+
+        self._group_ready: set[str] = set()
+        self._stream_depth = 0  # последнее известное XLEN (для /metrics без похода в Redis)
+        self._last_claim = 0.0
+
+        self._bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    # ---------------- enqueue ----------------
+    async def enqueue(self, bot: Bot, jobs: Iterable[PublishJob]) -> int:
+        """-> сколько задач реально добавлено (ad_id, уже стоящие в очереди, пропускаются)."""
+        added = 0
+        r = getattr(runtime, "REDIS", None)
+        for job in jobs:
+            if int(job.ad_id) in self._jobs:
+                TOTALS["duplicate"] += 1
+                continue
+            if r is not None:
+                marked = False
+                try:
+                    fresh = await r.set(self._key_queued(bot, job.ad_id), "1", nx=True, ex=PUBLISH_MARKER_TTL_SEC)
+                    if not fresh:
+                        TOTALS["duplicate"] += 1
+                        continue
+                    marked = True
+                    await r.xadd(self._key_stream(bot), job.to_fields())
+                    self._stream_depth += 1
+                    TOTALS["enqueued"] += 1
+                    added += 1
+                    continue
+                except Exception:
+                    logger.exception("publish_queue: xadd failed ad_id=%s -> memory", job.ad_id)
+                # задача уходит в память процесса: маркер без записи в stream прятал бы
+                # объявление из /намодерации и глушил повторный approve на PUBLISH_MARKER_TTL_SEC
+                if marked:
+                    try:
+                        await r.delete(self._key_queued(bot, job.ad_id))
+                    except Exception:
+                        logger.exception("publish_queue: queued marker cleanup failed ad_id=%s", job.ad_id)
+
+            self._jobs[int(job.ad_id)] = job
+            TOTALS["enqueued"] += 1
+            TOTALS["enqueued_memory"] += 1
+            added += 1
+
+        if added:
+            self.start(bot)
+            if self._wakeup is not None:
+                self._wakeup.set()
+        return added
+
+    async def queued_among(self, bot: Bot, ad_ids: Iterable[int]) -> set[int]:
+        """Какие из ad_id сейчас ждут публикации (в любом процессе) — одним MGET."""
+        ids = [int(x) for x in ad_ids]
+        out = {x for x in ids if x in self._jobs}
+        r = getattr(runtime, "REDIS", None)
+        rest = [x for x in ids if x not in out]
+        if r is None or not rest:
+            return out
+        try:
+            flags = await r.mget([self._key_queued(bot, x) for x in rest])
+        except Exception:
+            logger.exception("publish_queue: mget queued markers failed")
+            return out
+        return out | {x for x, flag in zip(rest, flags) if flag}
+
+    def depth(self) -> int:
+        """Быстрая оценка без Redis: очередь в памяти + последнее известное XLEN."""
+        return len(self._jobs) + self._stream_depth
+
+    async def fetch_depth(self, bot: Bot) -> int:
+        r = getattr(runtime, "REDIS", None)
+        if r is not None:
+            try:
+                self._stream_depth = int(await r.xlen(self._key_stream(bot)) or 0)
+            except Exception:
+                logger.exception("publish_queue: xlen failed")
+        return self.depth()
+
+    def eta_sec(self, position: Optional[int] = None) -> float:
+        """Через сколько секунд дойдёт очередь до позиции (по умолчанию — до последней задачи)."""
+        n = self.depth() if position is None else max(0, int(position))
+        wait_first = max(0.0, self._next_slot - self._clock())
+        return wait_first + max(0, n - 1) * self.interval
+
+    # ---------------- keys ----------------
+    @staticmethod
+    def _key_stream(bot: Bot) -> str:
+        return KEY_STREAM.format(bot_id=int(bot.id))
+
+    @staticmethod
+    def _key_queued(bot: Bot, ad_id: int) -> str:
+        return KEY_QUEUED.format(bot_id=int(bot.id), ad_id=int(ad_id))
+
+    @staticmethod
+    def _key_sent(bot: Bot, ad_id: int) -> str:
+        return KEY_SENT.format(bot_id=int(bot.id), ad_id=int(ad_id))
+
+    @staticmethod
+    def _key_slot(bot: Bot) -> str:
+        return KEY_SLOT.format(bot_id=int(bot.id))
+
+    # ---------------- pacing ----------------
+    async def _acquire_slot(self, bot: Bot) -> None:
+        """Ждём своей очереди на пост: локальный интервал + общий ключ-слот в Redis."""
+        while True:
+            wait = self._next_slot - self._clock()
+            if wait > 0:
+                await self._sleep(wait)
+                continue
+
+            r = getattr(runtime, "REDIS", None)
+            if r is not None:
+                try:
+                    ms = max(1, int(self.interval * 1000))
+                    if not await r.set(self._key_slot(bot), self.consumer, nx=True, px=ms):
+                        pttl = int(await r.pttl(self._key_slot(bot)) or 0)
+                        await self._sleep(max(pttl, 50) / 1000.0)
+                        continue
+                except Exception:
+                    logger.exception("publish_queue: slot acquire failed -> local pacing only")
+
+            self._next_slot = self._clock() + self.interval
+            return
+
+    async def _pause(self, bot: Bot, seconds: float) -> None:
+        """429: Telegram сказал ждать seconds — не постим раньше ни здесь, ни в других процессах."""
+        seconds = max(0.0, float(seconds))
+        self._next_slot = max(self._next_slot, self._clock() + seconds)
+        r = getattr(runtime, "REDIS", None)
+        if r is not None and seconds > 0:
+            try:
+                await r.set(self._key_slot(bot), self.consumer, px=max(1, int(seconds * 1000)))
+            except Exception:
+                logger.exception("publish_queue: slot pause failed")
+
+    # ---------------- sent markers ----------------
+    async def _get_sent(self, bot: Bot, ad_id: int) -> Optional[int]:
+        if int(ad_id) in self._sent:
+            return self._sent[int(ad_id)]
+        r = getattr(runtime, "REDIS", None)
+        if r is None:
+            return None
+        try:
+            raw = await r.get(self._key_sent(bot, ad_id))
+        except Exception:
+            logger.exception("publish_queue: sent marker read failed ad_id=%s", ad_id)
+            return None
+        return int(raw) if raw else None
+
+    async def _mark_sent(self, bot: Bot, ad_id: int, message_id: int) -> None:
+        self._sent[int(ad_id)] = int(message_id)
+        r = getattr(runtime, "REDIS", None)
+        if r is None:
+            return
+        try:
+            await r.set(self._key_sent(bot, ad_id), str(int(message_id)), ex=PUBLISH_MARKER_TTL_SEC)
+        except Exception:
+            logger.exception("publish_queue: sent marker write failed ad_id=%s", ad_id)
+
+    async def _release(self, bot: Bot, ad_id: int, msg_id: Optional[str]) -> None:
+        self._sent.pop(int(ad_id), None)
+        r = getattr(runtime, "REDIS", None)
+        if r is None:
+            return
+        try:
+            if msg_id is not None:
+                stream = self._key_stream(bot)
+                await r.xack(stream, GROUP, msg_id)
+                await r.xdel(stream, msg_id)
+                self._stream_depth = max(0, self._stream_depth - 1)
+            await r.delete(self._key_queued(bot, ad_id), self._key_sent(bot, ad_id))
+        except Exception:
+            logger.exception("publish_queue: release failed ad_id=%s", ad_id)
+
+    # ---------------- claim ----------------
+    async def _ensure_group(self, r: Any, stream: str) -> None:
+        if stream in self._group_ready:
+            return
+        try:
+            await r.xgroup_create(stream, GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready.add(stream)
+
+    async def _claim_redis(self, bot: Bot, *, block: bool) -> Optional[Tuple[str, PublishJob]]:
+        r = getattr(runtime, "REDIS", None)
+        if r is None:
+            return None
+        stream = self._key_stream(bot)
+        try:
+            await self._ensure_group(r, stream)
+
+            now = self._clock()
+            if now - self._last_claim >= PUBLISH_CLAIM_IDLE_SEC / 2:
+                self._last_claim = now
+                res = await r.xautoclaim(
+                    stream, GROUP, self.consumer, int(PUBLISH_CLAIM_IDLE_SEC * 1000), start_id="0-0", count=1
+                )
+                claimed = res[1] if res and len(res) > 1 else []
+                if claimed:
+                    TOTALS["reclaimed"] += 1
+                    self._last_claim = 0.0  # забрали — возможно, там ещё
+                    msg_id, fields = claimed[0]
+                    return str(msg_id), PublishJob.from_fields(fields)
+
+            res = await r.xreadgroup(
+                GROUP,
+                self.consumer,
+                {stream: ">"},
+                count=1,
+                block=(int(self.idle_sec * 1000) if block else None),
+            )
+        except Exception:
+            logger.exception("publish_queue: claim failed")
+            self._group_ready.discard(stream)
+            return None
+
+        for _stream, messages in res or []:
+            for msg_id, fields in messages:
+                try:
+                    return str(msg_id), PublishJob.from_fields(fields)
+                except Exception:
+                    logger.warning("publish_queue: bad stream entry %s %r", msg_id, fields)
+                    with contextlib.suppress(Exception):
+                        await r.xack(stream, GROUP, msg_id)
+                        await r.xdel(stream, msg_id)
+        return None
+
+    # ---------------- run ----------------
+    async def _requeue(self, bot: Bot, job: PublishJob, msg_id: Optional[str]) -> None:
+        nxt = replace(job, attempt=job.attempt + 1)
+        TOTALS["retried"] += 1
+        if msg_id is None:
+            self._jobs[int(job.ad_id)] = nxt
+            self._jobs.move_to_end(int(job.ad_id))
+            return
+        r = getattr(runtime, "REDIS", None)
+        stream = self._key_stream(bot)
+        try:
+            await r.xadd(stream, nxt.to_fields())
+            await r.xack(stream, GROUP, msg_id)
+            await r.xdel(stream, msg_id)
+        except Exception:
+            # не переставили — запись останется в PEL и вернётся через XAUTOCLAIM
+            logger.exception("publish_queue: requeue failed ad_id=%s", job.ad_id)
+
+    async def process(self, bot: Bot, job: PublishJob, msg_id: Optional[str] = None) -> str:
+        """Одна задача: публикация, ретрай или исход. msg_id=None — задача из памяти. -> статус."""
+        hooks = PublishHooks(
+            before_send=lambda: self._acquire_slot(bot),
+            on_sent=lambda mid: self._mark_sent(bot, job.ad_id, mid),
+            resume_message_id=await self._get_sent(bot, job.ad_id),
+        )
+        retry_after = 0.0
+        try:
+            result = await self._publish(bot, job, hooks)
+            status = str(result.status)
+            retry_after = float(getattr(result, "retry_after", 0.0) or 0.0)
+        except Exception:
+            logger.exception("publish_queue: publish crashed ad_id=%s", job.ad_id)
+            status = ST_ERROR
+
+        if status in (ST_RETRY, ST_ERROR) and job.attempt + 1 < PUBLISH_MAX_ATTEMPTS:
+            await self._pause(bot, retry_after or PUBLISH_RETRY_BACKOFF_SEC * (job.attempt + 1))
+            await self._requeue(bot, job, msg_id)
+            return ST_RETRY
+
+        if status == ST_RETRY:
+            status = "failed"
+        if msg_id is None:
+            self._jobs.pop(int(job.ad_id), None)
+        await self._release(bot, job.ad_id, msg_id)
+
+        TOTALS[status if status in TOTALS else "skipped"] += 1
+        if job.report_chat_id:
+            counts = self._reports.setdefault(int(job.report_chat_id), {})
+            counts[status] = counts.get(status, 0) + 1
+        elif job.card_chat_id and status != ST_PUBLISHED:
+            await self._notify_card(bot, job, status)
+        return status
+
+    async def _notify_card(self, bot: Bot, job: PublishJob, status: str) -> None:
+        try:
+            await bot.send_message(
+                job.card_chat_id,
+                _failure_note(job.ad_id, status),
+                reply_to_message_id=(job.card_message_id or None),
+            )
+        except Exception:
+            logger.exception("publish_queue: failure note failed ad_id=%s", job.ad_id)
+
+    async def run_one(self, bot: Bot, *, block: bool = False) -> Optional[str]:
+        """Следующая задача (память, затем stream). -> статус или None, если очередь пуста."""
+        if self._stopping:
+            return None
+        if self._jobs:
+            job = next(iter(self._jobs.values()))
+            return await self.process(bot, job)
+        claimed = await self._claim_redis(bot, block=block)
+        if claimed is None:
+            return None
+        msg_id, job = claimed
+        return await self.process(bot, job, msg_id)
+
+    async def flush_reports(self, bot: Bot) -> None:
+        reports, self._reports = self._reports, {}
+        for chat_id, counts in reports.items():
+            try:
+                await bot.send_message(chat_id, render_summary(counts))
+            except Exception:
+                logger.exception("publish_queue: summary failed chat_id=%s", chat_id)
+
+    async def run_loop(self, bot: Bot) -> None:
+        self._wakeup = asyncio.Event()
+        try:
+            while not self._stopping:
+                try:
+                    if await self.run_one(bot, block=True) is not None:
+                        continue
+                    await self.flush_reports(bot)
+                    self._wakeup.clear()
+                    if self._jobs or self._stopping:
+                        continue
+                    if getattr(runtime, "REDIS", None) is not None:
+                        continue  # XREADGROUP BLOCK уже подождал
+                    with contextlib.suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.idle_sec)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    # цикл не умирает: иначе задачи в stream ждут, пока кто-то снова позовёт start()
+                    TOTALS["error"] += 1
+                    logger.exception("publish_queue: loop iteration failed")
+                    await self._sleep(PUBLISH_LOOP_ERROR_SEC)
+        except asyncio.CancelledError:
+            return
+        finally:
+            self._wakeup = None
+
+    def start(self, bot: Bot) -> asyncio.Task:
+        if self._task is not None and not self._task.done():
+            return self._task
+        self._bot = bot
+        self._stopping = False
+        self._task = asyncio.create_task(self.run_loop(bot), name="channel_publish_queue")
+        return self._task
+
+    async def stop(self, timeout: float = PUBLISH_QUEUE_STOP_SEC) -> int:
+        """
+        Останавливает цикл: текущей публикации даём завершиться (иначе пост уйдёт в канал,
+        а статус не запишется). Задачи в Redis дождутся другого процесса; очередь в памяти
+        бросаем — объявления остаются pending. -> сколько брошено.
+        """
+        task, self._task = self._task, None
+        self._stopping = True
+        if task is not None:
+            if self._wakeup is not None:
+                self._wakeup.set()
+            done, _ = await asyncio.wait({task}, timeout=max(0.0, float(timeout)))
+            if not done:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await task
+
+        dropped = len(self._jobs)
+        self._jobs.clear()
+        if dropped:
+            logger.warning("publish_queue: %s memory jobs dropped on stop (ads stay pending)", dropped)
+        return dropped
+
+
+PUBLISH_QUEUE = ChannelPublishQueue()
+
+
+async def enqueue(bot: Bot, jobs: List[PublishJob]) -> int:
+    return await PUBLISH_QUEUE.enqueue(bot, jobs)
+
+
+async def queued_among(bot: Bot, ad_ids: Iterable[int]) -> set[int]:
+    return await PUBLISH_QUEUE.queued_among(bot, ad_ids)
+
+
+def depth() -> int:
+    return PUBLISH_QUEUE.depth()
+
+
+def totals_snapshot() -> dict[str, int]:
+    return dict(TOTALS)
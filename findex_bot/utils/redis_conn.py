@@ -0,0 +1,310 @@
+# findex_bot/utils/redis_conn.py
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from typing import Any, Optional
+
+import findex_bot.runtime as runtime
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Единый Redis-клиент процесса: явный ConnectionPool + circuit breaker
+# ======================================================
+# Раньше bot._redis_health_loop на сбой ping закрывал клиент и клал в runtime.REDIS новый
+# from_url — команды, которые в этот момент летели через старый клиент (alerts/menu/responds
+# читают глобал когда угодно), падали на закрытом соединении. jobs / resurrection_worker
+# собирали свои клиенты со своими настройками.
+#
+# Теперь на процесс один клиент поверх одного пула, он НЕ пересоздаётся и не закрывается
+# до остановки процесса; переподключение отдельных соединений делает сам redis-py.
+#
+# Circuit breaker для in-memory fallback'ов (все модули проверяют runtime.REDIS is None):
+#   closed     — Redis здоров, runtime.REDIS = client
+#   open       — BREAKER_FAILURES подряд неудачных ping/команд: runtime.REDIS = None,
+#                модули уходят в fallback и не ждут таймаутов на каждом запросе
+#   half_open  — через BREAKER_RESET_SEC пробный ping: успех -> closed, иначе снова open
+# Воркеры (jobs, resurrection_worker) берут тот же клиент, но runtime.REDIS не трогают.
+
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "64"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "3"))
+REDIS_RETRY_ATTEMPTS = int(os.getenv("REDIS_RETRY_ATTEMPTS", "2"))
+# redis-py сам пингует соединение, простоявшее дольше этого, перед выдачей из пула
+REDIS_CONN_HEALTH_CHECK_SEC = int(os.getenv("REDIS_CONN_HEALTH_CHECK_SEC", "30"))
+
+REDIS_HEALTHCHECK_EVERY_SECONDS = float(os.getenv("REDIS_HEALTHCHECK_EVERY_SECONDS", "10"))
+BREAKER_FAILURES = int(os.getenv("REDIS_BREAKER_FAILURES", "3"))
+BREAKER_RESET_SEC = float(os.getenv("REDIS_BREAKER_RESET_SEC", "5"))
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# ping latency, секунды
+PING_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def build_url(*, default_host: str = "127.0.0.1") -> str:
+    """REDIS_DSN / REDIS_URL, иначе REDIS_HOST/PORT/DB/PASSWORD."""
+    dsn = os.getenv("REDIS_DSN") or os.getenv("REDIS_URL")
+    if dsn:
+        return dsn
+
+    host = os.getenv("REDIS_HOST", default_host)
+    port = os.getenv("REDIS_PORT", "6379")
+    db = os.getenv("REDIS_DB", "0")
+    password = os.getenv("REDIS_PASSWORD")
+    if password:
+        return f"redis://:{password}@{host}:{port}/{db}"
+    return f"redis://{host}:{port}/{db}"
+
+
+def _is_connection_error(exc: BaseException) -> bool:
+    try:
+        from redis.exceptions import ConnectionError as RedisConnectionError
+        from redis.exceptions import TimeoutError as RedisTimeoutError
+    except Exception:
+        return isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError))
+    return isinstance(exc, (RedisConnectionError, RedisTimeoutError, ConnectionError, asyncio.TimeoutError))
+
+
+class RedisManager:
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        *,
+        publish_runtime: bool = False,
+        max_connections: int = REDIS_MAX_CONNECTIONS,
+        failures_to_open: int = BREAKER_FAILURES,
+        reset_sec: float = BREAKER_RESET_SEC,
+    ) -> None:
+        self.url = url
+        self.publish_runtime = publish_runtime
+        self.max_connections = max(1, int(max_connections))
+        self.failures_to_open = max(1, int(failures_to_open))
+        self.reset_sec = float(reset_sec)
+
+        self.client: Any = None
+        self.pool: Any = None
+        self.state = STATE_OPEN
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+
+        self.stats: dict[str, int] = {"trips": 0, "probes": 0, "command_errors": 0, "pings": 0}
+        self.ping_hist = [0] * (len(PING_BUCKETS) + 1)
+        self.ping_sum = 0.0
+        self.last_ping_sec: Optional[float] = None
+
+    # ---------------- lifecycle ----------------
+    def build(self) -> Any:
+        """Создаёт пул и клиент (без сети). Повторный вызов возвращает тот же клиент."""
+        if self.client is not None:
+            return self.client
+
+        from redis.asyncio import ConnectionPool, Redis  # type: ignore
+        from redis.asyncio.retry import Retry  # type: ignore
+        from redis.backoff import ExponentialBackoff  # type: ignore
+
+        self.pool = ConnectionPool.from_url(
+            self.url or build_url(),
+            max_connections=self.max_connections,
+            socket_keepalive=True,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+            health_check_interval=REDIS_CONN_HEALTH_CHECK_SEC,
+            retry_on_timeout=True,
+            retry=Retry(ExponentialBackoff(cap=1.0, base=0.05), max(0, REDIS_RETRY_ATTEMPTS)),
+            decode_responses=True,
+        )
+        self.client = Redis(connection_pool=self.pool)
+        self._watch_commands(self.client)
+        return self.client
+
+    async def connect(self) -> Any:
+        """build() + первый ping; клиент возвращается даже при недоступном Redis (breaker open)."""
+        self.build()
+        await self.ping()
+        return self.client
+
+    async def close(self) -> None:
+        client, self.client = self.client, None
+        pool, self.pool = self.pool, None
+        if self.publish_runtime and getattr(runtime, "REDIS", None) is client:
+            runtime.REDIS = None
+        self.state = STATE_OPEN
+        if client is not None:
+            with contextlib.suppress(Exception):
+                await client.aclose()
+        if pool is not None:
+            with contextlib.suppress(Exception):
+                await pool.aclose()
+
+    # ---------------- breaker ----------------
+    @property
+    def available(self) -> bool:
+        return self.client is not None and self.state == STATE_CLOSED
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        if self.state != STATE_CLOSED:
+            logger.info("✅ Redis available (breaker closed)")
+            self._set_state(STATE_CLOSED)
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == STATE_HALF_OPEN or (
+            self.state == STATE_CLOSED and self.consecutive_failures >= self.failures_to_open
+        ):
+            if self.state == STATE_CLOSED:
+                self.stats["trips"] += 1
+                logger.warning("⚠️ Redis unavailable -> in-memory fallback (breaker open)")
+            self.opened_at = time.monotonic()
+            self._set_state(STATE_OPEN)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        if self.publish_runtime:
+            runtime.REDIS = self.client if state == STATE_CLOSED else None
+
+    def should_probe(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return self.state == STATE_OPEN and now - self.opened_at >= self.reset_sec
+
+    def _watch_commands(self, client: Any) -> None:
+        # ошибки соединения в обычных командах и в pipeline тоже открывают breaker (не ждём следующего ping)
+        client.execute_command = self._report_errors(client.execute_command)
+
+        orig_pipeline = getattr(client, "pipeline", None)
+        if orig_pipeline is None:
+            return
+
+        def pipeline(*args: Any, **kwargs: Any) -> Any:
+            pipe = orig_pipeline(*args, **kwargs)
+            pipe.execute = self._report_errors(pipe.execute)
+            # WATCH / команды до MULTI идут мимо execute — сразу в соединение
+            pipe.immediate_execute_command = self._report_errors(pipe.immediate_execute_command)
+            return pipe
+
+        client.pipeline = pipeline
+
+    def _report_errors(self, fn: Any) -> Any:
+        async def wrapped(*args: Any, **kwargs: Any) -> Any:
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                if _is_connection_error(e):
+                    self.stats["command_errors"] += 1
+                    self.record_failure()
+                raise
+
+        return wrapped
+
+    # ---------------- health ----------------
+    async def ping(self) -> bool:
+        if self.client is None:
+            return False
+        if self.state == STATE_OPEN:
+            self.stats["probes"] += 1
+            self._set_state(STATE_HALF_OPEN)
+
+        t0 = time.perf_counter()
+        try:
+            await self.client.ping()
+        except Exception:
+            self.record_failure()
+            return False
+
+        dt = time.perf_counter() - t0
+        self.stats["pings"] += 1
+        self.last_ping_sec = dt
+        self.ping_sum += dt
+        for i, b in enumerate(PING_BUCKETS):
+            if dt <= b:
+                self.ping_hist[i] += 1
+                break
+        else:
+            self.ping_hist[-1] += 1
+        self.record_success()
+        return True
+
+    async def health_loop(self, every: float = REDIS_HEALTHCHECK_EVERY_SECONDS) -> None:
+        try:
+            while True:
+                await asyncio.sleep(min(every, self.reset_sec) if self.state != STATE_CLOSED else every)
+                if self.client is None:
+                    continue
+                if self.state == STATE_OPEN and not self.should_probe():
+                    continue
+                await self.ping()
+        except asyncio.CancelledError:
+            return
+
+    # ---------------- metrics ----------------
+    def pool_stats(self) -> dict[str, int]:
+        pool = self.pool
+        if pool is None:
+            return {"max": self.max_connections, "created": 0, "in_use": 0, "idle": 0}
+        in_use = len(getattr(pool, "_in_use_connections", ()) or ())
+        idle = len(getattr(pool, "_available_connections", ()) or ())
+        return {"max": self.max_connections, "created": in_use + idle, "in_use": in_use, "idle": idle}
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "last_ping_ms": None if self.last_ping_sec is None else round(self.last_ping_sec * 1000, 2),
+            "pool": self.pool_stats(),
+            **self.stats,
+        }
+
+    def render_prometheus(self, lines: list[str]) -> None:
+        lines.append("# HELP findex_redis_breaker_open Redis circuit breaker state (1 = fallback to memory)")
+        lines.append("# TYPE findex_redis_breaker_open gauge")
+        lines.append(f"findex_redis_breaker_open {0 if self.state == STATE_CLOSED else 1}")
+        lines.append("# TYPE findex_redis_breaker_events_total counter")
+        for k, v in sorted(self.stats.items()):
+            lines.append(f'findex_redis_breaker_events_total{{event="{k}"}} {v}')
+
+        lines.append("# HELP findex_redis_pool_connections Redis connection pool")
+        lines.append("# TYPE findex_redis_pool_connections gauge")
+        for k, v in sorted(self.pool_stats().items()):
+            lines.append(f'findex_redis_pool_connections{{kind="{k}"}} {v}')
+
+        lines.append("# HELP findex_redis_ping_seconds Health-check PING latency")
+        lines.append("# TYPE findex_redis_ping_seconds histogram")
+        acc = 0
+        for b, n in zip(PING_BUCKETS, self.ping_hist):
+            acc += n
+            lines.append(f'findex_redis_ping_seconds_bucket{{le="{b}"}} {acc}')
+        acc += self.ping_hist[-1]
+        lines.append(f'findex_redis_ping_seconds_bucket{{le="+Inf"}} {acc}')
+        lines.append(f"findex_redis_ping_seconds_sum {self.ping_sum:.6f}")
+        lines.append(f"findex_redis_ping_seconds_count {acc}")
+
+
+# менеджер процесса (bot / webhook-воркер / jobs / resurrection_worker создают его на старте)
+MANAGER: Optional[RedisManager] = None
+
+
+def get_manager() -> Optional[RedisManager]:
+    return MANAGER
+
+
+async def init(*, publish_runtime: bool, default_host: str = "127.0.0.1") -> RedisManager:
+    global MANAGER
+    if MANAGER is None:
+        MANAGER = RedisManager(build_url(default_host=default_host), publish_runtime=publish_runtime)
+    await MANAGER.connect()
+    return MANAGER
+
+
+async def shutdown() -> None:
+    global MANAGER
+    mgr, MANAGER = MANAGER, None
+    if mgr is not None:
+        await mgr.close()
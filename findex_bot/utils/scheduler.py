@@ -0,0 +1,280 @@
+# findex_bot/utils/scheduler.py
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import heapq
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+
+import findex_bot.runtime as runtime
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Отложенные действия (удаление эфемерных сообщений) в Redis ZSET
+# ======================================================
+# Было: на каждое "удалить через N секунд" — своя корутина с asyncio.sleep,
+# под нагрузкой тысячи спящих задач, на рестарте всё теряется и в чатах остаётся мусор.
+#
+# Стало: schedule() — один ZADD в delayed_actions:{bot_id}
+#   score  = due_ts (unix, float)
+#   member = "{action}:{chat_id}:{message_id}"  (повторное планирование того же сообщения — просто новый score)
+# Один цикл на процесс (run_loop) забирает созревшие записи одним EVAL (ZRANGEBYSCORE + ZREM —
+# запись достаётся ровно одной реплике) и выполняет их пачками не быстрее DELAYED_ACTIONS_RATE в секунду.
+# Записи живут в Redis — после рестарта их выполнит новый процесс.
+#
+# Без Redis (или если Redis упал) — та же очередь в памяти (heap); на остановке она выполняется сразу.
+#
+# after= — необязательная доочистка (state/кэш) после действия; хранится только в памяти процесса,
+# выполняется, если действие забрал этот же процесс.
+
+DELAYED_ACTIONS_RATE = max(1, int(os.getenv("DELAYED_ACTIONS_RATE", "20")))      # действий в секунду
+DELAYED_ACTIONS_IDLE_SEC = float(os.getenv("DELAYED_ACTIONS_IDLE_SEC", "1.0"))   # максимум сна цикла
+DELAYED_ACTIONS_ERROR_SEC = float(os.getenv("DELAYED_ACTIONS_ERROR_SEC", "1.0"))  # пауза после сбоя итерации
+
+KEY_DELAYED_ACTIONS = "delayed_actions:{bot_id}"
+
+# забрать до ARGV[2] созревших записей и вернуть их + score ближайшей оставшейся
+_CLAIM_LUA = r"""
+local due = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, tonumber(ARGV[2]))
+if #due > 0 then
+  redis.call("ZREM", KEYS[1], unpack(due))
+end
+local nxt = redis.call("ZRANGE", KEYS[1], 0, 0, "WITHSCORES")
+return {due, nxt[2] or ""}
+"""
+
+ActionFn = Callable[[Bot, int, int], Awaitable[Any]]
+
+
+async def _delete(bot: Bot, chat_id: int, message_id: int) -> None:
+    await bot.delete_message(chat_id=chat_id, message_id=message_id)
+
+
+ACTIONS: Dict[str, ActionFn] = {
+    "delete": _delete,
+}
+
+# накопительные счётчики процесса (для /metrics)
+TOTALS: dict[str, int] = {
+    "scheduled": 0,
+    "scheduled_memory": 0,
+    "executed": 0,
+    "failed": 0,
+    "loop_errors": 0,
+}
+
+
+def make_member(action: str, chat_id: int, message_id: int) -> str:
+    return f"{action}:{int(chat_id)}:{int(message_id)}"
+
+
+def parse_member(member: Any) -> Tuple[str, int, int]:
+    action, chat_id, message_id = str(member).split(":", 2)
+    return action, int(chat_id), int(message_id)
+
+
+class DelayedActionScheduler:
+    def __init__(self, *, rate: int = DELAYED_ACTIONS_RATE, idle_sec: float = DELAYED_ACTIONS_IDLE_SEC) -> None:
+        self.rate = max(1, int(rate))
+        self.idle_sec = max(0.05, float(idle_sec))
+
+        self._bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._next_due: float = 0.0
+
+        # fallback без Redis: heap (due, member) + актуальный due по member (устаревшие записи heap пропускаются)
+        self._mem_heap: List[Tuple[float, str]] = []
+        self._mem_due: Dict[str, float] = {}
+
+        # member -> (due, after)
+        self._after: Dict[str, Tuple[float, Callable[[], Awaitable[Any]]]] = {}
+
+    # ---------------- schedule ----------------
+    async def schedule(
+        self,
+        bot: Bot,
+        chat_id: int,
+        message_id: int,
+        delay: float,
+        *,
+        action: str = "delete",
+        after: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> None:
+        if action not in ACTIONS:
+            raise ValueError(f"unknown delayed action: {action}")
+
+        member = make_member(action, chat_id, message_id)
+        due = time.time() + max(0.0, float(delay))
+        if after is not None:
+            self._after[member] = (due, after)
+        else:
+            self._after.pop(member, None)
+
+        TOTALS["scheduled"] += 1
+        r = getattr(runtime, "REDIS", None)
+        if r is not None:
+            try:
+                await r.zadd(KEY_DELAYED_ACTIONS.format(bot_id=int(bot.id)), {member: due})
+                self._poke(due)
+                return
+            except Exception:
+                logger.exception("scheduler: zadd failed member=%s -> memory", member)
+
+        TOTALS["scheduled_memory"] += 1
+        self._mem_due[member] = due
+        heapq.heappush(self._mem_heap, (due, member))
+        self._poke(due)
+
+    def _poke(self, due: float) -> None:
+        # цикл спит до ближайшей известной записи — будим, если новая раньше
+        if self._wakeup is not None and (not self._next_due or due < self._next_due):
+            self._wakeup.set()
+
+    def pending_memory(self) -> int:
+        return len(self._mem_due)
+
+    # ---------------- claim ----------------
+    async def _claim_redis(self, bot: Bot, now: float) -> Tuple[List[str], Optional[float]]:
+        r = getattr(runtime, "REDIS", None)
+        if r is None:
+            return [], None
+        try:
+            due, nxt = await r.eval(
+                _CLAIM_LUA, 1, KEY_DELAYED_ACTIONS.format(bot_id=int(bot.id)), repr(now), str(self.rate)
+            )
+        except Exception:
+            logger.exception("scheduler: claim failed")
+            return [], None
+        return [str(m) for m in (due or [])], (float(nxt) if nxt else None)
+
+    def _claim_memory(self, now: float, limit: int) -> Tuple[List[str], Optional[float]]:
+        out: List[str] = []
+        while self._mem_heap and len(out) < limit:
+            due, member = self._mem_heap[0]
+            if self._mem_due.get(member) != due:
+                heapq.heappop(self._mem_heap)  # перепланирована или уже выполнена
+                continue
+            if due > now:
+                break
+            heapq.heappop(self._mem_heap)
+            self._mem_due.pop(member, None)
+            out.append(member)
+        return out, (self._mem_heap[0][0] if self._mem_heap else None)
+
+    # ---------------- execute ----------------
+    async def _execute(self, bot: Bot, member: str) -> None:
+        hook = self._after.pop(member, None)
+        try:
+            action, chat_id, message_id = parse_member(member)
+        except Exception:
+            logger.warning("scheduler: bad member %r", member)
+            return
+
+        fn = ACTIONS.get(action)
+        if fn is None:
+            logger.warning("scheduler: unknown action %r", member)
+            return
+        try:
+            await fn(bot, chat_id, message_id)
+            TOTALS["executed"] += 1
+        except Exception:
+            # сообщение уже удалено пользователем / слишком старое — не повод шуметь в логах
+            TOTALS["failed"] += 1
+
+        if hook is not None:
+            try:
+                await hook[1]()
+            except Exception:
+                logger.exception("scheduler: after-hook failed member=%s", member)
+
+    async def run_due(self, bot: Bot, now: Optional[float] = None) -> Tuple[int, Optional[float]]:
+        """Одна пачка созревших действий (не больше rate). -> (выполнено, due ближайшей оставшейся записи)."""
+        now = time.time() if now is None else float(now)
+        redis_members, redis_next = await self._claim_redis(bot, now)
+        mem_members, mem_next = self._claim_memory(now, self.rate - len(redis_members))
+        members = redis_members + mem_members
+
+        if members:
+            await asyncio.gather(*(self._execute(bot, m) for m in members))
+
+        self._prune_hooks(now)
+        nexts = [x for x in (redis_next, mem_next) if x is not None]
+        return len(members), (min(nexts) if nexts else None)
+
+    def _prune_hooks(self, now: float) -> None:
+        # запись забрала другая реплика — хук здесь уже не выполнится
+        stale = [m for m, (due, _fn) in self._after.items() if now - due > 60]
+        for m in stale:
+            self._after.pop(m, None)
+
+    # ---------------- loop ----------------
+    async def run_loop(self, bot: Bot) -> None:
+        self._wakeup = asyncio.Event()
+        try:
+            while True:
+                try:
+                    started = time.monotonic()
+                    done, next_due = await self.run_due(bot)
+                    self._next_due = next_due or 0.0
+
+                    if done >= self.rate:
+                        # упёрлись в лимит пачки — следующая не раньше чем через секунду от начала этой
+                        await asyncio.sleep(max(0.0, 1.0 - (time.monotonic() - started)))
+                        continue
+
+                    sleep_for = self.idle_sec
+                    if next_due is not None:
+                        sleep_for = min(sleep_for, max(0.0, next_due - time.time()))
+                    self._wakeup.clear()
+                    with contextlib.suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=sleep_for)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    # цикл не умирает: иначе сохранённые удаления встанут до рестарта процесса
+                    TOTALS["loop_errors"] += 1
+                    logger.exception("scheduler: loop iteration failed")
+                    await asyncio.sleep(DELAYED_ACTIONS_ERROR_SEC)
+        except asyncio.CancelledError:
+            return
+        finally:
+            self._wakeup = None
+
+    def start(self, bot: Bot) -> asyncio.Task:
+        if self._task is not None and not self._task.done():
+            return self._task
+        self._bot = bot
+        self._task = asyncio.create_task(self.run_loop(bot), name="delayed_actions")
+        return self._task
+
+    async def stop(self) -> int:
+        """Останавливает цикл; очередь в памяти выполняется сразу (Redis-записи дождутся нового процесса)."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await task
+
+        if self._bot is None or not self._mem_due:
+            return 0
+
+        members = list(self._mem_due)
+        self._mem_due.clear()
+        self._mem_heap.clear()
+        for i in range(0, len(members), self.rate):
+            await asyncio.gather(*(self._execute(self._bot, m) for m in members[i : i + self.rate]))
+        return len(members)
+
+
+SCHEDULER = DelayedActionScheduler()
+
+
+def totals_snapshot() -> dict[str, int]:
+    return dict(TOTALS)
@@ -0,0 +1,178 @@
+# findex_bot/utils/share_cache.py
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Iterable, Optional
+
+import findex_bot.runtime as runtime
+from findex_bot.utils import ad_render
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Кэш inline-share карточек (@bot share_ad_<id>)
+# ======================================================
+# Было: каждое нажатие клавиши в inline-режиме = сессия БД + AdRepo.get + build_share_card,
+# ответ с cache_time=1 и is_personal=True — Telegram переспрашивал бота постоянно.
+#
+# Стало:
+#   - готовая карточка (id/title/description/HTML-текст результата) лежит в Redis
+#     inline_share:{ad_id} (общая для всех процессов) на SHARE_CACHE_TTL_SEC;
+#     «нельзя поделиться» (нет объявления / не опубликовано / скрыто) — тоже кэшируется,
+#     но на SHARE_NEGATIVE_TTL_SEC;
+#   - сброс — из AdRepo: set_status / mark_published / patch_payload, если патч трогает поля
+#     карточки или флаги видимости (SHARE_FIELDS); служебные ключи (координаты превью) кэш не трогают;
+#   - без Redis — тот же кэш в памяти процесса.
+# В карточку зашит @username бота (deep link) — он же часть проверки записи.
+
+SHARE_CACHE_TTL_SEC = int(os.getenv("SHARE_CACHE_TTL_SEC", "900"))
+SHARE_NEGATIVE_TTL_SEC = int(os.getenv("SHARE_NEGATIVE_TTL_SEC", "30"))
+SHARE_CACHE_MEMORY_MAX = max(16, int(os.getenv("SHARE_CACHE_MEMORY_MAX", "2048")))
+
+KEY_SHARE = "inline_share:{ad_id}"
+
+# флаги payload, которые проверяет vacancy_utils.is_ad_shareable
+_VISIBILITY_FIELDS = (
+    "status",
+    "deleted", "is_deleted", "removed", "is_removed",
+    "archived", "is_archived",
+    "hidden", "is_hidden", "unpublished", "is_unpublished",
+    "is_active",
+)
+SHARE_FIELDS = frozenset(ad_render.RENDER_FIELDS) | frozenset(_VISIBILITY_FIELDS)
+
+# накопительные счётчики процесса (для /metrics): inline-запросы по типу (rate() = QPS) и кэш
+QUERIES: dict[str, int] = {
+    "share": 0,
+    "search": 0,
+    "empty": 0,
+}
+TOTALS: dict[str, int] = {
+    "hit": 0,
+    "negative_hit": 0,
+    "miss": 0,
+    "stored": 0,
+    "invalidated": 0,
+    "error": 0,
+}
+
+
+@dataclass(frozen=True)
+class ShareCard:
+    ad_id: int
+    title: str
+    description: str
+    text: str  # HTML (build_share_card)
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    card: Optional[ShareCard]  # None — делиться нельзя
+    bot_username: str
+
+    def dumps(self) -> str:
+        return json.dumps(
+            {"u": self.bot_username, "card": (asdict(self.card) if self.card else None)},
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def loads(cls, raw: str) -> "CacheEntry":
+        data = json.loads(raw)
+        card = data.get("card")
+        return cls(card=(ShareCard(**card) if card else None), bot_username=str(data.get("u") or ""))
+
+
+def affects_share(payload_patch: Iterable[str]) -> bool:
+    return any(k in SHARE_FIELDS for k in payload_patch)
+
+
+# память: fallback без Redis (ad_id -> (срок, запись))
+_MEM: dict[int, tuple[float, CacheEntry]] = {}
+
+
+def _key(ad_id: int) -> str:
+    return KEY_SHARE.format(ad_id=int(ad_id))
+
+
+def _mem_get(ad_id: int) -> Optional[CacheEntry]:
+    hit = _MEM.get(int(ad_id))
+    if hit is None:
+        return None
+    expires, entry = hit
+    if expires <= time.monotonic():
+        _MEM.pop(int(ad_id), None)
+        return None
+    return entry
+
+
+def _mem_put(ad_id: int, entry: CacheEntry, ttl: int) -> None:
+    if len(_MEM) >= SHARE_CACHE_MEMORY_MAX:
+        now = time.monotonic()
+        for k in [k for k, (exp, _e) in _MEM.items() if exp <= now]:
+            _MEM.pop(k, None)
+        while len(_MEM) >= SHARE_CACHE_MEMORY_MAX:
+            _MEM.pop(next(iter(_MEM)), None)
+    _MEM[int(ad_id)] = (time.monotonic() + ttl, entry)
+
+
+async def get(ad_id: int, bot_username: str) -> Optional[CacheEntry]:
+    """-> запись кэша (card=None — «делиться нельзя») или None при промахе."""
+    entry: Optional[CacheEntry] = None
+    r = getattr(runtime, "REDIS", None)
+    if r is not None:
+        try:
+            raw = await r.get(_key(ad_id))
+            entry = CacheEntry.loads(raw) if raw else None
+        except Exception:
+            TOTALS["error"] += 1
+            logger.exception("share_cache: get failed ad_id=%s", ad_id)
+    else:
+        entry = _mem_get(ad_id)
+
+    if entry is None or entry.bot_username != bot_username:
+        TOTALS["miss"] += 1
+        return None
+    TOTALS["hit" if entry.card is not None else "negative_hit"] += 1
+    return entry
+
+
+async def put(ad_id: int, entry: CacheEntry) -> None:
+    ttl = SHARE_CACHE_TTL_SEC if entry.card is not None else SHARE_NEGATIVE_TTL_SEC
+    if ttl <= 0:
+        return
+    TOTALS["stored"] += 1
+    r = getattr(runtime, "REDIS", None)
+    if r is None:
+        _mem_put(ad_id, entry, ttl)
+        return
+    try:
+        await r.set(_key(ad_id), entry.dumps(), ex=ttl)
+    except Exception:
+        TOTALS["error"] += 1
+        logger.exception("share_cache: put failed ad_id=%s", ad_id)
+
+
+async def invalidate(ad_id: int) -> None:
+    TOTALS["invalidated"] += 1
+    _MEM.pop(int(ad_id), None)
+    r = getattr(runtime, "REDIS", None)
+    if r is None:
+        return
+    try:
+        await r.delete(_key(ad_id))
+    except Exception:
+        TOTALS["error"] += 1
+        logger.exception("share_cache: invalidate failed ad_id=%s", ad_id)
+
+
+def queries_snapshot() -> dict[str, int]:
+    return dict(QUERIES)
+
+
+def totals_snapshot() -> dict[str, int]:
+    return dict(TOTALS)
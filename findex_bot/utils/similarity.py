@@ -0,0 +1,313 @@
+# findex_bot/utils/similarity.py
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import hashlib
+import html
+import logging
+import os
+import random
+import re
+import struct
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Поиск почти-дублей объявлений: MinHash + LSH
+# ======================================================
+# Текст объявления (title + description/about + location) -> множество символьных k-грамм,
+# контакты (телефоны / @username / email / ссылки) -> отдельные "токены-шинглы":
+# совпавший контакт — сильный сигнал перепоста.
+#
+# MinHash: SIM_NUM_PERM независимых хэш-функций h(x) = (a*x + b) mod 2^61-1,
+# подпись — минимум каждой по всем шинглам. Доля совпавших позиций двух подписей
+# оценивает Jaccard множеств шинглов.
+#
+# LSH: подпись режется на SIM_BANDS полос по rows значений, хэш полосы — бакет.
+# Два объявления — кандидаты, если совпал хоть один бакет:
+# P(кандидат) = 1 - (1 - J^rows)^bands; при 32x4 — J=0.6 -> ~99%, J=0.3 -> ~23%.
+#
+# Хранение: Postgres ad_minhash (signature INTEGER[], bands BIGINT[] + GIN) — см db/ad_similarity.py.
+# Подпись считается при отправке на модерацию (и бэкфиллом для старых объявлений),
+# кандидаты — один индексный запрос, ранжирование — по оценке Jaccard в процессе.
+#
+# Бэкфилл: python -m findex_bot.utils.similarity backfill [--batch 500]
+
+SIM_NUM_PERM = 128
+SIM_BANDS = 32
+SIM_ROWS = SIM_NUM_PERM // SIM_BANDS
+SHINGLE_K = 5
+
+SIM_WINDOW_DAYS = int(os.getenv("SIM_WINDOW_DAYS", "30"))
+SIM_TOP_K = int(os.getenv("SIM_TOP_K", "3"))
+SIM_MIN_SCORE = float(os.getenv("SIM_MIN_SCORE", "0.5"))
+SIM_MAX_CANDIDATES = int(os.getenv("SIM_MAX_CANDIDATES", "200"))
+
+# лимиты Telegram: подпись медиа / текст сообщения
+CAPTION_LIMIT = 1024
+MESSAGE_LIMIT = 4096
+
+_MERSENNE_61 = (1 << 61) - 1
+_MASK_32 = (1 << 32) - 1
+
+# коэффициенты фиксированы: подписи в БД должны совпадать между процессами и релизами
+_rng = random.Random(0x5F1D3)
+_PERMS: tuple[tuple[int, int], ...] = tuple(
+    (_rng.randrange(1, _MERSENNE_61), _rng.randrange(0, _MERSENNE_61)) for _ in range(SIM_NUM_PERM)
+)
+del _rng
+
+_NON_WORD_RE = re.compile(r"[^0-9a-zа-я]+")
+_PHONE_RE = re.compile(r"\+?\d[\d\s().-]{5,}\d")
+_TG_RE = re.compile(r"(?<![\w.])@([a-z0-9_]{4,32})")
+_EMAIL_RE = re.compile(r"[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}")
+_URL_RE = re.compile(r"(?:https?://|www\.)([^\s/]+/?[^\s?#]*)")
+
+
+# ---------------- shingles ----------------
+def normalize_text(text: str) -> str:
+    s = (text or "").lower().replace("ё", "е")
+    return _NON_WORD_RE.sub(" ", s).strip()
+
+
+def contact_tokens(contacts: str) -> set[str]:
+    raw = (contacts or "").lower()
+    out: set[str] = set()
+    for m in _PHONE_RE.findall(raw):
+        digits = re.sub(r"\D", "", m)
+        if len(digits) >= 7:
+            out.add("tel:" + digits[-10:])  # 8-999… и +7-999… — один номер
+    out.update("tg:" + u for u in _TG_RE.findall(raw))
+    out.update("mail:" + e for e in _EMAIL_RE.findall(raw))
+    out.update("url:" + u.rstrip("/") for u in _URL_RE.findall(raw))
+    return out
+
+
+def _h64(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def shingle_hashes(payload: dict[str, Any]) -> set[int]:
+    p = payload or {}
+    body = " ".join(
+        str(p.get(k) or "")
+        for k in ("title", "description", "about", "location")
+    )
+    norm = normalize_text(body)
+
+    grams: set[str] = set()
+    if len(norm) <= SHINGLE_K:
+        if norm:
+            grams.add(norm)
+    else:
+        grams.update(norm[i : i + SHINGLE_K] for i in range(len(norm) - SHINGLE_K + 1))
+    grams.update(contact_tokens(str(p.get("contacts") or "")))
+    return {_h64(g) for g in grams}
+
+
+# ---------------- minhash / lsh ----------------
+def _signed32(v: int) -> int:
+    v &= _MASK_32
+    return v - (1 << 32) if v >= (1 << 31) else v
+
+
+def _signed64(v: int) -> int:
+    return v - (1 << 64) if v >= (1 << 63) else v
+
+
+def minhash(hashes: Iterable[int]) -> List[int]:
+    """Подпись длины SIM_NUM_PERM (int32 со знаком — под INTEGER[] в Postgres). Пустое множество -> []."""
+    hs = [h % _MERSENNE_61 for h in hashes]
+    if not hs:
+        return []
+    p = _MERSENNE_61
+    return [_signed32(min((a * h + b) % p for h in hs)) for a, b in _PERMS]
+
+
+def lsh_bands(signature: Sequence[int]) -> List[int]:
+    """Хэш каждой полосы (номер полосы входит в хэш — бакеты разных полос не пересекаются)."""
+    if len(signature) != SIM_NUM_PERM:
+        return []
+    out: List[int] = []
+    for band in range(SIM_BANDS):
+        rows = signature[band * SIM_ROWS : (band + 1) * SIM_ROWS]
+        raw = struct.pack(f"<H{SIM_ROWS}i", band, *rows)
+        out.append(_signed64(int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "little")))
+    return out
+
+
+def estimate_jaccard(a: Sequence[int], b: Sequence[int]) -> float:
+    if not a or len(a) != len(b):
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+@dataclass(frozen=True)
+class Signature:
+    values: List[int]
+    bands: List[int]
+
+
+def signature_for(payload: dict[str, Any]) -> Optional[Signature]:
+    values = minhash(shingle_hashes(payload))
+    if not values:
+        return None
+    return Signature(values=values, bands=lsh_bands(values))
+
+
+@dataclass(frozen=True)
+class Match:
+    ad_id: int
+    score: float
+    public_url: Optional[str] = None
+
+
+def rank_candidates(
+    signature: Sequence[int],
+    candidates: Iterable[tuple[int, Sequence[int], Optional[str]]],
+    *,
+    k: int = SIM_TOP_K,
+    min_score: float = SIM_MIN_SCORE,
+) -> List[Match]:
+    scored = [
+        Match(ad_id=int(ad_id), score=estimate_jaccard(signature, sig), public_url=url)
+        for ad_id, sig, url in candidates
+    ]
+    scored = [m for m in scored if m.score >= min_score]
+    scored.sort(key=lambda m: (-m.score, -m.ad_id))
+    return scored[: max(0, int(k))]
+
+
+# ---------------- storage ----------------
+async def index_ad(session: Any, *, ad_id: int, role: str, payload: dict[str, Any]) -> Optional[Signature]:
+    from findex_bot.db import ad_similarity
+
+    sig = signature_for(payload)
+    if sig is None:
+        return None
+    await ad_similarity.upsert_signatures(
+        session,
+        [{"ad_id": int(ad_id), "role": str(role), "signature": sig.values, "bands": sig.bands}],
+    )
+    return sig
+
+
+async def find_near_duplicates(
+    session: Any,
+    *,
+    ad_id: int,
+    role: str,
+    payload: dict[str, Any],
+    k: int = SIM_TOP_K,
+    window_days: int = SIM_WINDOW_DAYS,
+) -> List[Match]:
+    """Индексирует объявление и возвращает top-k похожих среди опубликованных за window_days."""
+    from findex_bot.db import ad_similarity
+
+    sig = await index_ad(session, ad_id=ad_id, role=role, payload=payload)
+    if sig is None:
+        return []
+    since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=int(window_days))
+    candidates = await ad_similarity.fetch_candidates(
+        session,
+        ad_id=int(ad_id),
+        role=str(role),
+        bands=sig.bands,
+        since=since,
+        limit=SIM_MAX_CANDIDATES,
+    )
+    return rank_candidates(sig.values, candidates, k=k)
+
+
+def render_matches(matches: Sequence[Match]) -> str:
+    """Блок для карточки модерации (HTML); пусто — если похожих нет."""
+    if not matches:
+        return ""
+    parts: List[str] = []
+    for m in matches:
+        label = f"#{m.ad_id}"
+        if m.public_url:
+            label = f'<a href="{html.escape(m.public_url, quote=True)}">{label}</a>'
+        parts.append(f"{label} {round(m.score * 100)}%")
+    return "\n\n🔁 Похожие опубликованные: " + ", ".join(parts)
+
+
+def with_note(text: str, note: str, *, media: bool) -> str:
+    """Дописывает блок похожих, только если карточка остаётся в лимите Telegram."""
+    if not note:
+        return text
+    limit = CAPTION_LIMIT if media else MESSAGE_LIMIT
+    out = (text or "") + note
+    return out if len(out) <= limit else text
+
+
+async def moderation_note(ad: Any) -> str:
+    """
+    Похожие объявления для карточки модерации. Никогда не падает: ошибка поиска
+    не должна мешать отправке на модерацию.
+    """
+    try:
+        from findex_bot.db.db import get_sessionmaker
+
+        t0 = time.perf_counter()
+        async with get_sessionmaker()() as session:
+            matches = await find_near_duplicates(
+                session,
+                ad_id=int(ad.id),
+                role=str(ad.role),
+                payload=dict(ad.payload or {}),
+            )
+        logger.info(
+            "similarity ad_id=%s matches=%s ms=%.1f",
+            ad.id,
+            [(m.ad_id, round(m.score, 2)) for m in matches],
+            (time.perf_counter() - t0) * 1000,
+        )
+        return render_matches(matches)
+    except Exception:
+        logger.exception("similarity: near-duplicate lookup failed ad_id=%s", getattr(ad, "id", None))
+        return ""
+
+
+# ---------------- backfill ----------------
+async def backfill(*, batch: int = 500) -> int:
+    """Подписи для всех pending/published объявлений (keyset по id, одна пачка — один executemany)."""
+    from findex_bot.db import ad_similarity
+    from findex_bot.db.db import get_sessionmaker
+
+    total = 0
+    after_id = 0
+    while True:
+        async with get_sessionmaker()() as session:
+            rows = await ad_similarity.fetch_backfill_batch(session, after_id=after_id, limit=batch)
+            if not rows:
+                return total
+            to_upsert = []
+            for ad_id, role, payload in rows:
+                sig = signature_for(payload)
+                if sig is not None:
+                    to_upsert.append({"ad_id": ad_id, "role": role, "signature": sig.values, "bands": sig.bands})
+            await ad_similarity.upsert_signatures(session, to_upsert)
+        total += len(to_upsert)
+        after_id = rows[-1][0]
+        logger.info("similarity backfill: up to ad_id=%s, indexed=%s", after_id, total)
+
+
+def _main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m findex_bot.utils.similarity")
+    parser.add_argument("command", choices=("backfill",))
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    n = asyncio.run(backfill(batch=max(1, args.batch)))
+    print(f"indexed={n}")
+
+
+if __name__ == "__main__":
+    _main()
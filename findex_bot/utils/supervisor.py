@@ -0,0 +1,172 @@
+# findex_bot/utils/supervisor.py
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+
+from findex_bot.utils import publish_queue
+from findex_bot.utils.scheduler import SCHEDULER, DelayedActionScheduler
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Фоновые задачи процесса и мягкая остановка
+# ======================================================
+# Раньше хендлеры делали голый asyncio.create_task(...) (автоудаление подсказок,
+# эфемерные уведомления) — при рестарте такие задачи просто пропадали, а апдейты
+# в обработке обрывались закрытием Redis/сессии.
+#
+# Теперь:
+#   spawn(coro)                                — фоновая задача под учётом (ссылка держится до завершения)
+#   await delete_later(bot, chat, msg, delay)  — отложенное удаление (utils/scheduler: Redis ZSET + один цикл)
+#   UpdateTrackingMiddleware                   — счётчик апдейтов в обработке (самый внешний outer на update)
+#
+# Остановка (dp.shutdown, до закрытия сессии бота и Redis):
+#   1) accepting=False — webhook-воркер отвечает 503, Telegram передоставит апдейт новому процессу
+#      (в polling новые апдейты перестают приходить сами — aiogram уже остановил getUpdates);
+#   2) ждём апдейты в обработке (общий дедлайн SHUTDOWN_DRAIN_SEC);
+#   3) останавливаем цикл отложенных действий: записи в Redis выполнит следующий процесс,
+#      очередь в памяти (без Redis) выполняется сразу;
+#   4) ждём остальные фоновые задачи до дедлайна, остаток отменяем;
+#   5) останавливаем очередь публикации в канал (utils/publish_queue): текущий пост дописывается,
+#      задачи в Redis stream заберёт следующий процесс, очередь в памяти остаётся pending в /намодерации.
+# На старте (dp.startup) запускаются цикл отложенных действий и очередь публикации этого бота.
+
+SHUTDOWN_DRAIN_SEC = float(os.getenv("SHUTDOWN_DRAIN_SEC", "10"))
+
+
+class TaskSupervisor:
+    def __init__(self, scheduler: DelayedActionScheduler = SCHEDULER) -> None:
+        self.accepting = True
+        self.in_flight = 0
+        self.scheduler = scheduler
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks: set[asyncio.Task] = set()
+
+    # ---------------- background tasks ----------------
+    def spawn(self, coro: Coroutine[Any, Any, Any], *, name: Optional[str] = None) -> asyncio.Task:
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+        return task
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            logger.error("supervisor: background task %s failed", task.get_name(), exc_info=exc)
+
+    def pending_tasks(self) -> int:
+        return len(self._tasks)
+
+    # ---------------- in-flight updates ----------------
+    def update_started(self) -> None:
+        self.in_flight += 1
+        self._idle.clear()
+
+    def update_finished(self) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+        if self.in_flight == 0:
+            self._idle.set()
+
+    # ---------------- shutdown ----------------
+    async def drain(self, timeout: float = SHUTDOWN_DRAIN_SEC) -> dict[str, int]:
+        self.accepting = False
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, float(timeout))
+
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._idle.wait(), timeout=max(0.0, deadline - loop.time()))
+        unfinished_updates = self.in_flight
+
+        flushed = await self.scheduler.stop()
+
+        current = asyncio.current_task()
+        tasks = [t for t in self._tasks if t is not current and not t.done()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=max(0.0, deadline - loop.time()))
+        stuck = [t for t in tasks if not t.done()]
+        for t in stuck:
+            t.cancel()
+        if stuck:
+            await asyncio.gather(*stuck, return_exceptions=True)
+        cancelled = len(stuck)
+
+        report = {
+            "unfinished_updates": unfinished_updates,
+            "flushed_memory_actions": flushed,
+            "cancelled_tasks": cancelled,
+        }
+        logger.info("supervisor: drained %s", report)
+        return report
+
+
+SUPERVISOR = TaskSupervisor()
+
+
+def spawn(coro: Coroutine[Any, Any, Any], *, name: Optional[str] = None) -> asyncio.Task:
+    return SUPERVISOR.spawn(coro, name=name)
+
+
+async def delete_later(
+    bot: Bot,
+    chat_id: int,
+    message_id: int,
+    delay: float,
+    *,
+    after: Optional[Callable[[], Awaitable[Any]]] = None,
+) -> None:
+    """
+    Удалить сообщение через delay секунд (переживает рестарт, если есть Redis).
+    after — необязательная доочистка (state/кэш) после удаления, только в памяти процесса.
+    """
+    await SUPERVISOR.scheduler.schedule(bot, chat_id, message_id, delay, after=after)
+
+
+class UpdateTrackingMiddleware(BaseMiddleware):
+    def __init__(self, supervisor: TaskSupervisor) -> None:
+        self.supervisor = supervisor
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        self.supervisor.update_started()
+        try:
+            return await handler(event, data)
+        finally:
+            self.supervisor.update_finished()
+
+
+def install(dp: Dispatcher, supervisor: TaskSupervisor = SUPERVISOR) -> TaskSupervisor:
+    """Самым первым outer-middleware на update (вокруг FSM flush); drain — в dp.shutdown."""
+    mw = UpdateTrackingMiddleware(supervisor)
+    manager = dp.update.outer_middleware
+    items = list(manager)
+    for m in items:
+        manager.unregister(m)
+    manager.register(mw)
+    for m in items:
+        manager.register(m)
+
+    async def _start_scheduler(bot: Bot) -> None:
+        supervisor.scheduler.start(bot)
+        publish_queue.PUBLISH_QUEUE.start(bot)
+
+    async def _drain_on_shutdown() -> None:
+        await supervisor.drain()
+        await publish_queue.PUBLISH_QUEUE.stop()
+
+    dp.startup.register(_start_scheduler)
+    dp.shutdown.register(_drain_on_shutdown)
+    return supervisor
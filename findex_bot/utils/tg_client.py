@@ -0,0 +1,151 @@
+# findex_bot/utils/tg_client.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Hashable, Optional
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetChat, GetChatMember, GetMe
+
+from findex_bot.utils.metrics import TelegramCallsMiddleware
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Общий исходящий клиент Telegram для всех процессов
+# ======================================================
+# bot.py / webhook-воркеры, resurrection_worker, findex_jobs/runner.py, support_bot —
+# все строят Bot через build_bot(): одинаковый connector и одинаковая цепочка
+# request-middleware (снаружи внутрь):
+#   RequestCoalescingMiddleware — одинаковые параллельные get_chat_member/get_me/get_chat
+#                                 делят один запрос (проверка подписки на каждом апдейте)
+#   RetryAfterMiddleware        — flood control: ждём retry_after и повторяем
+#   TelegramCallsMiddleware     — счётчики/latency/ошибки по методам (utils/metrics)
+
+TG_HTTP_TIMEOUT = int(os.getenv("TG_HTTP_TIMEOUT", "60"))
+TG_CONN_LIMIT = int(os.getenv("TG_CONN_LIMIT", "100"))
+TG_KEEPALIVE_SEC = float(os.getenv("TG_KEEPALIVE_SEC", "30"))
+TG_DNS_CACHE_SEC = int(os.getenv("TG_DNS_CACHE_SEC", "3600"))
+
+TG_RETRY_AFTER_MAX_SEC = float(os.getenv("TG_RETRY_AFTER_MAX_SEC", "30"))
+TG_RETRY_AFTER_ATTEMPTS = int(os.getenv("TG_RETRY_AFTER_ATTEMPTS", "2"))
+
+COALESCE_METHODS = (GetChatMember, GetMe, GetChat)
+
+
+class TunedAiohttpSession(AiohttpSession):
+    """AiohttpSession с keepalive, лимитом соединений на хост и кэшем DNS."""
+
+    def __init__(
+        self,
+        *,
+        limit: int = TG_CONN_LIMIT,
+        keepalive_timeout: float = TG_KEEPALIVE_SEC,
+        ttl_dns_cache: int = TG_DNS_CACHE_SEC,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(limit=limit, **kwargs)
+        # api.telegram.org — единственный хост, поэтому limit_per_host = limit
+        self._connector_init.update(
+            {
+                "limit_per_host": int(limit),
+                "keepalive_timeout": float(keepalive_timeout),
+                "ttl_dns_cache": int(ttl_dns_cache),
+                "enable_cleanup_closed": True,
+            }
+        )
+
+
+class RetryAfterMiddleware(BaseRequestMiddleware):
+    def __init__(self, *, attempts: int = TG_RETRY_AFTER_ATTEMPTS, max_wait: float = TG_RETRY_AFTER_MAX_SEC) -> None:
+        self.attempts = max(0, int(attempts))
+        self.max_wait = float(max_wait)
+
+    async def __call__(self, make_request, bot, method):  # type: ignore[override]
+        attempt = 0
+        while True:
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                wait = float(e.retry_after or 1)
+                if attempt >= self.attempts or wait > self.max_wait:
+                    raise
+                attempt += 1
+                logger.warning(
+                    "tg RetryAfter method=%s wait=%ss attempt=%s/%s",
+                    type(method).__name__,
+                    wait,
+                    attempt,
+                    self.attempts,
+                )
+                await asyncio.sleep(wait)
+
+
+class RequestCoalescingMiddleware(BaseRequestMiddleware):
+    """
+    Если такой же read-запрос уже летит — ждём его результат вместо второго запроса.
+    Кэша нет: как только запрос завершился, следующий вызов идёт в Telegram.
+    Запрос выполняется в задаче middleware, а не вызвавшего: отмена одного ожидающего
+    (таймаут, остановка воркера) не отменяет запрос для остальных.
+    """
+
+    def __init__(self, methods: tuple[type, ...] = COALESCE_METHODS) -> None:
+        self.methods = methods
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    def _key(self, bot: Bot, method: Any) -> Optional[Hashable]:
+        if not isinstance(method, self.methods):
+            return None
+        try:
+            return (bot.id, type(method).__name__, method.model_dump_json(exclude_none=True))
+        except Exception:
+            return None
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # ожидающих может не быть — не пишем "exception was never retrieved"
+
+    async def __call__(self, make_request, bot, method):  # type: ignore[override]
+        key = self._key(bot, method)
+        if key is None:
+            return await make_request(bot, method)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.create_task(make_request(bot, method))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        return await asyncio.shield(task)
+
+
+def build_session(*, timeout: int = TG_HTTP_TIMEOUT, **kwargs: Any) -> AiohttpSession:
+    session = TunedAiohttpSession(timeout=timeout, **kwargs)
+    session.middleware(RequestCoalescingMiddleware())
+    session.middleware(RetryAfterMiddleware())
+    session.middleware(TelegramCallsMiddleware())
+    return session
+
+
+def build_bot(
+    token: str,
+    *,
+    timeout: int = TG_HTTP_TIMEOUT,
+    default: Optional[DefaultBotProperties] = None,
+) -> Bot:
+    return Bot(
+        token=token,
+        session=build_session(timeout=timeout),
+        default=default or DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
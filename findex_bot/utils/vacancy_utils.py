@@ -37,57 +37,10 @@ def resolve_ad_role(ad_or_payload: Any) -> str:
 
 
 def get_ad_text(ad_or_payload: Any, *, include_contacts: bool = True) -> str:
-    payload = _p(ad_or_payload)
-    role = resolve_ad_role(ad_or_payload)
-
-    title = (payload.get("title") or "").strip()
-    salary = (payload.get("salary") or "").strip()
-    location = (payload.get("location") or "").strip()
-    contacts = (payload.get("contacts") or "").strip()
-
-    about = (payload.get("about") or "").strip()
-    description = (payload.get("description") or "").strip()
-    seeker_text = about or description
+    # собирается из полей и кэшируется по хэшу payload — см. utils/ad_render
+    from findex_bot.utils import ad_render
 
-    schedule = (payload.get("schedule") or "").strip()
-
-    tags = f"#FindexHub {make_hashtag(title)} {make_hashtag(location)}".strip()
-
-    if role == "seeker":
-        lines = [
-            "Соискатель",
-            "",
-            f"👤 Должность: {title}",
-            f"🕒 График: {schedule}",
-            f"💲 Зарплата: {salary}",
-            f"📍 Локация: {location}",
-        ]
-        if include_contacts:
-            lines.append(f"📞 Контакты: {contacts}")
-        lines.extend([
-            "📝 О себе:",
-            f"{seeker_text}",
-            "",
-            f"{tags}",
-        ])
-        return "\n".join(lines)
-
-    lines = [
-        "Работодатель",
-        "",
-        f"👤 Должность: {title}",
-        f"💲 Зарплата: {salary}",
-        f"📍 Локация: {location}",
-    ]
-    if include_contacts:
-        lines.append(f"📞 Контакты: {contacts}")
-    lines.extend([
-        "📝 Описание:",
-        f"{description}",
-        "",
-        f"{tags}",
-    ])
-    return "\n".join(lines)
+    return ad_render.text(ad_or_payload, contacts=include_contacts)
 
 
 def _clean_inline_text(value: Any) -> str:
@@ -0,0 +1,428 @@
+# findex_bot/webhook.py
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import zlib
+from typing import Any, Optional
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+from findex_bot.utils import metrics
+from findex_bot.utils.supervisor import SHUTDOWN_DRAIN_SEC, SUPERVISOR
+
+logging.basicConfig(level=logging.INFO, force=True)
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# Webhook-режим: ingress + N воркеров
+# ======================================================
+# Telegram -> reverse proxy (nginx, TLS) -> ingress (WEBHOOK_HOST:WEBHOOK_PORT)
+#   ingress проверяет X-Telegram-Bot-Api-Secret-Token, достаёт user_id из апдейта
+#   и пересылает апдейт воркеру shard = crc32(user_id) % N  (127.0.0.1:WEBHOOK_WORKER_BASE_PORT + shard)
+# Воркер (полный Dispatcher) кладёт апдейт в очередь пользователя:
+#   апдейты одного пользователя обрабатываются строго по порядку, разных — параллельно.
+#
+# Когда отвечать 200 (WEBHOOK_ACK_AFTER_HANDLE):
+#   0 (по умолчанию) — сразу после постановки в очередь. Быстро и не держит соединения Telegram,
+#     но апдейты, принятые в очередь и не обработанные к моменту падения / kill -9 воркера,
+#     ТЕРЯЮТСЯ: Telegram уже получил 200 и повторно их не пришлёт. Штатная остановка (SIGTERM)
+#     сначала отвечает 503 на новые и дообрабатывает принятые (feeder.drain).
+#   1 — 200 только после обработки апдейта хендлерами: падение воркера = не 200 = Telegram
+#     передоставит. Цена — соединение Telegram (WEBHOOK_MAX_CONNECTIONS) занято на всё время
+#     хендлера, таймаут пересылки ingress -> воркер по умолчанию поднимается до 55 с.
+#
+# Polling (python -m findex_bot.bot) остаётся для dev — там же снимается webhook.
+#
+# Запуск:
+#   python -m findex_bot.webhook            — ingress + WEBHOOK_WORKERS воркеров (multiprocessing)
+#   python -m findex_bot.webhook ingress    — только ingress (воркеры запущены отдельно, напр. systemd)
+#   python -m findex_bot.webhook worker -i 0
+
+WEBHOOK_URL = (os.getenv("WEBHOOK_URL") or "").rstrip("/")          # https://example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/tg/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_WORKERS = max(1, int(os.getenv("WEBHOOK_WORKERS", str(os.cpu_count() or 1))))
+WEBHOOK_WORKER_BASE_PORT = int(os.getenv("WEBHOOK_WORKER_BASE_PORT", "8100"))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+WEBHOOK_ACK_AFTER_HANDLE = os.getenv("WEBHOOK_ACK_AFTER_HANDLE", "0") == "1"
+WEBHOOK_FORWARD_TIMEOUT_SEC = float(
+    os.getenv("WEBHOOK_FORWARD_TIMEOUT_SEC", "55" if WEBHOOK_ACK_AFTER_HANDLE else "5")
+)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+INTERNAL_PATH = "/update"
+
+# Типы апдейтов, у которых есть отправитель (from / user)
+_USER_CARRIERS = (
+    "message",
+    "edited_message",
+    "callback_query",
+    "inline_query",
+    "chosen_inline_result",
+    "shipping_query",
+    "pre_checkout_query",
+    "poll_answer",
+    "my_chat_member",
+    "chat_member",
+    "chat_join_request",
+    "message_reaction",
+    "business_message",
+    "edited_business_message",
+)
+
+
+def route_key(update: dict[str, Any]) -> int:
+    """user_id отправителя; для апдейтов без пользователя — chat.id; иначе 0."""
+    for name in _USER_CARRIERS:
+        obj = update.get(name)
+        if not isinstance(obj, dict):
+            continue
+        user = obj.get("from") or obj.get("user")
+        if isinstance(user, dict) and user.get("id") is not None:
+            try:
+                return int(user["id"])
+            except Exception:
+                pass
+        chat = obj.get("chat")
+        if isinstance(chat, dict) and chat.get("id") is not None:
+            try:
+                return int(chat["id"])
+            except Exception:
+                pass
+
+    for name in ("channel_post", "edited_channel_post"):
+        obj = update.get(name)
+        if isinstance(obj, dict) and isinstance(obj.get("chat"), dict):
+            try:
+                return int(obj["chat"]["id"])
+            except Exception:
+                pass
+    return 0
+
+
+def shard_for(key: int, workers: int) -> int:
+    """Стабильный shard (одинаковый во всех процессах, в отличие от hash() с рандомным seed)."""
+    if workers <= 1:
+        return 0
+    return zlib.crc32(str(int(key)).encode("ascii")) % int(workers)
+
+
+def worker_port(index: int) -> int:
+    return WEBHOOK_WORKER_BASE_PORT + int(index)
+
+
+def secret_ok(request: web.Request) -> bool:
+    if not WEBHOOK_SECRET:
+        return True
+    got = request.headers.get(SECRET_HEADER, "")
+    return hmac.compare_digest(got.encode("utf-8"), WEBHOOK_SECRET.encode("utf-8"))
+
+
+# ---------------------------
+# Ordered per-user feeding
+# ---------------------------
+class OrderedFeeder:
+    """
+    Очередь на каждого пользователя: апдейты одного ключа — последовательно,
+    разных ключей — конкурентно. Пустые очереди удаляются.
+    submit() -> future, который завершается, когда апдейт обработан (или упал в хендлере).
+    """
+
+    def __init__(self, dp: Any, bot: Any) -> None:
+        self.dp = dp
+        self.bot = bot
+        self._queues: dict[int, asyncio.Queue] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, key: int, update: dict[str, Any]) -> asyncio.Future:
+        done = asyncio.get_running_loop().create_future()
+        q = self._queues.get(key)
+        if q is not None:
+            q.put_nowait((update, done))
+            return done
+
+        q = asyncio.Queue()
+        q.put_nowait((update, done))
+        self._queues[key] = q
+        task = asyncio.create_task(self._drain(key, q))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return done
+
+    async def _drain(self, key: int, q: asyncio.Queue) -> None:
+        try:
+            while True:
+                try:
+                    raw, done = q.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await self.dp.feed_raw_update(self.bot, raw)
+                except Exception:
+                    logger.exception("webhook: update handling failed key=%s update_id=%s", key, raw.get("update_id"))
+                finally:
+                    if not done.done():
+                        done.set_result(None)
+        finally:
+            if self._queues.get(key) is q:
+                self._queues.pop(key, None)
+
+    def inflight(self) -> int:
+        return len(self._queues)
+
+    async def drain(self, timeout: float = 30.0) -> None:
+        tasks = list(self._tasks)
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+
+# ---------------------------
+# Worker
+# ---------------------------
+async def _read_update(request: web.Request) -> Optional[dict[str, Any]]:
+    try:
+        data = await request.json(loads=json.loads)
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def build_worker_app(feeder: OrderedFeeder, *, path: str = INTERNAL_PATH) -> web.Application:
+    async def handle(request: web.Request) -> web.Response:
+        if not secret_ok(request):
+            return web.Response(status=401)
+        if not SUPERVISOR.accepting:
+            # воркер останавливается: не 200 -> Telegram передоставит апдейт после рестарта
+            return web.Response(status=503)
+        update = await _read_update(request)
+        if update is None:
+            return web.Response(status=400)
+        done = feeder.submit(route_key(update), update)
+        if WEBHOOK_ACK_AFTER_HANDLE:
+            # shield: обрыв соединения ingress не отменяет уже начатую обработку
+            await asyncio.shield(done)
+        return web.Response(text="ok")
+
+    async def health(_request: web.Request) -> web.Response:
+        return web.json_response({"ok": True, "inflight": feeder.inflight()})
+
+    app = web.Application()
+    app.router.add_post(path, handle)
+    app.router.add_get("/healthz", health)
+    # воркер слушает 127.0.0.1 — /metrics снаружи не виден, Prometheus скрейпит каждый порт воркера
+    app.router.add_get("/metrics", metrics.metrics_handler)
+    return app
+
+
+async def _serve(app: web.Application, host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=host, port=int(port))
+    await site.start()
+    return runner
+
+
+async def _wait_for_stop() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError, RuntimeError):
+            loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+
+async def _run_bot_app(*, host: str, port: int, path: str, index: int) -> None:
+    # bot.py на импорте читает конфиг и подключает роутеры — импортируем только в процессе воркера
+    from aiogram import Dispatcher
+
+    from findex_bot import bot as bot_mod
+    from findex_bot.utils import limits
+
+    bot = bot_mod.build_bot()
+    await bot_mod._init_redis()
+    dp = bot_mod.setup_dispatcher(Dispatcher(storage=bot_mod.build_fsm_storage()))
+    redis_health_task = asyncio.create_task(bot_mod._redis_health_loop())
+    await bot_mod.init_bot_username(bot)
+
+    feeder = OrderedFeeder(dp, bot)
+    runner = await _serve(build_worker_app(feeder, path=path), host, port)
+    logger.info("✅ webhook worker #%s listening on %s:%s%s", index, host, port, path)
+
+    try:
+        await dp.emit_startup(bot=bot)
+        await _wait_for_stop()
+    finally:
+        # новые апдейты -> 503; принятые дообрабатываем, drain фоновых задач — в dp.shutdown
+        SUPERVISOR.accepting = False
+        with contextlib.suppress(Exception):
+            await runner.cleanup()
+        with contextlib.suppress(Exception):
+            await feeder.drain(timeout=SHUTDOWN_DRAIN_SEC)
+        with contextlib.suppress(Exception):
+            await dp.emit_shutdown(bot=bot)
+        with contextlib.suppress(Exception):
+            redis_health_task.cancel()
+            await redis_health_task
+        with contextlib.suppress(Exception):
+            await limits.flush_pending_writes()
+        await bot_mod._close_redis()
+        with contextlib.suppress(Exception):
+            await bot.session.close()
+
+
+async def run_worker(index: int) -> None:
+    await _run_bot_app(host="127.0.0.1", port=worker_port(index), path=INTERNAL_PATH, index=index)
+
+
+# ---------------------------
+# Ingress
+# ---------------------------
+def build_ingress_app(workers: int) -> web.Application:
+    state: dict[str, Any] = {}
+
+    async def on_startup(_app: web.Application) -> None:
+        state["http"] = ClientSession(timeout=ClientTimeout(total=WEBHOOK_FORWARD_TIMEOUT_SEC))
+
+    async def on_cleanup(_app: web.Application) -> None:
+        http = state.pop("http", None)
+        if http is not None:
+            await http.close()
+
+    async def handle(request: web.Request) -> web.Response:
+        if not secret_ok(request):
+            return web.Response(status=401)
+        body = await request.read()
+        try:
+            update = json.loads(body)
+        except Exception:
+            return web.Response(status=400)
+        if not isinstance(update, dict):
+            return web.Response(status=400)
+
+        shard = shard_for(route_key(update), workers)
+        url = f"http://127.0.0.1:{worker_port(shard)}{INTERNAL_PATH}"
+        headers = {"Content-Type": "application/json"}
+        if WEBHOOK_SECRET:
+            headers[SECRET_HEADER] = WEBHOOK_SECRET
+
+        try:
+            async with state["http"].post(url, data=body, headers=headers) as resp:
+                if resp.status == 200:
+                    return web.Response(text="ok")
+                logger.warning("webhook ingress: worker #%s answered %s", shard, resp.status)
+        except Exception:
+            logger.exception("webhook ingress: forward to worker #%s failed", shard)
+
+        # не 200 -> Telegram повторит доставку позже
+        return web.Response(status=503)
+
+    app = web.Application()
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post(WEBHOOK_PATH, handle)
+    return app
+
+
+async def _register_webhook() -> None:
+    if not WEBHOOK_URL:
+        logger.warning("⚠️ WEBHOOK_URL is empty -> setWebhook skipped (configure it manually)")
+        return
+
+    from aiogram import Dispatcher
+
+    from findex_bot import bot as bot_mod
+
+    bot = bot_mod.build_bot()
+    try:
+        dp = bot_mod.setup_dispatcher(Dispatcher())
+        await bot.set_webhook(
+            url=WEBHOOK_URL + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            drop_pending_updates=False,
+        )
+        logger.info("✅ Webhook set: %s%s", WEBHOOK_URL, WEBHOOK_PATH)
+    finally:
+        with contextlib.suppress(Exception):
+            await bot.session.close()
+
+
+async def run_ingress(workers: int) -> None:
+    if not WEBHOOK_SECRET:
+        logger.warning("⚠️ WEBHOOK_SECRET is empty -> secret token is NOT verified")
+
+    runner = await _serve(build_ingress_app(workers), WEBHOOK_HOST, WEBHOOK_PORT)
+    logger.info("✅ webhook ingress listening on %s:%s%s (workers=%s)", WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, workers)
+    try:
+        try:
+            await _register_webhook()
+        except Exception:
+            logger.exception("⚠️ setWebhook failed")
+        await _wait_for_stop()
+    finally:
+        await runner.cleanup()
+
+
+async def run_single() -> None:
+    """WEBHOOK_WORKERS=1: без ingress, один процесс сразу слушает публичный путь."""
+    if not WEBHOOK_SECRET:
+        logger.warning("⚠️ WEBHOOK_SECRET is empty -> secret token is NOT verified")
+    try:
+        await _register_webhook()
+    except Exception:
+        logger.exception("⚠️ setWebhook failed")
+    await _run_bot_app(host=WEBHOOK_HOST, port=WEBHOOK_PORT, path=WEBHOOK_PATH, index=0)
+
+
+def _worker_entry(index: int) -> None:
+    asyncio.run(run_worker(index))
+
+
+def run_all(workers: int) -> None:
+    if workers <= 1:
+        asyncio.run(run_single())
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_worker_entry, args=(i,), name=f"findex-webhook-{i}") for i in range(workers)]
+    for p in procs:
+        p.start()
+
+    try:
+        asyncio.run(run_ingress(workers))
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        for p in procs:
+            p.join(timeout=30)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m findex_bot.webhook")
+    parser.add_argument("role", nargs="?", default="all", choices=("all", "ingress", "worker"))
+    parser.add_argument("-i", "--index", type=int, default=0)
+    parser.add_argument("-n", "--workers", type=int, default=WEBHOOK_WORKERS)
+    args = parser.parse_args(argv)
+
+    if args.role == "ingress":
+        asyncio.run(run_ingress(max(1, args.workers)))
+    elif args.role == "worker":
+        asyncio.run(run_worker(args.index))
+    else:
+        run_all(max(1, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, LinkPrevie
 
 from findex_bot.db.db import get_sessionmaker
 from findex_bot.db.repo import RespondRepo
+from findex_bot.utils import tg_client
 
 logger = logging.getLogger(__name__)
 
@@ -116,7 +117,7 @@ async def main() -> None:
     if not BOT_TOKEN:
         raise RuntimeError("BOT_TOKEN is not set (BOT_TOKEN/TELEGRAM_BOT_TOKEN)")
 
-    bot = Bot(BOT_TOKEN, parse_mode=ParseMode.HTML)
+    bot = tg_client.build_bot(BOT_TOKEN)
 
     while True:
         try:
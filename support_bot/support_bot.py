@@ -1,5 +1,6 @@
 # support_bot/support_bot.py
 import os
+import sys
 import asyncio
 import logging
 import html
@@ -45,13 +46,27 @@ SUPPORT_DB_DSN = os.getenv("SUPPORT_DB_DSN")
 MAIN_CHANNEL_ID = int(os.getenv("MAIN_CHANNEL_ID", "0") or 0)
 
 # ✅ важно: timeout числом, parse_mode через DefaultBotProperties
-session = AiohttpSession(timeout=30)
+# общий клиент основного бота (findex_bot/utils/tg_client): tuned connector, RetryAfter, coalescing;
+# support_bot запускается как скрипт из своей папки — корень проекта добавляем в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    from findex_bot.utils.tg_client import build_session
+    from findex_bot.utils import supervisor
+except ImportError:
+    logging.warning("⚠️ findex_bot.utils.tg_client недоступен -> стандартная AiohttpSession")
+    build_session = None
+    supervisor = None
+
+session = build_session(timeout=30) if build_session is not None else AiohttpSession(timeout=30)
 bot = Bot(
     token=BOT_TOKEN,
     session=session,
     default=DefaultBotProperties(parse_mode=ParseMode.HTML),
 )
 dp = Dispatcher()
+if supervisor is not None:
+    # подсказки с автоудалением не теряются на рестарте: на остановке удаляются сразу (Redis тут нет)
+    supervisor.install(dp)
 
 _db_pool = None
 
@@ -113,6 +128,9 @@ async def _delete_later(message: Message, seconds: int = 3) -> None:
 
 async def _temp_hint(message: Message, text: str, seconds: int = 3) -> None:
     sent = await message.answer(text)
+    if supervisor is not None:
+        await supervisor.delete_later(bot, int(sent.chat.id), int(sent.message_id), seconds)
+        return
     asyncio.create_task(_delete_later(sent, seconds=seconds))
 
 
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+from findex_bot.utils import ad_render
+from findex_bot.utils.vacancy_utils import get_ad_text
+
+
+def _ad(**payload):
+    base = {
+        "role": "employer",
+        "title": "Повар",
+        "salary": "100 000",
+        "location": "м. Курская",
+        "contacts": "@chef",
+        "description": "Кухня",
+    }
+    base.update(payload)
+    return SimpleNamespace(id=7, payload=base)
+
+
+def test_text_variants_are_built_from_fields():
+    ad = _ad()
+    assert get_ad_text(ad) == (
+        "Работодатель\n\n👤 Должность: Повар\n💲 Зарплата: 100 000\n📍 Локация: м. Курская\n"
+        "📞 Контакты: @chef\n📝 Описание:\nКухня\n\n#FindexHub #Повар #мКурская"
+    )
+    assert "Контакты" not in ad_render.text(ad, contacts=False)
+    assert ad_render.compact(ad) == "✅ Опубликовано • Повар • м. Курская"
+    assert ad_render.compact(_ad(title="", location="")) == "✅ Опубликовано"
+
+    seeker = _ad(role="seeker", about="Опыт 5 лет", schedule="2/2")
+    assert ad_render.parts(seeker).body == "Опыт 5 лет"
+    assert "🕒 График: 2/2" in get_ad_text(seeker)
+
+
+def test_cache_is_keyed_by_render_fields():
+    ad_render.CACHE.clear()
+    ad = _ad()
+    before = ad_render.totals_snapshot()
+
+    first = ad_render.text(ad)
+    assert ad_render.text(ad) is first
+    # служебные ключи payload рендер не меняют — кэш не сбивается
+    ad.payload["preview_message_id"] = 42
+    assert ad_render.text(ad) is first
+
+    ad.payload["title"] = "Су-шеф"
+    assert "Су-шеф" in ad_render.text(ad)
+
+    after = ad_render.totals_snapshot()
+    assert after["hit"] - before["hit"] >= 2
+
+
+def test_caption_is_truncated_to_telegram_limit():
+    ad = _ad(description="x" * 2000)
+    cap = ad_render.caption(ad)
+    assert len(cap) == ad_render.CAPTION_LIMIT and cap.endswith("…")
+    assert len(ad_render.text(ad)) > ad_render.CAPTION_LIMIT
+
+
+def test_lru_evicts_oldest():
+    cache = ad_render.RenderCache(max_items=2)
+    cache.put((1, "a", "full"), "1")
+    cache.put((2, "a", "full"), "2")
+    assert cache.get((1, "a", "full")) == "1"
+    cache.put((3, "a", "full"), "3")
+    assert cache.get((2, "a", "full")) is None
+    assert len(cache) == 2
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import time
+from decimal import Decimal
+
+import pytest
+
+from findex_bot.db import ad_search
+from findex_bot.db.ad_search import SearchHit, build_prefix_tsquery, decode_cursor, encode_cursor
+
+
+def test_prefix_tsquery_keeps_only_words():
+    assert build_prefix_tsquery("Повар  горячего цеха!") == "повар:* & горячего:* & цеха:*"
+    assert build_prefix_tsquery("ёлка') | !x & y:*") == "елка:*"
+    assert build_prefix_tsquery("повар повар") == "повар:*"
+    assert build_prefix_tsquery("  !! ") is None
+
+
+def test_cursor_roundtrip_and_garbage():
+    hit = SearchHit(ad_id=42, score=Decimal("0.123456"))
+    assert decode_cursor(encode_cursor(hit)) == (Decimal("0.123456"), 42)
+    assert decode_cursor("junk") is None
+    assert decode_cursor("") is None
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = None
+
+    async def execute(self, stmt, params):
+        self.params = params
+        return FakeResult(self.rows)
+
+
+def test_search_pages_with_limit_plus_one():
+    rows = [(3, Decimal("0.9")), (2, Decimal("0.5")), (1, Decimal("0.5"))]
+    session = FakeSession(rows)
+    hits, nxt = asyncio.run(
+        ad_search.search(session, "повар", role="Employer", location="50%_off", limit=2, cursor="0.95:7")
+    )
+    assert [h.ad_id for h in hits] == [3, 2]
+    assert nxt == "0.5:2"
+    p = session.params
+    assert p["limit"] == 3 and p["role"] == "employer"
+    assert p["location"] == "%50\\%\\_off%"
+    assert (p["c_score"], p["c_id"]) == (Decimal("0.95"), 7)
+
+    session = FakeSession(rows[:1])
+    hits, nxt = asyncio.run(ad_search.search(session, "повар", limit=2))
+    assert len(hits) == 1 and nxt is None and session.params["c_score"] is None
+
+
+def test_empty_query_does_not_hit_db():
+    session = FakeSession([])
+    assert asyncio.run(ad_search.search(session, "?!")) == ([], None)
+    assert session.params is None
+
+
+# ---------------- benchmark (opt-in) ----------------
+# SEARCH_BENCH_DATABASE_URL=postgresql+asyncpg://... (база на alembic head)
+# Сидирует SEARCH_BENCH_ADS объявлений в транзакции, меряет p99 и откатывает всё обратно.
+BENCH_URL = os.getenv("SEARCH_BENCH_DATABASE_URL")
+BENCH_ADS = int(os.getenv("SEARCH_BENCH_ADS", "1000000"))
+BENCH_P99_MS = float(os.getenv("SEARCH_BENCH_P99_MS", "50"))
+
+_SEED_SQL = """
+INSERT INTO ads (author_user_id, role, payload, status, created_at)
+SELECT
+    g,
+    CASE WHEN g % 3 = 0 THEN 'seeker' ELSE 'employer' END,
+    jsonb_build_object(
+        'title', (ARRAY['Повар','Официант','Бариста','Курьер','Кассир','Грузчик','Администратор',
+                        'Менеджер','Водитель','Уборщица','Продавец','Охранник'])[1 + g % 12]
+                 || ' ' || (ARRAY['в кафе','в ресторан','на склад','в магазин','в офис','на доставку',
+                                  'в пекарню','в столовую'])[1 + (g / 12) % 8],
+        'description', (ARRAY['График 2/2','Оплата ежедневно','Опыт не нужен','Питание и форма',
+                              'Официальное оформление','Выплаты два раза в месяц'])[1 + (g / 7) % 6]
+                       || '. ' || md5(g::text),
+        'location', (ARRAY['Москва, м. Тверская','Москва, м. Арбатская','Химки','Люберцы',
+                           'Москва, м. Курская','Мытищи'])[1 + (g / 5) % 6]
+    ),
+    'published',
+    NOW() - make_interval(secs => g)
+FROM generate_series(1, :n) AS g;
+"""
+
+_BENCH_QUERIES = ("повар", "официант кафе", "бариста", "курьер доставка", "пов", "склад", "грузчик химки",
+                  "администратор", "оплата ежедневно", "офицант")
+
+
+@pytest.mark.skipif(not BENCH_URL, reason="SEARCH_BENCH_DATABASE_URL is not set")
+def test_search_p99_benchmark():
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    async def scenario() -> list[float]:
+        engine = create_async_engine(BENCH_URL)
+        try:
+            async with engine.connect() as conn:
+                trans = await conn.begin()
+                try:
+                    await conn.execute(text(_SEED_SQL), {"n": BENCH_ADS})
+                    await conn.execute(text("ANALYZE ads"))
+                    session = AsyncSession(bind=conn)
+                    timings: list[float] = []
+                    for _ in range(20):
+                        for q in _BENCH_QUERIES:
+                            cursor = None
+                            for _page in range(2):
+                                t0 = time.perf_counter()
+                                _hits, cursor = await ad_search.search(session, q, limit=20, cursor=cursor)
+                                timings.append((time.perf_counter() - t0) * 1000)
+                                if not cursor:
+                                    break
+                    return timings
+                finally:
+                    await trans.rollback()
+        finally:
+            await engine.dispose()
+
+    timings = sorted(asyncio.run(scenario()))
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"search p50={timings[len(timings) // 2]:.1f}ms p99={p99:.1f}ms n={len(timings)}")
+    assert p99 < BENCH_P99_MS
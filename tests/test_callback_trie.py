@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from findex_bot.middlewares import callback_trie
+from findex_bot.middlewares.callback_trie import DataKeys, analyze_magic
+
+
+def _cb(data: str) -> Update:
+    msg = Message(message_id=1, date=datetime.now(), chat=Chat(id=1, type="private"))
+    cb = CallbackQuery(
+        id="1",
+        from_user=User(id=1, is_bot=False, first_name="T"),
+        chat_instance="1",
+        data=data,
+        message=msg,
+    )
+    return Update(update_id=1, callback_query=cb)
+
+
+def test_analyze_magic_filters():
+    assert analyze_magic(F.data == "noop") == DataKeys(exact=frozenset({"noop"}))
+    assert analyze_magic(F.data.in_({"a", "b"})) == DataKeys(exact=frozenset({"a", "b"}))
+    assert analyze_magic(F.data.startswith("resp_")) == DataKeys(prefixes=frozenset({"resp_"}))
+    assert analyze_magic(F.data.startswith("a:") | (F.data == "b")) == DataKeys(
+        exact=frozenset({"b"}), prefixes=frozenset({"a:"})
+    )
+    assert analyze_magic(F.data.startswith("a:") & F.from_user.id) == DataKeys(prefixes=frozenset({"a:"}))
+    # не разобрать — wildcard
+    assert analyze_magic(F.data.regexp(r"^a")) is None
+    assert analyze_magic(F.data.startswith("a:") | F.from_user.id) is None
+    assert analyze_magic(F.from_user.id == 1) is None
+
+
+def _build():
+    hits = []
+    r1, r2 = Router(name="r1"), Router(name="r2")
+
+    @r1.callback_query(F.data.startswith("resp_"))
+    async def resp_any(cb: CallbackQuery):
+        if cb.data == "resp_skip":
+            raise SkipHandler()
+        hits.append("resp_any")
+
+    @r1.callback_query(F.data == "noop")
+    async def noop(cb: CallbackQuery):
+        hits.append("noop")
+
+    @r2.callback_query(F.data.startswith("resp_form_"))
+    async def resp_form(cb: CallbackQuery):
+        hits.append("resp_form")
+
+    @r2.callback_query(F.data.startswith("resp_"))
+    async def resp_fallback(cb: CallbackQuery):
+        hits.append("resp_fallback")
+
+    @r2.callback_query(lambda cb: cb.data.endswith("!"))
+    async def bang(cb: CallbackQuery):
+        hits.append("bang")
+
+    dp = Dispatcher()
+    dp.include_router(r1)
+    dp.include_router(r2)
+    return dp, hits
+
+
+def test_fast_path_matches_registration_order_and_skip_handler():
+    dp, hits = _build()
+    mw = callback_trie.install(dp)
+
+    async def scenario():
+        bot = Bot(token="42:TEST")
+        res = []
+        for data in ("resp_form_1", "noop", "resp_skip", "x!", "unknown"):
+            res.append(await dp.feed_update(bot, _cb(data)))
+        await bot.session.close()
+        return res
+
+    res = asyncio.run(scenario())
+    # resp_ перехватывается первым роутером; SkipHandler -> следующий кандидат в том же порядке
+    assert hits == ["resp_any", "noop", "resp_fallback", "bang"]
+    assert res[-1] is UNHANDLED
+    assert len(mw.trie.wildcard) == 1
+    assert any("resp_form_" in line for line in mw.trie.collisions())
+
+
+def test_trie_candidates_are_ordered_subset():
+    dp, _hits = _build()
+    trie = callback_trie.CallbackTrie(callback_trie.collect_routes(dp))
+
+    names = [r.handler.callback.__name__ for r in trie.candidates("resp_form_7")]
+    assert names == ["resp_any", "resp_form", "resp_fallback", "bang"]
+    assert [r.handler.callback.__name__ for r in trie.candidates("noop")] == ["noop", "bang"]
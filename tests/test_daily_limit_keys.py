@@ -0,0 +1,27 @@
+from datetime import date, datetime, timezone
+
+from findex_bot.utils.limits import PUB, RESPOND, day_bucket, redis_key, remaining, seconds_to_reset
+
+
+def test_pub_day_is_utc():
+    now = datetime(2026, 10, 19, 22, 30, tzinfo=timezone.utc)
+
+    day, day_key, ttl = day_bucket(PUB, now)
+
+    assert day == date(2026, 10, 19)
+    assert day_key == "20261019"
+    assert ttl == 90 * 60 + 3600
+    assert redis_key(PUB, 42, now) == "pub:daily:42:20261019"
+
+
+def test_respond_key_follows_project_tz():
+    # 22:30 UTC = 01:30 следующего дня по Москве — ключ уже нового дня
+    now = datetime(2026, 10, 19, 22, 30, tzinfo=timezone.utc)
+
+    assert redis_key(RESPOND, 7, now) == "respond:daily:7:20261020"
+    assert seconds_to_reset(RESPOND, now) == 22 * 3600 + 30 * 60
+
+
+def test_remaining_never_negative():
+    assert remaining(PUB, 0) == PUB.limit
+    assert remaining(PUB, PUB.limit + 5) == 0
@@ -0,0 +1,45 @@
+from datetime import date, datetime, timezone
+
+from findex_bot.db.event_partitions import (
+    add_months,
+    expired_partitions,
+    parse_partition_name,
+    partition_for,
+    retention_border,
+)
+
+
+def test_partition_for_month_bounds():
+    p = partition_for(date(2026, 12, 17))
+
+    assert p.name == "respond_events_p202612"
+    assert p.start == date(2026, 12, 1)
+    assert p.end == date(2027, 1, 1)
+
+
+def test_add_months_wraps_year():
+    assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+
+
+def test_parse_partition_name_ignores_default_and_garbage():
+    assert parse_partition_name("respond_events_default") is None
+    assert parse_partition_name("respond_events_p202613") is None
+    assert parse_partition_name("respond_events_p202603").start == date(2026, 3, 1)
+
+
+def test_expired_partitions_only_fully_older_than_border():
+    parts = [parse_partition_name(f"respond_events_p2026{m:02d}") for m in (1, 2, 3)]
+    border = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+    names = [p.name for p in expired_partitions(parts, border=border)]
+
+    assert names == ["respond_events_p202601", "respond_events_p202602"]
+
+
+def test_retention_border_never_shorter_than_respond_ttl():
+    now = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+    border = retention_border(now=now, retention_days=7, respond_ttl_days=30)
+
+    assert (now - border).days == 60
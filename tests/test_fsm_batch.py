@@ -0,0 +1,108 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from findex_bot.utils.fsm_batch import K_LAST_STATE, K_LAST_TS, BufferedFSMContext
+
+
+def _key() -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=5, user_id=5)
+
+
+def test_writes_are_buffered_until_flush():
+    storage = MemoryStorage()
+
+    async def scenario():
+        ctx = BufferedFSMContext(storage=storage, key=_key())
+        await ctx.set_state("Form:title")
+        await ctx.update_data(title="Повар")
+
+        assert await ctx.get_state() == "Form:title"
+        assert (await ctx.get_data())["title"] == "Повар"
+        assert await storage.get_state(key=_key()) is None
+        assert await storage.get_data(key=_key()) == {}
+
+        await ctx.flush()
+
+        data = await storage.get_data(key=_key())
+        assert await storage.get_state(key=_key()) == "Form:title"
+        assert data["title"] == "Повар"
+        assert data[K_LAST_STATE] == "Form:title"
+        assert K_LAST_TS in data
+        assert ctx.stats.ctx_writes == 2
+        assert ctx.stats.ctx_reads == 2
+
+    asyncio.run(scenario())
+
+
+def test_write_through_after_flush_and_clear():
+    storage = MemoryStorage()
+
+    async def scenario():
+        ctx = BufferedFSMContext(storage=storage, key=_key())
+        await ctx.update_data(a=1)
+        await ctx.flush()
+
+        # фоновая задача хендлера после flush пишет сразу в storage
+        await ctx.update_data({"b": 2})
+        assert (await storage.get_data(key=_key()))["b"] == 2
+
+        ctx2 = BufferedFSMContext(storage=storage, key=_key())
+        await ctx2.clear()
+        assert (await storage.get_data(key=_key()))["a"] == 1
+        await ctx2.flush()
+        assert await storage.get_data(key=_key()) == {}
+
+    asyncio.run(scenario())
+
+
+def test_returned_data_is_a_copy():
+    storage = MemoryStorage()
+
+    async def scenario():
+        ctx = BufferedFSMContext(storage=storage, key=_key())
+        await ctx.update_data(items=[1])
+        got = await ctx.get_data()
+        got["items"].append(2)
+        assert (await ctx.get_data())["items"] == [1]
+        assert ctx.dirty is True
+
+    asyncio.run(scenario())
+
+
+def test_flush_merges_only_changed_keys():
+    storage = MemoryStorage()
+
+    async def scenario():
+        first = BufferedFSMContext(storage=storage, key=_key())
+        second = BufferedFSMContext(storage=storage, key=_key())
+        # оба апдейта прочитали один и тот же снимок
+        await first.get_data()
+        await second.get_data()
+        await first.update_data(title="Повар")
+        await second.update_data(salary="100")
+        await first.flush()
+        await second.flush()
+        data = await storage.get_data(key=_key())
+        assert data["title"] == "Повар" and data["salary"] == "100"
+
+        # set_data / clear — по-прежнему перезапись целиком
+        third = BufferedFSMContext(storage=storage, key=_key())
+        await third.set_data({"only": 1})
+        await third.flush()
+        assert await storage.get_data(key=_key()) == {"only": 1}
+
+    asyncio.run(scenario())
+
+
+def test_install_enables_event_isolation():
+    from aiogram import Dispatcher
+    from aiogram.fsm.storage.memory import SimpleEventIsolation
+
+    from findex_bot.utils import fsm_batch
+
+    dp = Dispatcher()
+    new = fsm_batch.install(dp)
+    assert dp.fsm is new
+    assert isinstance(new.events_isolation, SimpleEventIsolation)
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import findex_bot.runtime as runtime
+from findex_bot.utils import alerts, geo
+from findex_bot.utils.alerts import _matches_location_bidirectional, _split_keywords
+from findex_bot.utils.moscow_metro import STATIONS
+
+
+def test_every_station_has_coordinates():
+    assert len(geo._STATION_BY_KEY) == len(STATIONS)
+    for place in geo._STATION_BY_KEY.values():
+        assert 55.3 < place.lat < 56.1 and 37.1 < place.lon < 38.0, place
+
+
+def test_resolve_stations_and_cities():
+    assert geo.resolve("Москва (Курская)") is geo.resolve("kurskaya")
+    assert geo.resolve("Чкаловская").hub == geo.resolve("Курская").hub
+    assert geo.resolve("khimki").name == "Химки"
+    assert geo.resolve("спб").name == "Санкт-Петербург"
+    assert geo.resolve("Москва, Зеленоград").city == geo.MOSCOW_KEY
+    assert geo.resolve("Москва").area
+    assert geo.resolve("Москва (Непонятная)") is None
+
+
+def test_grid_index_radius_query():
+    kursk = geo.resolve("Курская")
+    near = [p.name for p in geo.INDEX.within(kursk.lat, kursk.lon, 1.5)]
+    assert near[0] == "Курская" and "Красные ворота" in near and "Таганская" not in near
+
+    # сетка отдаёт то же, что полный перебор
+    for radius in (0.5, 3, 12):
+        brute = {
+            p.key for p in geo._STATION_BY_KEY.values()
+            if geo.distance_km(kursk.lat, kursk.lon, p.lat, p.lon) <= radius
+        }
+        got = {p.key for p in geo.INDEX.within(kursk.lat, kursk.lon, radius) if p.key.startswith("st:")}
+        assert got == brute
+
+
+def test_split_radius():
+    assert geo.split_radius("Курская 3 км") == ("Курская", 3.0)
+    assert geo.split_radius("Москва (Курская), до 2,5 km") == ("Москва (Курская)", 2.5)
+    assert geo.split_radius("Улица 1905 года") == ("Улица 1905 года", 0.0)
+    assert geo.split_radius("3 км") == ("3 км", 0.0)
+
+
+def test_alert_location_with_radius():
+    kw = _split_keywords("Курская")
+    assert not _matches_location_bidirectional("Москва (Бауманская)", kw)
+    assert _matches_location_bidirectional("Москва (Бауманская)", kw, radius_km=3)
+    assert not _matches_location_bidirectional("Москва (Бауманская)", kw, radius_km=1)
+    assert _matches_location_bidirectional("Москва (Чкаловская)", kw)
+    assert _matches_location_bidirectional("Москва, Зеленоград", _split_keywords("Москва"))
+    assert _matches_location_bidirectional("Химки", _split_keywords("Ховрино"), radius_km=5)
+    # «Москва» без станции — точки нет, радиус не применяется
+    assert not _matches_location_bidirectional("Москва", kw, radius_km=10)
+    # вне справочника — сравнение по тексту, как раньше
+    assert _matches_location_bidirectional("Дубна", _split_keywords("дубна"), radius_km=3)
+
+
+def test_add_alert_parses_radius(monkeypatch):
+    monkeypatch.setattr(runtime, "REDIS", None, raising=False)
+
+    async def fake_get(user_id):
+        return []
+
+    async def fake_noop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(alerts, "get_user_alerts", fake_get)
+    monkeypatch.setattr(alerts, "set_user_alerts", fake_noop)
+    monkeypatch.setattr(alerts, "_rebuild_user_target_index", fake_noop)
+    monkeypatch.setattr(alerts, "can_create_alert", lambda *a: True)
+
+    a = asyncio.run(alerts.add_alert(1, alerts.ROLE_EMPLOYER, "Повар", "Курская 3 км"))
+    assert a["location_keywords"] == ["курская"] and a["radius_km"] == 3.0
+    assert "(до 3 км)" in alerts.format_alert_line(a)
+
+    a["created_at"] = int(time.time())
+    assert alerts._alert_matches(alerts.ROLE_EMPLOYER, "Повар", "Москва (Бауманская)", a)
+
+    for bad in ("Непонятное место 3 км", "Курская 80 км"):
+        try:
+            asyncio.run(alerts.add_alert(1, alerts.ROLE_EMPLOYER, "Повар", bad))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(bad)
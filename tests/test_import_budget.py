@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# холодный импорт воркера (sqlalchemy + модели) — сотни ms; бюджет с запасом под медленный CI
+IMPORT_BUDGET_MS = int(os.getenv("IMPORT_BUDGET_MS", "3000"))
+
+
+def _importtime(module: str) -> dict[str, int]:
+    """module -> cumulative import time (us) по выводу `python -X importtime`."""
+    env = dict(os.environ)
+    env.setdefault("BOT_TOKEN", "42:TEST")
+    env.setdefault("MODERATION_CHAT_ID", "1")
+    env.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if proc.returncode != 0:
+        pytest.skip(f"cannot import {module}: {proc.stderr.strip().splitlines()[-1:]}")
+
+    out: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        out[name.strip()] = int(cumulative_us)
+    return out
+
+
+def _loaded(mods: dict[str, int], prefix: str) -> list[str]:
+    return [m for m in mods if m == prefix or m.startswith(prefix + ".")]
+
+
+def test_jobs_worker_imports_only_db_layer():
+    mods = _importtime("findex_bot.jobs")
+    assert _loaded(mods, "aiogram") == []
+    assert _loaded(mods, "findex_bot.handlers") == []
+    assert mods["findex_bot.jobs"] / 1000 < IMPORT_BUDGET_MS
+
+
+def test_resurrection_worker_does_not_import_routers():
+    mods = _importtime("findex_bot.resurrection_worker")
+    assert _loaded(mods, "findex_bot.handlers") == []
+    assert _loaded(mods, "findex_bot.bot") == []
+
+
+def test_bot_module_loads_routers_lazily():
+    mods = _importtime("findex_bot.bot")
+    assert _loaded(mods, "findex_bot.handlers") == []
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Chat, Message, Update, User
+
+from findex_bot.utils import metrics
+
+
+def _update(text: str) -> Update:
+    msg = Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=7, type="private"),
+        from_user=User(id=7, is_bot=False, first_name="T"),
+        text=text,
+    )
+    return Update(update_id=1, message=msg)
+
+
+def test_update_stats_by_handler_and_sql_calls():
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    metrics.instrument_engine(engine)
+
+    router = Router()
+
+    @router.message()
+    async def echo_handler(message: Message) -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("select 1"))
+            await conn.execute(text("select 2"))
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    dp.update.outer_middleware(metrics.UpdateInstrumentationMiddleware())
+    dp.message.middleware(metrics.HandlerNameMiddleware())
+
+    async def scenario():
+        bot = Bot(token="42:TEST")
+        await dp.feed_update(bot, _update("hi"))
+        await bot.session.close()
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+    name = "test_metrics.test_update_stats_by_handler_and_sql_calls.<locals>.echo_handler"
+    agg = metrics.HANDLERS[name]
+    assert agg.latency.count == 1
+    assert agg.calls["sql"].sum >= 2
+
+    text_out = metrics.render_prometheus()
+    assert 'findex_update_duration_seconds_count{handler="%s"} 1' % name in text_out
+    assert any(r["handler"] == name for r in metrics.top_handlers())
+
+
+def test_calls_outside_update_go_to_totals_only():
+    before = metrics.TOTAL_CALLS["redis"].count
+    metrics._record_call("redis", "GET", 0.001)
+    assert metrics.TOTAL_CALLS["redis"].count == before + 1
+    assert metrics.current() is None
+
+
+def test_histogram_quantile():
+    h = metrics.Histogram((0.1, 1.0))
+    for v in (0.05, 0.05, 0.5, 5.0):
+        h.observe(v)
+    assert h.quantile(0.5) == 0.1
+    assert h.quantile(0.75) == 1.0
+    assert h.quantile(1.0) == float("inf")
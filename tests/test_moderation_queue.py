@@ -0,0 +1,409 @@
+import asyncio
+import fnmatch
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+import findex_bot.runtime as runtime
+from findex_bot.utils import moderation_queue, publish_queue
+from findex_bot.utils.moderation_queue import ModerationQueue, decode_cursor, encode_cursor
+from findex_bot.utils.publish_queue import ChannelPublishQueue, PublishJob, render_summary
+
+BOT = SimpleNamespace(id=1)
+T0 = datetime(2026, 10, 19, 12, 0, 0, 123456, tzinfo=timezone.utc)
+
+
+def _ad(i):
+    return SimpleNamespace(
+        id=i,
+        role="employer",
+        updated_at=T0 + timedelta(seconds=i),
+        payload={"title": f"Повар {i}", "location": "м. Курская"},
+    )
+
+
+def test_cursor_roundtrip_fits_callback_data():
+    raw = encode_cursor(T0, 1234567)
+    assert decode_cursor(raw) == (T0, 1234567)
+    assert len(f"mod_pending_list:n:{raw}") <= 64
+    assert decode_cursor("junk") is None
+    assert decode_cursor(None) is None
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalars(self):
+        return SimpleNamespace(all=lambda: list(self._rows))
+
+
+class FakeSession:
+    def __init__(self, ads):
+        self.ads = ads
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        limit = stmt._limit_clause.value
+        return FakeResult(self.ads[:limit])
+
+    async def scalar(self, stmt):
+        return len(self.ads)
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def _no_queued(monkeypatch, queued=()):
+    async def fake_queued_among(bot, ad_ids):
+        return {x for x in ad_ids if x in set(queued)}
+
+    monkeypatch.setattr(publish_queue, "queued_among", fake_queued_among)
+
+
+def test_forward_page_prefetches_next_pages(monkeypatch):
+    session = FakeSession([_ad(i) for i in range(1, 8)])
+    monkeypatch.setattr(moderation_queue, "get_sessionmaker", lambda: (lambda: session))
+    _no_queued(monkeypatch)
+    q = ModerationQueue(page_size=2, prefetch_pages=2, ttl_sec=60)
+
+    async def scenario():
+        first = await q.page(BOT)
+        second = await q.page(BOT, after=first.next_cursor)
+        third = await q.page(BOT, after=second.next_cursor)
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert [it.ad_id for it in first.items] == [1, 2] and first.prev_cursor is None
+    assert [it.ad_id for it in second.items] == [3, 4]
+    assert [it.ad_id for it in third.items] == [5, 6] and third.next_cursor
+    assert first.items[0].row == "#1 · employer · Повар 1 · м. Курская"
+    assert first.total == 7
+
+    # три страницы — один запрос строк (2 * (1 + 2) + 1)
+    assert len(session.statements) == 1
+    sql = _sql(session.statements[0])
+    assert "OFFSET" not in sql
+    assert "ORDER BY ads.updated_at ASC, ads.id ASC" in sql
+
+    after_sql = _sql(moderation_queue.pending_after_stmt(decode_cursor(first.next_cursor), 5))
+    assert "(ads.updated_at, ads.id) > (" in after_sql
+
+
+def test_handled_and_queued_ads_are_hidden(monkeypatch):
+    session = FakeSession([_ad(i) for i in range(1, 4)])
+    monkeypatch.setattr(moderation_queue, "get_sessionmaker", lambda: (lambda: session))
+    _no_queued(monkeypatch, queued=[2])
+    q = ModerationQueue(page_size=3, prefetch_pages=0, ttl_sec=60)
+
+    async def scenario():
+        await q.page(BOT)
+        q.forget(1)
+        return await q.page(BOT)
+
+    page = asyncio.run(scenario())
+    assert [it.ad_id for it in page.items] == [3]
+    assert len(session.statements) == 1
+
+
+class FakeBot:
+    id = 1
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+def _result(status, retry_after=0.0):
+    return SimpleNamespace(status=status, retry_after=retry_after)
+
+
+def test_publish_queue_paces_posts_and_dedups(monkeypatch):
+    monkeypatch.setattr(runtime, "REDIS", None, raising=False)
+    now = [0.0]
+    published = []
+    outcomes = {1: "published", 2: "not_pending", 3: "published"}
+
+    async def fake_sleep(sec):
+        now[0] += sec
+
+    async def publish(bot, job, hooks):
+        if outcomes[job.ad_id] == "published":
+            await hooks.before_send()
+        published.append((job.ad_id, now[0]))
+        return _result(outcomes[job.ad_id])
+
+    async def scenario():
+        q = ChannelPublishQueue(posts_per_min=30, publish=publish, clock=lambda: now[0], sleep=fake_sleep)
+        bot = FakeBot()
+        jobs = [PublishJob(ad_id=i, moderator="@mod", report_chat_id=77) for i in (1, 2, 3)]
+        assert await q.enqueue(bot, jobs) == 3
+        assert await q.enqueue(bot, jobs[:1]) == 0
+        assert await q.queued_among(bot, [2, 9]) == {2} and q.depth() == 3
+        assert q.eta_sec() == 4.0
+        for _ in range(10):
+            if not q.depth():
+                break
+            await asyncio.sleep(0)
+        await q.stop(timeout=1)
+        return bot
+
+    bot = asyncio.run(scenario())
+    # 30/мин -> пост раз в 2 с; not_pending слот темпа не ждёт и не тратит
+    assert published == [(1, 0.0), (2, 0.0), (3, 2.0)]
+    assert bot.sent == [(77, render_summary({"published": 2, "not_pending": 1}))]
+
+
+def test_publish_queue_loop_survives_iteration_errors(monkeypatch):
+    monkeypatch.setattr(runtime, "REDIS", None, raising=False)
+    pauses = []
+    calls = [0]
+
+    async def fake_sleep(sec):
+        pauses.append(sec)
+
+    async def scenario():
+        q = ChannelPublishQueue(sleep=fake_sleep)
+
+        async def flaky_run_one(bot, block=False):
+            calls[0] += 1
+            if calls[0] == 1:
+                raise RuntimeError("redis went away")
+            q._stopping = True
+            return None
+
+        q.run_one = flaky_run_one
+        await q.run_loop(FakeBot())
+
+    asyncio.run(scenario())
+    assert calls[0] == 2
+    assert pauses == [publish_queue.PUBLISH_LOOP_ERROR_SEC]
+
+
+def test_publish_queue_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(runtime, "REDIS", None, raising=False)
+    now = [0.0]
+    calls = []
+
+    async def fake_sleep(sec):
+        now[0] += sec
+
+    async def publish(bot, job, hooks):
+        await hooks.before_send()
+        calls.append((job.ad_id, job.attempt, now[0]))
+        if job.attempt == 0:
+            return _result("retry", retry_after=17)
+        return _result("published")
+
+    async def scenario():
+        q = ChannelPublishQueue(posts_per_min=60, publish=publish, clock=lambda: now[0], sleep=fake_sleep)
+        bot = FakeBot()
+        q._jobs[5] = PublishJob(ad_id=5, moderator="@mod", card_chat_id=10, card_message_id=3)
+        assert await q.run_one(bot) == "retry"
+        assert await q.run_one(bot) == "published"
+        assert await q.run_one(bot) is None
+        return bot
+
+    bot = asyncio.run(scenario())
+    # второй заход — не раньше retry_after из 429
+    assert calls == [(5, 0, 0.0), (5, 1, 17.0)]
+    assert bot.sent == []
+
+
+class FakeRedis:
+    def __init__(self):
+        self.kv = {}
+        self.streams = {}
+        self.pending = {}
+        self.seq = 0
+
+    async def set(self, key, value, nx=False, ex=None, px=None):
+        if nx and key in self.kv:
+            return None
+        self.kv[key] = value
+        return True
+
+    async def get(self, key):
+        return self.kv.get(key)
+
+    async def mget(self, keys):
+        return [self.kv.get(k) for k in keys]
+
+    async def delete(self, *keys):
+        for k in keys:
+            self.kv.pop(k, None)
+
+    async def pttl(self, key):
+        return -2
+
+    async def xadd(self, stream, fields):
+        self.seq += 1
+        msg_id = f"{self.seq}-0"
+        self.streams.setdefault(stream, []).append((msg_id, dict(fields)))
+        return msg_id
+
+    async def xgroup_create(self, stream, group, id="0", mkstream=False):
+        self.streams.setdefault(stream, [])
+
+    async def xautoclaim(self, stream, group, consumer, min_idle, start_id="0-0", count=1):
+        return ["0-0", [], []]
+
+    async def xreadgroup(self, group, consumer, streams, count=1, block=None):
+        out = []
+        for stream in streams:
+            fresh = [m for m in self.streams.get(stream, []) if m[0] not in self.pending]
+            if fresh:
+                self.pending[fresh[0][0]] = consumer
+                out.append((stream, fresh[:1]))
+        return out
+
+    async def xack(self, stream, group, msg_id):
+        self.pending.pop(msg_id, None)
+
+    async def xdel(self, stream, msg_id):
+        self.streams[stream] = [m for m in self.streams.get(stream, []) if m[0] != msg_id]
+
+    async def xlen(self, stream):
+        return len(self.streams.get(stream, []))
+
+    def keys(self, pattern):
+        return [k for k in self.kv if fnmatch.fnmatch(k, pattern)]
+
+
+def test_publish_queue_redis_stream_survives_crash_after_send(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(runtime, "REDIS", redis, raising=False)
+    sent_posts = []
+
+    async def publish(bot, job, hooks):
+        if hooks.resume_message_id is None:
+            await hooks.before_send()
+            sent_posts.append(job.ad_id)
+            await hooks.on_sent(900 + job.ad_id)
+            if job.attempt == 0:
+                raise RuntimeError("db down after send")
+        return _result("published")
+
+    async def scenario():
+        q = ChannelPublishQueue(posts_per_min=600, publish=publish, sleep=lambda s: asyncio.sleep(0))
+        q.start = lambda bot: None  # цикл не нужен — шаги вручную
+        bot = FakeBot()
+        job = PublishJob(ad_id=4, moderator="@mod", report_chat_id=77)
+        assert await q.enqueue(bot, [job]) == 1
+        assert await q.enqueue(bot, [job]) == 0  # маркер NX виден и другим процессам
+        assert await q.queued_among(bot, [4, 5]) == {4}
+        assert await q.fetch_depth(bot) == 1
+
+        q._sent.clear()  # «другой процесс»: помнит только Redis
+        assert await q.run_one(bot) == "retry"
+        q._sent.clear()
+        assert await q.run_one(bot) == "published"
+        assert await q.run_one(bot) is None
+        assert await q.fetch_depth(bot) == 0
+        return q
+
+    asyncio.run(scenario())
+    # пост ушёл один раз: повтор только дописал статус по сохранённому message_id
+    assert sent_posts == [4]
+    assert redis.keys("publish_queue:1:ad:*") == [] and redis.keys("publish_queue:1:sent:*") == []
+    assert redis.pending == {}
+
+
+def test_publish_queue_xadd_failure_drops_queued_marker(monkeypatch):
+    class BrokenStreamRedis(FakeRedis):
+        async def xadd(self, stream, fields):
+            raise ConnectionError("redis down")
+
+    redis = BrokenStreamRedis()
+    monkeypatch.setattr(runtime, "REDIS", redis, raising=False)
+
+    async def scenario():
+        q = ChannelPublishQueue(posts_per_min=600, publish=None, sleep=lambda s: asyncio.sleep(0))
+        q.start = lambda bot: None
+        bot = FakeBot()
+        assert await q.enqueue(bot, [PublishJob(ad_id=4, moderator="@mod", report_chat_id=77)]) == 1
+        return q
+
+    q = asyncio.run(scenario())
+    # задача в памяти процесса, маркера «в очереди» в Redis нет
+    assert 4 in q._jobs
+    assert redis.keys("publish_queue:1:ad:*") == []
+
+
+class FakeAdSession:
+    def __init__(self, ad):
+        self.ad = ad
+        self.db_status = ad.status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def refresh(self, obj, attribute_names=None):
+        obj.status = self.db_status
+
+
+class FakeAdRepo:
+    def __init__(self, session):
+        self.session = session
+
+    async def get(self, ad_id):
+        return self.session.ad
+
+    async def mark_published(self, ad_id, *, public_url, channel_message_id, expected_status):
+        return self.session.db_status == expected_status
+
+
+class FakeChannelBot:
+    def __init__(self):
+        self.sent = []
+        self.deleted = []
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.sent.append(text)
+        return SimpleNamespace(message_id=900 + len(self.sent))
+
+    async def delete_message(self, chat_id, message_id):
+        self.deleted.append(message_id)
+
+
+def test_publish_rechecks_status_after_waiting_for_slot(monkeypatch):
+    from findex_bot.handlers import forms
+
+    ad = SimpleNamespace(id=5, status="pending", author_user_id=None, public_url=None,
+                         payload={"role": "employer", "title": "Повар", "location": "м. Курская"})
+    session = FakeAdSession(ad)
+    monkeypatch.setattr(runtime, "MAIN_CHANNEL_ID", -100, raising=False)
+    monkeypatch.setattr(forms, "get_sessionmaker", lambda: (lambda: session))
+    monkeypatch.setattr(forms, "AdRepo", FakeAdRepo)
+
+    async def rejected_while_waiting():
+        session.db_status = "draft"
+
+    async def rejected_during_send(message_id):
+        session.db_status = "draft"
+
+    async def scenario():
+        bot = FakeChannelBot()
+        first = await forms.publish_ad(bot, 5, moderator="m", only_pending=True, before_send=rejected_while_waiting)
+        assert first.status == forms.PUBLISH_NOT_PENDING and bot.sent == []
+
+        ad.status = session.db_status = "pending"
+        second = await forms.publish_ad(bot, 5, moderator="m", only_pending=True, on_sent=rejected_during_send)
+        assert second.status == forms.PUBLISH_NOT_PENDING
+        assert bot.deleted == [901]
+
+    asyncio.run(scenario())
@@ -0,0 +1,50 @@
+from findex_bot.utils import moscow_metro as metro
+from findex_bot.utils.alerts import _matches_location_bidirectional, _split_keywords
+
+
+def test_prefix_search_cyrillic_and_latin():
+    assert [s.name for s in metro.search_stations("кур")] == ["Курская"]
+    assert [s.name for s in metro.search_stations("ворота")] == ["Красные ворота"]
+    assert [s.name for s in metro.search_stations("сокол")][:2] == ["Сокол", "Сокольники"]
+    assert metro.find_station("tverskaya").name == "Тверская"
+    assert metro.find_station("Schelkovskaya").name == metro.find_station("Shchyolkovskaya").name == "Щёлковская"
+    assert metro.find_station("м. тропарево").name == "Тропарёво"
+    assert metro.find_station("Химки") is None
+
+
+def test_suggestions_only_for_unfinished_input():
+    assert [s.name for s in metro.metro_suggestions("кур")] == ["Курская"]
+    assert metro.metro_suggestions("Курская") == []
+    assert metro.metro_suggestions("Москва (Кур)") == []
+    assert metro.metro_suggestions("ку") == []
+    assert metro.metro_suggestions("Казань") == []
+
+    kb = metro.metro_suggest_keyboard(metro.metro_suggestions("кур"))
+    station = kb.inline_keyboard[0][0]
+    assert station.callback_data == "metro_station:3:7"
+    assert metro.resolve_station("3", 7) == "Курская"
+    assert metro.metro_suggest_keyboard(metro.metro_suggestions("кур")) is kb
+
+
+def test_location_input_resolves_stations():
+    assert metro.normalize_location_input("москва, курская") == "Москва (Курская)"
+    assert metro.normalize_location_input("м. kurskaya") == "Москва (Курская)"
+    assert metro.normalize_location_input("Москва (библиотека им. ленина)") == "Москва (Библиотека им. Ленина)"
+    assert metro.validate_location_input("Москва (Библиотека им. Ленина)") is None
+    assert metro.normalize_location_input("химки") == "Химки"
+    assert metro.normalize_location_input("Москва (Непонятная)") == "Москва (Непонятная)"
+
+
+def test_keyboards_are_prebuilt():
+    assert metro.metro_lines_keyboard(0) is metro.metro_lines_keyboard(0)
+    assert metro.metro_lines_keyboard(99) is metro.metro_lines_keyboard(1)
+    assert metro.metro_stations_keyboard("1", 1) is metro.metro_stations_keyboard("1", 5)
+    assert metro.metro_stations_keyboard("nope") is metro.metro_lines_keyboard(0)
+
+
+def test_alert_location_is_station_aware():
+    assert _matches_location_bidirectional("Москва (Пушкинская)", _split_keywords("Тверская"))
+    assert _matches_location_bidirectional("Москва (Курская)", _split_keywords("kurskaya"))
+    assert _matches_location_bidirectional("Москва (Курская)", _split_keywords("Москва"))
+    assert not _matches_location_bidirectional("Москва (Таганская)", _split_keywords("Москва (Курская)"))
+    assert _matches_location_bidirectional("Химки", _split_keywords("химки"))
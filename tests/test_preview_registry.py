@@ -0,0 +1,40 @@
+import asyncio
+
+import findex_bot.runtime as runtime
+from findex_bot.utils import preview_registry as reg
+
+
+def test_registry_modes_and_reregister(monkeypatch):
+    monkeypatch.setattr(runtime, "REDIS", None)
+    monkeypatch.setattr(reg, "_MEM", {})
+
+    async def scenario():
+        await reg.register(1, 100, ad_id=7)
+        # черновик не глушится
+        assert await reg.mode_for_message(1, 100) is None
+
+        await reg.set_mode_for_ad(7, reg.PREVIEW_MODE_MODERATION)
+        assert await reg.mode_for_message(1, 100) == reg.PREVIEW_MODE_MODERATION
+
+        # превью переотправили: старое сообщение больше не считается превью
+        await reg.lock_preview(1, 200, reg.PREVIEW_MODE_PUBLISHED, ad_id=7)
+        assert await reg.lookup(1, 100) is None
+        assert await reg.mode_for_message(1, 200) == reg.PREVIEW_MODE_PUBLISHED
+
+        await reg.set_mode_for_ad(7, reg.PREVIEW_MODE_DRAFT)
+        assert await reg.mode_for_message(1, 200) is None
+        assert await reg.mode_for_message(2, 200) is None
+
+    asyncio.run(scenario())
+
+
+def test_registry_entries_expire(monkeypatch):
+    monkeypatch.setattr(runtime, "REDIS", None)
+    monkeypatch.setattr(reg, "_MEM", {})
+    monkeypatch.setattr(reg, "PREVIEW_REGISTRY_TTL_SECONDS", -1)
+
+    async def scenario():
+        await reg.lock_preview(1, 1, reg.PREVIEW_MODE_MODERATION, ad_id=1)
+        assert await reg.lookup(1, 1) is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from findex_bot.db.repo import (
+    CandidateProfileRepo,
+    ProfileFilter,
+    decode_profile_cursor,
+    encode_profile_cursor,
+)
+from findex_bot.utils.citizenship import citizenship_code
+
+
+def test_citizenship_codes():
+    assert citizenship_code("Россия") == "ru"
+    assert citizenship_code("  РФ ") == "ru"
+    assert citizenship_code("kg") == "kg"
+    assert citizenship_code("Киргизия") == "kg"
+    assert citizenship_code("Сербия") == "сербия"
+    assert citizenship_code("Южная   Корея") == citizenship_code("южная-корея")
+    assert citizenship_code(None) == ""
+
+
+def test_cursor_roundtrip():
+    dt = datetime(2026, 10, 19, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    profile = SimpleNamespace(user_id=77, last_responded_at=None, updated_at=dt)
+    assert decode_profile_cursor(encode_profile_cursor(profile)) == (dt, 77)
+    assert decode_profile_cursor("garbage") is None
+    assert decode_profile_cursor(None) is None
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalars(self):
+        return SimpleNamespace(all=lambda: list(self._rows))
+
+
+class FakeSession:
+    def __init__(self, rows=(), scalar=0):
+        self.rows = list(rows)
+        self.scalar_value = scalar
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return FakeResult(self.rows)
+
+    async def scalar(self, stmt):
+        self.statements.append(stmt)
+        return self.scalar_value
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_search_profiles_uses_keyset_and_indexed_filters():
+    dt = datetime(2026, 10, 19, tzinfo=timezone.utc)
+    rows = [SimpleNamespace(user_id=i, last_responded_at=dt, updated_at=dt) for i in (5, 4, 3)]
+    session = FakeSession(rows)
+    repo = CandidateProfileRepo(session)
+
+    page = asyncio.run(
+        repo.search_profiles(
+            ProfileFilter(citizenship="РФ", username="@Ivan"),
+            limit=2,
+            cursor=f"{dt.isoformat()}|9",
+        )
+    )
+    assert [p.user_id for p in page.items] == [5, 4]
+    assert decode_profile_cursor(page.next_cursor) == (dt, 4)
+
+    sql = _sql(session.statements[0])
+    assert "OFFSET" not in sql and "ILIKE" not in sql.upper()
+    assert "candidate_profiles.citizenship_code = " in sql
+    assert "lower(candidate_profiles.username) = " in sql
+    assert "(coalesce(candidate_profiles.last_responded_at, candidate_profiles.updated_at), candidate_profiles.user_id) < " in sql
+    assert "ORDER BY coalesce(candidate_profiles.last_responded_at, candidate_profiles.updated_at) DESC" in sql
+
+
+def test_count_is_exact_below_cap():
+    session = FakeSession(scalar=17)
+    count = asyncio.run(CandidateProfileRepo(session).count_profiles(ProfileFilter(has_resume=True), exact_cap=100))
+    assert count.value == 17 and count.exact
+    assert "LIMIT" in _sql(session.statements[0])
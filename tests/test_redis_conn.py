@@ -0,0 +1,140 @@
+import asyncio
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+import findex_bot.runtime as runtime
+from findex_bot.utils.redis_conn import STATE_CLOSED, STATE_OPEN, RedisManager
+
+
+class FlakyClient:
+    def __init__(self):
+        self.up = True
+
+    async def ping(self):
+        if not self.up:
+            raise RedisConnectionError("down")
+        return True
+
+    async def execute_command(self, *args, **kwargs):
+        if not self.up:
+            raise RedisConnectionError("down")
+        return "OK"
+
+
+def _manager(monkeypatch, client):
+    monkeypatch.setattr(runtime, "REDIS", None)
+    mgr = RedisManager("redis://unused", publish_runtime=True, failures_to_open=2, reset_sec=0)
+    mgr.client = client
+    mgr._watch_commands(client)
+    return mgr
+
+
+def test_breaker_hides_client_and_brings_the_same_one_back(monkeypatch):
+    client = FlakyClient()
+    mgr = _manager(monkeypatch, client)
+
+    async def scenario():
+        assert await mgr.ping()
+        assert mgr.state == STATE_CLOSED and runtime.REDIS is client
+
+        client.up = False
+        assert not await mgr.ping()
+        assert runtime.REDIS is client  # один сбой — ещё не повод уходить в fallback
+        assert not await mgr.ping()
+        assert mgr.state == STATE_OPEN and runtime.REDIS is None
+
+        client.up = True
+        assert mgr.should_probe()
+        assert await mgr.ping()
+        assert mgr.state == STATE_CLOSED and runtime.REDIS is client
+
+    asyncio.run(scenario())
+    # первый ping после создания — тоже проба (менеджер стартует в open)
+    assert mgr.stats["trips"] == 1 and mgr.stats["probes"] == 2
+
+
+def test_command_connection_errors_open_breaker(monkeypatch):
+    client = FlakyClient()
+    mgr = _manager(monkeypatch, client)
+
+    async def scenario():
+        await mgr.ping()
+        client.up = False
+        for _ in range(2):
+            try:
+                await client.execute_command("GET", "k")
+            except RedisConnectionError:
+                pass
+
+    asyncio.run(scenario())
+    assert mgr.state == STATE_OPEN and runtime.REDIS is None
+    assert mgr.stats["command_errors"] == 2
+
+
+def test_pipeline_connection_errors_open_breaker(monkeypatch):
+    class FlakyPipeline:
+        def __init__(self, client):
+            self.client = client
+
+        async def immediate_execute_command(self, *args, **kwargs):
+            if not self.client.up:
+                raise RedisConnectionError("down")
+            return "OK"
+
+        async def execute(self):
+            if not self.client.up:
+                raise RedisConnectionError("down")
+            return []
+
+    class PipelineClient(FlakyClient):
+        def pipeline(self, transaction=True):
+            return FlakyPipeline(self)
+
+    client = PipelineClient()
+    mgr = _manager(monkeypatch, client)
+
+    async def scenario():
+        await mgr.ping()
+        client.up = False
+        pipe = client.pipeline(transaction=True)
+        for call in (pipe.immediate_execute_command("WATCH", "k"), pipe.execute()):
+            try:
+                await call
+            except RedisConnectionError:
+                pass
+
+    asyncio.run(scenario())
+    assert mgr.state == STATE_OPEN and runtime.REDIS is None
+    assert mgr.stats["command_errors"] == 2
+
+
+def test_failed_probe_reopens(monkeypatch):
+    client = FlakyClient()
+    mgr = _manager(monkeypatch, client)
+    client.up = False
+
+    async def scenario():
+        assert not await mgr.ping()  # стартовое состояние open -> half_open -> open
+
+    asyncio.run(scenario())
+    assert mgr.state == STATE_OPEN and runtime.REDIS is None
+
+
+def test_explicit_pool_settings_and_unreachable_redis(monkeypatch):
+    monkeypatch.setattr(runtime, "REDIS", None)
+    mgr = RedisManager("redis://127.0.0.1:1/0", publish_runtime=True, max_connections=7)
+
+    async def scenario():
+        client = await mgr.connect()
+        kw = mgr.pool.connection_kwargs
+        assert mgr.pool.max_connections == 7
+        assert kw["socket_keepalive"] is True and kw["retry_on_timeout"] is True
+        assert client is mgr.client and not mgr.available
+        assert mgr.pool_stats()["max"] == 7
+        lines = []
+        mgr.render_prometheus(lines)
+        assert "findex_redis_breaker_open 1" in lines
+        await mgr.close()
+
+    asyncio.run(scenario())
+    assert runtime.REDIS is None
@@ -0,0 +1,152 @@
+import asyncio
+
+import findex_bot.runtime as runtime
+from findex_bot.utils.scheduler import KEY_DELAYED_ACTIONS, DelayedActionScheduler
+
+
+class FakeBot:
+    id = 42
+
+    def __init__(self):
+        self.deleted = []
+
+    async def delete_message(self, chat_id, message_id):
+        self.deleted.append((chat_id, message_id))
+        return True
+
+
+class FakeRedis:
+    """ZADD + EVAL claim-скрипта (ZRANGEBYSCORE LIMIT / ZREM / ближайший score)."""
+
+    def __init__(self):
+        self.zsets = {}
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    async def eval(self, script, numkeys, key, now, limit):
+        z = self.zsets.setdefault(key, {})
+        due = sorted((m for m, s in z.items() if s <= float(now)), key=z.get)[: int(limit)]
+        for m in due:
+            z.pop(m)
+        nxt = min(z.values()) if z else None
+        return [due, repr(nxt) if nxt is not None else ""]
+
+
+def test_memory_queue_runs_due_actions_and_after_hook(monkeypatch):
+    monkeypatch.setattr(runtime, "REDIS", None)
+    bot = FakeBot()
+    seen = []
+
+    async def after():
+        seen.append("after")
+
+    async def scenario():
+        s = DelayedActionScheduler()
+        await s.schedule(bot, 1, 10, 0, after=after)
+        await s.schedule(bot, 2, 20, 60)
+        done, next_due = await s.run_due(bot)
+        assert done == 1 and next_due is not None
+        assert s.pending_memory() == 1
+
+    asyncio.run(scenario())
+    assert bot.deleted == [(1, 10)]
+    assert seen == ["after"]
+
+
+def test_reschedule_replaces_previous_due(monkeypatch):
+    monkeypatch.setattr(runtime, "REDIS", None)
+    bot = FakeBot()
+
+    async def scenario():
+        s = DelayedActionScheduler()
+        await s.schedule(bot, 1, 10, 0)
+        await s.schedule(bot, 1, 10, 60)
+        done, _ = await s.run_due(bot)
+        assert done == 0
+        done, _ = await s.run_due(bot, now=10**12)
+        assert done == 1
+
+    asyncio.run(scenario())
+    assert bot.deleted == [(1, 10)]
+
+
+def test_batch_is_rate_limited(monkeypatch):
+    monkeypatch.setattr(runtime, "REDIS", None)
+    bot = FakeBot()
+
+    async def scenario():
+        s = DelayedActionScheduler(rate=2)
+        for mid in range(5):
+            await s.schedule(bot, 1, mid, 0)
+        return [(await s.run_due(bot))[0] for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [2, 2, 1]
+
+
+def test_redis_entries_survive_restart(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(runtime, "REDIS", redis)
+    bot = FakeBot()
+
+    async def old_process():
+        s = DelayedActionScheduler()
+        await s.schedule(bot, 1, 10, 0.01)
+        # остановка до срока: в Redis ничего не трогаем
+        assert await s.stop() == 0
+
+    asyncio.run(old_process())
+    key = KEY_DELAYED_ACTIONS.format(bot_id=42)
+    assert list(redis.zsets[key]) == ["delete:1:10"]
+
+    async def new_process():
+        s = DelayedActionScheduler(idle_sec=0.05)
+        s.start(bot)
+        await asyncio.sleep(0.2)
+        await s.stop()
+
+    asyncio.run(new_process())
+    assert bot.deleted == [(1, 10)]
+    assert redis.zsets[key] == {}
+
+
+def test_stop_flushes_memory_queue(monkeypatch):
+    monkeypatch.setattr(runtime, "REDIS", None)
+    bot = FakeBot()
+
+    async def scenario():
+        s = DelayedActionScheduler()
+        s.start(bot)
+        await s.schedule(bot, 3, 30, 60)
+        return await s.stop()
+
+    assert asyncio.run(scenario()) == 1
+    assert bot.deleted == [(3, 30)]
+
+
+def test_loop_survives_iteration_errors(monkeypatch):
+    from findex_bot.utils import scheduler
+
+    monkeypatch.setattr(runtime, "REDIS", None)
+    monkeypatch.setattr(scheduler, "DELAYED_ACTIONS_ERROR_SEC", 0.0)
+    calls = [0]
+
+    async def scenario():
+        s = DelayedActionScheduler()
+        stop = asyncio.Event()
+
+        async def flaky_run_due(bot, now=None):
+            calls[0] += 1
+            if calls[0] == 1:
+                raise RuntimeError("boom")
+            stop.set()
+            return 0, None
+
+        s.run_due = flaky_run_due
+        task = s.start(FakeBot())
+        await asyncio.wait_for(stop.wait(), timeout=2)
+        assert not task.done()
+        await s.stop()
+
+    asyncio.run(scenario())
+    assert calls[0] >= 2
@@ -0,0 +1,115 @@
+import asyncio
+from types import SimpleNamespace
+
+import findex_bot.runtime as runtime
+from findex_bot.handlers import inline_share
+from findex_bot.utils import share_cache
+
+
+def _ad(status="published", **payload):
+    base = {"role": "employer", "title": "Повар", "salary": "100", "location": "м. Курская", "contacts": "@c"}
+    base.update(payload)
+    return SimpleNamespace(id=5, role="employer", status=status, payload=base)
+
+
+class FakeSession:
+    def __init__(self, ads):
+        self.ads = ads
+        self.loads = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeRepo:
+    def __init__(self, session):
+        self.session = session
+
+    async def get(self, ad_id):
+        self.session.loads += 1
+        return self.session.ads.get(ad_id)
+
+
+class FakeQuery:
+    def __init__(self, query):
+        self.query = query
+        self.offset = ""
+        self.answers = []
+
+    async def answer(self, results, **kwargs):
+        self.answers.append((results, kwargs))
+
+
+def _setup(monkeypatch, ads):
+    monkeypatch.setattr(runtime, "REDIS", None, raising=False)
+    monkeypatch.setattr(runtime, "BOT_USERNAME", "findex_bot", raising=False)
+    share_cache._MEM.clear()
+    session = FakeSession(ads)
+    monkeypatch.setattr(inline_share, "get_sessionmaker", lambda: (lambda: session))
+    monkeypatch.setattr(inline_share, "AdRepo", FakeRepo)
+    return session
+
+
+def test_share_answers_from_cache_with_public_cache_time(monkeypatch):
+    session = _setup(monkeypatch, {5: _ad()})
+
+    async def scenario():
+        queries = [FakeQuery("share_ad_5") for _ in range(3)]
+        for iq in queries:
+            await inline_share.inline_share_handler(iq)
+        return queries
+
+    queries = asyncio.run(scenario())
+    assert session.loads == 1
+    for iq in queries:
+        (results, kwargs), = iq.answers
+        assert [r.id for r in results] == ["share_ad_5"]
+        assert kwargs["is_personal"] is False
+        assert kwargs["cache_time"] == inline_share.SHARE_INLINE_CACHE_TIME
+    assert "start=resp_5" in queries[0].answers[0][0][0].input_message_content.message_text
+
+
+def test_not_shareable_is_cached_and_invalidated(monkeypatch):
+    ads = {5: _ad(status="pending")}
+    session = _setup(monkeypatch, ads)
+
+    async def ask():
+        iq = FakeQuery("share_ad_5")
+        await inline_share.inline_share_handler(iq)
+        (results, kwargs), = iq.answers
+        return results, kwargs
+
+    async def scenario():
+        first = await ask()
+        second = await ask()
+        ads[5] = _ad()
+        # служебный патч payload кэш не трогает, публикация — сбрасывает
+        assert not share_cache.affects_share(["preview_message_id", "preview_collapsed"])
+        assert share_cache.affects_share(["title"])
+        await share_cache.invalidate(5)
+        third = await ask()
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert first[0] == [] and first[1]["is_personal"] is True
+    assert second[0] == []
+    assert [r.id for r in third[0]] == ["share_ad_5"]
+    assert session.loads == 2
+
+
+def test_cache_entry_roundtrip_and_username_check(monkeypatch):
+    monkeypatch.setattr(runtime, "REDIS", None, raising=False)
+    share_cache._MEM.clear()
+    card = share_cache.ShareCard(ad_id=1, title="t", description="d", text="<b>x</b>")
+    entry = share_cache.CacheEntry(card=card, bot_username="a_bot")
+    assert share_cache.CacheEntry.loads(entry.dumps()) == entry
+
+    async def scenario():
+        await share_cache.put(1, entry)
+        return await share_cache.get(1, "a_bot"), await share_cache.get(1, "other_bot")
+
+    same, other = asyncio.run(scenario())
+    assert same == entry and other is None
@@ -0,0 +1,69 @@
+from findex_bot.utils.similarity import (
+    SIM_BANDS,
+    SIM_NUM_PERM,
+    Match,
+    contact_tokens,
+    estimate_jaccard,
+    rank_candidates,
+    render_matches,
+    signature_for,
+    with_note,
+)
+
+AD = {
+    "title": "Требуется повар на кухню",
+    "description": "Кафе в центре ищет повара горячего цеха. График 2/2, оплата ежедневно, питание, форма. Опыт от года.",
+    "location": "Москва, м. Тверская",
+    "contacts": "+7 999 111-22-33, @cafe_hr",
+}
+
+
+def test_signature_is_deterministic_and_fits_postgres_types():
+    a = signature_for(AD)
+    b = signature_for(dict(AD))
+    assert a == b
+    assert len(a.values) == SIM_NUM_PERM and len(a.bands) == SIM_BANDS
+    assert all(-(2**31) <= v < 2**31 for v in a.values)
+    assert all(-(2**63) <= v < 2**63 for v in a.bands)
+    assert signature_for({}) is None
+
+
+def test_repost_with_small_edits_is_near_duplicate():
+    repost = dict(
+        AD,
+        description=AD["description"].replace("ежедневно", "еженедельно").upper(),
+        contacts="8 (999) 111 22 33",
+    )
+    a, b = signature_for(AD), signature_for(repost)
+    assert estimate_jaccard(a.values, b.values) > 0.6
+    assert set(a.bands) & set(b.bands)
+
+
+def test_unrelated_ad_is_not_candidate():
+    other = {"title": "Курьер", "description": "Доставка по району на своём велосипеде", "contacts": "@other_hr"}
+    a, b = signature_for(AD), signature_for(other)
+    assert estimate_jaccard(a.values, b.values) < 0.3
+    assert not set(a.bands) & set(b.bands)
+
+
+def test_contact_tokens_normalize_phone_formats():
+    assert contact_tokens("+7 (999) 111-22-33") == contact_tokens("89991112233")
+    assert "tg:cafe_hr" in contact_tokens("пишите @Cafe_HR")
+
+
+def test_rank_candidates_orders_and_filters():
+    sig = [1] * SIM_NUM_PERM
+    half = [1] * (SIM_NUM_PERM // 2) + [0] * (SIM_NUM_PERM // 2)
+    candidates = [(10, [0] * SIM_NUM_PERM, None), (11, half, None), (12, sig, "https://t.me/c/1/2")]
+    out = rank_candidates(sig, candidates, k=3, min_score=0.5)
+    assert [m.ad_id for m in out] == [12, 11]
+    assert rank_candidates(sig, candidates, k=1)[0].score == 1.0
+
+
+def test_render_and_caption_limit():
+    note = render_matches([Match(ad_id=7, score=0.874, public_url='https://t.me/x?a=1&b="2"'), Match(ad_id=8, score=0.5)])
+    assert "#8 50%" in note and "87%" in note and "&amp;" in note and "&quot;" in note
+    assert render_matches([]) == ""
+    assert with_note("card", note, media=True) == "card" + note
+    assert with_note("x" * 1020, note, media=True) == "x" * 1020
+    assert with_note("x" * 1020, note, media=False).endswith(note)
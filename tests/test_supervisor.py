@@ -0,0 +1,63 @@
+import asyncio
+
+import findex_bot.runtime as runtime
+from findex_bot.utils.scheduler import DelayedActionScheduler
+from findex_bot.utils.supervisor import TaskSupervisor
+
+
+class FakeBot:
+    id = 42
+
+    def __init__(self):
+        self.deleted = []
+
+    async def delete_message(self, chat_id, message_id):
+        self.deleted.append((chat_id, message_id))
+        return True
+
+
+def test_drain_waits_for_updates_and_background_tasks():
+    done = []
+
+    async def scenario():
+        sup = TaskSupervisor(DelayedActionScheduler())
+        sup.update_started()
+
+        async def finish_update():
+            await asyncio.sleep(0.02)
+            done.append("update")
+            sup.update_finished()
+
+        async def commit():
+            await asyncio.sleep(0.03)
+            done.append("task")
+
+        async def stuck():
+            await asyncio.sleep(60)
+
+        asyncio.get_running_loop().create_task(finish_update())
+        sup.spawn(commit())
+        sup.spawn(stuck())
+        report = await sup.drain(timeout=0.2)
+        assert sup.accepting is False
+        assert sup.pending_tasks() == 0
+        return report
+
+    report = asyncio.run(scenario())
+    assert done == ["update", "task"]
+    assert report == {"unfinished_updates": 0, "flushed_memory_actions": 0, "cancelled_tasks": 1}
+
+
+def test_drain_without_redis_runs_pending_deletions_now(monkeypatch):
+    monkeypatch.setattr(runtime, "REDIS", None)
+    bot = FakeBot()
+
+    async def scenario():
+        sup = TaskSupervisor(DelayedActionScheduler())
+        sup.scheduler.start(bot)
+        await sup.scheduler.schedule(bot, 3, 30, 60)
+        return await sup.drain(timeout=1)
+
+    report = asyncio.run(scenario())
+    assert report["flushed_memory_actions"] == 1
+    assert bot.deleted == [(3, 30)]
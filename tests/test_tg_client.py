@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetChatMember, SendMessage
+
+from findex_bot.utils.tg_client import RequestCoalescingMiddleware, RetryAfterMiddleware, TunedAiohttpSession
+
+
+def _bot() -> Bot:
+    return Bot(token="42:TEST")
+
+
+def test_concurrent_get_chat_member_share_one_request():
+    mw = RequestCoalescingMiddleware()
+    calls = []
+
+    async def make_request(bot, method):
+        calls.append(method)
+        await asyncio.sleep(0.01)
+        return f"member:{method.user_id}"
+
+    async def scenario():
+        bot = _bot()
+        same = [mw(make_request, bot, GetChatMember(chat_id=-100, user_id=5)) for _ in range(5)]
+        other = mw(make_request, bot, GetChatMember(chat_id=-100, user_id=6))
+        res = await asyncio.gather(*same, other)
+        await bot.session.close()
+        return res
+
+    res = asyncio.run(scenario())
+    assert res[:5] == ["member:5"] * 5
+    assert res[5] == "member:6"
+    assert len(calls) == 2
+    assert mw.coalesced == 4
+    assert mw._inflight == {}
+
+
+def test_leader_cancellation_does_not_cancel_waiters():
+    mw = RequestCoalescingMiddleware()
+    calls = []
+
+    async def make_request(bot, method):
+        calls.append(method)
+        await asyncio.sleep(0.02)
+        return "member"
+
+    async def scenario():
+        bot = _bot()
+        method = GetChatMember(chat_id=-100, user_id=5)
+        leader = asyncio.create_task(mw(make_request, bot, method))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(mw(make_request, bot, method))
+        await asyncio.sleep(0)
+        leader.cancel()
+        res = await asyncio.gather(leader, waiter, return_exceptions=True)
+        await bot.session.close()
+        return leader, waiter, res
+
+    leader, waiter, res = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert not waiter.cancelled() and res[1] == "member"
+    assert len(calls) == 1
+    assert mw._inflight == {}
+
+
+def test_write_methods_are_not_coalesced():
+    mw = RequestCoalescingMiddleware()
+    calls = []
+
+    async def make_request(bot, method):
+        calls.append(method)
+        await asyncio.sleep(0)
+        return True
+
+    async def scenario():
+        bot = _bot()
+        m = SendMessage(chat_id=1, text="x")
+        await asyncio.gather(mw(make_request, bot, m), mw(make_request, bot, m))
+        await bot.session.close()
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_retry_after_waits_and_repeats():
+    mw = RetryAfterMiddleware(attempts=2, max_wait=5)
+    attempts = []
+
+    async def make_request(bot, method):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise TelegramRetryAfter(method=method, message="flood", retry_after=0)
+        return "ok"
+
+    async def scenario():
+        bot = _bot()
+        res = await mw(make_request, bot, SendMessage(chat_id=1, text="x"))
+        await bot.session.close()
+        return res
+
+    assert asyncio.run(scenario()) == "ok"
+    assert len(attempts) == 2
+
+
+def test_retry_after_too_long_is_raised():
+    mw = RetryAfterMiddleware(attempts=2, max_wait=5)
+
+    async def make_request(bot, method):
+        raise TelegramRetryAfter(method=method, message="flood", retry_after=60)
+
+    async def scenario():
+        bot = _bot()
+        try:
+            await mw(make_request, bot, SendMessage(chat_id=1, text="x"))
+        finally:
+            await bot.session.close()
+
+    with pytest.raises(TelegramRetryAfter):
+        asyncio.run(scenario())
+
+
+def test_tuned_connector_settings():
+    s = TunedAiohttpSession(limit=20, keepalive_timeout=15)
+    assert s._connector_init["limit"] == 20
+    assert s._connector_init["limit_per_host"] == 20
+    assert s._connector_init["keepalive_timeout"] == 15
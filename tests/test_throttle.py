@@ -0,0 +1,74 @@
+import asyncio
+
+from aiogram.types import CallbackQuery, User
+
+import findex_bot.runtime as runtime
+from findex_bot.middlewares.throttle import DEFAULT_COST, ROUTE_COSTS, ThrottleMiddleware, route_cost
+
+
+def test_gcra_burst_then_refill():
+    t = ThrottleMiddleware(window_seconds=10, limit=5)
+    now = 1_000_000
+
+    assert all(t._check_memory(1, 1, now) == 0 for _ in range(5))
+    retry = t._check_memory(1, 1, now)
+    assert retry == t.interval_ms
+
+    # другой пользователь не затронут
+    assert t._check_memory(2, 1, now) == 0
+    # через interval снова пропускает одно событие
+    assert t._check_memory(1, 1, now + t.interval_ms) == 0
+
+
+def test_heavy_cost_consumes_more_budget():
+    t = ThrottleMiddleware(window_seconds=10, limit=6)
+    now = 0
+
+    assert t._check_memory(1, 3, now) == 0
+    assert t._check_memory(1, 3, now) == 0
+    assert t._check_memory(1, 1, now) > 0
+
+
+def test_idle_users_are_swept():
+    t = ThrottleMiddleware(window_seconds=10, limit=5)
+    t._check_memory(1, 1, 0)
+    t._check_memory(2, 1, 0)
+    t._sweep(60_000)
+    assert t._mem_tat == {}
+
+
+def test_noop_routes_are_free():
+    assert dict(ROUTE_COSTS)["al_noop"] == 0
+    assert route_cost(_cb("resp_noop")) == 0
+    assert route_cost(_cb("noop")) == 0
+
+
+def _cb(data: str, user_id: int = 1) -> CallbackQuery:
+    return CallbackQuery(
+        id="1", from_user=User(id=user_id, is_bot=False, first_name="u"), chat_instance="c", data=data,
+    )
+
+
+def test_submit_routes_are_heavy():
+    assert route_cost(_cb("resp_form_send:42")) > DEFAULT_COST
+    assert route_cost(_cb("resp_fast_send:42")) > DEFAULT_COST
+    # открытие формы отклика — обычный клик
+    assert route_cost(_cb("respond:42")) == DEFAULT_COST
+
+
+def test_moderators_are_not_throttled(monkeypatch):
+    monkeypatch.setattr(runtime, "MODERATORS", {7})
+    monkeypatch.setattr(runtime, "REDIS", None)
+    t = ThrottleMiddleware(window_seconds=10, limit=2)
+    passed: list[str] = []
+
+    async def handler(event, _data):
+        passed.append(event.data)
+
+    async def scenario():
+        for n in range(10):
+            await t(handler, _cb(f"approve:{n}", user_id=7), {})
+
+    asyncio.run(scenario())
+    assert len(passed) == 10
+    assert t._mem_tat == {}
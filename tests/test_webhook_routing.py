@@ -0,0 +1,69 @@
+import asyncio
+
+from findex_bot.webhook import OrderedFeeder, route_key, shard_for
+
+
+def test_route_key_prefers_sender():
+    cb = {"update_id": 1, "callback_query": {"from": {"id": 42}, "message": {"chat": {"id": -100}}}}
+    post = {"update_id": 2, "channel_post": {"chat": {"id": -100500}}}
+
+    assert route_key(cb) == 42
+    assert route_key(post) == -100500
+    assert route_key({"update_id": 3}) == 0
+
+
+def test_shard_is_stable_and_in_range():
+    shards = {shard_for(uid, 4) for uid in range(1000)}
+
+    assert shards == {0, 1, 2, 3}
+    assert shard_for(777, 4) == shard_for(777, 4)
+    assert shard_for(777, 1) == 0
+
+
+def test_feeder_keeps_per_user_order():
+    seen: list[tuple[int, int]] = []
+
+    class _Dp:
+        async def feed_raw_update(self, _bot, raw):
+            # первый апдейт пользователя "медленный" — второй не должен его обогнать
+            if raw["uid"] == 1 and raw["n"] == 0:
+                await asyncio.sleep(0.01)
+            seen.append((raw["uid"], raw["n"]))
+
+    async def scenario():
+        feeder = OrderedFeeder(_Dp(), bot=None)
+        for n in range(3):
+            feeder.submit(1, {"uid": 1, "n": n})
+        feeder.submit(2, {"uid": 2, "n": 0})
+        await feeder.drain()
+        assert feeder.inflight() == 0
+
+    asyncio.run(scenario())
+
+    assert [n for uid, n in seen if uid == 1] == [0, 1, 2]
+    # другой пользователь не ждал медленный апдейт
+    assert seen.index((2, 0)) < seen.index((1, 0))
+
+
+def test_submit_future_resolves_after_handling():
+    seen: list[int] = []
+
+    class _Dp:
+        async def feed_raw_update(self, _bot, raw):
+            await asyncio.sleep(0.01)
+            if raw["n"] == 1:
+                raise RuntimeError("handler failed")
+            seen.append(raw["n"])
+
+    async def scenario():
+        feeder = OrderedFeeder(_Dp(), bot=None)
+        first = feeder.submit(1, {"uid": 1, "n": 0})
+        second = feeder.submit(1, {"uid": 1, "n": 1})
+        assert not first.done()
+        await first
+        assert seen == [0]
+        # ошибка хендлера логируется, но future всё равно завершается
+        await asyncio.wait_for(second, 1)
+        await feeder.drain()
+
+    asyncio.run(scenario())